@@ -0,0 +1,27 @@
+import os
+from app.core.metrics import REGISTRY
+from app.core.tracing import TRACER
+from app.services.flow_service import FlowService
+from app.services.log_service import LogService
+from app.services.log_shipper import LogShipper
+from app.services.catalog_cache import CatalogCache
+from app.services.catalog_sync import CatalogSyncer
+
+# 日志路由和流程执行写入同一个日志服务，由日志转发组件统一上传到 SaaS 平台；
+# 配置 LOG_SEGMENT_DIR 时日志段写入磁盘，重启后日志转发从已确认的 offset 继续
+log_service = LogService(segment_dir=os.environ.get("LOG_SEGMENT_DIR"))
+# 流程、步骤和执行路由共享同一个服务实例，保证流程状态和执行计划一致
+flow_service = FlowService(log_service)
+# 未配置 SAAS_API_URL 时为None
+log_shipper = LogShipper.from_env(log_service)
+# SaaS 平台已发布模板和知识库的本地缓存；配置 CATALOG_SNAPSHOT_PATH 时启动即从快照加载
+catalog_cache = CatalogCache(os.environ.get("CATALOG_SNAPSHOT_PATH"))
+# 未配置 SAAS_API_URL 时为None
+catalog_syncer = CatalogSyncer.from_env(catalog_cache)
+
+# 已有的统计在输出 /metrics 时读取
+REGISTRY.add_collector(flow_service.collect_metrics)
+REGISTRY.add_collector(catalog_cache.collect_metrics)
+if log_shipper is not None:
+    REGISTRY.add_collector(log_shipper.collect_metrics)
+REGISTRY.add_collector(TRACER.collect_metrics)
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
+from app.core.serialization import json_response
+from app.api.deps import catalog_cache, catalog_syncer
+
+router = APIRouter()
+
+@router.get("/templates", response_model=List[Dict[str, Any]])
+async def list_templates(category: Optional[str] = None):
+    """获取本地缓存的已发布模板列表"""
+    return json_response(catalog_cache.list_templates(category))
+
+@router.get("/templates/{template_id}", response_model=Dict[str, Any])
+async def get_template(template_id: str):
+    """根据ID获取本地缓存的模板"""
+    template = catalog_cache.get_template(template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found in local catalog")
+    return template
+
+@router.get("/knowledge", response_model=List[Dict[str, Any]])
+async def list_knowledge_items(category: Optional[str] = None):
+    """获取本地缓存的知识库条目列表"""
+    return json_response(catalog_cache.list_knowledge_items(category))
+
+@router.get("/knowledge/{item_id}", response_model=Dict[str, Any])
+async def get_knowledge_item(item_id: str):
+    """根据ID获取本地缓存的知识库条目"""
+    item = catalog_cache.get_knowledge_item(item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Knowledge item not found in local catalog")
+    return item
+
+@router.get("/stats")
+async def get_catalog_stats():
+    """获取本地缓存和同步状态"""
+    if catalog_syncer is None:
+        return catalog_cache.stats()
+    return catalog_syncer.stats()
+
+@router.post("/sync")
+async def sync_catalog():
+    """立即从 SaaS 平台同步一次"""
+    if catalog_syncer is None:
+        raise HTTPException(status_code=404, detail="Catalog sync is not configured")
+    try:
+        # 同步会阻塞在 HTTP 请求和快照写入上，放到线程池执行，不占用事件循环
+        applied = await run_in_threadpool(catalog_syncer.sync_once)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Catalog sync failed: {str(e)}")
+    return {"applied": applied, "version": catalog_cache.version}
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
 from app.schemas.execution import Execution, ExecutionCreate, ExecutionUpdate
-from app.services.flow_service import FlowService
+from app.core.serialization import json_response
+from app.api.deps import flow_service
 
 router = APIRouter()
-flow_service = FlowService()
 
 @router.get("/flow/{flow_id}", response_model=List[Execution])
 async def list_executions(flow_id: str):
     """获取指定流程的所有执行实例"""
-    return flow_service.get_executions_by_flow_id(flow_id)
+    return json_response(flow_service.get_executions_by_flow_id(flow_id))
 
 @router.get("/{execution_id}", response_model=Execution)
 async def get_execution(execution_id: str):
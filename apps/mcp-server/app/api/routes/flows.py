@@ -1,15 +1,16 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
+import copy
 from app.schemas.flow import Flow, FlowCreate, FlowUpdate
-from app.services.flow_service import FlowService
+from app.core.serialization import json_response
+from app.api.deps import flow_service, catalog_cache
 
 router = APIRouter()
-flow_service = FlowService()
 
 @router.get("/", response_model=List[Flow])
 async def list_flows():
     """获取所有流程列表"""
-    return flow_service.get_all_flows()
+    return json_response(flow_service.get_all_flows())
 
 @router.get("/{flow_id}", response_model=Flow)
 async def get_flow(flow_id: str):
@@ -24,10 +25,27 @@ async def create_flow(flow: FlowCreate):
     """创建新流程"""
     return flow_service.create_flow(flow)
 
+@router.post("/from-template/{template_id}", response_model=Flow)
+async def create_flow_from_template(template_id: str):
+    """根据本地缓存的 SaaS 模板创建流程"""
+    template = catalog_cache.get_template(template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found in local catalog")
+    return flow_service.create_flow(FlowCreate(
+        name=template["name"],
+        description=template.get("description"),
+        # 缓存内容只读，流程持有自己的 DSL 副本
+        dsl=copy.deepcopy(template["dsl"]),
+        version=template.get("version") or "1.0"
+    ))
+
 @router.put("/{flow_id}", response_model=Flow)
 async def update_flow(flow_id: str, flow: FlowUpdate):
     """更新流程"""
-    updated_flow = flow_service.update_flow(flow_id, flow)
+    try:
+        updated_flow = flow_service.update_flow(flow_id, flow)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not updated_flow:
         raise HTTPException(status_code=404, detail="Flow not found")
     return updated_flow
@@ -39,3 +57,14 @@ async def delete_flow(flow_id: str):
     if not success:
         raise HTTPException(status_code=404, detail="Flow not found")
     return {"message": "Flow deleted successfully"}
+
+@router.post("/{flow_id}/publish", response_model=Flow)
+async def publish_flow(flow_id: str):
+    """发布流程（编译并校验 DSL）"""
+    try:
+        flow = flow_service.publish_flow(flow_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not flow:
+        raise HTTPException(status_code=404, detail="Flow not found")
+    return flow
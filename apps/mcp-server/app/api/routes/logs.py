@@ -1,16 +1,23 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import List
 from app.schemas.log import Log, LogCreate
-from app.services.log_service import LogService
+from app.core.serialization import json_response
+from app.api.deps import log_service, log_shipper
 from datetime import datetime
 
 router = APIRouter()
-log_service = LogService()
 
 @router.get("/execution/{execution_id}", response_model=List[Log])
 async def list_logs_by_execution(execution_id: str):
     """根据执行实例ID获取日志列表"""
-    return log_service.get_logs_by_execution_id(execution_id)
+    return json_response(log_service.get_logs_by_execution_id(execution_id))
+
+@router.get("/shipper/stats")
+async def get_shipper_stats():
+    """获取日志转发状态"""
+    if log_shipper is None:
+        raise HTTPException(status_code=404, detail="Log shipper is not configured")
+    return log_shipper.stats()
 
 @router.get("/{log_id}", response_model=Log)
 async def get_log(log_id: str):
@@ -23,7 +30,7 @@ async def get_log(log_id: str):
 @router.post("/", response_model=Log)
 async def create_log(log: LogCreate):
     """创建新日志"""
-    return log_service.create_log(log)
+    return log_service.create_log(log.dict())
 
 @router.get("/search", response_model=List[Log])
 async def search_logs(
@@ -36,7 +43,7 @@ async def search_logs(
     limit: int = Query(100, le=1000)
 ):
     """搜索日志"""
-    return log_service.search_logs(
+    return json_response(log_service.search_logs(
         flow_id=flow_id,
         execution_id=execution_id,
         step_id=step_id,
@@ -44,4 +51,4 @@ async def search_logs(
         start_time=start_time,
         end_time=end_time,
         limit=limit
-    )
+    ))
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
 from app.schemas.step import Step, StepCreate, StepUpdate
-from app.services.flow_service import FlowService
+from app.core.serialization import json_response
+from app.api.deps import flow_service
 
 router = APIRouter()
-flow_service = FlowService()
 
 @router.get("/flow/{flow_id}", response_model=List[Step])
 async def list_steps(flow_id: str):
     """获取指定流程的所有步骤"""
-    return flow_service.get_steps_by_flow_id(flow_id)
+    return json_response(flow_service.get_steps_by_flow_id(flow_id))
 
 @router.get("/{step_id}", response_model=Step)
 async def get_step(step_id: str):
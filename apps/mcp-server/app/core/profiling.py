@@ -0,0 +1,398 @@
+# 与 apps/saas-api、apps/mcp-server 中的同名模块保持完全一致，修改时两处同步（tests/test_shared_modules.py 检查）
+from typing import Any, Dict, List, Optional
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import functools
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from app.core.tracing import current_span
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 单次采样的时长和间隔上限
+MAX_PROFILE_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+
+# CPU 采样依赖线程级 CPU 时钟（Linux 等 POSIX 平台）
+CPU_SAMPLING_SUPPORTED = hasattr(time, "pthread_getcpuclockid")
+
+class Profile:
+    """
+    一次采样的结果：折叠栈 -> 权重（微秒）
+
+    折叠栈以线程名为根，从外到内用分号连接，可直接交给 flamegraph.pl 或 speedscope。
+    """
+
+    def __init__(self, mode: str, interval: float):
+        self.mode = mode
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.duration = 0.0
+
+    def add(self, stack: str, weight_us: int) -> None:
+        self.stacks[stack] = self.stacks.get(stack, 0) + weight_us
+
+    def collapsed(self) -> str:
+        """折叠栈格式，每行为 "栈 权重"，按权重降序"""
+        lines = [f"{stack} {weight}" for stack, weight in sorted(self.stacks.items(), key=lambda item: -item[1])]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def speedscope(self, name: str = "profile") -> Dict[str, Any]:
+        """speedscope 的 sampled 格式（https://www.speedscope.app/file-format-schema.json）"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[str, int] = {}
+        samples = []
+        weights = []
+        for stack, weight in self.stacks.items():
+            sample = []
+            for label in stack.split(";"):
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label})
+                sample.append(index[label])
+            samples.append(sample)
+            weights.append(weight)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{name} ({self.mode})",
+                "unit": "microseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "mcp-platform",
+        }
+
+class SamplingProfiler:
+    """
+    对进程内所有线程定时采样调用栈
+
+    wall 模式按墙钟时间记录每个线程（包括等待 I/O 和锁的线程）；
+    cpu 模式只记录两次采样之间线程 CPU 时钟前进过的线程，权重为实际消耗的 CPU 时间。
+    采样在调用 run 的线程中进行，采样线程自身不计入结果；同一时间只允许一个采样。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, mode: str = "wall", interval: float = 0.01) -> Profile:
+        """
+        采样指定时长
+
+        Args:
+            seconds: 采样时长（秒）
+            mode: wall 或 cpu
+            interval: 采样间隔（秒）
+
+        Returns:
+            采样结果
+
+        Raises:
+            ValueError: 参数无效或平台不支持 CPU 采样
+            RuntimeError: 已有采样在进行
+        """
+        if mode not in ("wall", "cpu"):
+            raise ValueError(f"未知的采样模式: {mode}")
+        if mode == "cpu" and not CPU_SAMPLING_SUPPORTED:
+            raise ValueError("当前平台不支持 CPU 采样")
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            raise ValueError(f"采样时长必须在 0 到 {MAX_PROFILE_SECONDS:g} 秒之间")
+        if not MIN_INTERVAL <= interval < seconds:
+            raise ValueError("采样间隔无效")
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("已有采样在进行")
+        try:
+            logger.info(f"开始 {mode} 采样，时长 {seconds:g} 秒，间隔 {interval * 1000:g} 毫秒")
+            return self._sample(seconds, mode, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, mode: str, interval: float) -> Profile:
+        profile = Profile(mode, interval)
+        own = threading.get_ident()
+        cpu_clocks: Dict[int, float] = {}
+        started = last = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            time.sleep(interval)
+            now = time.perf_counter()
+            elapsed_us = int((now - last) * 1e6)
+            last = now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if mode == "cpu":
+                    weight = self._cpu_delta(ident, cpu_clocks)
+                    if weight <= 0:
+                        continue
+                else:
+                    weight = elapsed_us
+                profile.add(self._stack(names.get(ident, f"thread-{ident}"), frame), weight)
+            profile.samples += 1
+            if now >= deadline:
+                break
+        profile.duration = last - started
+        return profile
+
+    @staticmethod
+    def _cpu_delta(ident: int, clocks: Dict[int, float]) -> int:
+        """线程自上次采样以来消耗的 CPU 时间（微秒），首次见到的线程返回0"""
+        try:
+            cpu = time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (OSError, OverflowError):
+            # 线程已退出
+            return 0
+        previous = clocks.get(ident)
+        clocks[ident] = cpu
+        return int((cpu - previous) * 1e6) if previous is not None else 0
+
+    def _stack(self, thread_name: str, frame) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(thread_name)
+        labels.reverse()
+        return ";".join(labels)
+
+    def _label(self, code) -> str:
+        # 按函数（而不是当前行）命名，同一函数的样本在火焰图中合并
+        label = self._labels.get(code)
+        if label is None:
+            parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+            filename = "/".join(parts[-2:])
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        return label
+
+class _RequestTiming:
+    """一次请求各阶段的累计耗时"""
+
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+_current_timing: ContextVar[Optional[_RequestTiming]] = ContextVar("current_timing", default=None)
+
+# FastAPI 处理请求的三个阶段：依赖解析（鉴权、参数校验）、调用路由函数、响应序列化
+_PHASES = {
+    "solve_dependencies": "dependencies",
+    "run_endpoint_function": "endpoint",
+    "serialize_response": "serialization",
+}
+
+def _timed(func, phase: str):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        timing = _current_timing.get()
+        if timing is None:
+            return await func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            timing.add(phase, time.perf_counter() - start)
+    wrapper._profiling_phase = phase
+    return wrapper
+
+def _patch_fastapi_phases() -> None:
+    """在 fastapi.routing 中为各阶段函数计时（请求处理函数在调用时按模块全局名查找）"""
+    import fastapi.routing
+
+    for name, phase in _PHASES.items():
+        func = getattr(fastapi.routing, name)
+        if not hasattr(func, "_profiling_phase"):
+            setattr(fastapi.routing, name, _timed(func, phase))
+
+class SlowRequestRecorder:
+    """
+    记录超过阈值的请求及其各阶段耗时（有界环形缓冲区）
+
+    阶段为 dependencies（鉴权、参数解析和校验）、endpoint（路由函数，即服务调用）、serialization（响应校验和编码），
+    其余时间（中间件、读取请求体、发送响应）计入 other。
+    """
+
+    def __init__(self, threshold_ms: float = 500.0, size: int = 200):
+        self.threshold = threshold_ms / 1000
+        self.records: deque = deque(maxlen=size)
+        self.total = 0
+
+    def record(self, scope, status: int, duration: float, timing: _RequestTiming) -> None:
+        route = scope.get("route")
+        phases = {phase: round(seconds * 1000, 3) for phase, seconds in timing.phases.items()}
+        phases["other"] = round(max(0.0, duration - sum(timing.phases.values())) * 1000, 3)
+        span = current_span()
+        self.records.append({
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "method": scope["method"],
+            "route": getattr(route, "path", None),
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "phases": phases,
+            "trace_id": span.trace_id if span is not None and span.sampled else None,
+        })
+        self.total += 1
+
+    def get_records(self, route: Optional[str] = None, min_duration_ms: Optional[float] = None,
+                    limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        查询慢请求，最近的在前
+
+        Args:
+            route: 只返回该路由模板的请求
+            min_duration_ms: 最短耗时（毫秒）
+            limit: 返回数量上限
+
+        Returns:
+            慢请求记录列表
+        """
+        results = []
+        for record in reversed(list(self.records)):
+            if route is not None and record["route"] != route:
+                continue
+            if min_duration_ms is not None and record["duration_ms"] < min_duration_ms:
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+class _SlowRequestMiddleware:
+    """记录每个请求的阶段耗时，超过阈值的交给 SlowRequestRecorder"""
+
+    def __init__(self, app, recorder: SlowRequestRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        # 采样接口本身耗时就是采样时长，不记录
+        if scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        timing = _RequestTiming()
+        token = _current_timing.set(timing)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _current_timing.reset(token)
+            if duration >= self.recorder.threshold:
+                self.recorder.record(scope, status_code, duration, timing)
+
+def instrument_profiling(app, token: Optional[str] = None, slow_request_ms: Optional[float] = None,
+                         ring_size: Optional[int] = None) -> Optional[SlowRequestRecorder]:
+    """
+    启用采样分析和慢请求记录
+
+    未配置管理令牌（参数或环境变量 PROFILING_ADMIN_TOKEN）时不做任何事，不增加任何开销。
+    启用后注册需要 X-Admin-Token 请求头的接口：
+    GET /debug/profile（采样 seconds 秒，返回折叠栈或 speedscope 文件）和 GET /debug/slow-requests。
+    慢请求阈值和缓冲区大小取参数或环境变量 SLOW_REQUEST_MS（默认 500）、SLOW_REQUEST_RING（默认 200）。
+
+    Args:
+        app: FastAPI 应用
+        token: 管理令牌
+        slow_request_ms: 慢请求阈值（毫秒）
+        ring_size: 慢请求缓冲区大小
+
+    Returns:
+        慢请求记录器，未启用时返回None
+    """
+    token = token or os.environ.get("PROFILING_ADMIN_TOKEN")
+    if not token:
+        return None
+
+    from fastapi import Header, HTTPException, Query
+    from starlette.responses import JSONResponse, PlainTextResponse
+
+    if slow_request_ms is None:
+        slow_request_ms = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+    if ring_size is None:
+        ring_size = int(os.environ.get("SLOW_REQUEST_RING", "200"))
+    recorder = SlowRequestRecorder(slow_request_ms, ring_size)
+    profiler = SamplingProfiler()
+    _patch_fastapi_phases()
+    app.add_middleware(_SlowRequestMiddleware, recorder=recorder)
+
+    def check_token(value: Optional[str]) -> None:
+        if value is None or not hmac.compare_digest(value.encode("utf-8"), token.encode("utf-8")):
+            raise HTTPException(status_code=403, detail="无效的管理令牌")
+
+    # 同步接口在线程池中执行，采样期间不阻塞事件循环
+    @app.get("/debug/profile", include_in_schema=False)
+    def profile(
+        seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+        mode: str = "wall",
+        interval_ms: float = Query(10.0, ge=1, le=1000),
+        format: str = "collapsed",
+        x_admin_token: Optional[str] = Header(None)
+    ):
+        check_token(x_admin_token)
+        if format not in ("collapsed", "speedscope"):
+            raise HTTPException(status_code=400, detail=f"未知的输出格式: {format}")
+        try:
+            result = profiler.run(seconds, mode, interval_ms / 1000)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        name = f"{app.title} {datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+        if format == "speedscope":
+            return JSONResponse(result.speedscope(name), headers={
+                "Content-Disposition": f'attachment; filename="profile-{mode}.speedscope.json"'
+            })
+        return PlainTextResponse(result.collapsed(), headers={
+            "Content-Disposition": f'attachment; filename="profile-{mode}.collapsed.txt"',
+            "X-Profile-Samples": str(result.samples),
+        })
+
+    @app.get("/debug/slow-requests", include_in_schema=False)
+    async def slow_requests(
+        route: Optional[str] = None,
+        min_duration_ms: Optional[float] = None,
+        limit: int = Query(50, gt=0, le=1000),
+        x_admin_token: Optional[str] = Header(None)
+    ):
+        check_token(x_admin_token)
+        return {
+            "threshold_ms": recorder.threshold * 1000,
+            "total": recorder.total,
+            "requests": recorder.get_records(route, min_duration_ms, limit),
+        }
+
+    logger.info(f"已启用采样分析接口，慢请求阈值 {slow_request_ms:g} 毫秒")
+    return recorder
@@ -1,5 +1,9 @@
 from fastapi import FastAPI
-from app.api.routes import flows, steps, executions, logs
+from app.api.routes import flows, steps, executions, logs, catalog
+from app.api.deps import log_service, log_shipper, catalog_syncer
+from app.core.metrics import instrument_app
+from app.core.profiling import instrument_profiling
+from app.core.tracing import TRACER, configure_tracing, instrument_tracing
 
 app = FastAPI(
     title="SAP MCP Server",
@@ -12,6 +16,36 @@ app.include_router(flows.router, prefix="/flows", tags=["flows"])
 app.include_router(steps.router, prefix="/steps", tags=["steps"])
 app.include_router(executions.router, prefix="/executions", tags=["executions"])
 app.include_router(logs.router, prefix="/logs", tags=["logs"])
+app.include_router(catalog.router, prefix="/catalog", tags=["catalog"])
+
+# 按路由记录请求耗时，并提供 Prometheus 格式的 /metrics
+instrument_app(app, prefix="mcp_http")
+
+# 配置 PROFILING_ADMIN_TOKEN 时启用采样分析和慢请求记录（/debug/profile、/debug/slow-requests）
+instrument_profiling(app)
+
+# 链路追踪：沿用请求头中的 traceparent，采样的链路可通过 /traces 查询
+configure_tracing("mcp-server")
+instrument_tracing(app)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # 后台线程把本地日志增量上传到 SaaS 平台
+    if log_shipper is not None:
+        log_shipper.start()
+    # 后台线程从 SaaS 平台增量同步模板和知识库
+    if catalog_syncer is not None:
+        catalog_syncer.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    if log_shipper is not None:
+        log_shipper.stop()
+    if catalog_syncer is not None:
+        catalog_syncer.stop()
+    # 把未写满的日志段也写入磁盘，未发送的日志在重启后继续转发
+    log_service.flush()
+    TRACER.shutdown()
 
 @app.get("/")
 async def root():
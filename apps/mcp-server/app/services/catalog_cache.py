@@ -0,0 +1,214 @@
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime
+import gzip
+import json
+import logging
+import os
+import threading
+from app.core.metrics import Sample
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 快照格式版本，格式不兼容时丢弃旧快照重新全量同步
+SNAPSHOT_FORMAT = 1
+
+class CatalogCache:
+    """
+    SaaS 平台模板和知识库的本地只读缓存
+
+    内容由增量同步写入，流程执行时直接读内存中的字典，不访问广域网。
+    可选把缓存保存为 gzip 压缩的 JSON 快照，启动时先加载快照，再从快照的版本水位继续同步。
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        """
+        初始化缓存
+
+        Args:
+            snapshot_path: 快照文件路径，为None时不持久化
+        """
+        self.snapshot_path = snapshot_path
+        # 已发布的流程模板和知识库条目，ID -> SaaS 平台返回的字段
+        self.templates: Dict[str, Dict[str, Any]] = {}
+        self.knowledge: Dict[str, Dict[str, Any]] = {}
+        # 同步位置：变更流ID、版本水位和对应的 ETag
+        self.feed_id: Optional[str] = None
+        self.version = 0
+        self.etag: Optional[str] = None
+        self.synced_at: Optional[datetime] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if snapshot_path:
+            self.load_snapshot()
+
+    def get_template(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """
+        根据ID获取已发布的流程模板（返回的字典为缓存内容，调用方不得修改）
+
+        Args:
+            template_id: 流程模板ID
+
+        Returns:
+            模板字段，未缓存时返回None
+        """
+        value = self.templates.get(template_id)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_knowledge_item(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """
+        根据ID获取知识库条目（返回的字典为缓存内容，调用方不得修改）
+
+        Args:
+            item_id: 知识库条目ID
+
+        Returns:
+            条目字段，未缓存时返回None
+        """
+        value = self.knowledge.get(item_id)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def list_templates(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取缓存的流程模板列表
+
+        Args:
+            category: 分类筛选
+
+        Returns:
+            模板列表
+        """
+        return [t for t in list(self.templates.values()) if category is None or t.get("category") == category]
+
+    def list_knowledge_items(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取缓存的知识库条目列表
+
+        Args:
+            category: 分类筛选
+
+        Returns:
+            条目列表
+        """
+        return [i for i in list(self.knowledge.values()) if category is None or i.get("category") == category]
+
+    def apply(self, changes: Dict[str, Any], etag: Optional[str] = None) -> int:
+        """
+        应用一页增量同步结果（/sync/changes 的响应）
+
+        Args:
+            changes: 同步结果
+            etag: 响应的 ETag
+
+        Returns:
+            应用的变更数
+        """
+        with self._lock:
+            if changes.get("reset"):
+                logger.info("同步变更流已重建，清空本地模板和知识库缓存")
+                self.templates = {}
+                self.knowledge = {}
+            for change in changes.get("changes", []):
+                target = self.templates if change["kind"] == "template" else self.knowledge
+                if change["op"] == "upsert":
+                    target[change["id"]] = change["data"]
+                else:
+                    target.pop(change["id"], None)
+            self.feed_id = changes["feed_id"]
+            self.version = changes["version"]
+            self.etag = etag
+            self.synced_at = datetime.now()
+            applied = len(changes.get("changes", []))
+            if applied or changes.get("reset"):
+                self._dirty = True
+            return applied
+
+    def save_snapshot(self) -> bool:
+        """
+        有新变更时把缓存写入快照文件（先写临时文件再替换，进程中途退出不会留下损坏的快照）
+
+        Returns:
+            写入快照返回True，没有配置路径或没有新变更返回False
+        """
+        if not self.snapshot_path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            state = {
+                "format": SNAPSHOT_FORMAT,
+                "feed_id": self.feed_id,
+                "version": self.version,
+                "etag": self.etag,
+                "templates": self.templates,
+                "knowledge": self.knowledge,
+            }
+            data = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._dirty = False
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(data, compresslevel=6))
+        os.replace(tmp_path, self.snapshot_path)
+        logger.info(f"保存模板和知识库快照: 版本 {state['version']}, {len(data)} 字节")
+        return True
+
+    def load_snapshot(self) -> bool:
+        """
+        从快照文件加载缓存
+
+        Returns:
+            加载成功返回True
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                state = json.loads(gzip.decompress(f.read()))
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"读取模板和知识库快照失败，将全量同步: {str(e)}")
+            return False
+        if state.get("format") != SNAPSHOT_FORMAT:
+            return False
+        with self._lock:
+            self.templates = state["templates"]
+            self.knowledge = state["knowledge"]
+            self.feed_id = state["feed_id"]
+            self.version = state["version"]
+            self.etag = state.get("etag")
+        logger.info(f"加载模板和知识库快照: 版本 {self.version}, {len(self.templates)} 个模板, {len(self.knowledge)} 个知识库条目")
+        return True
+
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        输出缓存命中和条目数指标（注册为指标采集回调）
+
+        Returns:
+            指标样本
+        """
+        yield ("mcp_catalog_cache_hits_total", "counter", "Local catalog lookups served from cache", [({}, self.hits)])
+        yield ("mcp_catalog_cache_misses_total", "counter", "Local catalog lookups not in cache", [({}, self.misses)])
+        yield ("mcp_catalog_entries", "gauge", "Cached catalog entries by kind", [
+            ({"kind": "template"}, len(self.templates)),
+            ({"kind": "knowledge"}, len(self.knowledge)),
+        ])
+        yield ("mcp_catalog_version", "gauge", "Synced catalog change feed version", [({}, self.version)])
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "feed_id": self.feed_id,
+            "version": self.version,
+            "templates": len(self.templates),
+            "knowledge_items": len(self.knowledge),
+            "synced_at": self.synced_at,
+        }
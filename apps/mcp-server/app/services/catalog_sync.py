@@ -0,0 +1,185 @@
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+import gzip
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+from app.services.catalog_cache import CatalogCache
+from app.utils.http_client import KeepAliveClient
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# SaaS 平台的增量同步接口
+CHANGES_PATH = "/sync/changes"
+
+class CatalogSyncError(Exception):
+    """
+    增量同步请求失败（非 2xx/304 响应）
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+class CatalogSyncer:
+    """
+    模板和知识库的后台增量同步
+
+    定期从 SaaS 平台拉取版本水位之后的变更并写入本地缓存，有变更时保存快照。
+    已同步到最新版本时带 If-None-Match 请求，平台直接返回 304。
+    """
+
+    def __init__(self, cache: CatalogCache, endpoint_url: str, tenant_id: Optional[str] = None,
+                 api_key: Optional[str] = None, interval: float = 30.0, page_size: int = 500,
+                 max_backoff: float = 300.0, timeout: float = 10.0):
+        """
+        初始化同步组件
+
+        Args:
+            cache: 本地缓存
+            endpoint_url: SaaS 平台地址
+            tenant_id: 本节点所属租户ID，为None时只同步公开内容
+            api_key: SaaS 平台 API 密钥
+            interval: 同步间隔（秒）
+            page_size: 每次请求的最大变更数
+            max_backoff: 失败重试的最大等待时间（秒）
+            timeout: HTTP 超时（秒）
+        """
+        self.cache = cache
+        self.tenant_id = tenant_id
+        self.interval = interval
+        self.page_size = page_size
+        self.max_backoff = max_backoff
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+        if api_key:
+            headers["X-API-Key"] = api_key
+        self.client = KeepAliveClient(endpoint_url, pool_size=1, timeout=timeout, headers=headers)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+
+        self.syncs = 0
+        self.not_modified = 0
+        self.changes_applied = 0
+        self.failed_syncs = 0
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, cache: CatalogCache) -> Optional["CatalogSyncer"]:
+        """
+        根据环境变量创建同步组件
+
+        SAAS_API_URL 未配置时返回None（不同步）；可选 MCP_TENANT_ID、SAAS_API_KEY
+        和 CATALOG_SYNC_INTERVAL（秒）。
+        """
+        endpoint_url = os.environ.get("SAAS_API_URL")
+        if not endpoint_url:
+            return None
+        return cls(
+            cache,
+            endpoint_url,
+            tenant_id=os.environ.get("MCP_TENANT_ID"),
+            api_key=os.environ.get("SAAS_API_KEY"),
+            interval=float(os.environ.get("CATALOG_SYNC_INTERVAL", "30")),
+        )
+
+    def start(self) -> None:
+        """启动后台同步线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-sync", daemon=True)
+        self._thread.start()
+        logger.info(f"模板和知识库同步已启动: 从版本 {self.cache.version} 开始")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        停止后台线程并保存快照
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.cache.save_snapshot()
+        self.client.close()
+
+    def sync_once(self) -> int:
+        """
+        拉取并应用全部新变更
+
+        Returns:
+            应用的变更数
+
+        Raises:
+            OSError: 连接失败或超时
+            http.client.HTTPException: 响应格式错误
+            CatalogSyncError: 平台返回错误响应
+        """
+        with self._lock:
+            applied = 0
+            while True:
+                params = {"since": self.cache.version, "limit": self.page_size}
+                if self.tenant_id:
+                    params["tenant_id"] = self.tenant_id
+                if self.cache.feed_id:
+                    params["feed_id"] = self.cache.feed_id
+                headers = {"If-None-Match": self.cache.etag} if self.cache.etag else None
+                status, response_headers, body = self.client.request(
+                    "GET", f"{CHANGES_PATH}?{urlencode(params)}", headers=headers
+                )
+                if status == 304:
+                    self.not_modified += 1
+                    break
+                if status != 200:
+                    raise CatalogSyncError(status, body[:200].decode("utf-8", "replace"))
+                if response_headers.get("content-encoding", "").lower() == "gzip":
+                    body = gzip.decompress(body)
+                changes = json.loads(body)
+                # 只有同步到最新版本的响应 ETag 才能用于下次的条件请求
+                etag = None if changes.get("has_more") else response_headers.get("etag")
+                applied += self.cache.apply(changes, etag)
+                if not changes.get("has_more"):
+                    break
+            self.syncs += 1
+            self.changes_applied += applied
+            if applied:
+                logger.info(f"同步模板和知识库变更: {applied} 条, 版本 {self.cache.version}")
+            self.cache.save_snapshot()
+            return applied
+
+    def stats(self) -> Dict[str, Any]:
+        """获取同步统计"""
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "syncs": self.syncs,
+            "not_modified": self.not_modified,
+            "changes_applied": self.changes_applied,
+            "failed_syncs": self.failed_syncs,
+            "last_error": self.last_error,
+            **self.cache.stats(),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except (OSError, http.client.HTTPException, CatalogSyncError, ValueError) as e:
+                # ValueError 包括响应体不是合法 JSON 的情况
+                self.failed_syncs += 1
+                self._failures += 1
+                self.last_error = str(e)
+                delay = min(self.max_backoff, self.interval * 2 ** (self._failures - 1))
+                delay *= 0.5 + random.random() / 2
+                logger.warning(f"模板和知识库同步失败，{delay:.1f} 秒后重试: {str(e)}")
+                self._stop.wait(delay)
+                continue
+            self._failures = 0
+            self._stop.wait(self.interval)
@@ -0,0 +1,333 @@
+# 与 apps/saas-api、apps/mcp-server 中的同名模块保持完全一致，修改时两处同步（tests/test_shared_modules.py 检查）
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from collections import OrderedDict, deque
+from types import MappingProxyType
+import hashlib
+import json
+import logging
+import threading
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 支持的步骤类型
+STEP_TYPES = ("mcp_call", "condition", "loop", "input", "output", "subflow")
+
+# ReactFlow 节点类型到步骤类型的映射（data.type 优先）
+_NODE_TYPES = {"input": "input", "output": "output"}
+
+SchemaResolver = Callable[[str], Dict[str, Any]]
+
+class CompiledStep(NamedTuple):
+    """编译后的步骤，config 和 rfc_schema 均为只读结构"""
+    id: str
+    name: str
+    type: str
+    config: Any
+    next: Tuple[str, ...]
+    depends_on: Tuple[str, ...]
+    level: int
+    rfc_schema: Any = None
+
+class ExecutionPlan(NamedTuple):
+    """
+    不可变的执行计划
+
+    steps 按拓扑顺序排列；level 相同的步骤之间没有依赖，可以并行执行。
+    """
+    source_id: str
+    version: str
+    content_hash: str
+    steps: Tuple[CompiledStep, ...]
+    index: Any
+    entry: Tuple[str, ...]
+
+    def get_step(self, step_id: str) -> Optional[CompiledStep]:
+        """按ID获取步骤，不存在时返回None"""
+        position = self.index.get(step_id)
+        return self.steps[position] if position is not None else None
+
+def content_hash(dsl: Dict[str, Any]) -> str:
+    """
+    计算 DSL 的内容哈希（与键顺序无关）
+
+    Args:
+        dsl: 流程 DSL
+
+    Returns:
+        sha256 十六进制摘要
+    """
+    payload = json.dumps(dsl, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def freeze(value: Any) -> Any:
+    """把 dict/list 递归转换为只读的 MappingProxyType/tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def _as_list(value: Any) -> List[str]:
+    """把单个引用或引用列表统一为列表"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+def _normalize(dsl: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    把两种 DSL 写法统一为步骤列表
+
+    - {"steps": [{"id", "name", "type", "config", "next", "depends_on"}]}
+    - 流程设计器导出的 {"nodes": [...], "edges": [{"source", "target"}]}
+    """
+    if not isinstance(dsl, dict):
+        raise ValueError("DSL 必须是 JSON 对象")
+
+    if "steps" in dsl:
+        steps = dsl["steps"]
+        if not isinstance(steps, list):
+            raise ValueError("DSL 的 steps 必须是列表")
+        normalized = []
+        for step in steps:
+            if not isinstance(step, dict):
+                raise ValueError("DSL 的步骤必须是 JSON 对象")
+            normalized.append({
+                "id": step.get("id"),
+                "name": step.get("name") or step.get("id"),
+                "type": step.get("type"),
+                "config": step.get("config") or {},
+                "next": _as_list(step.get("next")),
+                "depends_on": _as_list(step.get("depends_on"))
+            })
+        return normalized
+
+    if "nodes" in dsl:
+        nodes = dsl["nodes"]
+        edges = dsl.get("edges") or []
+        if not isinstance(nodes, list) or not isinstance(edges, list):
+            raise ValueError("DSL 的 nodes 和 edges 必须是列表")
+        normalized = []
+        by_id = {}
+        for node in nodes:
+            if not isinstance(node, dict):
+                raise ValueError("DSL 的节点必须是 JSON 对象")
+            data = node.get("data") or {}
+            step = {
+                "id": node.get("id"),
+                "name": data.get("label") or node.get("id"),
+                "type": data.get("type") or _NODE_TYPES.get(node.get("type")),
+                "config": data.get("config") or {},
+                "next": [],
+                "depends_on": []
+            }
+            normalized.append(step)
+            by_id[step["id"]] = step
+        for edge in edges:
+            source = edge.get("source") if isinstance(edge, dict) else None
+            if not isinstance(source, str) or source not in by_id:
+                raise ValueError(f"连线引用了不存在的步骤: {source}")
+            by_id[source]["next"].append(edge.get("target"))
+        return normalized
+
+    raise ValueError("DSL 缺少 steps 或 nodes 定义")
+
+def compile_dsl(
+    dsl: Dict[str, Any],
+    source_id: str = "",
+    version: str = "",
+    schema_resolver: Optional[SchemaResolver] = None,
+    dsl_hash: Optional[str] = None
+) -> ExecutionPlan:
+    """
+    校验并编译 DSL
+
+    解析步骤引用、按依赖关系拓扑排序（Kahn 算法，同层保持定义顺序），
+    并通过 schema_resolver 预先解析 mcp_call 步骤的 RFC 参数结构。
+
+    Args:
+        dsl: 流程 DSL
+        source_id: 模板或流程ID
+        version: 版本号
+        schema_resolver: RFC 参数结构查询函数，为None时不预解析
+        dsl_hash: 调用方已知的 DSL 内容哈希，作为执行计划的 content_hash，为None时重新计算
+
+    Returns:
+        不可变的执行计划
+
+    Raises:
+        ValueError: DSL 格式错误、引用了不存在的步骤、存在循环依赖或 RFC 结构查询失败
+    """
+    steps = _normalize(dsl)
+    if not steps:
+        raise ValueError("DSL 至少需要一个步骤")
+
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for step in steps:
+        step_id = step["id"]
+        if not isinstance(step_id, str) or not step_id:
+            raise ValueError("步骤缺少ID")
+        if step_id in by_id:
+            raise ValueError(f"步骤ID重复: {step_id}")
+        if step["type"] not in STEP_TYPES:
+            raise ValueError(f"步骤 {step_id} 的类型无效: {step['type']}")
+        if not isinstance(step["config"], dict):
+            raise ValueError(f"步骤 {step_id} 的配置必须是 JSON 对象")
+        by_id[step_id] = step
+
+    # 汇总所有边：next、depends_on 以及条件步骤的分支
+    successors: Dict[str, List[str]] = {step_id: [] for step_id in by_id}
+    predecessors: Dict[str, List[str]] = {step_id: [] for step_id in by_id}
+
+    def link(source: str, target: Any) -> None:
+        if not isinstance(target, str) or target not in by_id:
+            raise ValueError(f"步骤 {source} 引用了不存在的步骤: {target}")
+        if target not in successors[source]:
+            successors[source].append(target)
+            predecessors[target].append(source)
+
+    for step_id, step in by_id.items():
+        for target in step["next"]:
+            link(step_id, target)
+        for source in step["depends_on"]:
+            if not isinstance(source, str) or source not in by_id:
+                raise ValueError(f"步骤 {step_id} 引用了不存在的步骤: {source}")
+            link(source, step_id)
+        if step["type"] == "condition":
+            for branch in ("true_next", "false_next"):
+                for target in _as_list(step["config"].get(branch)):
+                    link(step_id, target)
+
+    # Kahn 拓扑排序，按定义顺序处理入度为 0 的步骤
+    in_degree = {step_id: len(sources) for step_id, sources in predecessors.items()}
+    levels = {step_id: 0 for step_id in by_id}
+    queue = deque(step_id for step_id in by_id if in_degree[step_id] == 0)
+    entry = tuple(queue)
+    order = []
+    while queue:
+        step_id = queue.popleft()
+        order.append(step_id)
+        for target in successors[step_id]:
+            levels[target] = max(levels[target], levels[step_id] + 1)
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                queue.append(target)
+
+    if len(order) < len(by_id):
+        cyclic = [step_id for step_id in by_id if in_degree[step_id] > 0]
+        raise ValueError(f"流程存在循环依赖: {', '.join(cyclic)}")
+
+    schemas: Dict[str, Any] = {}
+    compiled = []
+    for step_id in order:
+        step = by_id[step_id]
+        config = step["config"]
+        rfc_schema = None
+        if step["type"] == "mcp_call":
+            function_name = config.get("rfc_function")
+            if not function_name:
+                raise ValueError(f"步骤 {step_id} 的配置中缺少 RFC 函数名称")
+            if schema_resolver is not None:
+                if function_name not in schemas:
+                    try:
+                        schemas[function_name] = freeze(schema_resolver(function_name))
+                    except Exception as e:
+                        raise ValueError(f"步骤 {step_id} 的 RFC 函数结构查询失败: {str(e)}")
+                rfc_schema = schemas[function_name]
+        elif step["type"] == "subflow" and not config.get("flow_id"):
+            raise ValueError(f"步骤 {step_id} 的配置中缺少子流程ID")
+
+        compiled.append(CompiledStep(
+            id=step_id,
+            name=step["name"],
+            type=step["type"],
+            config=freeze(config),
+            next=tuple(successors[step_id]),
+            depends_on=tuple(predecessors[step_id]),
+            level=levels[step_id],
+            rfc_schema=rfc_schema
+        ))
+
+    return ExecutionPlan(
+        source_id=source_id,
+        version=version,
+        content_hash=dsl_hash or content_hash(dsl),
+        steps=tuple(compiled),
+        index=MappingProxyType({step.id: i for i, step in enumerate(compiled)}),
+        entry=entry
+    )
+
+class DSLCompiler:
+    """
+    带缓存的 DSL 编译器
+
+    执行计划按 (ID, 版本, 内容哈希) 缓存，DSL 未变化时重复获取只需一次字典查找。
+    """
+
+    def __init__(self, schema_resolver: Optional[SchemaResolver] = None, cache_size: int = 1024):
+        """
+        初始化编译器
+
+        Args:
+            schema_resolver: RFC 参数结构查询函数
+            cache_size: 最多缓存的执行计划数
+        """
+        self.schema_resolver = schema_resolver
+        self.cache_size = cache_size
+        self._plans: "OrderedDict[Tuple[str, str, str], ExecutionPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(
+        self,
+        source_id: str,
+        version: str,
+        dsl: Dict[str, Any],
+        dsl_hash: Optional[str] = None
+    ) -> ExecutionPlan:
+        """
+        获取执行计划，缓存未命中时编译并缓存
+
+        Args:
+            source_id: 模板或流程ID
+            version: 版本号
+            dsl: 流程 DSL
+            dsl_hash: 调用方已知的 DSL 内容哈希（如内容寻址存储的根哈希），省去重新计算
+
+        Returns:
+            不可变的执行计划
+
+        Raises:
+            ValueError: DSL 无效
+        """
+        dsl_hash = dsl_hash or content_hash(dsl)
+        key = (source_id, version, dsl_hash)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+
+        plan = compile_dsl(dsl, source_id, version, self.schema_resolver, dsl_hash=dsl_hash)
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+        logger.info(f"编译执行计划: {source_id} v{version}, {len(plan.steps)} 个步骤")
+        return plan
+
+    def evict(self, source_id: str) -> None:
+        """
+        删除某个模板或流程的全部缓存计划
+
+        Args:
+            source_id: 模板或流程ID
+        """
+        with self._lock:
+            for key in [key for key in self._plans if key[0] == source_id]:
+                del self._plans[key]
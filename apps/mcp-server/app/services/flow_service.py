@@ -1,32 +1,58 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+from collections import Counter
 from datetime import datetime
 import uuid
 import logging
+import time
+from app.core.metrics import REGISTRY, Sample
+from app.core.tracing import TRACER
 from app.schemas.flow import Flow, FlowCreate, FlowUpdate
-from app.schemas.step import Step, StepCreate, StepUpdate
-from app.schemas.execution import Execution, ExecutionCreate, ExecutionUpdate
+from app.schemas.step import StepCreate, StepUpdate
+from app.schemas.execution import ExecutionCreate, ExecutionUpdate
 from app.services.rfc_service import RFCService
 from app.services.log_service import LogService
+from app.services.dsl_compiler import DSLCompiler, ExecutionPlan
+from app.services.records import ExecutionRecord, StepRecord, interned
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+STEP_LATENCY = REGISTRY.histogram("mcp_step_duration_seconds", "Step execution latency by step type", ("type",))
+STEP_PHASE_LATENCY = REGISTRY.histogram(
+    "mcp_step_phase_duration_seconds", "Time spent in each phase of step execution", ("phase",)
+)
+STEP_ERRORS = REGISTRY.counter("mcp_step_errors_total", "Failed step executions by step type", ("type",))
+STEPS_IN_PROGRESS = REGISTRY.gauge("mcp_steps_in_progress", "Steps currently executing")
+
+# 热路径上直接使用子指标，省去按标签查找
+_VALIDATE_PHASE = STEP_PHASE_LATENCY.labels("validate")
+_RUN_PHASE = STEP_PHASE_LATENCY.labels("run")
+_LOG_PHASE = STEP_PHASE_LATENCY.labels("log")
+
 class FlowService:
     """
     流程服务类，负责处理流程、步骤和执行相关的业务逻辑
     """
     
-    def __init__(self):
+    def __init__(self, log_service: Optional[LogService] = None):
         """
         初始化流程服务
+        
+        Args:
+            log_service: 日志服务，执行日志写入其中
         """
         self.rfc_service = RFCService()
-        self.log_service = LogService()
+        self.log_service = log_service if log_service is not None else LogService()
+        # 发布时编译 DSL，RFC 参数结构在编译阶段预先解析
+        self.compiler = DSLCompiler(schema_resolver=self.rfc_service.search_rfc_schema)
+        # 已发布流程的执行计划
+        self.plans: Dict[str, ExecutionPlan] = {}
         # 在实际实现中，这里需要连接数据库
         # 为了简化，我们使用内存存储
         self.flows = {}
-        self.steps = {}
-        self.executions = {}
+        # 步骤和执行实例以紧凑记录保存
+        self.steps: Dict[str, StepRecord] = {}
+        self.executions: Dict[str, ExecutionRecord] = {}
     
     # Flow 相关方法
     
@@ -93,14 +119,60 @@ class FlowService:
         flow = self.flows[flow_id]
         update_data = flow_update.dict(exclude_unset=True)
         
+        # 已发布的流程修改 DSL 时先编译，无效的 DSL 不会覆盖当前版本
+        plan = None
+        if flow.status == "published" and ("dsl" in update_data or "version" in update_data):
+            plan = self.compiler.compile(
+                flow_id,
+                update_data.get("version") or flow.version,
+                update_data.get("dsl") or flow.dsl
+            )
+        
         for field, value in update_data.items():
             setattr(flow, field, value)
             
+        if plan is not None:
+            self.plans[flow_id] = plan
         flow.updated_at = datetime.now()
         self.flows[flow_id] = flow
         logger.info(f"更新流程: {flow_id}")
         return flow
     
+    def publish_flow(self, flow_id: str) -> Optional[Flow]:
+        """
+        发布流程，发布前编译并校验 DSL
+        
+        Args:
+            flow_id: 流程ID
+            
+        Returns:
+            发布后的流程对象，如果未找到则返回None
+            
+        Raises:
+            ValueError: DSL 无效
+        """
+        if flow_id not in self.flows:
+            return None
+            
+        flow = self.flows[flow_id]
+        self.plans[flow_id] = self.compiler.compile(flow_id, flow.version, flow.dsl)
+        flow.status = "published"
+        flow.updated_at = datetime.now()
+        logger.info(f"发布流程: {flow_id}")
+        return flow
+    
+    def get_execution_plan(self, flow_id: str) -> Optional[ExecutionPlan]:
+        """
+        获取已发布流程的执行计划
+        
+        Args:
+            flow_id: 流程ID
+            
+        Returns:
+            执行计划，流程未发布时返回None
+        """
+        return self.plans.get(flow_id)
+    
     def delete_flow(self, flow_id: str) -> bool:
         """
         删除流程
@@ -125,12 +197,14 @@ class FlowService:
             del self.executions[execution_id]
             
         del self.flows[flow_id]
+        self.plans.pop(flow_id, None)
+        self.compiler.evict(flow_id)
         logger.info(f"删除流程: {flow_id}")
         return True
     
     # Step 相关方法
     
-    def get_steps_by_flow_id(self, flow_id: str) -> List[Step]:
+    def get_steps_by_flow_id(self, flow_id: str) -> List[StepRecord]:
         """
         获取指定流程的所有步骤
         
@@ -142,7 +216,7 @@ class FlowService:
         """
         return [step for step in self.steps.values() if step.flow_id == flow_id]
     
-    def get_step_by_id(self, step_id: str) -> Optional[Step]:
+    def get_step_by_id(self, step_id: str) -> Optional[StepRecord]:
         """
         根据ID获取步骤详情
         
@@ -154,7 +228,7 @@ class FlowService:
         """
         return self.steps.get(step_id)
     
-    def create_step(self, step_create: StepCreate) -> Step:
+    def create_step(self, step_create: StepCreate) -> StepRecord:
         """
         创建新步骤
         
@@ -169,22 +243,23 @@ class FlowService:
             raise ValueError("流程不存在")
             
         step_id = str(uuid.uuid4())
-        step = Step(
-            id=step_id,
-            flow_id=step_create.flow_id,
+        now = datetime.now()
+        step = StepRecord(
+            flow_id=interned(step_create.flow_id),
             name=step_create.name,
             description=step_create.description,
-            type=step_create.type,
+            type=interned(step_create.type),
             config=step_create.config,
             position=step_create.position,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            id=step_id,
+            created_at=now,
+            updated_at=now
         )
         self.steps[step_id] = step
         logger.info(f"创建新步骤: {step_id}")
         return step
     
-    def update_step(self, step_id: str, step_update: StepUpdate) -> Optional[Step]:
+    def update_step(self, step_id: str, step_update: StepUpdate) -> Optional[StepRecord]:
         """
         更新步骤
         
@@ -228,7 +303,7 @@ class FlowService:
     
     # Execution 相关方法
     
-    def get_executions_by_flow_id(self, flow_id: str) -> List[Execution]:
+    def get_executions_by_flow_id(self, flow_id: str) -> List[ExecutionRecord]:
         """
         获取指定流程的所有执行实例
         
@@ -240,7 +315,7 @@ class FlowService:
         """
         return [execution for execution in self.executions.values() if execution.flow_id == flow_id]
     
-    def get_execution_by_id(self, execution_id: str) -> Optional[Execution]:
+    def get_execution_by_id(self, execution_id: str) -> Optional[ExecutionRecord]:
         """
         根据ID获取执行实例详情
         
@@ -252,7 +327,7 @@ class FlowService:
         """
         return self.executions.get(execution_id)
     
-    def start_execution(self, execution_create: ExecutionCreate) -> Execution:
+    def start_execution(self, execution_create: ExecutionCreate) -> ExecutionRecord:
         """
         启动新流程执行
         
@@ -266,33 +341,41 @@ class FlowService:
         if execution_create.flow_id not in self.flows:
             raise ValueError("流程不存在")
             
+        # 已发布的流程直接使用发布时编译好的执行计划
+        plan = self.plans.get(execution_create.flow_id)
+            
         execution_id = str(uuid.uuid4())
-        execution = Execution(
-            id=execution_id,
-            flow_id=execution_create.flow_id,
-            user_id=execution_create.user_id,
-            initial_parameters=execution_create.initial_parameters,
-            status="running",
-            started_at=datetime.now()
-        )
-        self.executions[execution_id] = execution
-        logger.info(f"启动新流程执行: {execution_id}")
-        
-        # 记录日志
-        self.log_service.create_log({
-            "flow_id": execution.flow_id,
-            "execution_id": execution_id,
-            "user_id": execution.user_id,
-            "level": "info",
-            "message": "流程执行已启动",
-            "details": {
-                "initial_parameters": execution.initial_parameters
-            }
-        })
+        with TRACER.span("execution.start", {"execution_id": execution_id, "flow_id": execution_create.flow_id}):
+            execution = ExecutionRecord(
+                flow_id=interned(execution_create.flow_id),
+                user_id=interned(execution_create.user_id),
+                initial_parameters=execution_create.initial_parameters,
+                id=execution_id,
+                status="running",
+                current_step_id=plan.entry[0] if plan else None,
+                started_at=datetime.now(),
+                finished_at=None,
+                result=None
+            )
+            self.executions[execution_id] = execution
+            logger.info(f"启动新流程执行: {execution_id}")
+            
+            # 记录日志
+            self.log_service.create_log({
+                "flow_id": execution.flow_id,
+                "execution_id": execution_id,
+                "user_id": execution.user_id,
+                "level": "info",
+                "message": "流程执行已启动",
+                "details": {
+                    "initial_parameters": execution.initial_parameters,
+                    "plan_hash": plan.content_hash if plan else None
+                }
+            })
         
         return execution
     
-    def update_execution(self, execution_id: str, execution_update: ExecutionUpdate) -> Optional[Execution]:
+    def update_execution(self, execution_id: str, execution_update: ExecutionUpdate) -> Optional[ExecutionRecord]:
         """
         更新执行实例
         
@@ -363,66 +446,112 @@ class FlowService:
         Returns:
             执行结果
         """
-        # 验证执行实例是否存在
-        if execution_id not in self.executions:
-            raise ValueError("执行实例不存在")
+        with TRACER.span("step.execute", {"execution_id": execution_id, "step_id": step_id}) as span:
+            started = time.perf_counter()
+            step_type = "unknown"
+            STEPS_IN_PROGRESS.inc()
+            try:
+                # 验证执行实例是否存在
+                if execution_id not in self.executions:
+                    raise ValueError("执行实例不存在")
+                
+                execution = self.executions[execution_id]
             
-        execution = self.executions[execution_id]
-        
-        # 验证步骤是否存在
-        if step_id not in self.steps:
-            raise ValueError("步骤不存在")
+                # 验证步骤是否存在
+                if step_id not in self.steps:
+                    raise ValueError("步骤不存在")
+                
+                step = self.steps[step_id]
+                step_type = step.type
+                span.set_attribute("step.type", step_type)
             
-        step = self.steps[step_id]
-        
-        # 验证步骤是否属于该流程
-        if step.flow_id != execution.flow_id:
-            raise ValueError("步骤不属于该流程")
-            
-        # 根据步骤类型执行不同的逻辑
-        result = None
-        if step.type == "mcp_call":
-            # 调用 RFC 函数
-            rfc_function = step.config.get("rfc_function")
-            if not rfc_function:
-                raise ValueError("步骤配置中缺少 RFC 函数名称")
+                # 验证步骤是否属于该流程
+                if step.flow_id != execution.flow_id:
+                    raise ValueError("步骤不属于该流程")
+            
+                checked = time.perf_counter()
+                _VALIDATE_PHASE.observe(checked - started)
                 
-            result = self.rfc_service.call_rfc(rfc_function, parameters)
-        elif step.type == "condition":
-            # 条件判断逻辑
-            result = {
-                "type": "condition",
-                "result": True,  # 简化实现，总是返回True
-                "next_step": step.config.get("true_next", "")
-            }
-        else:
-            # 其他类型的步骤
-            result = {
-                "type": step.type,
-                "result": "success",
-                "message": f"步骤 {step.name} 执行成功"
-            }
-        
-        # 记录执行日志
-        self.log_service.create_log({
-            "flow_id": execution.flow_id,
-            "execution_id": execution_id,
-            "step_id": step_id,
-            "user_id": execution.user_id,
-            "level": "info" if result.get("result", {}).get("status") == "success" else "error",
-            "message": f"步骤 {step.name} 执行完成",
-            "details": {
-                "parameters": parameters,
-                "result": result
-            }
-        })
+                # 根据步骤类型执行不同的逻辑
+                result = None
+                if step.type == "mcp_call":
+                    # 调用 RFC 函数
+                    rfc_function = step.config.get("rfc_function")
+                    if not rfc_function:
+                        raise ValueError("步骤配置中缺少 RFC 函数名称")
+                    
+                    result = self.rfc_service.call_rfc(rfc_function, parameters)
+                elif step.type == "condition":
+                    # 条件判断逻辑
+                    result = {
+                        "type": "condition",
+                        "result": True,  # 简化实现，总是返回True
+                        "next_step": step.config.get("true_next", "")
+                    }
+                else:
+                    # 其他类型的步骤
+                    result = {
+                        "type": step.type,
+                        "result": "success",
+                        "message": f"步骤 {step.name} 执行成功"
+                    }
+            
+                ran = time.perf_counter()
+                _RUN_PHASE.observe(ran - checked)
+            
+                # 记录执行日志
+                self.log_service.create_log({
+                    "flow_id": execution.flow_id,
+                    "execution_id": execution_id,
+                    "step_id": step_id,
+                    "user_id": execution.user_id,
+                    "level": "info" if _step_succeeded(result) else "error",
+                    "message": f"步骤 {step.name} 执行完成",
+                    "details": {
+                        "parameters": parameters,
+                        "result": result
+                    }
+                })
+            
+                finished = time.perf_counter()
+                _LOG_PHASE.observe(finished - ran)
+                STEP_LATENCY.labels(step_type).observe(finished - started)
+            except Exception:
+                STEP_ERRORS.labels(step_type).inc()
+                raise
+            finally:
+                STEPS_IN_PROGRESS.dec()
         
         logger.info(f"执行步骤: {step_id} in execution: {execution_id}")
         return result
     
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        输出执行实例和执行计划缓存的指标（注册为指标采集回调）
+        
+        Returns:
+            指标样本
+        """
+        statuses = Counter(execution.status for execution in list(self.executions.values()))
+        yield (
+            "mcp_executions",
+            "gauge",
+            "Executions by status; running executions are in flight",
+            [({"status": status}, count) for status, count in sorted(statuses.items())]
+        )
+        yield ("mcp_plan_cache_hits_total", "counter", "Execution plan cache hits", [({}, self.compiler.hits)])
+        yield ("mcp_plan_cache_misses_total", "counter", "Execution plan cache misses", [({}, self.compiler.misses)])
+    
     def close(self):
         """
         关闭服务连接
         """
         if self.rfc_service:
             self.rfc_service.close()
+
+def _step_succeeded(result: Dict[str, Any]) -> bool:
+    """RFC 调用的结果带 status 字段，其他步骤的 result 为普通值"""
+    outcome = result.get("result")
+    if isinstance(outcome, dict):
+        return outcome.get("status") == "success"
+    return outcome not in (False, None, "failed")
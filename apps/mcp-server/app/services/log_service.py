@@ -1,26 +1,47 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union
 from datetime import datetime
 import uuid
 import logging
-from app.schemas.log import Log, LogCreate
+import time
+from app.core.metrics import REGISTRY
+from app.services.records import LogRecord
+from app.services.log_store import ColumnarLogStore, DictLogStore
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 字典编码的日志列
+LOG_COLUMNS = ("flow_id", "execution_id", "step_id", "user_id", "level")
+
+LogStore = Union[ColumnarLogStore, DictLogStore]
+
+LOG_WRITE_LATENCY = REGISTRY.histogram("mcp_log_write_duration_seconds", "Local log write latency")
+
 class LogService:
     """
     日志服务类，负责处理日志相关的业务逻辑
     """
     
-    def __init__(self):
+    def __init__(self, store: Optional[LogStore] = None, segment_dir: Optional[str] = None):
         """
         初始化日志服务
+        
+        Args:
+            store: 日志存储，默认为列式存储
+            segment_dir: 列式存储的磁盘日志段目录，为None时日志只保存在内存中；
+                指定目录时存储标识和追加序号在重启后保持不变，日志转发可以从断点继续
         """
         # 在实际实现中，这里需要连接数据库
         # 为了简化，我们使用内存存储
-        self.logs = {}
+        self.store = store if store is not None else ColumnarLogStore(LogRecord, LOG_COLUMNS, directory=segment_dir)
+    
+    def flush(self) -> None:
+        """
+        封存正在写入的日志段（配置了磁盘目录时写入磁盘），服务停止前调用
+        """
+        self.store.flush()
     
-    def get_logs_by_execution_id(self, execution_id: str) -> List[Log]:
+    def get_logs_by_execution_id(self, execution_id: str) -> List[LogRecord]:
         """
         根据执行实例ID获取日志列表
         
@@ -28,11 +49,12 @@ class LogService:
             execution_id: 执行实例ID
             
         Returns:
-            日志列表
+            日志列表，按时间顺序
         """
-        return [log for log in self.logs.values() if log.execution_id == execution_id]
+        logs = self.store.query({"execution_id": execution_id}, limit=len(self.store))
+        return logs[::-1]
     
-    def get_log_by_id(self, log_id: str) -> Optional[Log]:
+    def get_log_by_id(self, log_id: str) -> Optional[LogRecord]:
         """
         根据ID获取日志详情
         
@@ -42,9 +64,9 @@ class LogService:
         Returns:
             日志对象，如果未找到则返回None
         """
-        return self.logs.get(log_id)
+        return self.store.get(log_id)
     
-    def create_log(self, log_create: Dict[str, Any]) -> Log:
+    def create_log(self, log_create: Dict[str, Any]) -> LogRecord:
         """
         创建新日志
         
@@ -54,9 +76,10 @@ class LogService:
         Returns:
             创建的日志对象
         """
+        start = time.perf_counter()
         log_id = str(uuid.uuid4())
-        log = Log(
-            id=log_id,
+        # 日志由服务内部或已校验的 LogCreate 产生，直接构造记录
+        log = LogRecord(
             flow_id=log_create["flow_id"],
             execution_id=log_create["execution_id"],
             step_id=log_create.get("step_id"),
@@ -64,9 +87,11 @@ class LogService:
             level=log_create["level"],
             message=log_create["message"],
             details=log_create.get("details"),
+            id=log_id,
             timestamp=datetime.now()
         )
-        self.logs[log_id] = log
+        self.store.append(log)
+        LOG_WRITE_LATENCY.observe(time.perf_counter() - start)
         logger.info(f"创建新日志: {log_id}")
         return log
     
@@ -79,7 +104,7 @@ class LogService:
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
         limit: int = 100
-    ) -> List[Log]:
+    ) -> List[LogRecord]:
         """
         搜索日志
         
@@ -95,32 +120,40 @@ class LogService:
         Returns:
             日志列表
         """
-        filtered_logs = list(self.logs.values())
+        equals = {
+            column: value
+            for column, value in (
+                ("flow_id", flow_id),
+                ("execution_id", execution_id),
+                ("step_id", step_id),
+                ("user_id", user_id)
+            )
+            if value
+        }
+        return self.store.query(equals, start_time, end_time, limit=limit)
+    
+    @property
+    def store_id(self) -> str:
+        """日志存储的标识，存储被重建后追加序号从0开始，标识随之改变"""
+        return self.store.store_id
+    
+    @property
+    def appended(self) -> int:
+        """已追加的总日志数（含已删除），即下一条日志的追加序号"""
+        return self.store.appended
+    
+    def read_since(self, offset: int, limit: int = 1000) -> Tuple[List[Tuple[int, LogRecord]], int]:
+        """
+        按写入顺序读取日志（供日志转发组件增量读取）
         
-        # 应用过滤条件
-        if flow_id:
-            filtered_logs = [log for log in filtered_logs if log.flow_id == flow_id]
-            
-        if execution_id:
-            filtered_logs = [log for log in filtered_logs if log.execution_id == execution_id]
-            
-        if step_id:
-            filtered_logs = [log for log in filtered_logs if log.step_id == step_id]
-            
-        if user_id:
-            filtered_logs = [log for log in filtered_logs if log.user_id == user_id]
-            
-        if start_time:
-            filtered_logs = [log for log in filtered_logs if log.timestamp >= start_time]
-            
-        if end_time:
-            filtered_logs = [log for log in filtered_logs if log.timestamp <= end_time]
+        Args:
+            offset: 起始追加序号
+            limit: 最多返回的日志数
             
-        # 按时间倒序排列
-        filtered_logs.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        # 限制返回数量
-        return filtered_logs[:limit]
+        Returns:
+            ([(追加序号, 日志)], 下一次读取的起始序号)
+        """
+        return self.store.read_since(offset, limit)
     
     def delete_log(self, log_id: str) -> bool:
         """
@@ -132,9 +165,8 @@ class LogService:
         Returns:
             删除成功返回True，否则返回False
         """
-        if log_id not in self.logs:
+        if not self.store.delete(log_id):
             return False
             
-        del self.logs[log_id]
         logger.info(f"删除日志: {log_id}")
         return True
@@ -0,0 +1,398 @@
+from typing import Any, Dict, Iterator, Optional, Tuple
+from datetime import datetime
+import gzip
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from app.core.metrics import Sample
+from app.services.records import LogRecord
+from app.services.log_service import LogService
+from app.utils.http_client import KeepAliveClient
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# SaaS 平台的批量日志导入接口
+BULK_PATH = "/logs/bulk"
+
+class LogShipError(Exception):
+    """
+    日志批次发送失败（非 2xx 响应）
+    """
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+class LogShipper:
+    """
+    日志转发组件，把本地日志增量上传到 SaaS 平台
+
+    后台线程按追加序号读取日志存储，把一批日志编码为 gzip 压缩的 NDJSON，通过长连接发送到
+    SaaS 平台的 /logs/bulk 接口。已确认的追加序号持久化到 offset 文件，重启后从断点继续。
+
+    - 去重：每批带 X-Batch-Id（节点ID + 存储标识 + 序号区间），发送前先记录待确认区间，
+      超时或重启后按原区间重发，平台对同一批次只写入一次
+    - 自适应批量：批次满且在目标延迟内完成时加大批量，超时或失败时减半（AIMD）
+    - 背压：429/503 按 Retry-After 等待，其他失败指数退避；发送失败时日志留在本地存储，
+      流程执行写日志不受影响
+    """
+
+    def __init__(self, log_service: LogService, endpoint_url: str, tenant_id: str,
+                 api_key: Optional[str] = None, offset_path: Optional[str] = None,
+                 min_batch: int = 100, max_batch: int = 5000, interval: float = 1.0,
+                 target_latency: float = 2.0, max_payload_bytes: int = 4 << 20,
+                 max_backoff: float = 60.0, timeout: float = 10.0):
+        """
+        初始化日志转发组件
+
+        Args:
+            log_service: 本地日志服务
+            endpoint_url: SaaS 平台地址，例如 https://saas.example.com
+            tenant_id: 本节点所属租户ID
+            api_key: SaaS 平台 API 密钥
+            offset_path: offset 文件路径，为None时不持久化（重启后从头发送）
+            min_batch: 最小批量，同时是批量的加性增量
+            max_batch: 最大批量
+            interval: 没有积压时的轮询间隔（秒）
+            target_latency: 单批发送的目标耗时（秒），超过时减小批量
+            max_payload_bytes: 单批压缩后的最大字节数
+            max_backoff: 失败重试的最大等待时间（秒）
+            timeout: HTTP 超时（秒）
+        """
+        if min_batch <= 0 or max_batch < min_batch:
+            raise ValueError("批量大小配置无效")
+        self.log_service = log_service
+        self.tenant_id = tenant_id
+        self.offset_path = offset_path
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.interval = interval
+        self.target_latency = target_latency
+        self.max_payload_bytes = max_payload_bytes
+        self.max_backoff = max_backoff
+
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        if api_key:
+            headers["X-API-Key"] = api_key
+        self.client = KeepAliveClient(endpoint_url, pool_size=1, timeout=timeout, headers=headers)
+
+        self.node_id = uuid.uuid4().hex[:12]
+        self.offset = 0
+        # 已发送但未确认的 [起始序号, 结束序号)
+        self.pending: Optional[Tuple[int, int]] = None
+        self._load_offset()
+        # 启动时立即核对本地存储，异常退出丢失的日志末尾要在新日志复用追加序号之前发现
+        self._check_store()
+
+        self.batch_size = min_batch
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+
+        self.shipped = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.bytes_raw = 0
+        self.bytes_sent = 0
+        self.last_error: Optional[str] = None
+        self.last_shipped_at: Optional[datetime] = None
+
+    @classmethod
+    def from_env(cls, log_service: LogService) -> Optional["LogShipper"]:
+        """
+        根据环境变量创建日志转发组件
+
+        SAAS_API_URL 未配置时返回None（不转发）；同时需要 MCP_TENANT_ID，
+        可选 SAAS_API_KEY 和 LOG_SHIPPER_OFFSET_PATH。
+
+        Raises:
+            ValueError: 配置了 SAAS_API_URL 但缺少 MCP_TENANT_ID
+        """
+        endpoint_url = os.environ.get("SAAS_API_URL")
+        if not endpoint_url:
+            return None
+        tenant_id = os.environ.get("MCP_TENANT_ID")
+        if not tenant_id:
+            raise ValueError("配置了 SAAS_API_URL 时必须配置 MCP_TENANT_ID")
+        return cls(
+            log_service,
+            endpoint_url,
+            tenant_id,
+            api_key=os.environ.get("SAAS_API_KEY"),
+            offset_path=os.environ.get("LOG_SHIPPER_OFFSET_PATH"),
+        )
+
+    def start(self) -> None:
+        """启动后台发送线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._thread.start()
+        logger.info(f"日志转发已启动: 节点 {self.node_id}, 从序号 {self.offset} 开始")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        停止后台线程，并在 timeout 秒内尽量发送剩余日志
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        deadline = time.monotonic() + timeout
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        try:
+            while time.monotonic() < deadline and self.ship_once():
+                pass
+        except (OSError, http.client.HTTPException, LogShipError) as e:
+            logger.warning(f"停止时发送剩余日志失败: {str(e)}")
+        self.client.close()
+
+    def ship_once(self) -> int:
+        """
+        发送一批日志
+
+        Returns:
+            发送成功（或因超过平台请求体上限而丢弃）的日志数，没有新日志时为0
+
+        Raises:
+            OSError: 连接失败或超时
+            http.client.HTTPException: 响应格式错误
+            LogShipError: 平台返回非 2xx 响应
+        """
+        with self._lock:
+            self._check_store()
+            if self.pending is not None:
+                # 上次发送未确认，按原区间重发，批次ID不变
+                start, end = self.pending
+                rows = [r for r in self.log_service.read_since(start, end - start)[0] if r[0] < end]
+            else:
+                start = self.offset
+                rows, end = self.log_service.read_since(start, self.batch_size)
+            if not rows:
+                if end != self.offset:
+                    # 区间内的日志都已删除
+                    self.offset, self.pending = end, None
+                    self._save_offset()
+                return 0
+
+            lines = [self._encode(log) for _, log in rows]
+            payload = gzip.compress(b"".join(lines), compresslevel=6)
+            while len(payload) > self.max_payload_bytes and len(rows) > 1:
+                half = len(rows) // 2
+                rows, lines = rows[:half], lines[:half]
+                end = rows[-1][0] + 1
+                payload = gzip.compress(b"".join(lines), compresslevel=6)
+
+            # 发送前记录待确认区间，进程在发送过程中退出时重启后按原批次重发
+            self.pending = (start, end)
+            self._save_offset()
+
+            batch_id = f"{self.node_id}-{self.log_service.store_id}-{start}-{end}"
+            began = time.monotonic()
+            try:
+                status, headers, body = self.client.request(
+                    "POST", BULK_PATH, body=payload, headers={"X-Batch-Id": batch_id}
+                )
+            except (OSError, http.client.HTTPException):
+                self._shrink()
+                raise
+            elapsed = time.monotonic() - began
+
+            if status == 413:
+                self.pending = None
+                if len(rows) == 1:
+                    # 单条日志已超过平台的请求体上限，重试也不会成功：丢弃该条并前移 offset
+                    self.offset = end
+                    self._save_offset()
+                    self.dropped += 1
+                    logger.error(f"日志超过 SaaS 平台的请求体上限，已丢弃: 序号 {start}, 压缩后 {len(payload)} 字节")
+                    return len(rows)
+                # 请求体过大：按实际被拒绝的大小调小单批上限，放弃该区间后按更小的批次重新读取，
+                # 按失败指数退避（不带 Retry-After）
+                self._save_offset()
+                self._shrink()
+                self.max_payload_bytes = max(1, min(self.max_payload_bytes, len(payload)) // 2)
+                raise LogShipError(status, "请求体过大")
+            if status < 200 or status >= 300:
+                self._shrink()
+                raise LogShipError(status, body[:200].decode("utf-8", "replace"), _retry_after(headers))
+
+            result = _parse_result(body)
+            self.offset, self.pending = end, None
+            self._save_offset()
+
+            self.batches += 1
+            self.shipped += result.get("accepted", len(rows))
+            self.rejected += result.get("rejected", 0)
+            self.bytes_raw += sum(len(line) for line in lines)
+            self.bytes_sent += len(payload)
+            self.last_shipped_at = datetime.now()
+            if result.get("rejected"):
+                logger.warning(f"SaaS 平台拒绝了 {result['rejected']} 条日志: {result.get('errors', [])[:3]}")
+
+            if elapsed > self.target_latency:
+                self._shrink()
+            elif len(rows) >= self.batch_size:
+                self.batch_size = min(self.max_batch, self.batch_size + self.min_batch)
+            return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取发送统计"""
+        return {
+            "node_id": self.node_id,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "offset": self.offset,
+            "backlog": max(0, self.log_service.store.appended - self.offset),
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "shipped": self.shipped,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "bytes_raw": self.bytes_raw,
+            "bytes_sent": self.bytes_sent,
+            "compression_ratio": self.bytes_raw / self.bytes_sent if self.bytes_sent else None,
+            "last_error": self.last_error,
+            "last_shipped_at": self.last_shipped_at,
+        }
+
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        输出发送统计指标（注册为指标采集回调）
+
+        Returns:
+            指标样本
+        """
+        yield ("mcp_log_shipper_shipped_total", "counter", "Logs accepted by the SaaS API", [({}, self.shipped)])
+        yield ("mcp_log_shipper_dropped_total", "counter", "Logs dropped because a single row exceeds the upload limit",
+               [({}, self.dropped)])
+        yield ("mcp_log_shipper_failed_batches_total", "counter", "Failed log batches", [({}, self.failed_batches)])
+        yield ("mcp_log_shipper_bytes_sent_total", "counter", "Compressed log bytes sent", [({}, self.bytes_sent)])
+        yield ("mcp_log_shipper_backlog", "gauge", "Local logs not yet shipped",
+               [({}, max(0, self.log_service.store.appended - self.offset))])
+        yield ("mcp_log_shipper_batch_size", "gauge", "Current adaptive batch size", [({}, self.batch_size)])
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                shipped = self.ship_once()
+            except (OSError, http.client.HTTPException, LogShipError) as e:
+                self.failed_batches += 1
+                self._failures += 1
+                self.last_error = str(e)
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is None:
+                    # 指数退避，加随机抖动避免多个节点同时重试
+                    retry_after = min(self.max_backoff, 2 ** (self._failures - 1))
+                    retry_after *= 0.5 + random.random() / 2
+                logger.warning(f"日志发送失败，{retry_after:.1f} 秒后重试: {str(e)}")
+                self._stop.wait(retry_after)
+                continue
+            except Exception as e:
+                # 不能让意外错误终止发送线程
+                self.failed_batches += 1
+                self.last_error = str(e)
+                logger.error(f"日志发送出错: {str(e)}")
+                self._stop.wait(self.interval)
+                continue
+            self._failures = 0
+            if shipped < self.batch_size:
+                # 没有积压，等待新日志
+                self._stop.wait(self.interval)
+
+    def _shrink(self) -> None:
+        self.batch_size = max(self.min_batch, self.batch_size // 2)
+
+    def _encode(self, log: LogRecord) -> bytes:
+        # 映射为 SaaS 平台的日志格式：执行实例对应流程实例，流程ID放入 details
+        details = dict(log.details or {})
+        details["flow_id"] = log.flow_id
+        row = {
+            "tenant_id": self.tenant_id,
+            "process_id": log.execution_id,
+            "step_id": log.step_id,
+            "user_id": log.user_id,
+            "level": log.level,
+            "message": log.message,
+            "details": details,
+            "timestamp": log.timestamp.isoformat(),
+        }
+        return json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+
+    def _check_store(self) -> None:
+        # 本地存储重建后追加序号从0开始，旧的 offset 不再有效
+        store_id = self.log_service.store_id
+        if self._store_id != store_id:
+            if self._store_id is not None:
+                logger.info("本地日志存储已变化，从头开始发送")
+            self._store_id = store_id
+            self.offset, self.pending = 0, None
+            return
+        appended = self.log_service.appended
+        if self.offset > appended or (self.pending is not None and self.pending[1] > appended):
+            # 进程异常退出时未封存的日志段丢失，之后的日志会复用这些追加序号；
+            # 换一个节点ID，避免新日志的批次ID与已发送的批次相同而被平台当作重试丢弃
+            logger.warning(f"本地日志存储缺少已发送区间的末尾，从 {appended} 继续发送")
+            self.node_id = uuid.uuid4().hex[:12]
+            self.offset, self.pending = appended, None
+            self._save_offset()
+
+    def _load_offset(self) -> None:
+        self._store_id: Optional[str] = None
+        if not self.offset_path or not os.path.exists(self.offset_path):
+            return
+        try:
+            with open(self.offset_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 offset 文件失败，从头开始发送: {str(e)}")
+            return
+        self.node_id = state.get("node_id") or self.node_id
+        self._store_id = state.get("store_id")
+        self.offset = int(state.get("offset", 0))
+        pending = state.get("pending")
+        self.pending = (int(pending[0]), int(pending[1])) if pending else None
+
+    def _save_offset(self) -> None:
+        if not self.offset_path:
+            return
+        state = {
+            "node_id": self.node_id,
+            "store_id": self._store_id,
+            "offset": self.offset,
+            "pending": list(self.pending) if self.pending else None,
+        }
+        tmp_path = self.offset_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.offset_path)
+
+def _retry_after(headers: Dict[str, str]) -> Optional[float]:
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        # HTTP 日期格式的 Retry-After 按默认退避处理
+        return None
+
+def _parse_result(body: bytes) -> Dict[str, Any]:
+    try:
+        result = json.loads(body)
+    except ValueError:
+        return {}
+    return result if isinstance(result, dict) else {}
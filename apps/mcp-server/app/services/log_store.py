@@ -0,0 +1,862 @@
+# 与 apps/saas-api、apps/mcp-server 中的同名模块保持完全一致，修改时两处同步（tests/test_shared_modules.py 检查）
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from datetime import datetime, timedelta
+from bisect import bisect_right
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+import numpy as np
+from pydantic import BaseModel
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 时间列以本地时间相对该时刻的微秒数存储
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# 磁盘日志段目录名前缀，以及字典文件名
+_SEGMENT_PREFIX = "segment-"
+_DICTIONARIES = "dictionaries.json"
+_STORE_ID = "store_id"
+
+# 日志对象：记录数据类（见 records.LogRecord）或 pydantic 模型
+LogObject = Any
+
+def _field_names(model: type) -> Tuple[str, ...]:
+    """日志类的字段名"""
+    fields = getattr(model, "__dataclass_fields__", None)
+    return tuple(fields if fields is not None else model.__fields__)
+
+def to_micros(timestamp: datetime) -> int:
+    """把时间转换为微秒整数，带时区的时间先转换为本地时间"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return (timestamp - _EPOCH) // _MICROSECOND
+
+def from_micros(value: int) -> datetime:
+    """把微秒整数还原为时间"""
+    return _EPOCH + timedelta(microseconds=int(value))
+
+class DictLogStore:
+    """
+    以字典保存日志对象的存储，筛选逐条比较属性
+
+    实现简单，作为列式存储的对照实现。
+    """
+
+    def __init__(self, model: type, dict_columns: Sequence[str]):
+        """
+        初始化存储
+
+        Args:
+            model: 日志模型类
+            dict_columns: 可按等值筛选的列（含不属于日志模型的附加列）
+        """
+        self.model = model
+        self.dict_columns = tuple(dict_columns)
+        self._fields = frozenset(_field_names(model))
+        self._logs: Dict[str, LogObject] = {}
+        self._extra: Dict[str, Dict[str, Any]] = {}
+        # 写入顺序，下标即日志的追加序号（删除后不复用）
+        self._order: List[str] = []
+        # 追加序号只在同一个存储实例内有意义
+        self.store_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def append(self, log: LogObject, **extra: Any) -> None:
+        """
+        写入一条日志
+
+        Args:
+            log: 日志对象
+            extra: 附加列的值
+        """
+        with self._lock:
+            self._logs[log.id] = log
+            self._order.append(log.id)
+            if extra:
+                self._extra[log.id] = extra
+
+    def append_many(self, logs: Sequence[LogObject], extras: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        """批量写入日志"""
+        for i, log in enumerate(logs):
+            self.append(log, **(extras[i] if extras else {}))
+
+    @property
+    def appended(self) -> int:
+        """已追加的总行数（含已删除），即下一条日志的追加序号"""
+        return len(self._order)
+
+    def read_since(self, offset: int, limit: int) -> Tuple[List[Tuple[int, LogObject]], int]:
+        """
+        按追加顺序读取序号不小于 offset 的日志
+
+        Args:
+            offset: 起始追加序号
+            limit: 最多返回的日志数
+
+        Returns:
+            ([(追加序号, 日志)], 下一次读取的起始序号)；已删除的日志被跳过
+        """
+        with self._lock:
+            logs = []
+            position = offset
+            while position < len(self._order) and len(logs) < limit:
+                log = self._logs.get(self._order[position])
+                if log is not None:
+                    logs.append((position, log))
+                position += 1
+            return logs, position
+
+    def flush(self) -> None:
+        """字典存储没有需要落盘的数据"""
+
+    def get(self, log_id: str) -> Optional[LogObject]:
+        """按ID获取日志，不存在时返回None"""
+        return self._logs.get(log_id)
+
+    def delete(self, log_id: str) -> bool:
+        """删除日志，不存在时返回False"""
+        with self._lock:
+            self._extra.pop(log_id, None)
+            return self._logs.pop(log_id, None) is not None
+
+    def query(
+        self,
+        equals: Optional[Dict[str, Any]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        message_contains: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[LogObject]:
+        """
+        查询日志，按时间倒序分页
+
+        Args:
+            equals: {列名: 值} 等值筛选
+            start_time: 开始时间（含）
+            end_time: 结束时间（含）
+            message_contains: 日志内容包含的文本（不区分大小写）
+            skip: 跳过的日志数
+            limit: 返回的日志数
+
+        Returns:
+            日志列表
+        """
+        logs = [log for log in list(self._logs.values()) if self._match(log, equals, start_time, end_time, message_contains)]
+        logs.sort(key=lambda log: log.timestamp, reverse=True)
+        return logs[skip:skip + limit]
+
+    def count_by(
+        self,
+        column: str,
+        equals: Optional[Dict[str, Any]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Dict[Any, int]:
+        """
+        按列分组计数
+
+        Args:
+            column: 分组列
+            equals: 等值筛选
+            start_time: 开始时间（含）
+            end_time: 结束时间（含）
+
+        Returns:
+            {列值: 日志数}
+        """
+        counts: Dict[Any, int] = {}
+        for log in list(self._logs.values()):
+            if self._match(log, equals, start_time, end_time, None):
+                value = self._value(log, column)
+                counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def _value(self, log: LogObject, column: str) -> Any:
+        if column in self._fields:
+            return getattr(log, column)
+        return self._extra.get(log.id, {}).get(column)
+
+    def _match(
+        self,
+        log: LogObject,
+        equals: Optional[Dict[str, Any]],
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        message_contains: Optional[str]
+    ) -> bool:
+        for column, value in (equals or {}).items():
+            if self._value(log, column) != value:
+                return False
+        if start_time and log.timestamp < start_time:
+            return False
+        if end_time and log.timestamp > end_time:
+            return False
+        if message_contains and message_contains.lower() not in log.message.lower():
+            return False
+        return True
+
+class _Segment:
+    """
+    列式日志段
+
+    ID 以 16 字节 UUID、时间以 int64 微秒、低基数字符串列以字典编码的 int32 存储，
+    日志内容和详情保留为 Python 对象列表。写满 capacity 行后封存：裁剪数组并建立按ID排序的索引。
+    """
+    __slots__ = (
+        "ids", "timestamps", "codes", "messages", "details", "alive",
+        "size", "min_ts", "max_ts", "id_order", "zones", "sealed"
+    )
+
+    def __init__(self, capacity: int, columns: Sequence[str]):
+        self.ids = np.zeros(capacity, dtype="S16")
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.codes = {column: np.zeros(capacity, dtype=np.int32) for column in columns}
+        self.messages: List[str] = []
+        self.details: List[Any] = []
+        self.alive = np.ones(capacity, dtype=bool)
+        self.size = 0
+        self.min_ts = np.iinfo(np.int64).max
+        self.max_ts = np.iinfo(np.int64).min
+        self.id_order: Optional[np.ndarray] = None
+        # 封存后各 zone map 列出现过的编码
+        self.zones: Optional[Dict[str, Set[int]]] = None
+        self.sealed = False
+
+    def seal(self, zone_columns: Sequence[str] = ()) -> None:
+        """封存日志段并建立 zone map，之后只允许标记删除"""
+        size = self.size
+        self.ids = self.ids[:size].copy()
+        self.timestamps = self.timestamps[:size].copy()
+        self.codes = {column: codes[:size].copy() for column, codes in self.codes.items()}
+        self.alive = self.alive[:size].copy()
+        self.id_order = np.argsort(self.ids, kind="stable")
+        self.zones = {column: set(np.unique(self.codes[column]).tolist()) for column in zone_columns}
+        self.sealed = True
+
+    def find(self, key: bytes) -> Optional[int]:
+        """在封存的日志段中二分查找ID所在行"""
+        return _find(self.ids, self.id_order, self.size, key)
+
+def _find(ids: np.ndarray, id_order: np.ndarray, size: int, key: bytes) -> Optional[int]:
+    """在按 id_order 排序的ID列中二分查找"""
+    position = int(np.searchsorted(ids, key, sorter=id_order))
+    if position < size:
+        row = int(id_order[position])
+        if ids[row] == key:
+            return row
+    return None
+
+class _BlobColumn:
+    """
+    磁盘上的变长值列：所有值的 UTF-8 编码首尾相接存为一个文件，另存 int64 偏移量，
+    按行读取时只访问该行所在的页
+    """
+    __slots__ = ("path", "is_json", "_blob", "_offsets")
+
+    def __init__(self, path: str, is_json: bool = False):
+        self.path = path
+        self.is_json = is_json
+        self._blob = None
+        self._offsets = None
+
+    def __getitem__(self, row: int) -> Any:
+        if self._offsets is None:
+            self._offsets = np.load(self.path + ".offsets.npy", mmap_mode="r")
+            self._blob = np.memmap(self.path + ".bin", dtype=np.uint8, mode="r") if self._offsets[-1] else b""
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        text = bytes(self._blob[start:end]).decode("utf-8")
+        if not self.is_json:
+            return text
+        return json.loads(text) if text else None
+
+    @staticmethod
+    def write(path: str, values: List[Any], is_json: bool = False) -> None:
+        """写入变长值列，JSON 列中的 None 写为空值"""
+        encoded = [
+            (json.dumps(value, ensure_ascii=False, default=str) if value is not None else "") if is_json else value
+            for value in values
+        ]
+        chunks = [value.encode("utf-8") for value in encoded]
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+        with open(path + ".bin", "wb") as f:
+            f.write(b"".join(chunks))
+        np.save(path + ".offsets.npy", offsets)
+
+class _DiskColumns:
+    """按需以 mmap 方式打开的字典编码列"""
+    __slots__ = ("path", "_columns")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        codes = self._columns.get(column)
+        if codes is None:
+            codes = self._columns[column] = np.load(os.path.join(self.path, f"codes.{column}.npy"), mmap_mode="r")
+        return codes
+
+class _DiskSegment:
+    """
+    已写入磁盘的日志段
+
+    打开时只读取 meta.json（行数、时间范围和 zone map），各列在第一次被访问时才以 mmap 方式打开，
+    被 zone map 排除的段不会触及数据页。
+    """
+    __slots__ = ("path", "size", "min_ts", "max_ts", "zones", "deleted", "codes", "messages", "details", "_arrays", "_alive")
+    sealed = True
+
+    def __init__(self, path: str, meta: Dict[str, Any], zones: Dict[str, Set[int]]):
+        self.path = path
+        self.size = meta["size"]
+        self.min_ts = meta["min_ts"]
+        self.max_ts = meta["max_ts"]
+        self.zones = zones
+        self.deleted: List[int] = meta.get("deleted", [])
+        self.codes = _DiskColumns(path)
+        self.messages = _BlobColumn(os.path.join(path, "messages"))
+        self.details = _BlobColumn(os.path.join(path, "details"), is_json=True)
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._alive: Optional[np.ndarray] = None
+
+    def _array(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            array = self._arrays[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return array
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._array("ids")
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._array("timestamps")
+
+    @property
+    def id_order(self) -> np.ndarray:
+        return self._array("id_order")
+
+    @property
+    def alive(self) -> np.ndarray:
+        if self._alive is None:
+            self._alive = np.ones(self.size, dtype=bool)
+            self._alive[self.deleted] = False
+        return self._alive
+
+    def find(self, key: bytes) -> Optional[int]:
+        """二分查找ID所在行"""
+        return _find(self.ids, self.id_order, self.size, key)
+
+    def mark_deleted(self, row: int) -> None:
+        """标记删除并持久化删除记录"""
+        self.alive[row] = False
+        self.deleted.append(row)
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["deleted"] = self.deleted
+        _write_json(meta_path, meta)
+
+    @staticmethod
+    def write(directory: str, name: str, segment: _Segment, zones: Dict[str, List[Any]]) -> str:
+        """
+        把封存的内存日志段写入磁盘
+
+        先写入临时目录再整体改名，进程中途退出不会留下不完整的日志段。
+        """
+        path = os.path.join(directory, name)
+        staging = path + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, "ids.npy"), segment.ids)
+        np.save(os.path.join(staging, "timestamps.npy"), segment.timestamps)
+        np.save(os.path.join(staging, "id_order.npy"), segment.id_order)
+        for column, codes in segment.codes.items():
+            np.save(os.path.join(staging, f"codes.{column}.npy"), codes)
+        _BlobColumn.write(os.path.join(staging, "messages"), segment.messages)
+        _BlobColumn.write(os.path.join(staging, "details"), segment.details, is_json=True)
+        deleted = np.flatnonzero(~segment.alive).tolist()
+        meta = {
+            "size": segment.size,
+            "min_ts": int(segment.min_ts),
+            "max_ts": int(segment.max_ts),
+            "zones": zones,
+            "deleted": deleted
+        }
+        _write_json(os.path.join(staging, "meta.json"), meta)
+        os.replace(staging, path)
+        return path
+
+def _write_json(path: str, value: Any) -> None:
+    """原子地写入 JSON 文件"""
+    staging = path + ".tmp"
+    with open(staging, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False)
+    os.replace(staging, path)
+
+class ColumnarLogStore:
+    """
+    列式日志存储
+
+    日志按写入顺序追加到定长日志段中，筛选在每个段上用 NumPy 布尔掩码向量化完成，
+    只有最终返回的那一页才构造日志对象。每个段记录时间范围（zone map），
+    时间条件与之不相交的段直接跳过；按时间倒序取前 N 条时，段的最大时间早于
+    已取得的第 N 条时即可停止。
+
+    指定 directory 时，封存的日志段写入磁盘并以 mmap 方式读回，内存中只保留正在写入的段；
+    启动时只读取各段的元数据，不需要重新加载日志。封存的段还为 zone_columns 记录出现过的值，
+    按这些列等值筛选时不含该值的段整段跳过。
+    """
+
+    def __init__(
+        self,
+        model: type,
+        dict_columns: Sequence[str],
+        segment_size: int = 8192,
+        directory: Optional[str] = None,
+        zone_columns: Sequence[str] = ()
+    ):
+        """
+        初始化存储
+
+        Args:
+            model: 日志模型类，需包含 id、timestamp、message、details 字段
+            dict_columns: 字典编码的字符串列（含不属于日志模型的附加列），编码 0 表示 None
+            segment_size: 每个日志段的行数
+            directory: 日志段目录，为None时只保存在内存中
+            zone_columns: 建立 zone map 的字典编码列
+        """
+        self.model = model
+        self.dict_columns = tuple(dict_columns)
+        self.segment_size = segment_size
+        self.directory = directory
+        self.zone_columns = tuple(zone_columns)
+        self._model_columns = tuple(column for column in self.dict_columns if column in _field_names(model))
+        # 记录数据类直接构造；pydantic 模型用 construct 跳过重复校验
+        self._build = model.construct if issubclass(model, BaseModel) else model
+        self._dictionaries: Dict[str, Dict[str, int]] = {column: {} for column in self.dict_columns}
+        self._values: Dict[str, List[Optional[str]]] = {column: [None] for column in self.dict_columns}
+        self._segments: List[_Segment] = []
+        self._active: Optional[_Segment] = None
+        # 未封存段的 ID -> 行号
+        self._active_ids: Dict[bytes, int] = {}
+        self._count = 0
+        # 各日志段第一行的追加序号，以及已追加的总行数（含已删除）
+        self._starts: List[int] = []
+        self._appended = 0
+        self._next_segment = 0
+        self._lock = threading.RLock()
+        # 追加序号只在同一个存储实例内有意义；磁盘存储重启后沿用原来的ID
+        self.store_id = uuid.uuid4().hex
+        if directory is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, log: LogObject, **extra: Any) -> None:
+        """
+        写入一条日志
+
+        Args:
+            log: 日志对象，ID 必须是 UUID 字符串
+            extra: 附加列的值
+        """
+        self.append_many([log], [extra])
+
+    def append_many(self, logs: Sequence[LogObject], extras: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        """
+        批量写入日志，在一次加锁内按日志段切片整体赋值
+
+        Args:
+            logs: 日志对象列表，ID 必须是 UUID 字符串
+            extras: 与 logs 一一对应的附加列的值
+        """
+        keys = [uuid.UUID(log.id).bytes for log in logs]
+        timestamps = [to_micros(log.timestamp) for log in logs]
+        columns = {
+            column: [getattr(log, column) for log in logs] if column in self._model_columns
+            else [extra.get(column) for extra in extras] if extras else [None] * len(logs)
+            for column in self.dict_columns
+        }
+        with self._lock:
+            start = 0
+            while start < len(logs):
+                segment = self._active
+                if segment is None or segment.size >= self.segment_size:
+                    if segment is not None:
+                        self._seal()
+                    segment = self._active = _Segment(self.segment_size, self.dict_columns)
+                    self._segments.append(segment)
+                    self._starts.append(self._appended)
+                    self._active_ids = {}
+
+                row = segment.size
+                end = min(len(logs), start + self.segment_size - row)
+                chunk = slice(row, row + end - start)
+                segment.ids[chunk] = keys[start:end]
+                chunk_ts = np.asarray(timestamps[start:end], dtype=np.int64)
+                segment.timestamps[chunk] = chunk_ts
+                for column, values in columns.items():
+                    segment.codes[column][chunk] = [self._encode(column, value) for value in values[start:end]]
+                segment.messages.extend(log.message for log in logs[start:end])
+                segment.details.extend(log.details for log in logs[start:end])
+                segment.min_ts = min(segment.min_ts, int(chunk_ts.min()))
+                segment.max_ts = max(segment.max_ts, int(chunk_ts.max()))
+                segment.size = row + end - start
+                self._active_ids.update(zip(keys[start:end], range(row, segment.size)))
+                self._count += end - start
+                self._appended += end - start
+                start = end
+
+    @property
+    def appended(self) -> int:
+        """已追加的总行数（含已删除），即下一条日志的追加序号"""
+        return self._appended
+
+    def read_since(self, offset: int, limit: int) -> Tuple[List[Tuple[int, LogObject]], int]:
+        """
+        按追加顺序读取序号不小于 offset 的日志
+
+        Args:
+            offset: 起始追加序号
+            limit: 最多返回的日志数
+
+        Returns:
+            ([(追加序号, 日志)], 下一次读取的起始序号)；已删除的日志被跳过
+        """
+        with self._lock:
+            logs = []
+            position = max(0, offset)
+            index = bisect_right(self._starts, position) - 1
+            while 0 <= index < len(self._segments) and len(logs) < limit:
+                segment, start = self._segments[index], self._starts[index]
+                row = position - start
+                if row >= segment.size:
+                    if index == len(self._segments) - 1:
+                        break
+                    index += 1
+                    position = self._starts[index]
+                    continue
+                alive = segment.alive
+                while row < segment.size and len(logs) < limit:
+                    if alive[row]:
+                        logs.append((start + row, self._materialize(segment, row)))
+                    row += 1
+                position = start + row
+            return logs, position
+
+    def flush(self) -> None:
+        """封存正在写入的日志段（未写满也封存），指定了目录时同时写入磁盘"""
+        with self._lock:
+            if self._active is not None and self._active.size:
+                self._seal()
+
+    def get(self, log_id: str) -> Optional[LogObject]:
+        """按ID获取日志，不存在时返回None"""
+        location = self._locate(log_id)
+        if location is None:
+            return None
+        segment, row = location
+        return self._materialize(segment, row)
+
+    def delete(self, log_id: str) -> bool:
+        """标记删除日志，不存在时返回False"""
+        with self._lock:
+            location = self._locate(log_id)
+            if location is None:
+                return False
+            segment, row = location
+            if isinstance(segment, _DiskSegment):
+                segment.mark_deleted(row)
+            else:
+                segment.alive[row] = False
+            self._count -= 1
+            return True
+
+    def query(
+        self,
+        equals: Optional[Dict[str, Any]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        message_contains: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[LogObject]:
+        """
+        查询日志，按时间倒序分页
+
+        Args:
+            equals: {列名: 值} 等值筛选
+            start_time: 开始时间（含）
+            end_time: 结束时间（含）
+            message_contains: 日志内容包含的文本（不区分大小写）
+            skip: 跳过的日志数
+            limit: 返回的日志数
+
+        Returns:
+            日志列表
+        """
+        wanted = skip + limit
+        if wanted <= 0:
+            return []
+        with self._lock:
+            codes = self._equal_codes(equals)
+            if codes is None:
+                return []
+            low, high = self._time_bounds(start_time, end_time)
+            needle = message_contains.lower() if message_contains else None
+
+            # 候选 (时间, 段序号, 行号)，按时间最大的段优先处理
+            candidates: List[Tuple[int, int, int]] = []
+            order = sorted(range(len(self._segments)), key=lambda i: self._segments[i].max_ts, reverse=True)
+            for index in order:
+                segment = self._segments[index]
+                if len(candidates) >= wanted and segment.max_ts < candidates[wanted - 1][0]:
+                    break
+                rows = self._filter(segment, codes, low, high)
+                if needle is not None:
+                    rows = [row for row in rows.tolist() if needle in segment.messages[row].lower()]
+                    rows = np.asarray(rows, dtype=np.int64)
+                if not len(rows):
+                    continue
+                timestamps = segment.timestamps[rows]
+                # 段内只保留最新的 wanted 行
+                if len(rows) > wanted:
+                    top = np.argpartition(-timestamps, wanted - 1)[:wanted]
+                    rows, timestamps = rows[top], timestamps[top]
+                candidates.extend(zip(timestamps.tolist(), [index] * len(rows), rows.tolist()))
+                # 时间相同时先写入的在前，与稳定排序的结果一致
+                candidates.sort(key=lambda item: (-item[0], item[1], item[2]))
+                del candidates[wanted:]
+
+            return [
+                self._materialize(self._segments[index], row)
+                for _, index, row in candidates[skip:wanted]
+            ]
+
+    def count_by(
+        self,
+        column: str,
+        equals: Optional[Dict[str, Any]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Dict[Any, int]:
+        """
+        按字典编码列分组计数
+
+        Args:
+            column: 分组列
+            equals: 等值筛选
+            start_time: 开始时间（含）
+            end_time: 结束时间（含）
+
+        Returns:
+            {列值: 日志数}
+        """
+        if column not in self._dictionaries:
+            raise ValueError(f"不支持按该列分组: {column}")
+        with self._lock:
+            codes = self._equal_codes(equals)
+            if codes is None:
+                return {}
+            low, high = self._time_bounds(start_time, end_time)
+            totals = np.zeros(len(self._values[column]), dtype=np.int64)
+            for segment in self._segments:
+                mask = self._mask(segment, codes, low, high)
+                if mask is None:
+                    continue
+                grouped = segment.codes[column][:segment.size][mask]
+                totals[:] += np.bincount(grouped, minlength=len(totals))
+            values = self._values[column]
+            return {values[code]: int(count) for code, count in enumerate(totals.tolist()) if count}
+
+    def memory_usage(self) -> int:
+        """
+        估算列数据占用的字节数（不含日志内容字符串和详情对象本身）
+
+        Returns:
+            字节数
+        """
+        with self._lock:
+            total = 0
+            for segment in self._segments:
+                if isinstance(segment, _DiskSegment):
+                    continue
+                total += segment.ids.nbytes + segment.timestamps.nbytes + segment.alive.nbytes
+                total += sum(codes.nbytes for codes in segment.codes.values())
+                if segment.id_order is not None:
+                    total += segment.id_order.nbytes
+                total += 8 * (len(segment.messages) + len(segment.details))
+            return total
+
+    def _equal_codes(self, equals: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """把等值条件转换为编码，值从未出现过时返回None（结果必为空）"""
+        codes = {}
+        for column, value in (equals or {}).items():
+            if column not in self._dictionaries:
+                raise ValueError(f"不支持按该列筛选: {column}")
+            code = 0 if value is None else self._dictionaries[column].get(value)
+            if code is None:
+                return None
+            codes[column] = code
+        return codes
+
+    @staticmethod
+    def _time_bounds(start_time: Optional[datetime], end_time: Optional[datetime]) -> Tuple[Optional[int], Optional[int]]:
+        return (
+            to_micros(start_time) if start_time else None,
+            to_micros(end_time) if end_time else None
+        )
+
+    def _mask(
+        self,
+        segment: _Segment,
+        codes: Dict[str, int],
+        low: Optional[int],
+        high: Optional[int]
+    ) -> Optional[np.ndarray]:
+        """计算日志段的筛选掩码，时间范围不相交时返回None"""
+        size = segment.size
+        if not size or (low is not None and segment.max_ts < low) or (high is not None and segment.min_ts > high):
+            return None
+        if segment.zones:
+            for column, code in codes.items():
+                zone = segment.zones.get(column)
+                if zone is not None and code not in zone:
+                    return None
+        mask = segment.alive[:size].copy()
+        for column, code in codes.items():
+            mask &= segment.codes[column][:size] == code
+        if low is not None and segment.min_ts < low:
+            mask &= segment.timestamps[:size] >= low
+        if high is not None and segment.max_ts > high:
+            mask &= segment.timestamps[:size] <= high
+        return mask
+
+    def _filter(self, segment: _Segment, codes: Dict[str, int], low: Optional[int], high: Optional[int]) -> np.ndarray:
+        mask = self._mask(segment, codes, low, high)
+        if mask is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(mask)
+
+    def _seal(self) -> None:
+        """封存当前日志段；指定了目录时写入磁盘并换成 mmap 读取的日志段（调用方已持有锁）"""
+        segment = self._active
+        segment.seal(self.zone_columns)
+        self._active = None
+        self._active_ids = {}
+        if self.directory is None:
+            return
+
+        # 先持久化字典，保证磁盘上任意日志段的编码都能解析
+        _write_json(os.path.join(self.directory, _DICTIONARIES), {
+            column: values[1:] for column, values in self._values.items()
+        })
+        zones = {
+            column: [self._values[column][code] for code in sorted(codes)]
+            for column, codes in segment.zones.items()
+        }
+        name = f"{_SEGMENT_PREFIX}{self._next_segment:08d}"
+        self._next_segment += 1
+        path = _DiskSegment.write(self.directory, name, segment, zones)
+        self._segments[self._segments.index(segment)] = _DiskSegment(path, {
+            "size": segment.size,
+            "min_ts": int(segment.min_ts),
+            "max_ts": int(segment.max_ts),
+            "deleted": np.flatnonzero(~segment.alive).tolist()
+        }, segment.zones)
+        logger.info(f"日志段已写入磁盘: {name}, {segment.size} 行")
+
+    def _load(self) -> None:
+        """打开目录中已有的日志段，只读取元数据"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, _STORE_ID)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.store_id = f.read().strip()
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.store_id)
+
+        path = os.path.join(self.directory, _DICTIONARIES)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            for column in self.dict_columns:
+                for value in stored.get(column, []):
+                    self._encode(column, value)
+
+        for name in sorted(os.listdir(self.directory)):
+            if not name.startswith(_SEGMENT_PREFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                # 上次写入中途退出留下的临时目录
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            zones = {
+                column: {self._dictionaries[column][value] if value is not None else 0 for value in values}
+                for column, values in meta.get("zones", {}).items()
+                if column in self._dictionaries
+            }
+            self._segments.append(_DiskSegment(path, meta, zones))
+            self._starts.append(self._appended)
+            self._appended += meta["size"]
+            self._count += meta["size"] - len(meta.get("deleted", []))
+            self._next_segment = max(self._next_segment, int(name[len(_SEGMENT_PREFIX):]) + 1)
+        if self._segments:
+            logger.info(f"打开 {len(self._segments)} 个磁盘日志段, {self._count} 条日志")
+
+    def _encode(self, column: str, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        dictionary = self._dictionaries[column]
+        code = dictionary.get(value)
+        if code is None:
+            code = dictionary[value] = len(self._values[column])
+            self._values[column].append(value)
+        return code
+
+    def _locate(self, log_id: str) -> Optional[Tuple[_Segment, int]]:
+        try:
+            key = uuid.UUID(log_id).bytes
+        except (ValueError, TypeError, AttributeError):
+            return None
+        with self._lock:
+            row = self._active_ids.get(key)
+            if row is not None and self._active.alive[row]:
+                return self._active, row
+            for segment in self._segments:
+                if not segment.sealed:
+                    continue
+                row = segment.find(key)
+                if row is not None and segment.alive[row]:
+                    return segment, row
+            return None
+
+    def _materialize(self, segment: _Segment, row: int) -> LogObject:
+        """构造单条日志对象（数据已在写入时校验，跳过重复校验）"""
+        fields: Dict[str, Any] = {
+            "id": str(uuid.UUID(bytes=segment.ids[row].ljust(16, b"\0"))),
+            "timestamp": from_micros(segment.timestamps[row]),
+            "message": segment.messages[row],
+            "details": segment.details[row]
+        }
+        for column in self._model_columns:
+            fields[column] = self._values[column][segment.codes[column][row]]
+        return self._build(**fields)
@@ -0,0 +1,59 @@
+from typing import Any, Dict, Optional
+from dataclasses import dataclass
+from datetime import datetime
+import sys
+
+# 内存存储使用的紧凑记录类型
+#
+# pydantic 模型每个实例带 __dict__ 和 __fields_set__，创建时还要逐字段校验；存储中的数据在接口层已校验过，
+# 因此服务内部保存为带 __slots__ 的数据类，字段与对应的 pydantic 模型相同，只在接口边界使用 pydantic 模型。
+# FastAPI 按 response_model 直接接受数据类，列表接口由 json_response 直接序列化（orjson 原生支持数据类）。
+
+def interned(value: Optional[str]) -> Optional[str]:
+    """驻留重复出现的字符串（流程ID、用户ID、状态等），相同取值的记录共用一个字符串对象"""
+    return sys.intern(value) if value is not None else None
+
+@dataclass
+class LogRecord:
+    """执行日志，字段同 schemas.log.Log"""
+    __slots__ = ("flow_id", "execution_id", "step_id", "user_id", "level", "message", "details", "id", "timestamp")
+    flow_id: str
+    execution_id: str
+    step_id: Optional[str]
+    user_id: str
+    level: str
+    message: str
+    details: Optional[Dict[str, Any]]
+    id: str
+    timestamp: datetime
+
+@dataclass
+class StepRecord:
+    """流程步骤，字段同 schemas.step.Step"""
+    __slots__ = ("flow_id", "name", "description", "type", "config", "position", "id", "created_at", "updated_at")
+    flow_id: str
+    name: str
+    description: Optional[str]
+    type: str
+    config: Dict[str, Any]
+    position: Dict[str, int]
+    id: str
+    created_at: datetime
+    updated_at: datetime
+
+@dataclass
+class ExecutionRecord:
+    """流程执行实例，字段同 schemas.execution.Execution"""
+    __slots__ = (
+        "flow_id", "user_id", "initial_parameters", "id", "status", "current_step_id",
+        "started_at", "finished_at", "result"
+    )
+    flow_id: str
+    user_id: str
+    initial_parameters: Optional[Dict[str, Any]]
+    id: str
+    status: str
+    current_step_id: Optional[str]
+    started_at: datetime
+    finished_at: Optional[datetime]
+    result: Optional[Dict[str, Any]]
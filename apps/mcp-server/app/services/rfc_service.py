@@ -1,9 +1,15 @@
 from typing import Dict, Any, Optional
 import logging
+import time
+from app.core.metrics import REGISTRY
+from app.core.tracing import TRACER
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+RFC_LATENCY = REGISTRY.histogram("mcp_rfc_call_duration_seconds", "SAP RFC call latency by function", ("function",))
+RFC_ERRORS = REGISTRY.counter("mcp_rfc_call_errors_total", "Failed SAP RFC calls by function", ("function",))
+
 class RFCService:
     """
     SAP RFC 服务类，负责与 SAP 系统进行 RFC 调用
@@ -45,30 +51,34 @@ class RFCService:
         Raises:
             Exception: RFC 调用失败时抛出异常
         """
-        try:
-            # 在实际实现中，这里需要调用真实的 SAP RFC 函数
-            # 例如：result = self.connection.call(function_name, **parameters)
-            
-            # 临时模拟实现
-            logger.info(f"调用 RFC 函数: {function_name}")
-            logger.debug(f"参数: {parameters}")
-            
-            # 模拟返回结果
-            result = {
-                "function_name": function_name,
-                "parameters": parameters,
-                "result": {
-                    "status": "success",
-                    "message": f"RFC 函数 {function_name} 调用成功",
-                    "data": {}
-                },
-                "timestamp": "2025-08-22T10:00:00Z"
-            }
-            
-            return result
-        except Exception as e:
-            logger.error(f"RFC 调用失败: {function_name}, 错误: {str(e)}")
-            raise Exception(f"RFC 调用失败: {str(e)}")
+        with TRACER.span("rfc.call", {"rfc.function": function_name}, kind="client"):
+            start = time.perf_counter()
+            try:
+                # 在实际实现中，这里需要调用真实的 SAP RFC 函数
+                # 例如：result = self.connection.call(function_name, **parameters)
+                
+                # 临时模拟实现
+                logger.info(f"调用 RFC 函数: {function_name}")
+                logger.debug(f"参数: {parameters}")
+                
+                # 模拟返回结果
+                result = {
+                    "function_name": function_name,
+                    "parameters": parameters,
+                    "result": {
+                        "status": "success",
+                        "message": f"RFC 函数 {function_name} 调用成功",
+                        "data": {}
+                    },
+                    "timestamp": "2025-08-22T10:00:00Z"
+                }
+                
+                RFC_LATENCY.labels(function_name).observe(time.perf_counter() - start)
+                return result
+            except Exception as e:
+                RFC_ERRORS.labels(function_name).inc()
+                logger.error(f"RFC 调用失败: {function_name}, 错误: {str(e)}")
+                raise Exception(f"RFC 调用失败: {str(e)}")
     
     def search_rfc_schema(self, function_name: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,130 @@
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import http.client
+import queue
+import threading
+import time
+from app.core.metrics import REGISTRY
+from app.core.tracing import TRACER
+
+POOL_WAIT = REGISTRY.histogram(
+    "mcp_http_pool_wait_seconds", "Time waiting for a pooled HTTP connection by host", ("host",)
+)
+CONNECTIONS_OPENED = REGISTRY.counter("mcp_http_connections_opened_total", "New HTTP connections by host", ("host",))
+
+class KeepAliveClient:
+    """
+    复用长连接的 HTTP 客户端（线程安全）
+
+    连接池最多 pool_size 个连接，请求结束后连接放回池中复用，省去每次请求的 TCP/TLS 握手。
+    复用的连接可能已被服务端关闭，此时换一个新连接重试一次。
+    每个请求带上当前链路的 traceparent 请求头，服务端的 Span 挂在本次调用的 client Span 下。
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 2, timeout: float = 10.0,
+                 headers: Optional[Dict[str, str]] = None):
+        """
+        初始化客户端
+
+        Args:
+            base_url: 服务地址，例如 http://localhost:8001
+            pool_size: 最大连接数
+            timeout: 连接和读取超时（秒）
+            headers: 每个请求都带上的请求头
+        """
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"无效的服务地址: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.connections_opened = 0
+        self._pool_wait = POOL_WAIT.labels(self.host)
+        self._opened = CONNECTIONS_OPENED.labels(self.host)
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        发送请求并读取完整响应
+
+        Args:
+            method: 请求方法
+            path: 请求路径（相对 base_url）
+            body: 请求体
+            headers: 额外的请求头
+
+        Returns:
+            (状态码, 响应头（小写键）, 响应体)
+
+        Raises:
+            OSError: 连接失败或超时
+            http.client.HTTPException: 响应格式错误
+        """
+        request_headers = dict(self.headers)
+        if headers:
+            request_headers.update(headers)
+        url = self.base_path + path
+
+        with TRACER.span(f"HTTP {method}", {"http.method": method, "http.url": f"{self.host}{url}"},
+                         kind="client") as span:
+            request_headers["traceparent"] = span.traceparent()
+            waited = time.perf_counter()
+            with self._slots:
+                self._pool_wait.observe(time.perf_counter() - waited)
+                conn, reused = self._acquire()
+                try:
+                    response = self._send(conn, method, url, body, request_headers)
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    if not reused:
+                        raise
+                    # 空闲的长连接被服务端关闭，换新连接重试一次
+                    conn, reused = self._new_connection(), False
+                    try:
+                        response = self._send(conn, method, url, body, request_headers)
+                    except (OSError, http.client.HTTPException):
+                        conn.close()
+                        raise
+
+                status, response_headers, data = response
+                span.set_attribute("http.status_code", status)
+                if response_headers.get("connection", "").lower() == "close":
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+                return status, response_headers, data
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        self.connections_opened += 1
+        self._opened.inc()
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    @staticmethod
+    def _send(conn: http.client.HTTPConnection, method: str, url: str, body: Optional[bytes],
+              headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        conn.request(method, url, body=body, headers=headers)
+        response = conn.getresponse()
+        # 必须读完响应体，连接才能复用
+        data = response.read()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, data
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from app.services.catalog_cache import CatalogCache
+from app.services.catalog_sync import CatalogSyncer
+
+class _ChangesHandler(BaseHTTPRequestHandler):
+    """模拟 SaaS 平台的 /sync/changes 接口"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        params = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        since, limit = int(params["since"]), int(params["limit"])
+        head = f'"feed-1.{len(server.changes)}"'
+        server.requests += 1
+        if self.headers.get("If-None-Match") == head and since == len(server.changes):
+            self._reply(304, b"", head)
+            return
+        page = server.changes[since:since + limit]
+        has_more = since + limit < len(server.changes)
+        version = since + len(page)
+        body = json.dumps({"feed_id": "feed-1", "version": version, "reset": False,
+                           "has_more": has_more, "changes": page}).encode("utf-8")
+        self._reply(200, body, f'"feed-1.{version}"')
+
+    def _reply(self, status, body, etag):
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _template(template_id, version, name):
+    return {"kind": "template", "id": template_id, "op": "upsert", "version": version,
+            "data": {"id": template_id, "name": name, "category": "sales", "dsl": {"steps": []}}}
+
+class TestCatalogCache(unittest.TestCase):
+    """模板和知识库本地缓存测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ChangesHandler)
+        self.server.changes = []
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.mkdtemp()
+        self.snapshot_path = os.path.join(self.directory, "catalog.json.gz")
+
+    def tearDown(self):
+        """测试后清理"""
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_apply_changes(self):
+        """测试应用新增、更新、删除和重建"""
+        cache = CatalogCache()
+        cache.apply({"feed_id": "f", "version": 2, "changes": [
+            _template("t1", 1, "销售订单"),
+            {"kind": "knowledge", "id": "k1", "op": "upsert", "version": 2, "data": {"id": "k1", "category": "sap"}},
+        ]})
+        self.assertEqual(cache.get_template("t1")["name"], "销售订单")
+        self.assertEqual([i["id"] for i in cache.list_knowledge_items("sap")], ["k1"])
+
+        cache.apply({"feed_id": "f", "version": 4, "changes": [
+            _template("t1", 3, "销售订单 v2"),
+            {"kind": "knowledge", "id": "k1", "op": "delete", "version": 4},
+        ]})
+        self.assertEqual(cache.get_template("t1")["name"], "销售订单 v2")
+        self.assertIsNone(cache.get_knowledge_item("k1"))
+
+        cache.apply({"feed_id": "g", "version": 1, "reset": True, "changes": [_template("t2", 1, "交货")]})
+        self.assertIsNone(cache.get_template("t1"))
+        self.assertEqual(cache.feed_id, "g")
+
+    def test_sync_with_etag(self):
+        """测试分页同步，已是最新版本时平台返回 304"""
+        self.server.changes = [_template(f"t{i}", i + 1, f"模板 {i}") for i in range(5)]
+        cache = CatalogCache()
+        syncer = CatalogSyncer(cache, self.url, tenant_id="tenant-1", page_size=2)
+        self.assertEqual(syncer.sync_once(), 5)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(cache.version, 5)
+        self.assertEqual(cache.etag, '"feed-1.5"')
+
+        self.assertEqual(syncer.sync_once(), 0)
+        self.assertEqual(syncer.not_modified, 1)
+
+        self.server.changes.append(_template("t0", 6, "模板 0 v2"))
+        self.assertEqual(syncer.sync_once(), 1)
+        self.assertEqual(cache.get_template("t0")["name"], "模板 0 v2")
+        self.assertEqual(syncer.client.connections_opened, 1)
+        syncer.stop()
+
+    def test_snapshot(self):
+        """测试快照保存后重启即可加载，并从快照的版本继续同步"""
+        self.server.changes = [_template(f"t{i}", i + 1, f"模板 {i}") for i in range(3)]
+        cache = CatalogCache(self.snapshot_path)
+        CatalogSyncer(cache, self.url).sync_once()
+        self.assertTrue(os.path.exists(self.snapshot_path))
+        # 没有新变更时不重写快照
+        self.assertFalse(cache.save_snapshot())
+
+        restored = CatalogCache(self.snapshot_path)
+        self.assertEqual(restored.version, 3)
+        self.assertEqual(restored.get_template("t2")["name"], "模板 2")
+        requests = self.server.requests
+        self.assertEqual(CatalogSyncer(restored, self.url).sync_once(), 0)
+        self.assertEqual(self.server.requests, requests + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+from app.services.flow_service import FlowService
+from app.services.dsl_compiler import compile_dsl
+from app.schemas.flow import FlowCreate, FlowUpdate
+from app.schemas.execution import ExecutionCreate
+from app.schemas.step import StepCreate
+from app.services.flow_service import STEP_LATENCY, STEP_PHASE_LATENCY, STEP_ERRORS
+
+ORDER_DSL = {
+    "steps": [
+        {"id": "notify", "type": "output", "depends_on": ["create", "check"]},
+        {"id": "start", "type": "input", "next": "check"},
+        {"id": "check", "type": "condition", "config": {"true_next": "create"}},
+        {"id": "create", "type": "mcp_call", "config": {"rfc_function": "BAPI_SALESORDER_CREATEFROMDAT2"}}
+    ]
+}
+
+class TestFlowService(unittest.TestCase):
+    """流程服务测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.flow_service = FlowService()
+    
+    def tearDown(self):
+        """测试后清理"""
+        self.flow_service.close()
+    
+    def test_compile_dsl(self):
+        """测试 DSL 编译的拓扑排序和 RFC 结构预解析"""
+        plan = compile_dsl(ORDER_DSL, "flow-1", "1.0", self.flow_service.rfc_service.search_rfc_schema)
+        
+        self.assertEqual([step.id for step in plan.steps], ["start", "check", "create", "notify"])
+        self.assertEqual(plan.entry, ("start",))
+        self.assertEqual(plan.get_step("notify").depends_on, ("create", "check"))
+        self.assertEqual(plan.get_step("notify").level, 3)
+        self.assertEqual(plan.get_step("create").rfc_schema["function_name"], "BAPI_SALESORDER_CREATEFROMDAT2")
+        with self.assertRaises(TypeError):
+            plan.get_step("create").config["rfc_function"] = "OTHER"
+        
+        # 流程设计器导出的 nodes/edges 写法
+        plan = compile_dsl({
+            "nodes": [
+                {"id": "2", "data": {"label": "RFC调用", "type": "mcp_call", "config": {"rfc_function": "STFC_CONNECTION"}}},
+                {"id": "1", "type": "input", "data": {"label": "开始"}},
+                {"id": "3", "type": "output", "data": {"label": "结束"}}
+            ],
+            "edges": [{"id": "e1-2", "source": "1", "target": "2"}, {"id": "e2-3", "source": "2", "target": "3"}]
+        })
+        self.assertEqual([step.id for step in plan.steps], ["1", "2", "3"])
+        self.assertEqual(plan.get_step("2").name, "RFC调用")
+    
+    def test_compile_dsl_rejects_invalid(self):
+        """测试无效 DSL 在编译阶段被拒绝"""
+        invalid_dsls = [
+            {},
+            {"steps": []},
+            {"steps": [{"id": "a", "type": "unknown"}]},
+            {"steps": [{"id": "a", "type": "input", "next": "missing"}]},
+            {"steps": [{"id": "a", "type": "input", "next": "b"}, {"id": "b", "type": "output", "next": "a"}]},
+            {"steps": [{"id": "a", "type": "mcp_call", "config": {}}]},
+            {"steps": [{"id": "a", "type": "input"}, {"id": "a", "type": "output"}]}
+        ]
+        for dsl in invalid_dsls:
+            with self.assertRaises(ValueError):
+                compile_dsl(dsl)
+    
+    def test_publish_flow(self):
+        """测试发布流程后执行直接使用缓存的执行计划"""
+        flow = self.flow_service.create_flow(FlowCreate(name="销售订单", dsl=ORDER_DSL))
+        
+        published = self.flow_service.publish_flow(flow.id)
+        self.assertEqual(published.status, "published")
+        plan = self.flow_service.get_execution_plan(flow.id)
+        
+        execution = self.flow_service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+        self.assertEqual(execution.current_step_id, "start")
+        self.assertIs(self.flow_service.get_execution_plan(flow.id), plan)
+        
+        # 重新发布相同的 DSL 命中编译缓存
+        self.flow_service.publish_flow(flow.id)
+        self.assertEqual(self.flow_service.compiler.hits, 1)
+        
+        # 已发布流程更新为无效 DSL 时被拒绝，原 DSL 保持不变
+        with self.assertRaises(ValueError):
+            self.flow_service.update_flow(flow.id, FlowUpdate(dsl={"steps": [{"id": "a", "type": "loop", "next": "a"}]}))
+        self.assertEqual(self.flow_service.get_flow_by_id(flow.id).dsl, ORDER_DSL)
+        
+        # 草稿流程发布时才校验
+        draft = self.flow_service.create_flow(FlowCreate(name="无效流程", dsl={"steps": []}))
+        with self.assertRaises(ValueError):
+            self.flow_service.publish_flow(draft.id)
+        self.assertEqual(draft.status, "draft")
+        self.assertIsNone(self.flow_service.publish_flow("missing"))
+    
+    def test_execute_step_metrics(self):
+        """测试步骤执行按类型和阶段记录耗时，失败时计数"""
+        flow = self.flow_service.create_flow(FlowCreate(name="销售订单", dsl=ORDER_DSL))
+        position = {"x": 0, "y": 0}
+        call = self.flow_service.create_step(StepCreate(
+            flow_id=flow.id, name="创建订单", type="mcp_call", position=position,
+            config={"rfc_function": "BAPI_SALESORDER_CREATEFROMDAT2"}
+        ))
+        check = self.flow_service.create_step(StepCreate(
+            flow_id=flow.id, name="检查", type="condition", position=position, config={}
+        ))
+        execution = self.flow_service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+        
+        calls = STEP_LATENCY.labels("mcp_call")
+        runs = STEP_PHASE_LATENCY.labels("run")
+        before = (sum(calls.counts), sum(runs.counts), STEP_ERRORS.labels("unknown").value)
+        self.flow_service.execute_step(execution.id, call.id, {"PARAM1": "X"})
+        result = self.flow_service.execute_step(execution.id, check.id, {})
+        self.assertTrue(result["result"])
+        with self.assertRaises(ValueError):
+            self.flow_service.execute_step(execution.id, "missing", {})
+        
+        self.assertEqual(sum(calls.counts) - before[0], 1)
+        self.assertEqual(sum(runs.counts) - before[1], 2)
+        self.assertEqual(STEP_ERRORS.labels("unknown").value - before[2], 1)
+        logs = self.flow_service.log_service.get_logs_by_execution_id(execution.id)
+        self.assertEqual([log.level for log in logs], ["info", "info", "info"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,309 @@
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.services.log_service import LogService
+from app.services.log_shipper import LogShipError, LogShipper
+
+class _BulkHandler(BaseHTTPRequestHandler):
+    """模拟 SaaS 平台的 /logs/bulk 接口"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server.connections.add(self.client_address)
+        if server.fail_next > 0:
+            server.fail_next -= 1
+            self._reply(503, b"{}", {"Retry-After": "0"})
+            return
+        if server.max_body is not None and len(body) > server.max_body:
+            self._reply(413, b"{}")
+            return
+        batch_id = self.headers["X-Batch-Id"]
+        rows = [json.loads(line) for line in gzip.decompress(body).splitlines()]
+        if batch_id not in server.batches:
+            server.batches[batch_id] = rows
+            server.rows.extend(rows)
+        result = {"accepted": len(server.batches[batch_id]), "rejected": 0, "errors": []}
+        self._reply(200, json.dumps(result).encode("utf-8"))
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestLogShipper(unittest.TestCase):
+    """日志转发测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _BulkHandler)
+        self.server.batches = {}
+        self.server.rows = []
+        self.server.connections = set()
+        self.server.fail_next = 0
+        self.server.max_body = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.mkdtemp()
+        self.offset_path = os.path.join(self.directory, "offset.json")
+        self.log_service = LogService()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def _write_logs(self, count, start=0):
+        for i in range(start, start + count):
+            self.log_service.create_log({
+                "flow_id": "flow-1",
+                "execution_id": f"exec-{i % 3}",
+                "step_id": "step-1",
+                "user_id": "user-1",
+                "level": "error" if i % 10 == 0 else "info",
+                "message": f"日志 {i}",
+            })
+
+    def _shipper(self, **kwargs):
+        return LogShipper(self.log_service, self.url, "tenant-1", offset_path=self.offset_path,
+                          min_batch=50, max_batch=400, interval=0.01, **kwargs)
+
+    def test_ship_all_logs_once(self):
+        """测试所有日志按顺序只发送一次，并复用长连接"""
+        self._write_logs(1000)
+        shipper = self._shipper()
+        while shipper.ship_once():
+            pass
+        messages = [row["message"] for row in self.server.rows]
+        self.assertEqual(messages, [f"日志 {i}" for i in range(1000)])
+        row = self.server.rows[0]
+        self.assertEqual(row["tenant_id"], "tenant-1")
+        self.assertEqual(row["process_id"], "exec-0")
+        self.assertEqual(row["details"], {"flow_id": "flow-1"})
+        # 批次满且响应快时批量逐步加大
+        self.assertGreater(shipper.batch_size, 50)
+        self.assertEqual(shipper.client.connections_opened, 1)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertLess(shipper.bytes_sent, shipper.bytes_raw)
+        self.assertEqual(shipper.stats()["backlog"], 0)
+
+    def test_resume_from_offset(self):
+        """测试重启后从持久化的 offset 继续发送"""
+        self._write_logs(120)
+        shipper = self._shipper()
+        while shipper.ship_once():
+            pass
+        shipper.stop()
+        self._write_logs(30, start=120)
+        shipper = self._shipper()
+        self.assertEqual(shipper.offset, 120)
+        while shipper.ship_once():
+            pass
+        self.assertEqual(len(self.server.rows), 150)
+        self.assertEqual(self.server.rows[-1]["message"], "日志 149")
+
+    def test_resume_after_restart(self):
+        """测试日志段写入磁盘时，进程重启后存储标识不变，从 offset 继续发送"""
+        segment_dir = os.path.join(self.directory, "segments")
+        self.log_service = LogService(segment_dir=segment_dir)
+        self._write_logs(120)
+        shipper = self._shipper()
+        while shipper.ship_once():
+            pass
+        shipper.stop()
+        self.log_service.flush()
+
+        self.log_service = LogService(segment_dir=segment_dir)
+        self._write_logs(30, start=120)
+        shipper = self._shipper()
+        self.assertEqual(shipper.offset, 120)
+        while shipper.ship_once():
+            pass
+        self.assertEqual(len(self.server.rows), 150)
+        self.assertEqual(self.server.rows[-1]["message"], "日志 149")
+
+    def test_lost_tail_after_crash(self):
+        """测试异常退出丢失未封存的日志后，新日志换节点ID发送，不被当作重试丢弃"""
+        segment_dir = os.path.join(self.directory, "segments")
+        self.log_service = LogService(segment_dir=segment_dir)
+        self._write_logs(40)
+        shipper = self._shipper()
+        while shipper.ship_once():
+            pass
+        node_id = shipper.node_id
+
+        # 未调用 flush，已发送的 40 条日志没有写入磁盘
+        self.log_service = LogService(segment_dir=segment_dir)
+        shipper = self._shipper()
+        self.assertNotEqual(shipper.node_id, node_id)
+        self.assertEqual(shipper.offset, 0)
+        self._write_logs(40, start=40)
+        while shipper.ship_once():
+            pass
+        self.assertEqual(shipper.offset, 40)
+        self.assertEqual(len(self.server.rows), 80)
+        self.assertEqual(self.server.rows[-1]["message"], "日志 79")
+
+    def test_resend_pending_batch(self):
+        """测试未确认的批次重发时批次ID不变，平台不会重复写入"""
+        self._write_logs(80)
+        shipper = self._shipper()
+        shipper.ship_once()
+        # 模拟发送成功但确认前进程退出
+        with open(self.offset_path, "w", encoding="utf-8") as f:
+            json.dump({"node_id": shipper.node_id, "store_id": self.log_service.store_id,
+                       "offset": 0, "pending": [0, 50]}, f)
+        shipper = self._shipper()
+        while shipper.ship_once():
+            pass
+        self.assertEqual(len(self.server.batches), 2)
+        self.assertEqual(len(self.server.rows), 80)
+
+    def test_oversized_row_dropped(self):
+        """测试单条日志超过请求体上限时丢弃该条，其余日志按更小的批次发送"""
+        self._write_logs(30)
+        self.log_service.create_log({
+            "flow_id": "flow-1", "execution_id": "exec-0", "user_id": "user-1",
+            "level": "error", "message": os.urandom(20000).hex()
+        })
+        self._write_logs(30, start=30)
+        self.server.max_body = 4000
+        shipper = self._shipper()
+        for _ in range(20):
+            try:
+                if not shipper.ship_once():
+                    break
+            except LogShipError as e:
+                # 多条日志的批次过大时不立即重试，由后台线程指数退避
+                self.assertEqual(e.status, 413)
+                self.assertIsNone(e.retry_after)
+        self.assertEqual(shipper.dropped, 1)
+        self.assertEqual(shipper.offset, 61)
+        self.assertEqual([row["message"] for row in self.server.rows], [f"日志 {i}" for i in range(60)])
+
+    def test_retry_after_unavailable(self):
+        """测试平台不可用时不前移 offset，后台线程重试后发送成功"""
+        self._write_logs(60)
+        self.server.fail_next = 2
+        shipper = self._shipper()
+        with self.assertRaises(LogShipError):
+            shipper.ship_once()
+        self.assertEqual(shipper.offset, 0)
+        shipper.start()
+        deadline = time.monotonic() + 5
+        while shipper.offset < 60 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        shipper.stop()
+        self.assertEqual(shipper.failed_batches, 1)
+        self.assertEqual(len(self.server.rows), 60)
+        self.assertEqual(shipper.offset, 60)
+
+# 在 SaaS API 目录的子进程中运行真实的 /logs 路由（BulkLogIngestor、validate_log_line），
+# 用标准库 HTTP 服务器转发请求，第一行输出监听端口
+_SAAS_BRIDGE = """
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.routes import logs
+
+app = FastAPI()
+app.include_router(logs.router, prefix="/logs")
+client = TestClient(app)
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._forward(None)
+
+    def do_POST(self):
+        self._forward(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def _forward(self, body):
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ("host", "content-length")}
+        response = client.request(self.command, self.path, content=body, headers=headers)
+        self.send_response(response.status_code)
+        for name, value in response.headers.items():
+            if name.lower() not in ("content-length", "connection"):
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(response.content)))
+        self.end_headers()
+        self.wfile.write(response.content)
+
+    def log_message(self, format, *args):
+        pass
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+print(server.server_address[1], flush=True)
+server.serve_forever()
+"""
+
+class TestLogShipperContract(unittest.TestCase):
+    """日志转发与 SaaS API 批量导入接口的契约测试"""
+
+    def setUp(self):
+        """测试前准备：在子进程中启动 SaaS API 的日志路由"""
+        saas_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "saas-api")
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", _SAAS_BRIDGE],
+            cwd=saas_dir,
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        self.addCleanup(self.process.stdout.close)
+        self.addCleanup(self.process.wait)
+        self.addCleanup(self.process.terminate)
+        self.url = f"http://127.0.0.1:{int(self.process.stdout.readline())}"
+        self.log_service = LogService()
+
+    def test_payload_accepted_by_saas_api(self):
+        """测试转发的批次被 SaaS API 逐行校验通过，重发的批次不重复写入"""
+        for i in range(120):
+            self.log_service.create_log({
+                "flow_id": "flow-1",
+                "execution_id": f"exec-{i % 3}",
+                "step_id": "step-1",
+                "user_id": "user-1",
+                "level": "error" if i % 10 == 0 else "info",
+                "message": f"日志 {i}",
+                "details": {"rfc": "BAPI_SALESORDER_CREATEFROMDAT2"}
+            })
+        shipper = LogShipper(self.log_service, self.url, "tenant-1", min_batch=50, max_batch=400)
+        self.addCleanup(shipper.client.close)
+        while shipper.ship_once():
+            pass
+        self.assertEqual((shipper.shipped, shipper.rejected), (120, 0))
+
+        # 模拟确认前退出：按原区间重发同一批次
+        shipper.pending = (0, 50)
+        shipper.ship_once()
+
+        status, _, body = shipper.client.request("GET", "/logs/aggregate/stats?tenant_id=tenant-1")
+        stats = json.loads(body)
+        self.assertEqual((status, stats["total_logs"], stats["error_logs"]), (200, 120, 12))
+        status, _, body = shipper.client.request("GET", "/logs/?tenant_id=tenant-1&limit=1")
+        latest = json.loads(body)[0]
+        self.assertEqual((latest["process_id"], latest["step_id"], latest["user_id"]), ("exec-2", "step-1", "user-1"))
+        self.assertEqual(latest["details"], {"rfc": "BAPI_SALESORDER_CREATEFROMDAT2", "flow_id": "flow-1"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from app.services.log_service import LogService
+
+# 在子进程中导入应用，使依赖按测试设置的环境变量重新创建
+_RUN_APP = """
+from fastapi.testclient import TestClient
+from app.main import app
+
+with TestClient(app) as client:
+    response = client.post("/logs/", json={
+        "flow_id": "flow-1", "execution_id": "exec-1", "user_id": "user-1",
+        "level": "info", "message": "步骤执行完成"
+    })
+    assert response.status_code == 200, response.text
+"""
+
+class TestMain(unittest.TestCase):
+    """应用启动和关闭测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.directory)
+
+    def test_shutdown_flushes_log_segment(self):
+        """测试配置 LOG_SEGMENT_DIR 时，应用关闭把正在写入的日志段写入磁盘"""
+        env = {key: value for key, value in os.environ.items()
+               if key not in ("SAAS_API_URL", "CATALOG_SNAPSHOT_PATH", "LOG_SHIPPER_OFFSET_PATH")}
+        env["LOG_SEGMENT_DIR"] = self.directory
+        result = subprocess.run(
+            [sys.executable, "-c", _RUN_APP],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(any(name.startswith("segment-") for name in os.listdir(self.directory)))
+
+        log_service = LogService(segment_dir=self.directory)
+        self.assertEqual(log_service.appended, 1)
+        self.assertEqual(log_service.get_logs_by_execution_id("exec-1")[0].message, "步骤执行完成")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.profiling import CPU_SAMPLING_SUPPORTED, SamplingProfiler, instrument_profiling
+
+def _spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+def _idle(stop: threading.Event) -> None:
+    stop.wait()
+
+class TestProfiling(unittest.TestCase):
+    """采样分析和慢请求记录测试类"""
+
+    def setUp(self):
+        """测试前准备：启动一个占用 CPU 的线程和一个空闲线程"""
+        self.stop = threading.Event()
+        self.threads = [
+            threading.Thread(target=_spin, args=(self.stop,), name="spinner"),
+            threading.Thread(target=_idle, args=(self.stop,), name="sleeper"),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+
+    def test_wall_profile(self):
+        """测试墙钟采样记录所有线程，折叠栈以线程名为根"""
+        profile = SamplingProfiler().run(0.2, "wall", 0.01)
+        stacks = profile.collapsed().splitlines()
+        self.assertGreater(profile.samples, 5)
+        self.assertTrue(any(line.startswith("spinner;") and "_spin" in line for line in stacks))
+        self.assertTrue(any(line.startswith("sleeper;") and "_idle" in line for line in stacks))
+        # 每行为 "栈 权重"
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in stacks))
+
+    @unittest.skipUnless(CPU_SAMPLING_SUPPORTED, "需要线程级 CPU 时钟")
+    def test_cpu_profile_skips_idle_threads(self):
+        """测试 CPU 采样只记录消耗 CPU 的线程"""
+        profile = SamplingProfiler().run(0.3, "cpu", 0.01)
+        self.assertTrue(any(stack.startswith("spinner;") for stack in profile.stacks))
+        self.assertFalse(any(stack.startswith("sleeper;") for stack in profile.stacks))
+
+    def test_speedscope_format(self):
+        """测试 speedscope 文件中的样本引用共享的帧表"""
+        profile = SamplingProfiler().run(0.1, "wall", 0.01)
+        document = profile.speedscope("mcp-server")
+        frames = document["shared"]["frames"]
+        sampled = document["profiles"][0]
+        self.assertEqual(sampled["type"], "sampled")
+        self.assertEqual(len(sampled["samples"]), len(sampled["weights"]))
+        self.assertEqual(sampled["endValue"], sum(sampled["weights"]))
+        self.assertTrue(all(0 <= i < len(frames) for sample in sampled["samples"] for i in sample))
+        self.assertEqual(len({frame["name"] for frame in frames}), len(frames))
+
+    def test_invalid_arguments(self):
+        """测试无效的采样参数和并发采样"""
+        profiler = SamplingProfiler()
+        with self.assertRaises(ValueError):
+            profiler.run(0.1, "heap")
+        with self.assertRaises(ValueError):
+            profiler.run(120)
+        profiler._lock.acquire()
+        with self.assertRaises(RuntimeError):
+            profiler.run(0.1)
+
+    def test_disabled_without_token(self):
+        """测试未配置管理令牌时不注册中间件和接口"""
+        app = FastAPI()
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(instrument_profiling(app))
+        self.assertEqual(app.user_middleware, [])
+        self.assertFalse(any(route.path.startswith("/debug") for route in app.routes))
+
+    def test_endpoints(self):
+        """测试接口需要管理令牌，慢请求记录各阶段耗时"""
+        app = FastAPI()
+
+        @app.get("/slow/{item_id}")
+        def slow(item_id: str):
+            time.sleep(0.05)
+            return {"id": item_id}
+
+        @app.get("/fast")
+        async def fast():
+            return {}
+
+        recorder = instrument_profiling(app, token="secret", slow_request_ms=30, ring_size=2)
+        client = TestClient(app)
+        headers = {"X-Admin-Token": "secret"}
+        self.assertEqual(client.get("/debug/slow-requests").status_code, 403)
+        self.assertEqual(client.get("/debug/slow-requests", headers={"X-Admin-Token": "wrong"}).status_code, 403)
+
+        for i in range(3):
+            client.get(f"/slow/{i}")
+        client.get("/fast")
+        body = client.get("/debug/slow-requests", headers=headers).json()
+        self.assertEqual(body["total"], 3)
+        # 缓冲区只保留最近 2 条，最近的在前
+        self.assertEqual([r["path"] for r in body["requests"]], ["/slow/2", "/slow/1"])
+        record = body["requests"][0]
+        self.assertEqual(record["route"], "/slow/{item_id}")
+        self.assertEqual(record["status"], 200)
+        self.assertGreaterEqual(record["phases"]["endpoint"], 50)
+        self.assertEqual(set(record["phases"]), {"dependencies", "endpoint", "serialization", "other"})
+        self.assertEqual(len(recorder.records), 2)
+
+        response = client.get("/debug/profile", params={"seconds": 0.1, "mode": "wall"}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response.headers["X-Profile-Samples"]), 0)
+        self.assertIn("spinner;", response.text)
+        response = client.get("/debug/profile", params={"seconds": 0.1, "format": "speedscope"}, headers=headers)
+        self.assertEqual(response.json()["profiles"][0]["type"], "sampled")
+        self.assertEqual(client.get("/debug/profile", params={"mode": "heap"}, headers=headers).status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
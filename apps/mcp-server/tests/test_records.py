@@ -0,0 +1,80 @@
+import importlib
+import json
+import sys
+import unittest
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from app.api.routes import executions, logs, steps
+from app.core import serialization
+from app.schemas.execution import Execution, ExecutionCreate
+from app.schemas.flow import FlowCreate
+from app.schemas.log import Log
+from app.schemas.step import Step, StepCreate
+from app.services.flow_service import FlowService
+
+class TestRecords(unittest.TestCase):
+    """紧凑记录类型测试类"""
+
+    def setUp(self):
+        """测试前准备：路由使用新的流程服务"""
+        self.flow_service = FlowService()
+        flow = self.flow_service.create_flow(FlowCreate(name="订单流程", dsl={}))
+        self.flow_id = flow.id
+        self.step = self.flow_service.create_step(StepCreate(
+            flow_id=flow.id, name="创建订单", type="mcp_call", config={"rfc_function": "STFC_CONNECTION"},
+            position={"x": 1, "y": 2}
+        ))
+        self.execution = self.flow_service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+        self.originals = (executions.flow_service, steps.flow_service, logs.log_service)
+        executions.flow_service = steps.flow_service = self.flow_service
+        logs.log_service = self.flow_service.log_service
+        app = FastAPI()
+        app.include_router(executions.router, prefix="/executions")
+        app.include_router(steps.router, prefix="/steps")
+        app.include_router(logs.router, prefix="/logs")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        """测试后清理"""
+        executions.flow_service, steps.flow_service, logs.log_service = self.originals
+        self.flow_service.close()
+
+    def test_records_are_compact(self):
+        """测试记录不带实例字典，相同的ID字符串共用一个对象"""
+        other = self.flow_service.start_execution(ExecutionCreate(flow_id=self.flow_id, user_id="user-1"))
+        self.assertFalse(hasattr(self.execution, "__dict__"))
+        self.assertFalse(hasattr(self.step, "__dict__"))
+        self.assertIs(other.user_id, self.execution.user_id)
+        with self.assertRaises(AttributeError):
+            self.execution.unknown = 1
+
+    def test_routes_match_models(self):
+        """测试单条和列表接口的输出与对应的 pydantic 模型一致"""
+        expected = jsonable_encoder(Execution(**self.client.get(f"/executions/{self.execution.id}").json()))
+        self.assertEqual(self.client.get(f"/executions/{self.execution.id}").json(), expected)
+        self.assertEqual(self.client.get(f"/executions/flow/{self.flow_id}").json(), [expected])
+        self.assertEqual(expected["finished_at"], None)
+
+        step = self.client.get(f"/steps/flow/{self.flow_id}").json()
+        self.assertEqual(step, [jsonable_encoder(Step(**step[0]))])
+        self.assertEqual(step[0]["position"], {"x": 1, "y": 2})
+
+        rows = self.client.get(f"/logs/execution/{self.execution.id}").json()
+        self.assertEqual(rows, [jsonable_encoder(Log(**row)) for row in rows])
+        self.assertEqual(rows[0]["message"], "流程执行已启动")
+
+    def test_stdlib_fallback(self):
+        """测试未安装 orjson 时记录也能序列化"""
+        rows = self.flow_service.get_executions_by_flow_id(self.flow_id)
+        expected = json.loads(serialization.dumps(rows))
+        try:
+            with mock.patch.dict(sys.modules, {"orjson": None}):
+                fallback = importlib.reload(serialization)
+                self.assertEqual(json.loads(fallback.dumps(rows)), expected)
+        finally:
+            importlib.reload(serialization)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.core.tracing import TRACER, AdaptiveSampler, OTLPFileExporter, Tracer, current_span, extract
+from app.schemas.execution import ExecutionCreate
+from app.schemas.flow import FlowCreate
+from app.schemas.step import StepCreate
+from app.services.flow_service import FlowService
+from app.utils.http_client import KeepAliveClient
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    """返回收到的 traceparent 请求头"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"traceparent": self.headers.get("traceparent")}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestTracing(unittest.TestCase):
+    """链路追踪测试类"""
+
+    def setUp(self):
+        """测试前准备：全部采样"""
+        self.sampler = TRACER.sampler
+        TRACER.sampler = AdaptiveSampler(target_per_second=float("inf"))
+        self.flow_service = FlowService()
+
+    def tearDown(self):
+        """测试后清理"""
+        TRACER.sampler = self.sampler
+        self.flow_service.close()
+
+    def test_execution_spans(self):
+        """测试执行、步骤和 RFC 调用的 Span 父子关系及按执行实例查询"""
+        flow = self.flow_service.create_flow(FlowCreate(name="销售订单", dsl={"steps": [{"id": "a", "type": "input"}]}))
+        step = self.flow_service.create_step(StepCreate(
+            flow_id=flow.id, name="创建订单", type="mcp_call", position={"x": 0, "y": 0},
+            config={"rfc_function": "BAPI_SALESORDER_CREATEFROMDAT2"}
+        ))
+        execution = self.flow_service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+        with TRACER.span("POST /executions/{execution_id}/steps/{step_id}", kind="server"):
+            self.flow_service.execute_step(execution.id, step.id, {"PARAM1": "X"})
+
+        traces = TRACER.get_traces(execution_id=execution.id)
+        self.assertEqual(len(traces), 2)
+        start, run = sorted(traces, key=lambda t: t["start_time_ns"])
+        self.assertEqual([s["name"] for s in start["spans"]], ["execution.start"])
+        self.assertEqual(start["spans"][0]["attributes"]["flow_id"], flow.id)
+
+        server, step_span, rfc_span = run["spans"]
+        self.assertIsNone(server["parent_id"])
+        self.assertEqual(step_span["parent_id"], server["span_id"])
+        self.assertEqual(rfc_span["parent_id"], step_span["span_id"])
+        self.assertEqual(step_span["attributes"],
+                         {"execution_id": execution.id, "step_id": step.id, "step.type": "mcp_call"})
+        self.assertEqual(rfc_span["attributes"]["rfc.function"], "BAPI_SALESORDER_CREATEFROMDAT2")
+        self.assertEqual(rfc_span["kind"], "client")
+
+        # 失败的步骤记录错误，异常继续抛出
+        with self.assertRaises(ValueError):
+            self.flow_service.execute_step(execution.id, "missing", {})
+        failed = TRACER.get_traces(name="step.execute", limit=1)[0]
+        self.assertTrue(failed["error"])
+        self.assertIn("步骤不存在", failed["spans"][0]["error"])
+
+    def test_propagation_and_unsampled(self):
+        """测试 traceparent 的解析，以及未采样链路不记录 Span"""
+        parent = extract("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+        self.assertEqual(parent.trace_id, "0af7651916cd43dd8448eb211c80319c")
+        self.assertTrue(parent.sampled)
+        for header in (None, "", "garbage", "00-" + "0" * 32 + "-b7ad6b7169203331-01",
+                       "01-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"):
+            self.assertIsNone(extract(header))
+
+        tracer = Tracer(sampler=AdaptiveSampler(target_per_second=float("inf")))
+        with tracer.span("server", kind="server", parent=parent) as span:
+            self.assertIs(current_span(), span)
+            self.assertEqual(span.trace_id, parent.trace_id)
+            self.assertEqual(span.parent_id, parent.span_id)
+            self.assertTrue(span.traceparent().endswith("-01"))
+        self.assertIsNone(current_span())
+
+        unsampled = extract("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00")
+        with tracer.span("server", parent=unsampled) as span:
+            with tracer.span("child") as child:
+                self.assertIs(child, span)
+                child.set_attribute("ignored", 1)
+            self.assertEqual(span.traceparent(), f"00-{unsampled.trace_id}-{span.span_id}-00")
+        self.assertEqual(tracer.recorded, 1)
+
+    def test_adaptive_sampler(self):
+        """测试根 Span 速率超过目标时采样概率下降"""
+        sampler = AdaptiveSampler(target_per_second=100, window=0.05)
+        # 第一个窗口还没有速率统计，全部采样
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            sampler.should_sample()
+        calls = sampled = 0
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            calls += 1
+            sampled += sampler.should_sample()
+        self.assertLess(sampler.probability, 0.1)
+        self.assertLess(sampled, calls / 10)
+
+    def test_http_client_propagation(self):
+        """测试 HTTP 客户端在请求头中带上 client Span 的 traceparent"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = KeepAliveClient(f"http://127.0.0.1:{server.server_port}")
+        try:
+            with TRACER.span("ship") as root:
+                status, _, body = client.request("GET", "/echo")
+            self.assertEqual(status, 200)
+            remote = extract(json.loads(body)["traceparent"])
+            client_span = TRACER.get_traces(trace_id=root.trace_id)[0]["spans"][1]
+            self.assertEqual(remote.trace_id, root.trace_id)
+            self.assertEqual(remote.span_id, client_span["span_id"])
+            self.assertEqual(client_span["parent_id"], root.span_id)
+            self.assertEqual(client_span["attributes"]["http.status_code"], 200)
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_otlp_file_exporter(self):
+        """测试导出的文件为每行一个 OTLP/JSON 请求"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "traces.jsonl")
+            tracer = Tracer(sampler=AdaptiveSampler(target_per_second=float("inf")),
+                            exporter=OTLPFileExporter(path, "mcp-server", flush_interval=0.05))
+            with tracer.span("execution.start", {"execution_id": "e-1", "retry": 2}):
+                try:
+                    with tracer.span("rfc.call", kind="client"):
+                        raise RuntimeError("timeout")
+                except RuntimeError:
+                    pass
+            tracer.shutdown()
+
+            with open(path, encoding="utf-8") as f:
+                requests = [json.loads(line) for line in f]
+            resource_spans = requests[0]["resourceSpans"][0]
+            self.assertEqual(resource_spans["resource"]["attributes"][0]["value"], {"stringValue": "mcp-server"})
+            rfc, root = resource_spans["scopeSpans"][0]["spans"]
+            self.assertEqual(rfc["parentSpanId"], root["spanId"])
+            self.assertEqual(rfc["kind"], 3)
+            self.assertEqual(rfc["status"], {"code": 2, "message": "RuntimeError: timeout"})
+            self.assertEqual(root["attributes"][1], {"key": "retry", "value": {"intValue": "2"}})
+            self.assertNotIn("parentSpanId", root)
+            self.assertEqual(len(root["traceId"]), 32)
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    unittest.main()
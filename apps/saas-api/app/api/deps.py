@@ -0,0 +1,39 @@
+import os
+from app.core.metrics import REGISTRY
+from app.core.response_cache import ResponseCache
+from app.core.tracing import TRACER
+from app.services.template_service import TemplateService
+from app.services.rag_service import ALL_SCOPE, RAGService
+from app.services.log_service import LogService
+from app.services.analytics_service import AnalyticsService
+from app.services.sync_service import SyncService
+
+# 模板路由和分析路由共享同一个模板服务，分析数据直接读取模板使用计数
+template_service = TemplateService()
+# 配置 KNOWLEDGE_INDEX_DIR 时启动即加载保存的向量索引和条目，关闭时写回；
+# 配置 KNOWLEDGE_ANN_NLIST/KNOWLEDGE_ANN_NPROBE 时使用 IVF 近似索引
+rag_service = RAGService.from_env()
+# 日志路由写入的日志同步汇总到分析引擎；配置 LOG_SEGMENT_DIR 时封存的日志段写入磁盘
+log_service = LogService(segment_dir=os.environ.get("LOG_SEGMENT_DIR"))
+analytics_service = AnalyticsService(template_service, log_service)
+# 模板和知识库的变更汇总为增量同步流，供 MCP 服务器拉取
+sync_service = SyncService(template_service, rag_service)
+
+# 看板轮询的只读接口：响应按租户和查询参数缓存，ETag 由各服务的数据版本号计算
+response_cache = ResponseCache()
+response_cache.add_route("/templates/", ttl=30, generation=lambda: template_service.generation)
+response_cache.add_route("/templates/catalog", ttl=30, generation=lambda: template_service.generation)
+response_cache.add_route("/knowledge/", ttl=30, generation=lambda: rag_service.generations.get(ALL_SCOPE))
+response_cache.add_route("/logs/aggregate/stats", ttl=10, generation=lambda: log_service.generation)
+for path in ("process-stats", "step-latency", "template-usage", "tenant-stats", "error-analysis",
+             "optimization-suggestions"):
+    # 分析结果还包含模板名称；模板使用速率随时间变化，由 TTL 兜底
+    response_cache.add_route(
+        f"/analytics/{path}", ttl=10,
+        generation=lambda: (analytics_service.generation, template_service.generation)
+    )
+
+# 已有的统计在输出 /metrics 时读取
+REGISTRY.add_collector(template_service.collect_metrics)
+REGISTRY.add_collector(rag_service.collect_metrics)
+REGISTRY.add_collector(TRACER.collect_metrics)
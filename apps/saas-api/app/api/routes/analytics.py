@@ -6,12 +6,23 @@ from app.schemas.analytics import (
     TemplateUsage, 
     TenantStats, 
     ErrorAnalysis,
-    OptimizationSuggestion
+    ExecutionEvent,
+    OptimizationSuggestion,
+    StepLatency
 )
-from app.services.analytics_service import AnalyticsService
+from app.core.serialization import json_response
+from app.api.deps import analytics_service
 
 router = APIRouter()
-analytics_service = AnalyticsService()
+
+@router.post("/events")
+async def ingest_execution_events(events: List[ExecutionEvent]):
+    """写入流程执行事件（started、completed、failed）"""
+    try:
+        count = analytics_service.ingest_events(events)
+        return {"message": "Events ingested successfully", "count": count}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/process-stats", response_model=List[ProcessStats])
 async def get_process_stats(
@@ -21,15 +32,29 @@ async def get_process_stats(
     end_time: Optional[datetime] = None
 ):
     """获取流程统计信息"""
-    return analytics_service.get_process_stats(tenant_id, template_id, start_time, end_time)
+    return json_response(analytics_service.get_process_stats(tenant_id, template_id, start_time, end_time))
+
+@router.get("/step-latency", response_model=List[StepLatency])
+async def get_step_latency(
+    tenant_id: Optional[str] = None,
+    template_id: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+):
+    """获取步骤耗时分位数（p50/p90/p99/max）"""
+    return json_response(analytics_service.get_step_latency(tenant_id, template_id, start_time, end_time))
 
 @router.get("/template-usage", response_model=List[TemplateUsage])
 async def get_template_usage(
     tenant_id: Optional[str] = None,
-    limit: int = Query(100, le=1000)
+    limit: int = Query(100, le=1000),
+    sort: str = "total"
 ):
-    """获取模板使用情况"""
-    return analytics_service.get_template_usage(tenant_id, limit)
+    """获取模板使用情况（sort=total 按累计次数，sort=recent 按最近使用速率）"""
+    try:
+        return json_response(analytics_service.get_template_usage(tenant_id, limit, sort))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/tenant-stats", response_model=List[TenantStats])
 async def get_tenant_stats(
@@ -37,7 +62,7 @@ async def get_tenant_stats(
     end_time: Optional[datetime] = None
 ):
     """获取租户统计信息"""
-    return analytics_service.get_tenant_stats(start_time, end_time)
+    return json_response(analytics_service.get_tenant_stats(start_time, end_time))
 
 @router.get("/error-analysis", response_model=List[ErrorAnalysis])
 async def get_error_analysis(
@@ -47,7 +72,7 @@ async def get_error_analysis(
     end_time: Optional[datetime] = None
 ):
     """获取错误分析"""
-    return analytics_service.get_error_analysis(tenant_id, template_id, start_time, end_time)
+    return json_response(analytics_service.get_error_analysis(tenant_id, template_id, start_time, end_time))
 
 @router.get("/optimization-suggestions", response_model=List[OptimizationSuggestion])
 async def get_optimization_suggestions(
@@ -55,7 +80,7 @@ async def get_optimization_suggestions(
     template_id: Optional[str] = None
 ):
     """获取优化建议"""
-    return analytics_service.get_optimization_suggestions(tenant_id, template_id)
+    return json_response(analytics_service.get_optimization_suggestions(tenant_id, template_id))
 
 @router.post("/generate-report")
 async def generate_analytics_report(
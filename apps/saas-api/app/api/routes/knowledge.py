@@ -1,10 +1,11 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
-from app.schemas.knowledge import KnowledgeItem, KnowledgeItemCreate, KnowledgeItemUpdate
-from app.services.rag_service import RAGService
+from app.schemas.knowledge import KnowledgeItem, KnowledgeItemCreate, KnowledgeItemUpdate, VectorizationStatus
+from app.core.serialization import json_response
+from app.api.deps import rag_service
 
 router = APIRouter()
-rag_service = RAGService()
 
 @router.get("/", response_model=List[KnowledgeItem])
 async def list_knowledge_items(
@@ -14,7 +15,7 @@ async def list_knowledge_items(
     search: Optional[str] = None
 ):
     """获取知识库条目列表"""
-    return rag_service.get_knowledge_items(skip, limit, category, search)
+    return json_response(rag_service.get_knowledge_items(skip, limit, category, search))
 
 @router.get("/{item_id}", response_model=KnowledgeItem)
 async def get_knowledge_item(item_id: str):
@@ -29,6 +30,11 @@ async def create_knowledge_item(item: KnowledgeItemCreate):
     """创建新知识库条目"""
     return rag_service.create_knowledge_item(item)
 
+@router.post("/bulk", response_model=List[KnowledgeItem])
+async def create_knowledge_items(items: List[KnowledgeItemCreate]):
+    """批量创建知识库条目，向量化在后台完成"""
+    return rag_service.create_knowledge_items(items)
+
 @router.put("/{item_id}", response_model=KnowledgeItem)
 async def update_knowledge_item(item_id: str, item: KnowledgeItemUpdate):
     """更新知识库条目"""
@@ -46,11 +52,29 @@ async def delete_knowledge_item(item_id: str):
     return {"message": "Knowledge item deleted successfully"}
 
 @router.post("/search")
-async def search_knowledge(query: str, limit: int = Query(10, le=100)):
+async def search_knowledge(
+    query: str,
+    limit: int = Query(10, le=100),
+    mode: str = "keyword",
+    tenant_id: Optional[str] = None,
+    category: Optional[str] = None,
+    time_budget_ms: float = Query(200, gt=0, le=5000)
+):
     """搜索知识库"""
-    results = rag_service.search_knowledge(query, limit)
+    try:
+        # 嵌入、向量打分和等待混合检索都会阻塞（最长为时间预算），放到线程池执行，不占用事件循环
+        results = await run_in_threadpool(
+            rag_service.search_knowledge, query, limit, mode, tenant_id, category, time_budget_ms
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return results
 
+@router.get("/search/cache-stats")
+async def get_search_cache_stats():
+    """获取知识库搜索缓存统计"""
+    return rag_service.get_search_cache_stats()
+
 @router.post("/vectorize")
 async def vectorize_knowledge_item(item_id: str):
     """对知识库条目进行向量化"""
@@ -59,3 +83,16 @@ async def vectorize_knowledge_item(item_id: str):
         return {"message": "Knowledge item vectorized successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Vectorization failed: {str(e)}")
+
+@router.post("/vectorize/batch", response_model=List[VectorizationStatus])
+async def vectorize_knowledge_items(item_ids: List[str]):
+    """批量提交后台向量化"""
+    return rag_service.vectorize_items_async(item_ids)
+
+@router.get("/{item_id}/vectorization", response_model=VectorizationStatus)
+async def get_vectorization_status(item_id: str):
+    """获取知识库条目的向量化进度"""
+    status = rag_service.get_vectorization_status(item_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Vectorization status not found")
+    return status
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime
-from app.schemas.log import Log, LogCreate, LogSearch
-from app.services.log_service import LogService
+import hashlib
+from app.schemas.log import Log, LogBulkResult, LogCreate, LogSearch
+from app.core.serialization import json_response
+from app.services.log_ingest import BulkLogIngestor, BulkPayloadTooLarge
+from app.api.deps import log_service
 
 router = APIRouter()
-log_service = LogService()
+
+# 批量导入时每次交给线程池解压和切分的请求体字节数
+BULK_CHUNK_BYTES = 64 * 1024
+# 批量导入请求体（压缩时为压缩后）的最大字节数
+MAX_BULK_BODY_BYTES = 16 << 20
 
 @router.get("/", response_model=List[Log])
 async def list_logs(
@@ -18,7 +26,7 @@ async def list_logs(
     end_time: Optional[datetime] = None
 ):
     """获取日志列表"""
-    return log_service.get_logs(skip, limit, tenant_id, template_id, level, start_time, end_time)
+    return json_response(log_service.get_logs(skip, limit, tenant_id, template_id, level, start_time, end_time))
 
 @router.get("/{log_id}", response_model=Log)
 async def get_log(log_id: str):
@@ -33,10 +41,72 @@ async def create_log(log: LogCreate):
     """创建新日志"""
     return log_service.create_log(log)
 
+@router.post("/bulk", response_model=LogBulkResult)
+async def bulk_create_logs(request: Request):
+    """
+    批量导入日志：请求体为 NDJSON（每行一个 LogCreate，可带 timestamp），支持 Content-Encoding: gzip；
+    请求体按块流式读取并在线程池中解压、校验，整个请求体校验完成后才写入，请求体损坏时不写入任何日志。
+    请求体、解压后的大小或行数超过上限时返回 413。
+    带 X-Batch-Id 的请求重试时返回首次的导入结果，不会重复写入；同一批次仍在处理时返回 409
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_BULK_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {MAX_BULK_BODY_BYTES} bytes")
+
+    batch_key = None
+    batch_id = request.headers.get("x-batch-id")
+    if batch_id:
+        # 批次ID按租户（X-Tenant-Id 或 API 密钥）划分，不同租户的同名批次互不影响
+        api_key = request.headers.get("x-api-key")
+        tenant = request.headers.get("x-tenant-id") or (hashlib.sha256(api_key.encode()).hexdigest() if api_key else "")
+        batch_key = (tenant, batch_id)
+        claimed, result = log_service.claim_bulk_batch(batch_key)
+        if result is not None:
+            return result
+        if not claimed:
+            raise HTTPException(status_code=409, detail="Batch is being processed", headers={"Retry-After": "1"})
+    
+    result = None
+    try:
+        gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+        result = await _ingest(request, BulkLogIngestor(log_service, gzip=gzipped))
+    except BulkPayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if batch_key is not None:
+            log_service.release_bulk_batch(batch_key, result)
+    return result
+
+async def _ingest(request: Request, ingestor: BulkLogIngestor) -> LogBulkResult:
+    """
+    流式读取请求体，攒够 BULK_CHUNK_BYTES 后交给线程池解压、切分和校验（CPU 操作，不阻塞事件循环）
+
+    Raises:
+        BulkPayloadTooLarge: 请求体超过 MAX_BULK_BODY_BYTES，或解压后的大小、行数超过上限
+        ValueError: gzip 数据损坏或不完整
+    """
+    pending = []
+    pending_size = 0
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BULK_BODY_BYTES:
+            raise BulkPayloadTooLarge(f"请求体超过 {MAX_BULK_BODY_BYTES} 字节")
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= BULK_CHUNK_BYTES:
+            await run_in_threadpool(ingestor.feed, b"".join(pending))
+            pending, pending_size = [], 0
+    if pending:
+        await run_in_threadpool(ingestor.feed, b"".join(pending))
+    return await run_in_threadpool(ingestor.finish)
+
 @router.post("/search", response_model=List[Log])
 async def search_logs(search: LogSearch):
     """搜索日志"""
-    return log_service.search_logs(search)
+    return json_response(log_service.search_logs(search))
 
 @router.get("/aggregate/stats")
 async def get_log_stats(
@@ -52,7 +122,8 @@ async def get_log_stats(
 async def get_error_logs(
     tenant_id: Optional[str] = None,
     template_id: Optional[str] = None,
-    limit: int = Query(100, le=1000)
+    limit: int = Query(100, le=1000),
+    fingerprint: Optional[str] = None
 ):
-    """获取错误日志"""
-    return log_service.get_error_logs(tenant_id, template_id, limit)
+    """获取错误日志（fingerprint 取自错误分析结果）"""
+    return json_response(log_service.get_error_logs(tenant_id, template_id, limit, fingerprint))
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import Optional
+from app.schemas.sync import SyncChanges
+from app.services.sync_service import make_etag
+from app.api.deps import sync_service
+
+router = APIRouter()
+
+@router.get("/changes", response_model=SyncChanges)
+async def get_changes(
+    request: Request,
+    response: Response,
+    since: int = Query(0, ge=0),
+    tenant_id: Optional[str] = None,
+    limit: int = Query(500, gt=0, le=5000),
+    feed_id: Optional[str] = None
+):
+    """
+    获取版本水位之后的模板和知识库变更（增量同步）；
+    客户端已同步到最新版本并带上 If-None-Match 时返回 304
+    """
+    head = sync_service.head_etag()
+    if request.headers.get("if-none-match") == head and since == sync_service.version:
+        return Response(status_code=304, headers={"ETag": head})
+    try:
+        changes = sync_service.get_changes(since, tenant_id, limit, feed_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["ETag"] = make_etag(changes.feed_id, changes.version)
+    return changes
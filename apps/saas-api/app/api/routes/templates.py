@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
-from app.schemas.template import ProcessTemplate, ProcessTemplateCreate, ProcessTemplateUpdate
-from app.services.template_service import TemplateService
+from app.schemas.template import (
+    ProcessTemplate, ProcessTemplateCreate, ProcessTemplateUpdate, TemplatePage,
+    TemplateVersion, TemplateVersionDetail, DSLChange
+)
+from app.core.serialization import json_response
+from app.api.deps import template_service
 
 router = APIRouter()
-template_service = TemplateService()
 
 @router.get("/", response_model=List[ProcessTemplate])
 async def list_templates(
@@ -14,7 +17,22 @@ async def list_templates(
     search: Optional[str] = None
 ):
     """获取流程模板列表"""
-    return template_service.get_templates(skip, limit, category, search)
+    return json_response(template_service.get_templates(skip, limit, category, search))
+
+@router.get("/catalog", response_model=TemplatePage)
+async def browse_templates(
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, gt=0, le=100)
+):
+    """浏览模板目录（游标分页，附带分类和状态分面计数）"""
+    try:
+        return json_response(template_service.search_templates(category, status, search, sort, cursor, limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{template_id}", response_model=ProcessTemplate)
 async def get_template(template_id: str):
@@ -32,7 +50,10 @@ async def create_template(template: ProcessTemplateCreate):
 @router.put("/{template_id}", response_model=ProcessTemplate)
 async def update_template(template_id: str, template: ProcessTemplateUpdate):
     """更新流程模板"""
-    updated_template = template_service.update_template(template_id, template)
+    try:
+        updated_template = template_service.update_template(template_id, template)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid template DSL: {str(e)}")
     if not updated_template:
         raise HTTPException(status_code=404, detail="Process template not found")
     return updated_template
@@ -51,6 +72,8 @@ async def publish_template(template_id: str):
     try:
         template_service.publish_template(template_id)
         return {"message": "Process template published successfully"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid template DSL: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Publish failed: {str(e)}")
 
@@ -62,3 +85,42 @@ async def unpublish_template(template_id: str):
         return {"message": "Process template unpublished successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unpublish failed: {str(e)}")
+
+@router.post("/{template_id}/usage")
+async def record_template_usage(template_id: str, tenant_id: Optional[str] = None, duration: Optional[float] = None):
+    """记录一次模板使用（流程执行启动时上报）"""
+    if not template_service.record_usage(template_id, tenant_id, duration):
+        raise HTTPException(status_code=404, detail="Process template not found")
+    return {"message": "Template usage recorded"}
+
+@router.post("/{template_id}/clone", response_model=ProcessTemplate)
+async def clone_template(template_id: str, tenant_id: Optional[str] = None, name: Optional[str] = None):
+    """克隆流程模板（共享 DSL 存储）"""
+    template = template_service.clone_template(template_id, tenant_id, name)
+    if not template:
+        raise HTTPException(status_code=404, detail="Process template not found")
+    return template
+
+@router.get("/{template_id}/versions", response_model=List[TemplateVersion])
+async def list_template_versions(template_id: str):
+    """获取流程模板的版本历史"""
+    versions = template_service.get_template_versions(template_id)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Process template not found")
+    return json_response(versions)
+
+@router.get("/{template_id}/versions/{number}", response_model=TemplateVersionDetail)
+async def get_template_version(template_id: str, number: int):
+    """获取流程模板某个版本的 DSL"""
+    version = template_service.get_template_version(template_id, number)
+    if not version:
+        raise HTTPException(status_code=404, detail="Template version not found")
+    return version
+
+@router.get("/{template_id}/diff", response_model=List[DSLChange])
+async def diff_template_versions(template_id: str, from_version: int, to_version: int):
+    """比较流程模板两个版本的 DSL 结构差异"""
+    changes = template_service.diff_template_versions(template_id, from_version, to_version)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Template version not found")
+    return changes
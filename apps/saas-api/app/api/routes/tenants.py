@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Optional
 from app.schemas.tenant import Tenant, TenantCreate, TenantUpdate, APIKey
+from app.core.serialization import json_response
 from app.services.tenant_service import TenantService
-from app.core.security import create_api_key, verify_api_key
+from app.core.security import create_api_key
 
 router = APIRouter()
 tenant_service = TenantService()
@@ -14,7 +15,7 @@ async def list_tenants(
     name: Optional[str] = None
 ):
     """获取租户列表"""
-    return tenant_service.get_tenants(skip, limit, name)
+    return json_response(tenant_service.get_tenants(skip, limit, name))
 
 @router.get("/{tenant_id}", response_model=Tenant)
 async def get_tenant(tenant_id: str):
@@ -63,7 +64,7 @@ async def list_api_keys_for_tenant(tenant_id: str):
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
     
-    return tenant_service.get_api_keys_for_tenant(tenant_id)
+    return json_response(tenant_service.get_api_keys_for_tenant(tenant_id))
 
 @router.delete("/{tenant_id}/api-keys/{key_id}")
 async def revoke_api_key(tenant_id: str, key_id: str):
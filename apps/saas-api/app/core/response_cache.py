@@ -0,0 +1,290 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlencode
+import gzip
+import hashlib
+import logging
+import time
+from app.core.metrics import REGISTRY, Registry
+from app.utils.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只预压缩 gzip
+    brotli = None
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 小于该字节数的响应体不压缩
+MIN_COMPRESS_SIZE = 1024
+# 超过该字节数的响应体不缓存（只计算 ETag）
+MAX_BODY_SIZE = 1 << 20
+
+# 条件请求要求客户端每次都带 If-None-Match 重新验证
+_CACHE_CONTROL = b"private, no-cache"
+_VARY = b"Accept-Encoding"
+
+@dataclass
+class CacheRule:
+    """一个可缓存路由的配置"""
+    path: str
+    ttl: float  # seconds a cached body stays valid even if the generation does not change
+    generation: Callable[[], Hashable]  # data generation the response depends on
+    route: Any = None  # resolved route, set on cached responses for metrics/tracing labels
+
+@dataclass
+class _Entry:
+    headers: List[Tuple[bytes, bytes]]
+    bodies: Dict[str, bytes] = field(default_factory=dict)  # content-encoding -> body, "" is identity
+
+def _accepted_encodings(scope) -> Tuple[str, ...]:
+    """按优先级返回客户端接受的预压缩编码"""
+    header = _header(scope, b"accept-encoding")
+    if not header:
+        return ()
+    accepted = set()
+    for part in header.lower().split(","):
+        name, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip())
+    return tuple(encoding for encoding in ("br", "gzip") if encoding in accepted)
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _etag(base: str, encoding: str) -> bytes:
+    # 不同编码是同一资源的不同表示，强 ETag 按编码区分
+    return f'"{base}-{encoding}"'.encode() if encoding else f'"{base}"'.encode()
+
+def _matches(if_none_match: str, base: str) -> bool:
+    """If-None-Match 中是否有该资源（任一编码）的 ETag，按弱比较"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == base or tag.startswith(base + "-"):
+            return True
+    return False
+
+class ResponseCache:
+    """
+    看板轮询接口的响应缓存
+
+    缓存键由路径、租户（X-Tenant-Id 请求头和 X-API-Key 的摘要）和规范化的查询参数组成。
+    ETag 由缓存键、路由依赖的数据版本号和 TTL 时间片计算，不需要运行服务方法，
+    因此 If-None-Match 命中时直接返回 304；数据版本号变化或时间片切换后 ETag 随之改变。
+    缓存的响应体预先压缩为 gzip（安装 brotli 时还有 br），按 Accept-Encoding 返回。
+    """
+
+    def __init__(self, maxsize: int = 1024, max_body: int = MAX_BODY_SIZE):
+        """
+        初始化响应缓存
+
+        Args:
+            maxsize: 最多缓存的响应数
+            max_body: 可缓存的最大响应体字节数
+        """
+        self.rules: Dict[str, CacheRule] = {}
+        self.max_body = max_body
+        self._entries = TTLCache(maxsize=maxsize)
+        self.not_modified = 0
+
+    def add_route(self, path: str, ttl: float, generation: Callable[[], Hashable]) -> None:
+        """
+        注册可缓存的 GET 路由
+
+        Args:
+            path: 请求路径（精确匹配）
+            ttl: 缓存有效期（秒），也是 ETag 的时间片长度
+            generation: 返回路由依赖数据的版本号，数据变化时返回值随之变化
+        """
+        if ttl <= 0:
+            raise ValueError("缓存有效期必须大于0")
+        self.rules[path] = CacheRule(path=path, ttl=ttl, generation=generation)
+
+    def key(self, scope) -> str:
+        """按路径、租户和规范化的查询参数计算缓存键"""
+        query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        api_key = _header(scope, b"x-api-key")
+        return "|".join((
+            scope["path"],
+            _header(scope, b"x-tenant-id") or "",
+            hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else "",
+            urlencode(sorted(query))
+        ))
+
+    def etag_base(self, rule: CacheRule, key: str) -> str:
+        """
+        计算 ETag（不含编码后缀）
+
+        时间片按缓存键错开，避免所有响应在同一时刻过期。
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=16)
+        offset = int.from_bytes(digest.digest()[:4], "big") / 0xFFFFFFFF * rule.ttl
+        bucket = int((time.time() + offset) // rule.ttl)
+        digest.update(repr((rule.generation(), bucket)).encode())
+        return digest.hexdigest()
+
+    def get(self, etag_base: str) -> Optional[_Entry]:
+        return self._entries.get(etag_base)
+
+    def put(self, rule: CacheRule, etag_base: str, headers: List[Tuple[bytes, bytes]], body: bytes) -> _Entry:
+        """
+        缓存响应体并预压缩
+
+        Args:
+            rule: 路由配置
+            etag_base: ETag
+            headers: 原始响应头（不含 content-length）
+            body: 原始响应体
+
+        Returns:
+            缓存条目
+        """
+        entry = _Entry(headers=headers, bodies={"": body})
+        if len(body) >= MIN_COMPRESS_SIZE:
+            entry.bodies["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+            if brotli is not None:
+                entry.bodies["br"] = brotli.compress(body, quality=5)
+        self._entries.set(etag_base, entry, ttl=rule.ttl)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            条目数、命中率等（见 TTLCache.stats），以及返回 304 的次数
+        """
+        stats = self._entries.stats()
+        stats["not_modified"] = self.not_modified
+        return stats
+
+class _ResponseCacheMiddleware:
+    """按 ResponseCache 的路由配置处理条件请求、返回和填充缓存"""
+
+    def __init__(self, app, cache: ResponseCache, router, requests):
+        self.app = app
+        self.cache = cache
+        self.router = router
+        self.requests = requests
+
+    async def __call__(self, scope, receive, send):
+        rule = self.cache.rules.get(scope["path"]) if scope["type"] == "http" else None
+        if rule is None or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        base = self.cache.etag_base(rule, self.cache.key(scope))
+        encodings = _accepted_encodings(scope)
+        if_none_match = _header(scope, b"if-none-match")
+        if if_none_match and _matches(if_none_match, base):
+            self._set_route(scope, rule)
+            self.cache.not_modified += 1
+            self.requests.labels(rule.path, "not_modified").inc()
+            entry = self.cache.get(base)
+            encoding = self._choose(entry, encodings) if entry is not None else ""
+            await self._send(send, 304, [], _etag(base, encoding), encoding, b"")
+            return
+
+        entry = self.cache.get(base)
+        if entry is not None:
+            self._set_route(scope, rule)
+            self.requests.labels(rule.path, "hit").inc()
+            encoding = self._choose(entry, encodings)
+            await self._send(send, 200, entry.headers, _etag(base, encoding), encoding, entry.bodies[encoding])
+            return
+
+        self.requests.labels(rule.path, "miss").inc()
+        await self._fill(scope, receive, send, rule, base)
+
+    async def _fill(self, scope, receive, send, rule: CacheRule, base: str) -> None:
+        """运行路由，把 200 响应原样转发并缓存"""
+        headers: Optional[List[Tuple[bytes, bytes]]] = None
+        chunks: List[bytes] = []
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal headers, size
+            if message["type"] == "http.response.start":
+                if message["status"] == 200 and not any(key == b"content-encoding" for key, _ in message["headers"]):
+                    headers = [(key, value) for key, value in message["headers"] if key != b"content-length"]
+                    message = dict(message, headers=list(message["headers"]) + [
+                        (b"etag", _etag(base, "")), (b"cache-control", _CACHE_CONTROL), (b"vary", _VARY)
+                    ])
+            elif message["type"] == "http.response.body" and headers is not None:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > self.cache.max_body:
+                    headers = None
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+                    if not message.get("more_body", False):
+                        self.cache.put(rule, base, headers, b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _choose(entry: _Entry, encodings: Tuple[str, ...]) -> str:
+        for encoding in encodings:
+            if encoding in entry.bodies:
+                return encoding
+        return ""
+
+    @staticmethod
+    async def _send(send, status: int, headers: List[Tuple[bytes, bytes]], etag: bytes, encoding: str,
+                    body: bytes) -> None:
+        headers = headers + [(b"etag", etag), (b"cache-control", _CACHE_CONTROL), (b"vary", _VARY)]
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode()))
+        if status != 304:
+            headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _set_route(self, scope, rule: CacheRule) -> None:
+        # 不经过路由直接返回的请求也按路由模板记录指标和 Span 名称
+        if rule.route is None:
+            from starlette.routing import Match
+            for route in self.router.routes:
+                if route.matches(scope)[0] == Match.FULL:
+                    rule.route = route
+                    break
+        if rule.route is not None:
+            scope["route"] = rule.route
+
+def instrument_response_cache(app, cache: ResponseCache, registry: Registry = REGISTRY,
+                              prefix: str = "http") -> None:
+    """
+    为 FastAPI 应用启用响应缓存
+
+    应在 instrument_app 之前调用，使中间件位于指标和链路追踪之内，缓存命中和 304 也会被记录。
+
+    Args:
+        app: FastAPI 应用
+        cache: 响应缓存（路由配置见 ResponseCache.add_route）
+        registry: 指标注册表
+        prefix: 指标名前缀
+    """
+    requests = registry.counter(
+        f"{prefix}_response_cache_requests_total",
+        "Cacheable GET requests by route and result (hit, miss, not_modified)",
+        ("route", "result"),
+    )
+    app.add_middleware(_ResponseCacheMiddleware, cache=cache, router=app.router, requests=requests)
+    logger.info(f"响应缓存已启用: {len(cache.rules)} 个路由")
@@ -0,0 +1,110 @@
+# 与 apps/saas-api、apps/mcp-server 中的同名模块保持完全一致，修改时两处同步（tests/test_shared_modules.py 检查）
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+from datetime import date, datetime, time
+from decimal import Decimal
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from uuid import UUID
+import json
+from pydantic import BaseModel
+from starlette.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+# 超过该条数的列表以分块的流式响应返回，每块 STREAM_CHUNK_SIZE 条
+STREAM_THRESHOLD = 500
+STREAM_CHUNK_SIZE = 250
+
+def _model_fields(model: BaseModel) -> Dict[str, Any]:
+    # 存储中的模型由 construct 构造，字段已在写入时校验；只在带有多余属性时按声明的字段筛选
+    values = model.__dict__
+    fields = model.__fields__
+    if len(values) == len(fields):
+        return values
+    return {name: values[name] for name in fields if name in values}
+
+def _default(obj: Any) -> Any:
+    """把 json/orjson 不能直接处理的对象转换为可序列化的值"""
+    if isinstance(obj, BaseModel):
+        return _model_fields(obj)
+    if is_dataclass(obj) and not isinstance(obj, type):
+        # 服务内部的记录类型（orjson 原生支持，标准库 json 需要转换）
+        return {field.name: getattr(obj, field.name) for field in fields(obj)}
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "tolist"):
+        # numpy 数组和标量
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+else:
+    _ENCODER = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+def dumps(obj: Any) -> bytes:
+    """
+    把对象序列化为 JSON 字节串（优先使用 orjson）
+
+    pydantic 模型直接取字段值，不再按响应模型重新校验；输出与 FastAPI 默认的 jsonable_encoder 一致。
+
+    Args:
+        obj: 待序列化的对象
+
+    Returns:
+        UTF-8 编码的 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+    return _ENCODER.encode(obj).encode("utf-8")
+
+class JSONBytesResponse(Response):
+    """用 dumps 序列化的 JSON 响应，content 也可以是已序列化好的字节串"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+async def _array_chunks(items: Sequence[Any], chunk_size: int) -> AsyncIterator[bytes]:
+    yield b"["
+    for start in range(0, len(items), chunk_size):
+        # 整块序列化后去掉首尾的方括号，块之间补逗号
+        chunk = dumps(list(items[start:start + chunk_size]))[1:-1]
+        yield chunk if start == 0 else b"," + chunk
+    yield b"]"
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    构造 JSON 响应，跳过 FastAPI 按 response_model 的重新校验和 jsonable_encoder
+
+    路由返回 Response 对象时 FastAPI 不再处理返回值，response_model 仍用于生成接口文档。
+    只能用于内容已经是响应模型（或其字段的子集）的返回值。长列表按块流式输出。
+
+    Args:
+        content: 返回值
+        status_code: 状态码
+        headers: 额外的响应头
+
+    Returns:
+        响应对象
+    """
+    if isinstance(content, (list, tuple)) and len(content) > STREAM_THRESHOLD:
+        return StreamingResponse(
+            _array_chunks(content, STREAM_CHUNK_SIZE), status_code=status_code,
+            headers=headers, media_type=JSONBytesResponse.media_type
+        )
+    return JSONBytesResponse(content, status_code=status_code, headers=headers)
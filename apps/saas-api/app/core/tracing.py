@@ -0,0 +1,484 @@
+# 与 apps/saas-api、apps/mcp-server 中的同名模块保持完全一致，修改时两处同步（tests/test_shared_modules.py 检查）
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Union
+from collections import deque
+from contextvars import ContextVar
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from app.core.metrics import Sample
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# OTLP 的 SpanKind 和状态码
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+# W3C traceparent: 版本-trace_id-parent_id-flags
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class SpanContext(NamedTuple):
+    """从请求头解析出的远程父 Span"""
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+class Span:
+    """
+    一次操作的耗时记录，作为上下文管理器使用：进入时成为当前 Span，退出时结束
+
+    未采样的 Span 不记录任何内容，只用于向下游传递 trace_id 和不采样的决定。
+    """
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+        "attributes", "status", "error", "sampled", "_tracer", "_token"
+    )
+
+    def __init__(self, tracer: Optional["Tracer"], trace_id: str, span_id: str, parent_id: Optional[str],
+                 name: str, kind: str, sampled: bool, attributes: Optional[Dict[str, Any]] = None):
+        self._tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.attributes = dict(attributes) if sampled and attributes else {}
+        self.start_ns = time.time_ns() if sampled else 0
+        self.end_ns = 0
+        self.status = STATUS_UNSET
+        self.error: Optional[str] = None
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current_span.reset(self._token)
+        if self.sampled:
+            if exc is not None:
+                self.record_error(exc)
+            self._tracer._finish(self)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """设置属性（未采样时忽略）"""
+        if self.sampled:
+            self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        """标记为失败并记录错误信息"""
+        if self.sampled:
+            self.status = STATUS_ERROR
+            self.error = f"{type(error).__name__}: {error}"
+
+    def traceparent(self) -> str:
+        """W3C traceparent 请求头的值"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_ns": self.start_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": {STATUS_UNSET: "unset", STATUS_OK: "ok", STATUS_ERROR: "error"}[self.status],
+            "error": self.error,
+        }
+
+class _Unsampled:
+    """未采样链路上的子 Span：with 语句返回父 Span，不改变当前上下文"""
+
+    __slots__ = ("span",)
+
+    def __init__(self, span: Span):
+        self.span = span
+
+    def __enter__(self) -> Span:
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+# 当前协程或线程中正在进行的 Span
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    """获取当前的 Span"""
+    return _current_span.get()
+
+def extract(header: Optional[str]) -> Optional[SpanContext]:
+    """
+    解析 traceparent 请求头
+
+    Args:
+        header: 请求头的值
+
+    Returns:
+        远程父 Span，格式无效时返回None
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+class AdaptiveSampler:
+    """
+    自适应采样
+
+    按最近的根 Span 速率调整采样概率，使每秒采样的链路数接近 target_per_second；
+    负载越高采样概率越低，追踪开销不随请求量增长。子 Span 沿用父 Span 的采样决定。
+    """
+
+    def __init__(self, target_per_second: float = 10.0, window: float = 1.0):
+        """
+        初始化采样器
+
+        Args:
+            target_per_second: 每秒期望采样的链路数
+            window: 统计速率的时间窗口（秒）
+        """
+        self.target_per_second = target_per_second
+        self.window = window
+        self.probability = 1.0
+        self._rate: Optional[float] = None
+        self._count = 0
+        self._window_start = time.monotonic()
+
+    def should_sample(self) -> bool:
+        """决定一条新链路是否采样"""
+        self._count += 1
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= self.window and elapsed > 0:
+            rate = self._count / elapsed
+            # 指数平滑，避免突发流量让概率大幅抖动
+            self._rate = rate if self._rate is None else 0.5 * self._rate + 0.5 * rate
+            self.probability = min(1.0, self.target_per_second / self._rate) if self._rate > 0 else 1.0
+            self._count = 0
+            self._window_start = now
+        return self.probability >= 1.0 or random.random() < self.probability
+
+class OTLPFileExporter:
+    """
+    把采样的 Span 以 OTLP/JSON 格式写入文件
+
+    每行是一个 ExportTraceServiceRequest，可以用 OpenTelemetry Collector 的 otlpjsonfile 接收器导入。
+    Span 结束时只放入队列，后台线程批量写文件。
+    """
+
+    def __init__(self, path: str, service_name: str, flush_interval: float = 1.0, max_batch: int = 512):
+        """
+        初始化导出器
+
+        Args:
+            path: 输出文件路径（追加写入）
+            service_name: 服务名（resource 的 service.name）
+            flush_interval: 写文件的间隔（秒）
+            max_batch: 每行最多包含的 Span 数
+        """
+        self.path = path
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.exported = 0
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        """提交一个已结束的 Span"""
+        self._queue.put(span)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """写入剩余的 Span 并停止后台线程"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    logger.error(f"写入链路追踪文件失败: {str(e)}")
+
+    def _write(self, spans: List[Span]) -> None:
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(span) for span in spans]}],
+        }]}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+        self.exported += len(spans)
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": SPAN_KINDS.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": span.status},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    if span.error:
+        data["status"]["message"] = span.error
+    return data
+
+class Tracer:
+    """
+    进程内链路追踪
+
+    Span 通过 contextvars 形成父子关系，跨服务调用通过 traceparent 请求头传递。
+    采样的 Span 结束后进入环形缓冲区（可按 trace_id 或属性查询），配置了导出器时同时导出。
+    """
+
+    def __init__(self, service_name: str = "app", ring_size: int = 4096,
+                 sampler: Optional[AdaptiveSampler] = None, exporter: Optional[OTLPFileExporter] = None):
+        """
+        初始化追踪器
+
+        Args:
+            service_name: 服务名
+            ring_size: 环形缓冲区保留的 Span 数
+            sampler: 根 Span 的采样器，默认每秒采样约 10 条链路
+            exporter: Span 导出器
+        """
+        self.service_name = service_name
+        self.sampler = sampler or AdaptiveSampler()
+        self.exporter = exporter
+        self.spans: "deque[Span]" = deque(maxlen=ring_size)
+        self.recorded = 0
+        self.started_traces = 0
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal",
+             parent: Optional[SpanContext] = None) -> Union[Span, _Unsampled]:
+        """
+        创建一个 Span，用 with 语句包住要记录的代码块；代码块抛出的异常记录在 Span 上后继续抛出
+
+        Args:
+            name: 操作名
+            attributes: 属性
+            kind: internal、server 或 client
+            parent: 远程父 Span（如从请求头解析），为None时以当前 Span 为父
+
+        Returns:
+            Span 上下文管理器，with 语句返回 Span
+        """
+        if parent is None:
+            local_parent = _current_span.get()
+            if local_parent is not None:
+                if not local_parent.sampled:
+                    # 未采样的链路沿用父 Span，不生成ID也不切换上下文
+                    return _Unsampled(local_parent)
+                return Span(self, local_parent.trace_id, _new_id(64), local_parent.span_id, name, kind, True,
+                            attributes)
+            self.started_traces += 1
+            return Span(self, _new_id(128), _new_id(64), None, name, kind, self.sampler.should_sample(), attributes)
+        return Span(self, parent.trace_id, _new_id(64), parent.span_id, name, kind, parent.sampled, attributes)
+
+    def get_traces(
+        self,
+        trace_id: Optional[str] = None,
+        execution_id: Optional[str] = None,
+        name: Optional[str] = None,
+        min_duration_ms: Optional[float] = None,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        查询环形缓冲区中的链路
+
+        Args:
+            trace_id: 链路ID
+            execution_id: 含有该 execution_id 属性的链路
+            name: 含有该名称 Span 的链路
+            min_duration_ms: 根 Span（最早开始的 Span）耗时下限
+            limit: 最多返回的链路数
+
+        Returns:
+            按开始时间倒序的链路，每条包含全部 Span
+        """
+        spans = list(self.spans)
+        traces: Dict[str, List[Span]] = {}
+        for span in spans:
+            traces.setdefault(span.trace_id, []).append(span)
+
+        results = []
+        for tid, members in traces.items():
+            if trace_id and tid != trace_id:
+                continue
+            if execution_id and not any(s.attributes.get("execution_id") == execution_id for s in members):
+                continue
+            if name and not any(s.name == name for s in members):
+                continue
+            members.sort(key=lambda s: s.start_ns)
+            root = members[0]
+            end_ns = max(s.end_ns for s in members)
+            duration_ms = (end_ns - root.start_ns) / 1e6
+            if min_duration_ms is not None and duration_ms < min_duration_ms:
+                continue
+            results.append({
+                "trace_id": tid,
+                "root": root.name,
+                "start_time_ns": root.start_ns,
+                "duration_ms": duration_ms,
+                "error": any(s.status == STATUS_ERROR for s in members),
+                "spans": [s.to_dict() for s in members],
+            })
+        results.sort(key=lambda t: t["start_time_ns"], reverse=True)
+        return results[:limit]
+
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        输出追踪统计指标（注册为指标采集回调）
+
+        Returns:
+            指标样本
+        """
+        yield ("tracing_traces_started_total", "counter", "Root spans started", [({}, self.started_traces)])
+        yield ("tracing_spans_recorded_total", "counter", "Sampled spans recorded", [({}, self.recorded)])
+        yield ("tracing_sample_probability", "gauge", "Current adaptive sampling probability",
+               [({}, self.sampler.probability)])
+
+    def shutdown(self) -> None:
+        """停止导出器"""
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+    def _finish(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if span.status == STATUS_UNSET:
+            span.status = STATUS_OK
+        self.spans.append(span)
+        self.recorded += 1
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+def _new_id(bits: int) -> str:
+    return "%0*x" % (bits // 4, random.getrandbits(bits) or 1)
+
+# 进程内默认的追踪器，服务启动时调用 configure_tracing 设置服务名和导出
+TRACER = Tracer()
+
+def configure_tracing(service_name: str, tracer: Tracer = TRACER) -> Tracer:
+    """
+    根据环境变量配置追踪器
+
+    TRACE_SAMPLE_RATE 为每秒采样的链路数（默认 10），TRACE_EXPORT_PATH 为 OTLP/JSON 输出文件（可选）。
+
+    Args:
+        service_name: 服务名
+        tracer: 追踪器
+
+    Returns:
+        追踪器
+    """
+    tracer.service_name = service_name
+    tracer.sampler.target_per_second = float(os.environ.get("TRACE_SAMPLE_RATE", "10"))
+    export_path = os.environ.get("TRACE_EXPORT_PATH")
+    if export_path and tracer.exporter is None:
+        tracer.exporter = OTLPFileExporter(export_path, service_name)
+    return tracer
+
+class _TracingMiddleware:
+    """为每个 HTTP 请求创建 server Span"""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                header = value.decode("latin-1")
+                break
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with self.tracer.span(method, kind="server", parent=extract(header)) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if span.sampled:
+                    # 路由匹配后才能得到路由模板，按模板命名便于聚合
+                    route = scope.get("route")
+                    span.name = f"{method} {getattr(route, 'path', scope['path'])}"
+                    span.set_attribute("http.method", method)
+                    span.set_attribute("http.status_code", status_code)
+                    if status_code >= 500:
+                        span.status = STATUS_ERROR
+
+def instrument_tracing(app, tracer: Tracer = TRACER) -> None:
+    """
+    为 FastAPI 应用的每个请求创建 server Span（沿用请求头中的 traceparent），并注册 /traces 接口
+
+    Args:
+        app: FastAPI 应用
+        tracer: 追踪器
+    """
+    from fastapi import Query
+
+    # 纯 ASGI 中间件，省去 @app.middleware 包装请求和响应对象的开销
+    app.add_middleware(_TracingMiddleware, tracer=tracer)
+
+    @app.get("/traces", include_in_schema=False)
+    async def get_traces(
+        trace_id: Optional[str] = None,
+        execution_id: Optional[str] = None,
+        name: Optional[str] = None,
+        min_duration_ms: Optional[float] = None,
+        limit: int = Query(20, gt=0, le=200)
+    ):
+        return tracer.get_traces(trace_id, execution_id, name, min_duration_ms, limit)
@@ -1,5 +1,10 @@
 from fastapi import FastAPI
-from app.api.routes import knowledge, templates, tenants, logs, analytics
+from app.api.routes import knowledge, templates, tenants, logs, analytics, sync
+from app.api.deps import log_service, rag_service, response_cache, template_service
+from app.core.metrics import instrument_app
+from app.core.profiling import instrument_profiling
+from app.core.response_cache import instrument_response_cache
+from app.core.tracing import TRACER, configure_tracing, instrument_tracing
 
 app = FastAPI(
     title="SAP MCP SaaS API",
@@ -13,6 +18,34 @@ app.include_router(templates.router, prefix="/templates", tags=["templates"])
 app.include_router(tenants.router, prefix="/tenants", tags=["tenants"])
 app.include_router(logs.router, prefix="/logs", tags=["logs"])
 app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+app.include_router(sync.router, prefix="/sync", tags=["sync"])
+
+# 看板接口的响应缓存和条件请求（位于指标中间件之内，命中和 304 同样计入请求耗时）
+instrument_response_cache(app, response_cache, prefix="saas_http")
+
+# 按路由记录请求耗时，并提供 Prometheus 格式的 /metrics
+instrument_app(app, prefix="saas_http")
+
+# 配置 PROFILING_ADMIN_TOKEN 时启用采样分析和慢请求记录（/debug/profile、/debug/slow-requests）
+instrument_profiling(app)
+
+# 链路追踪：沿用请求头中的 traceparent，采样的链路可通过 /traces 查询
+configure_tracing("saas-api")
+instrument_tracing(app)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # 定期把模板使用计数批量写回模板服务
+    template_service.usage.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    template_service.usage.stop()
+    # 把未写满的日志段也写入磁盘
+    log_service.flush()
+    # 保存向量索引和知识库条目，下次启动直接加载
+    rag_service.save_index()
+    TRACER.shutdown()
 
 @app.get("/")
 async def root():
@@ -10,10 +10,27 @@ class ProcessStats(BaseModel):
     successful_executions: int
     failed_executions: int
     avg_duration: float  # in seconds
+    p50_duration: Optional[float] = None
+    p90_duration: Optional[float] = None
+    p99_duration: Optional[float] = None
+    max_duration: Optional[float] = None
     success_rate: float
     period_start: datetime
     period_end: datetime
 
+class StepLatency(BaseModel):
+    tenant_id: str
+    template_id: Optional[str] = None
+    step_id: str
+    count: int
+    avg_duration: float  # in seconds
+    p50_duration: float
+    p90_duration: float
+    p99_duration: float
+    max_duration: float
+    period_start: datetime
+    period_end: datetime
+
 class TemplateUsage(BaseModel):
     template_id: str
     template_name: str
@@ -21,6 +38,7 @@ class TemplateUsage(BaseModel):
     usage_count: int
     last_used: datetime
     avg_duration: float  # in seconds
+    recent_rate: float = 0.0  # uses per minute in the sliding window
 
 class TenantStats(BaseModel):
     tenant_id: str
@@ -36,12 +54,25 @@ class ErrorAnalysis(BaseModel):
     tenant_id: Optional[str] = None
     template_id: Optional[str] = None
     error_type: str
-    error_message: str
+    error_message: str  # latest sample
+    fingerprint: Optional[str] = None
+    message_template: Optional[str] = None
     count: int
     first_occurrence: datetime
     last_occurrence: datetime
     affected_processes: List[str]
 
+class ExecutionEvent(BaseModel):
+    tenant_id: str
+    template_id: Optional[str] = None
+    process_id: Optional[str] = None
+    step_id: Optional[str] = None  # step-level events only feed step latency
+    status: str  # started, completed, failed
+    duration: Optional[float] = None  # in seconds, for completed/failed
+    error_type: Optional[str] = None
+    error_message: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
 class OptimizationSuggestion(BaseModel):
     tenant_id: Optional[str] = None
     template_id: Optional[str] = None
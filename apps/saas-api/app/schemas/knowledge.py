@@ -28,3 +28,12 @@ class KnowledgeItem(KnowledgeItemBase):
 
     class Config:
         orm_mode = True
+
+class VectorizationStatus(BaseModel):
+    item_id: str
+    status: str = "pending"  # pending, running, completed, failed
+    total_chunks: int = 0
+    embedded_chunks: int = 0
+    reused_chunks: int = 0
+    error: Optional[str] = None
+    updated_at: datetime
@@ -22,6 +22,15 @@ class Log(LogBase):
     class Config:
         orm_mode = True
 
+class LogLineError(BaseModel):
+    line: int  # 1-based line number in the NDJSON body
+    error: str
+
+class LogBulkResult(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[LogLineError]  # first errors only, see rejected for the total
+
 class LogSearch(BaseModel):
     tenant_id: Optional[str] = None
     template_id: Optional[str] = None
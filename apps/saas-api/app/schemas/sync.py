@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+
+class SyncChange(BaseModel):
+    kind: str  # template, knowledge
+    id: str
+    op: str  # upsert, delete
+    version: int
+    data: Optional[Dict[str, Any]] = None  # full entity for upsert
+
+class SyncChanges(BaseModel):
+    feed_id: str  # changes when the feed is rebuilt, clients then resync from 0
+    version: int  # watermark to pass as since in the next request
+    reset: bool = False  # client must drop its cache before applying changes
+    has_more: bool = False
+    changes: List[SyncChange]
@@ -30,6 +30,30 @@ class ProcessTemplate(ProcessTemplateBase):
     updated_at: datetime
     status: str = "draft"  # draft, published, archived
     usage_count: int = 0
+    dsl_hash: Optional[str] = None  # 当前 DSL 的内容哈希
+    revision: int = 0  # 当前版本序号
 
     class Config:
         orm_mode = True
+
+class TemplatePage(BaseModel):
+    items: List[ProcessTemplate]
+    total: int
+    next_cursor: Optional[str] = None
+    facets: Dict[str, Dict[str, int]] = {}
+
+class TemplateVersion(BaseModel):
+    template_id: str
+    number: int  # 版本序号，从 1 开始递增
+    version: str  # 客户端设置的版本号
+    dsl_hash: str
+    created_at: datetime
+
+class TemplateVersionDetail(TemplateVersion):
+    dsl: Dict[str, Any]
+
+class DSLChange(BaseModel):
+    op: str  # add, remove, replace
+    path: str  # JSON Pointer
+    old_value: Optional[Any] = None
+    new_value: Optional[Any] = None
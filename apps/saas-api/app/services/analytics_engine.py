@@ -0,0 +1,405 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+import logging
+import threading
+from app.services.error_fingerprint import DEFAULT_LOG_ERROR_TYPE, fingerprint_error
+from app.utils.sketch import DDSketch
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每个错误汇总最多记录的受影响流程实例数
+MAX_AFFECTED_PROCESSES = 20
+
+# 每个时间桶最多跟踪的错误指纹数，超出时按 Space-Saving 替换计数最小的指纹
+MAX_ERROR_FINGERPRINTS = 512
+
+RollupKey = Tuple[str, Optional[str]]
+ErrorKey = Tuple[str, Optional[str], str]
+StepKey = Tuple[str, Optional[str], str]
+
+# 耗时分位数的相对误差和每个草图的最大桶数
+SKETCH_ACCURACY = 0.01
+SKETCH_MAX_BINS = 1024
+
+def new_sketch() -> DDSketch:
+    """创建分析引擎统一参数的耗时草图（参数相同才能合并）"""
+    return DDSketch(SKETCH_ACCURACY, SKETCH_MAX_BINS)
+
+class Rollup:
+    """单个 (租户, 模板, 时间桶) 的执行和日志汇总"""
+    COUNTERS = (
+        "started", "completed", "failed", "duration_sum", "duration_count",
+        "info_logs", "warn_logs", "error_logs"
+    )
+    __slots__ = COUNTERS + ("durations",)
+
+    def __init__(self):
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.info_logs = 0
+        self.warn_logs = 0
+        self.error_logs = 0
+        # 执行耗时草图，首次记录耗时时创建
+        self.durations: Optional[DDSketch] = None
+
+    def merge(self, other: "Rollup") -> None:
+        """把另一个汇总累加到当前汇总"""
+        for field in Rollup.COUNTERS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        if other.durations is not None:
+            if self.durations is None:
+                self.durations = new_sketch()
+            self.durations.merge(other.durations)
+
+    @property
+    def executions(self) -> int:
+        """执行次数；只上报结束事件时以结束数为准"""
+        return max(self.started, self.completed + self.failed)
+
+class ErrorRollup:
+    """单个 (租户, 模板, 错误指纹, 时间桶) 的错误汇总"""
+    __slots__ = (
+        "error_type", "template", "count", "overcount",
+        "first_occurrence", "last_occurrence", "message", "processes"
+    )
+
+    def __init__(self, error_type: str, template: str, timestamp: datetime, message: str):
+        self.error_type = error_type
+        self.template = template
+        self.count = 0
+        # 替换其他指纹时继承的计数，count - overcount 是该指纹的确切下界
+        self.overcount = 0
+        self.first_occurrence = timestamp
+        self.last_occurrence = timestamp
+        self.message = message
+        self.processes: List[str] = []
+
+class AnalyticsEngine:
+    """
+    增量聚合的分析引擎
+
+    每条执行事件或日志只更新一个 (租户, 模板, 时间桶) 汇总，查询时按时间桶遍历汇总，
+    耗时与查询范围内的时间桶数（及其中活跃的租户/模板数）成正比，与原始事件量无关。
+    超出保留期的时间桶在写入时淘汰。
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int = 3600,
+        retention_buckets: int = 24 * 90,
+        max_error_fingerprints: int = MAX_ERROR_FINGERPRINTS
+    ):
+        """
+        初始化分析引擎
+
+        Args:
+            bucket_seconds: 时间桶宽度（秒）
+            retention_buckets: 保留的时间桶数
+            max_error_fingerprints: 每个时间桶最多跟踪的错误指纹数
+        """
+        self.bucket_seconds = bucket_seconds
+        self.retention_buckets = retention_buckets
+        self.max_error_fingerprints = max_error_fingerprints
+        self._rollups: Dict[int, Dict[RollupKey, Rollup]] = {}
+        self._errors: Dict[int, Dict[ErrorKey, ErrorRollup]] = {}
+        self._steps: Dict[int, Dict[StepKey, DDSketch]] = {}
+        self._latest_bucket: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def bucket_of(self, timestamp: datetime) -> int:
+        """时间所在的时间桶编号"""
+        return int(timestamp.timestamp() // self.bucket_seconds)
+
+    def record_execution(
+        self,
+        tenant_id: str,
+        template_id: Optional[str],
+        status: str,
+        timestamp: datetime,
+        duration: Optional[float] = None,
+        process_id: Optional[str] = None,
+        error_type: Optional[str] = None,
+        error_message: Optional[str] = None,
+        step_id: Optional[str] = None
+    ) -> None:
+        """
+        记录一条执行事件
+
+        Args:
+            tenant_id: 租户ID
+            template_id: 模板ID
+            status: 事件类型（started、completed、failed）
+            timestamp: 事件时间
+            duration: 执行耗时（秒），仅结束事件有效
+            process_id: 流程实例ID
+            error_type: 错误类型，仅失败事件有效
+            error_message: 错误信息，仅失败事件有效
+            step_id: 步骤ID；步骤级事件只记录步骤耗时，不计入执行次数
+        """
+        if status not in ("started", "completed", "failed"):
+            raise ValueError(f"不支持的执行事件类型: {status}")
+        if status == "failed" and step_id is None:
+            error_type = error_type or "执行失败"
+            fingerprint, template = fingerprint_error(error_type, error_message or "")
+        bucket = self.bucket_of(timestamp)
+        with self._lock:
+            rollup = self._rollup(bucket, (tenant_id, template_id))
+            if rollup is None:
+                return
+            if step_id is not None:
+                if duration is not None and status != "started":
+                    sketches = self._steps.setdefault(bucket, {})
+                    sketch = sketches.get((tenant_id, template_id, step_id))
+                    if sketch is None:
+                        sketch = sketches[(tenant_id, template_id, step_id)] = new_sketch()
+                    sketch.add(max(0.0, duration))
+                return
+            if status == "started":
+                rollup.started += 1
+            elif status == "completed":
+                rollup.completed += 1
+            else:
+                rollup.failed += 1
+            if duration is not None and status != "started":
+                rollup.duration_sum += duration
+                rollup.duration_count += 1
+                if rollup.durations is None:
+                    rollup.durations = new_sketch()
+                rollup.durations.add(max(0.0, duration))
+            if status == "failed":
+                self._record_error(
+                    bucket, tenant_id, template_id, fingerprint, error_type, template,
+                    error_message or "", timestamp, process_id
+                )
+
+    def record_log(
+        self,
+        tenant_id: str,
+        template_id: Optional[str],
+        level: str,
+        timestamp: datetime,
+        message: str = "",
+        process_id: Optional[str] = None,
+        error_type: Optional[str] = None
+    ) -> None:
+        """
+        记录一条日志
+
+        Args:
+            tenant_id: 租户ID
+            template_id: 模板ID
+            level: 日志级别（info、warn、error）
+            timestamp: 日志时间
+            message: 日志内容
+            process_id: 流程实例ID
+            error_type: 错误类型，错误日志未提供时归为“运行错误”
+        """
+        if level == "error":
+            error_type = error_type or DEFAULT_LOG_ERROR_TYPE
+            fingerprint, template = fingerprint_error(error_type, message)
+        bucket = self.bucket_of(timestamp)
+        with self._lock:
+            rollup = self._rollup(bucket, (tenant_id, template_id))
+            if rollup is None:
+                return
+            if level == "info":
+                rollup.info_logs += 1
+            elif level == "warn":
+                rollup.warn_logs += 1
+            elif level == "error":
+                rollup.error_logs += 1
+                self._record_error(
+                    bucket, tenant_id, template_id, fingerprint, error_type, template,
+                    message, timestamp, process_id
+                )
+
+    def rollups(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        tenant_id: Optional[str] = None,
+        template_id: Optional[str] = None
+    ) -> Dict[RollupKey, Rollup]:
+        """
+        合并时间范围内的汇总
+
+        Args:
+            start_time: 开始时间（按所在时间桶对齐）
+            end_time: 结束时间（按所在时间桶对齐）
+            tenant_id: 租户筛选
+            template_id: 模板筛选
+
+        Returns:
+            {(租户, 模板): 合并后的汇总}
+        """
+        merged: Dict[RollupKey, Rollup] = {}
+        with self._lock:
+            for buckets in self._range(self._rollups, start_time, end_time):
+                for key, rollup in buckets.items():
+                    if tenant_id is not None and key[0] != tenant_id:
+                        continue
+                    if template_id is not None and key[1] != template_id:
+                        continue
+                    total = merged.get(key)
+                    if total is None:
+                        total = merged[key] = Rollup()
+                    total.merge(rollup)
+        return merged
+
+    def errors(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        tenant_id: Optional[str] = None,
+        template_id: Optional[str] = None
+    ) -> Dict[ErrorKey, Dict]:
+        """
+        合并时间范围内的错误汇总
+
+        Args:
+            start_time: 开始时间
+            end_time: 结束时间
+            tenant_id: 租户筛选
+            template_id: 模板筛选
+
+        Returns:
+            {(租户, 模板, 错误指纹): {error_type, template, count, overcount,
+            first_occurrence, last_occurrence, message, processes}}
+        """
+        merged: Dict[ErrorKey, Dict] = {}
+        with self._lock:
+            for buckets in self._range(self._errors, start_time, end_time):
+                for key, error in buckets.items():
+                    if tenant_id is not None and key[0] != tenant_id:
+                        continue
+                    if template_id is not None and key[1] != template_id:
+                        continue
+                    total = merged.get(key)
+                    if total is None:
+                        merged[key] = {
+                            "error_type": error.error_type,
+                            "template": error.template,
+                            "count": error.count,
+                            "overcount": error.overcount,
+                            "first_occurrence": error.first_occurrence,
+                            "last_occurrence": error.last_occurrence,
+                            "message": error.message,
+                            "processes": list(error.processes)
+                        }
+                        continue
+                    total["count"] += error.count
+                    total["overcount"] += error.overcount
+                    total["first_occurrence"] = min(total["first_occurrence"], error.first_occurrence)
+                    if error.last_occurrence >= total["last_occurrence"]:
+                        total["last_occurrence"] = error.last_occurrence
+                        total["message"] = error.message
+                    for process_id in error.processes:
+                        if len(total["processes"]) >= MAX_AFFECTED_PROCESSES:
+                            break
+                        if process_id not in total["processes"]:
+                            total["processes"].append(process_id)
+        return merged
+
+    def step_durations(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        tenant_id: Optional[str] = None,
+        template_id: Optional[str] = None
+    ) -> Dict[StepKey, DDSketch]:
+        """
+        合并时间范围内的步骤耗时草图
+
+        Args:
+            start_time: 开始时间
+            end_time: 结束时间
+            tenant_id: 租户筛选
+            template_id: 模板筛选
+
+        Returns:
+            {(租户, 模板, 步骤): 合并后的耗时草图}
+        """
+        merged: Dict[StepKey, DDSketch] = {}
+        with self._lock:
+            for buckets in self._range(self._steps, start_time, end_time):
+                for key, sketch in buckets.items():
+                    if tenant_id is not None and key[0] != tenant_id:
+                        continue
+                    if template_id is not None and key[1] != template_id:
+                        continue
+                    total = merged.get(key)
+                    if total is None:
+                        total = merged[key] = new_sketch()
+                    total.merge(sketch)
+        return merged
+
+    def _range(self, store: Dict[int, Dict], start_time: datetime, end_time: datetime) -> Iterator[Dict]:
+        """按时间桶顺序遍历范围内存在的时间桶"""
+        first = self.bucket_of(start_time)
+        last = self.bucket_of(end_time)
+        # 范围远大于已有时间桶数时直接遍历已有的时间桶
+        if last - first + 1 > len(store):
+            for bucket in sorted(store):
+                if first <= bucket <= last:
+                    yield store[bucket]
+            return
+        for bucket in range(first, last + 1):
+            buckets = store.get(bucket)
+            if buckets:
+                yield buckets
+
+    def _rollup(self, bucket: int, key: RollupKey) -> Optional[Rollup]:
+        """获取（必要时创建）汇总，超出保留期的事件返回None"""
+        if self._latest_bucket is None or bucket > self._latest_bucket:
+            self._latest_bucket = bucket
+            self._evict(bucket - self.retention_buckets)
+        if bucket <= self._latest_bucket - self.retention_buckets:
+            return None
+
+        buckets = self._rollups.setdefault(bucket, {})
+        rollup = buckets.get(key)
+        if rollup is None:
+            rollup = buckets[key] = Rollup()
+        return rollup
+
+    def _record_error(
+        self,
+        bucket: int,
+        tenant_id: str,
+        template_id: Optional[str],
+        fingerprint: str,
+        error_type: str,
+        template: str,
+        message: str,
+        timestamp: datetime,
+        process_id: Optional[str]
+    ) -> None:
+        """更新错误汇总（调用方已持有锁）"""
+        buckets = self._errors.setdefault(bucket, {})
+        key = (tenant_id, template_id, fingerprint)
+        error = buckets.get(key)
+        if error is None:
+            overcount = 0
+            if len(buckets) >= self.max_error_fingerprints:
+                # Space-Saving：新指纹替换计数最小的指纹并继承其计数，高频错误不会被挤出
+                victim = min(buckets, key=lambda candidate: buckets[candidate].count)
+                overcount = buckets.pop(victim).count
+            error = buckets[key] = ErrorRollup(error_type, template, timestamp, message)
+            error.count = error.overcount = overcount
+        error.count += 1
+        error.first_occurrence = min(error.first_occurrence, timestamp)
+        if timestamp >= error.last_occurrence:
+            error.last_occurrence = timestamp
+            error.message = message
+        if process_id and len(error.processes) < MAX_AFFECTED_PROCESSES and process_id not in error.processes:
+            error.processes.append(process_id)
+
+    def _evict(self, oldest: int) -> None:
+        """淘汰编号不大于 oldest 的时间桶"""
+        for store in (self._rollups, self._errors, self._steps):
+            for bucket in [bucket for bucket in store if bucket <= oldest]:
+                del store[bucket]
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 import logging
 from datetime import datetime, timedelta
@@ -7,27 +7,116 @@ from app.schemas.analytics import (
     TemplateUsage, 
     TenantStats, 
     ErrorAnalysis,
-    OptimizationSuggestion
+    ExecutionEvent,
+    OptimizationSuggestion,
+    StepLatency
 )
+from app.schemas.log import Log
+from app.services.analytics_engine import AnalyticsEngine
+from app.services.log_service import LogService
+from app.services.template_service import TemplateService
+from app.services.tenant_service import TenantService
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 报告中成功率低于该值的模板会给出可靠性建议
+LOW_SUCCESS_RATE = 0.9
+
+def _local_naive(timestamp: datetime) -> datetime:
+    """带时区的时间统一为本地时间（与服务端生成的时间和 log_ingest 一致），不带时区的原样返回"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
 class AnalyticsService:
     """
     分析服务类，负责处理分析相关的业务逻辑
+    
+    执行事件和日志写入时由分析引擎增量汇总，各统计接口只读取时间桶汇总。
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        template_service: Optional[TemplateService] = None,
+        log_service: Optional[LogService] = None,
+        tenant_service: Optional[TenantService] = None,
+        engine: Optional[AnalyticsEngine] = None
+    ):
         """
         初始化分析服务
+        
+        Args:
+            template_service: 流程模板服务，模板使用情况从其使用计数器读取
+            log_service: 日志服务，新日志写入时同步汇总到分析引擎
+            tenant_service: 租户服务，用于查询租户名称
+            engine: 分析引擎
         """
-        # 在实际实现中，这里需要连接数据库和日志服务
-        # 为了简化，我们使用内存存储
-        self.process_executions = []
-        self.tenants = {}
-        self.templates = {}
-        self.errors = []
+        self.template_service = template_service if template_service is not None else TemplateService()
+        self.tenant_service = tenant_service
+        self.engine = engine if engine is not None else AnalyticsEngine()
+        # 分析数据版本号，每写入一批事件或日志递增（响应缓存据此计算 ETag）
+        self.generation = 0
+        if log_service is not None:
+            log_service.add_listener(self.ingest_logs)
+    
+    def ingest_events(self, events: List[ExecutionEvent]) -> int:
+        """
+        写入执行事件
+        
+        Args:
+            events: 执行事件列表
+            
+        Returns:
+            写入的事件数
+            
+        Raises:
+            ValueError: 事件类型无效
+        """
+        for event in events:
+            if event.status not in ("started", "completed", "failed"):
+                raise ValueError(f"不支持的执行事件类型: {event.status}")
+                
+        for event in events:
+            self.engine.record_execution(
+                tenant_id=event.tenant_id,
+                template_id=event.template_id,
+                status=event.status,
+                timestamp=_local_naive(event.timestamp) if event.timestamp else datetime.now(),
+                duration=event.duration,
+                process_id=event.process_id,
+                error_type=event.error_type,
+                error_message=event.error_message,
+                step_id=event.step_id
+            )
+            # 执行启动同时计入模板使用次数，结束事件的耗时计入模板平均耗时
+            if event.template_id and not event.step_id:
+                if event.status == "started":
+                    self.template_service.record_usage(event.template_id, event.tenant_id)
+                elif event.duration is not None:
+                    self.template_service.record_duration(event.template_id, event.tenant_id, event.duration)
+        self.generation += 1
+        return len(events)
+    
+    def ingest_logs(self, logs: List[Log]) -> None:
+        """
+        汇总一批新日志（注册为日志服务的监听函数）
+        
+        Args:
+            logs: 日志对象列表
+        """
+        for log in logs:
+            details = log.details or {}
+            self.engine.record_log(
+                tenant_id=log.tenant_id,
+                template_id=log.template_id,
+                level=log.level,
+                timestamp=log.timestamp,
+                message=log.message,
+                process_id=log.process_id,
+                error_type=details.get("error_type")
+            )
+        self.generation += 1
     
     def get_process_stats(
         self,
@@ -46,60 +135,135 @@ class AnalyticsService:
             end_time: 结束时间筛选
             
         Returns:
-            流程统计信息列表
+            每个 (租户, 模板) 一项，按执行次数倒序
         """
-        # 在实际实现中，这里会从数据库查询数据
-        # 为了简化，我们返回模拟数据
+        start_time, end_time = self._period(start_time, end_time)
+        rollups = self.engine.rollups(start_time, end_time, tenant_id, template_id)
+        
+        stats = []
+        for (row_tenant, row_template), rollup in rollups.items():
+            if not rollup.executions:
+                continue
+            finished = rollup.completed + rollup.failed
+            durations = rollup.durations
+            stats.append(ProcessStats(
+                tenant_id=row_tenant,
+                template_id=row_template,
+                template_name=self._template_name(row_template),
+                total_executions=rollup.executions,
+                successful_executions=rollup.completed,
+                failed_executions=rollup.failed,
+                avg_duration=rollup.duration_sum / rollup.duration_count if rollup.duration_count else 0.0,
+                p50_duration=durations.quantile(0.5) if durations else None,
+                p90_duration=durations.quantile(0.9) if durations else None,
+                p99_duration=durations.quantile(0.99) if durations else None,
+                max_duration=durations.max if durations else None,
+                success_rate=rollup.completed / finished if finished else 0.0,
+                period_start=start_time,
+                period_end=end_time
+            ))
+        
+        stats.sort(key=lambda item: item.total_executions, reverse=True)
+        return stats
+    
+    def get_step_latency(
+        self,
+        tenant_id: Optional[str] = None,
+        template_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> List[StepLatency]:
+        """
+        获取步骤耗时分位数
         
-        # 默认时间范围为最近30天
-        if not start_time:
-            start_time = datetime.now() - timedelta(days=30)
-        if not end_time:
-            end_time = datetime.now()
+        Args:
+            tenant_id: 租户ID筛选
+            template_id: 模板ID筛选
+            start_time: 开始时间筛选
+            end_time: 结束时间筛选
             
-        stats = ProcessStats(
-            tenant_id=tenant_id,
-            template_id=template_id,
-            template_name="销售订单处理流程" if template_id else None,
-            total_executions=100,
-            successful_executions=85,
-            failed_executions=15,
-            avg_duration=120.5,
-            success_rate=0.85,
-            period_start=start_time,
-            period_end=end_time
-        )
+        Returns:
+            每个 (租户, 模板, 步骤) 一项，按 p99 耗时倒序
+        """
+        start_time, end_time = self._period(start_time, end_time)
+        sketches = self.engine.step_durations(start_time, end_time, tenant_id, template_id)
         
-        return [stats]
+        latency = [
+            StepLatency(
+                tenant_id=row_tenant,
+                template_id=row_template,
+                step_id=step_id,
+                count=sketch.count,
+                avg_duration=sketch.sum / sketch.count,
+                p50_duration=sketch.quantile(0.5),
+                p90_duration=sketch.quantile(0.9),
+                p99_duration=sketch.quantile(0.99),
+                max_duration=sketch.max,
+                period_start=start_time,
+                period_end=end_time
+            )
+            for (row_tenant, row_template, step_id), sketch in sketches.items()
+            if sketch.count
+        ]
+        latency.sort(key=lambda item: item.p99_duration, reverse=True)
+        return latency
     
     def get_template_usage(
         self,
         tenant_id: Optional[str] = None,
-        limit: int = 100
+        limit: int = 100,
+        sort: str = "total"
     ) -> List[TemplateUsage]:
         """
         获取模板使用情况
         
         Args:
-            tenant_id: 租户ID筛选
+            tenant_id: 租户ID筛选，不指定时按模板汇总所有租户
             limit: 返回结果数量限制
+            sort: 排序方式，total 按累计使用次数，recent 按最近窗口内的使用速率
             
         Returns:
             模板使用情况列表
         """
-        # 在实际实现中，这里会从数据库查询数据
-        # 为了简化，我们返回模拟数据
+        if sort not in ("total", "recent"):
+            raise ValueError(f"不支持的排序方式: {sort}")
+            
+        # 直接读取使用计数器中预先累计的数据，不需要扫描执行记录
+        merged: Dict[str, Dict[str, Any]] = {}
+        for row in self.template_service.usage.snapshot(tenant_id):
+            entry = merged.get(row["template_id"])
+            if entry is None:
+                merged[row["template_id"]] = dict(row, tenant_id=tenant_id)
+                continue
+            entry["avg_duration"] = (
+                entry["avg_duration"] * entry["duration_count"] + row["avg_duration"] * row["duration_count"]
+            ) / max(1, entry["duration_count"] + row["duration_count"])
+            entry["duration_count"] += row["duration_count"]
+            entry["usage_count"] += row["usage_count"]
+            entry["recent_rate"] += row["recent_rate"]
+            entry["last_used"] = max(entry["last_used"], row["last_used"])
+            
+        key = "usage_count" if sort == "total" else "recent_rate"
+        rows = sorted(merged.values(), key=lambda row: row[key], reverse=True)
         
-        usage = TemplateUsage(
-            template_id="template_1",
-            template_name="销售订单处理流程",
-            tenant_id=tenant_id,
-            usage_count=50,
-            last_used=datetime.now(),
-            avg_duration=120.5
-        )
+        usage = []
+        for row in rows:
+            template = self.template_service.get_template_by_id(row["template_id"])
+            if not template:
+                continue
+            usage.append(TemplateUsage(
+                template_id=row["template_id"],
+                template_name=template.name,
+                tenant_id=row["tenant_id"],
+                usage_count=row["usage_count"],
+                last_used=row["last_used"],
+                avg_duration=row["avg_duration"],
+                recent_rate=row["recent_rate"]
+            ))
+            if len(usage) >= limit:
+                break
         
-        return [usage]
+        return usage
     
     def get_tenant_stats(
         self,
@@ -114,29 +278,36 @@ class AnalyticsService:
             end_time: 结束时间筛选
             
         Returns:
-            租户统计信息列表
+            租户统计信息列表；total_processes 为有执行记录的模板数，
+            active_processes 为已启动但尚未结束的执行数，failed_processes 为失败的执行数
         """
-        # 在实际实现中，这里会从数据库查询数据
-        # 为了简化，我们返回模拟数据
+        start_time, end_time = self._period(start_time, end_time)
         
-        # 默认时间范围为最近30天
-        if not start_time:
-            start_time = datetime.now() - timedelta(days=30)
-        if not end_time:
-            end_time = datetime.now()
+        totals: Dict[str, Dict[str, int]] = {}
+        for (tenant_id, _), rollup in self.engine.rollups(start_time, end_time).items():
+            if not rollup.executions:
+                continue
+            total = totals.setdefault(tenant_id, {"processes": 0, "executions": 0, "active": 0, "failed": 0})
+            total["processes"] += 1
+            total["executions"] += rollup.executions
+            total["active"] += max(0, rollup.started - rollup.completed - rollup.failed)
+            total["failed"] += rollup.failed
             
-        stats = TenantStats(
-            tenant_id="tenant_1",
-            tenant_name="示例公司",
-            total_processes=5,
-            total_executions=200,
-            active_processes=3,
-            failed_processes=2,
-            period_start=start_time,
-            period_end=end_time
-        )
-        
-        return [stats]
+        stats = [
+            TenantStats(
+                tenant_id=tenant_id,
+                tenant_name=self._tenant_name(tenant_id),
+                total_processes=total["processes"],
+                total_executions=total["executions"],
+                active_processes=total["active"],
+                failed_processes=total["failed"],
+                period_start=start_time,
+                period_end=end_time
+            )
+            for tenant_id, total in totals.items()
+        ]
+        stats.sort(key=lambda item: item.total_executions, reverse=True)
+        return stats
     
     def get_error_analysis(
         self,
@@ -155,23 +326,29 @@ class AnalyticsService:
             end_time: 结束时间筛选
             
         Returns:
-            错误分析列表
+            每个 (租户, 模板, 错误指纹) 一项，按出现次数倒序；错误信息中的ID、数字和单据号
+            规范化后相同的错误归为同一指纹
         """
-        # 在实际实现中，这里会从日志服务查询错误数据
-        # 为了简化，我们返回模拟数据
+        start_time, end_time = self._period(start_time, end_time)
+        errors = self.engine.errors(start_time, end_time, tenant_id, template_id)
         
-        analysis = ErrorAnalysis(
-            tenant_id=tenant_id,
-            template_id=template_id,
-            error_type="参数验证错误",
-            error_message="缺少必需参数: customer_id",
-            count=5,
-            first_occurrence=datetime.now() - timedelta(days=5),
-            last_occurrence=datetime.now() - timedelta(hours=2),
-            affected_processes=["process_1", "process_2"]
-        )
-        
-        return [analysis]
+        analysis = [
+            ErrorAnalysis(
+                tenant_id=row_tenant,
+                template_id=row_template,
+                error_type=error["error_type"],
+                error_message=error["message"],
+                fingerprint=fingerprint,
+                message_template=error["template"],
+                count=error["count"],
+                first_occurrence=error["first_occurrence"],
+                last_occurrence=error["last_occurrence"],
+                affected_processes=error["processes"]
+            )
+            for (row_tenant, row_template, fingerprint), error in errors.items()
+        ]
+        analysis.sort(key=lambda item: (item.count, item.last_occurrence), reverse=True)
+        return analysis
     
     def get_optimization_suggestions(
         self,
@@ -220,15 +397,57 @@ class AnalyticsService:
         Returns:
             分析报告
         """
-        # 在实际实现中，这里会生成详细的分析报告
-        # 为了简化，我们返回模拟数据
+        start_time, end_time = self._period(start_time, end_time)
+        process_stats = self.get_process_stats(tenant_id, None, start_time, end_time)
+        errors = self.get_error_analysis(tenant_id, None, start_time, end_time)
+        
+        total_executions = sum(item.total_executions for item in process_stats)
+        successful = sum(item.successful_executions for item in process_stats)
+        finished = successful + sum(item.failed_executions for item in process_stats)
+        rollups = self.engine.rollups(start_time, end_time, tenant_id)
+        duration_sum = sum(rollup.duration_sum for rollup in rollups.values())
+        duration_count = sum(rollup.duration_count for rollup in rollups.values())
+        
+        # 同一模板在多个租户下的统计合并为一项
+        templates: Dict[Optional[str], Dict[str, Any]] = {}
+        for item in process_stats:
+            entry = templates.setdefault(item.template_id, {
+                "template_id": item.template_id,
+                "template_name": item.template_name,
+                "usage_count": 0,
+                "successful": 0,
+                "finished": 0
+            })
+            entry["usage_count"] += item.total_executions
+            entry["successful"] += item.successful_executions
+            entry["finished"] += item.successful_executions + item.failed_executions
+        top_templates = sorted(templates.values(), key=lambda entry: entry["usage_count"], reverse=True)[:5]
+        for entry in top_templates:
+            entry["success_rate"] = entry["successful"] / entry["finished"] if entry["finished"] else 0.0
+        
+        error_types: Dict[str, int] = {}
+        for item in errors:
+            error_types[item.error_type] = error_types.get(item.error_type, 0) + item.count
+        total_errors = sum(error_types.values())
+        top_error_types = [
+            {
+                "error_type": error_type,
+                "count": count,
+                "percentage": round(count * 100 / total_errors, 1)
+            }
+            for error_type, count in sorted(error_types.items(), key=lambda item: item[1], reverse=True)[:5]
+        ]
+        
+        recommendations = []
+        for entry in top_templates:
+            if entry["finished"] and entry["success_rate"] < LOW_SUCCESS_RATE:
+                name = entry["template_name"] or entry["template_id"]
+                recommendations.append({
+                    "type": "reliability",
+                    "description": f"'{name}'的成功率为{entry['success_rate']:.0%}，建议优先排查其最常见的错误",
+                    "priority": "high" if entry["success_rate"] < 0.7 else "medium"
+                })
         
-        # 默认时间范围为最近30天
-        if not start_time:
-            start_time = datetime.now() - timedelta(days=30)
-        if not end_time:
-            end_time = datetime.now()
-            
         report = {
             "report_id": str(uuid.uuid4()),
             "generated_at": datetime.now(),
@@ -236,36 +455,50 @@ class AnalyticsService:
             "period_end": end_time,
             "tenant_id": tenant_id,
             "summary": {
-                "total_processes": 5,
-                "total_executions": 200,
-                "success_rate": 0.85,
-                "avg_duration": 120.5
+                "total_processes": len(templates),
+                "total_executions": total_executions,
+                "success_rate": successful / finished if finished else 0.0,
+                "avg_duration": duration_sum / duration_count if duration_count else 0.0
             },
             "top_templates": [
                 {
-                    "template_id": "template_1",
-                    "template_name": "销售订单处理流程",
-                    "usage_count": 50,
-                    "success_rate": 0.90
+                    "template_id": entry["template_id"],
+                    "template_name": entry["template_name"],
+                    "usage_count": entry["usage_count"],
+                    "success_rate": entry["success_rate"]
                 }
+                for entry in top_templates
             ],
             "error_summary": {
-                "total_errors": 15,
-                "top_error_types": [
-                    {
-                        "error_type": "参数验证错误",
-                        "count": 5,
-                        "percentage": 33.3
-                    }
-                ]
+                "total_errors": total_errors,
+                "top_error_types": top_error_types
             },
-            "recommendations": [
-                {
-                    "type": "performance",
-                    "description": "建议为'销售订单处理流程'增加缓存机制",
-                    "priority": "medium"
-                }
-            ]
+            "recommendations": recommendations
         }
         
         return report
+    
+    def _period(
+        self,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> Tuple[datetime, datetime]:
+        """补全查询时间范围，默认为最近30天"""
+        end_time = _local_naive(end_time) if end_time else datetime.now()
+        start_time = _local_naive(start_time) if start_time else end_time - timedelta(days=30)
+        return start_time, end_time
+    
+    def _template_name(self, template_id: Optional[str]) -> Optional[str]:
+        """查询模板名称，模板不存在时返回None"""
+        if not template_id:
+            return None
+        template = self.template_service.get_template_by_id(template_id)
+        return template.name if template else None
+    
+    def _tenant_name(self, tenant_id: str) -> str:
+        """查询租户名称，未配置租户服务或租户不存在时返回租户ID"""
+        if self.tenant_service is not None:
+            tenant = self.tenant_service.get_tenant_by_id(tenant_id)
+            if tenant:
+                return tenant.name
+        return tenant_id
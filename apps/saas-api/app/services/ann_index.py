@@ -0,0 +1,270 @@
+from typing import List, Optional, Dict
+import json
+import logging
+import numpy as np
+from app.services.embedding_service import normalize
+from app.services.vector_index import VectorIndex, SearchHit
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class IVFIndex(VectorIndex):
+    """
+    倒排文件（IVF）近似最近邻索引
+
+    用球面 k-means 把向量划分为 nlist 个簇，检索时只在与查询最相近的 nprobe 个簇中
+    计算相似度。nprobe 越大召回率越高、延迟越大，nprobe == nlist 时等价于精确检索。
+    训练前（向量数不足 train_size）退化为精确检索。
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = 64,
+        nprobe: int = 8,
+        train_size: Optional[int] = None,
+        capacity: int = 1024
+    ):
+        """
+        初始化 IVF 索引
+
+        Args:
+            dim: 向量维度
+            nlist: 簇数量
+            nprobe: 检索时探查的簇数量，用于权衡召回率和延迟
+            train_size: 自动训练所需的最少向量数，默认 nlist * 8
+            capacity: 初始容量（行数）
+        """
+        super().__init__(dim, capacity)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size if train_size is not None else max(nlist * 8, 256)
+        self._centroids: Optional[np.ndarray] = None
+        # 每行所属的簇（-1 表示未分配）以及在簇内列表中的位置
+        self._assign = np.full(capacity, -1, dtype=np.int32)
+        self._list_pos = np.zeros(capacity, dtype=np.int64)
+        self._list_rows: List[np.ndarray] = []
+        self._list_sizes = np.zeros(0, dtype=np.int64)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self, iterations: int = 20, seed: int = 0) -> None:
+        """
+        用当前全部向量训练簇中心，并重新分配所有向量
+
+        Args:
+            iterations: k-means 迭代次数
+            seed: 随机种子
+        """
+        self._ensure_writable()
+        n = self._size
+        nlist = min(self.nlist, n)
+        if nlist == 0:
+            return
+
+        rng = np.random.default_rng(seed)
+        data = self._vectors[:n]
+        centroids = data[rng.choice(n, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            counts = np.bincount(labels, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            # 空簇用随机向量重新播种
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = data[rng.choice(n, int(empty.sum()), replace=False)]
+            centroids = normalize(sums)
+
+        self._centroids = centroids
+        self.nlist = nlist
+        self._list_rows = [np.zeros(16, dtype=np.int64) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self._assign[:n] = -1
+        self._assign_rows(np.arange(n))
+        logger.info(f"IVF 索引训练完成: {n} 个向量, {nlist} 个簇")
+
+    def remove(self, key: str) -> bool:
+        """
+        删除向量
+
+        Args:
+            key: 向量键
+
+        Returns:
+            删除成功返回True，键不存在返回False
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return False
+
+        self._ensure_writable()
+        if self._assign[row] >= 0:
+            self._list_remove(row)
+        return super().remove(key)
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        public_only: bool = False
+    ) -> List[List[SearchHit]]:
+        """
+        批量近似检索，所有查询共享同一组过滤条件
+
+        Args:
+            queries: (m, dim) 查询矩阵
+            k: 每个查询的返回数量
+            tenant_id: 租户筛选（该租户的条目和公开条目）
+            category: 分类筛选
+            public_only: 是否只检索公开条目
+
+        Returns:
+            每个查询对应一个按相似度降序排列的 (键, 相似度) 列表
+        """
+        if not self.is_trained:
+            return super().search_batch(queries, k, tenant_id, category, public_only)
+
+        queries = normalize(np.asarray(queries).reshape(-1, self.dim))
+        mask = self._filter_mask(tenant_id, category, public_only)
+
+        # 先选出每个查询最相近的 nprobe 个簇
+        nprobe = max(1, min(self.nprobe, self.nlist))
+        centroid_scores = queries @ self._centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, probe in zip(queries, probes):
+            rows = np.concatenate([self._list_rows[c][:self._list_sizes[c]] for c in probe])
+            if mask is not None:
+                rows = rows[mask[rows]]
+            results.append(self._top_k(self._vectors[rows] @ query, rows, k))
+        return results
+
+    def _on_rows_written(self, rows: np.ndarray) -> None:
+        """写入后分配簇；未训练且数据量足够时自动训练"""
+        if self.is_trained:
+            self._assign_rows(rows)
+        elif self._size >= self.train_size:
+            self.train()
+
+    def _assign_rows(self, rows: np.ndarray) -> None:
+        """把行分配到最近的簇，已分配的行先从原簇移除"""
+        if len(rows) == 0:
+            return
+
+        labels = np.argmax(self._vectors[rows] @ self._centroids.T, axis=1)
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            if self._assign[row] >= 0:
+                self._list_remove(row)
+            self._list_add(label, row)
+
+    def _list_add(self, cluster: int, row: int) -> None:
+        """把行追加到簇内列表"""
+        size = self._list_sizes[cluster]
+        rows = self._list_rows[cluster]
+        if size == rows.shape[0]:
+            grown = np.zeros(max(16, size * 2), dtype=np.int64)
+            grown[:size] = rows[:size]
+            rows = self._list_rows[cluster] = grown
+        rows[size] = row
+        self._list_pos[row] = size
+        self._list_sizes[cluster] = size + 1
+        self._assign[row] = cluster
+
+    def _list_remove(self, row: int) -> None:
+        """把行从所属簇的列表中移除（用列表末尾元素填补空位）"""
+        cluster = self._assign[row]
+        rows = self._list_rows[cluster]
+        pos = self._list_pos[row]
+        last = self._list_sizes[cluster] - 1
+        moved = rows[last]
+        rows[pos] = moved
+        self._list_pos[moved] = pos
+        self._list_sizes[cluster] = last
+        self._assign[row] = -1
+
+    def _append_row(self, key: str) -> int:
+        row = super()._append_row(key)
+        self._assign[row] = -1
+        return row
+
+    def _move_row(self, src: int, dst: int) -> None:
+        super()._move_row(src, dst)
+        cluster = self._assign[src]
+        self._assign[dst] = cluster
+        if cluster >= 0:
+            pos = self._list_pos[src]
+            self._list_rows[cluster][pos] = dst
+            self._list_pos[dst] = pos
+
+    def _grow(self, capacity: int) -> None:
+        size = self._size
+        super()._grow(capacity)
+
+        assign = np.full(capacity, -1, dtype=np.int32)
+        assign[:size] = self._assign[:size]
+        list_pos = np.zeros(capacity, dtype=np.int64)
+        list_pos[:size] = self._list_pos[:size]
+        self._assign, self._list_pos = assign, list_pos
+
+    def _ensure_writable(self) -> None:
+        if self._readonly:
+            self._list_rows = [np.array(rows) for rows in self._list_rows]
+        super()._ensure_writable()
+
+    def _persistent_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = super()._persistent_arrays()
+        n = self._size
+        arrays["assign"] = self._assign[:n]
+        arrays["list_pos"] = self._list_pos[:n]
+        if self.is_trained:
+            arrays["centroids"] = self._centroids
+            arrays["list_sizes"] = self._list_sizes
+            arrays["lists"] = np.concatenate(
+                [rows[:size] for rows, size in zip(self._list_rows, self._list_sizes)]
+            )
+        return arrays
+
+    def _persistent_meta(self) -> Dict:
+        meta = super()._persistent_meta()
+        meta.update(nlist=self.nlist, nprobe=self.nprobe, train_size=self.train_size)
+        return meta
+
+    def _restore(self, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+        super()._restore(meta, arrays)
+        self.nlist = meta["nlist"]
+        self.nprobe = meta["nprobe"]
+        self.train_size = meta["train_size"]
+        self._assign = arrays["assign"]
+        self._list_pos = arrays["list_pos"]
+        self._centroids = None
+        self._list_rows = []
+        self._list_sizes = np.zeros(0, dtype=np.int64)
+        if "centroids" in arrays:
+            self._centroids = np.array(arrays["centroids"])
+            self._list_sizes = np.array(arrays["list_sizes"])
+            # 簇内列表直接切片映射文件，首次写入时才复制
+            offsets = np.concatenate([[0], np.cumsum(self._list_sizes)])
+            lists = arrays["lists"]
+            self._list_rows = [lists[offsets[i]:offsets[i + 1]] for i in range(self.nlist)]
+
+def load_index(directory: str) -> VectorIndex:
+    """
+    从目录加载向量索引，根据元数据自动选择索引类型
+
+    Args:
+        directory: 索引目录
+
+    Returns:
+        加载后的向量索引
+    """
+    with open(f"{directory}/meta.json", encoding="utf-8") as f:
+        index_type = json.load(f)["type"]
+    index_class = {"VectorIndex": VectorIndex, "IVFIndex": IVFIndex}[index_type]
+    return index_class.load(directory)
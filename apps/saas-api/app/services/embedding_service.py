@@ -0,0 +1,79 @@
+from typing import Callable, Sequence
+import zlib
+import logging
+import numpy as np
+from app.utils.text import tokenize
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 嵌入函数：输入一批文本，返回形状为 (n, dim) 的 float32 矩阵
+EmbeddingFunction = Callable[[Sequence[str]], np.ndarray]
+
+class HashingEmbedder:
+    """
+    本地哈希嵌入器
+
+    使用特征哈希（hashing trick）把词元映射到固定维度的向量，不依赖外部模型，
+    结果完全确定，适合测试和离线环境。生产环境可替换为任意同签名的嵌入函数。
+    """
+
+    def __init__(self, dim: int = 256):
+        """
+        初始化哈希嵌入器
+
+        Args:
+            dim: 向量维度
+        """
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        批量生成文本向量
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            L2 归一化后的 (n, dim) float32 矩阵
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                # crc32 在进程间稳定，不受 PYTHONHASHSEED 影响
+                h = zlib.crc32(token.encode("utf-8"))
+                sign = 1.0 if (h >> 31) & 1 else -1.0
+                vectors[row, h % self.dim] += sign
+        return normalize(vectors)
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    按行做 L2 归一化，零向量保持为零
+
+    Args:
+        vectors: (n, dim) 矩阵
+
+    Returns:
+        归一化后的 float32 矩阵
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def embedding_dim(embedder: EmbeddingFunction) -> int:
+    """
+    获取嵌入函数的向量维度
+
+    优先读取 dim 属性，否则对空文本做一次试探性嵌入。
+
+    Args:
+        embedder: 嵌入函数
+
+    Returns:
+        向量维度
+    """
+    dim = getattr(embedder, "dim", None)
+    if dim is None:
+        dim = np.asarray(embedder([""])).shape[1]
+    return int(dim)
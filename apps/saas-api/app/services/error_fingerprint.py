@@ -0,0 +1,54 @@
+from typing import Tuple
+import hashlib
+import logging
+import re
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 错误日志未提供 error_type 时的默认错误类型
+DEFAULT_LOG_ERROR_TYPE = "运行错误"
+
+# 错误模板的最大长度
+MAX_TEMPLATE_LENGTH = 200
+
+# 按顺序替换的可变部分；ASCII 边界用环视实现，避免中文字符被当作单词字符
+_PATTERNS = (
+    (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"), "<uuid>"),
+    (re.compile(r"(?<![A-Za-z0-9])(?:0x[0-9a-fA-F]+|(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{12,})(?![A-Za-z0-9])"), "<hex>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\"|‘[^’]*’|“[^”]*”"), "<str>"),
+    # SAP 单据号等 6 位以上的纯数字编号
+    (re.compile(r"(?<![A-Za-z0-9.])\d{6,}(?![0-9.])"), "<doc>"),
+    (re.compile(r"(?<![A-Za-z0-9<])\d+(?:\.\d+)?"), "<num>"),
+)
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_error_message(message: str) -> str:
+    """
+    把错误信息规范化为模板：UUID、十六进制ID、引号内的值、单据号和数字替换为占位符
+
+    Args:
+        message: 原始错误信息
+
+    Returns:
+        错误模板
+    """
+    template = message or ""
+    for pattern, placeholder in _PATTERNS:
+        template = pattern.sub(placeholder, template)
+    return _WHITESPACE.sub(" ", template).strip()[:MAX_TEMPLATE_LENGTH]
+
+def fingerprint_error(error_type: str, message: str) -> Tuple[str, str]:
+    """
+    计算错误指纹
+
+    Args:
+        error_type: 错误类型
+        message: 原始错误信息
+
+    Returns:
+        (指纹, 错误模板)；错误类型和模板相同的错误指纹相同
+    """
+    template = normalize_error_message(message)
+    digest = hashlib.sha1(f"{error_type}\x00{template}".encode("utf-8")).hexdigest()[:16]
+    return digest, template
@@ -0,0 +1,285 @@
+from typing import Callable, Dict, List, NamedTuple, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import hashlib
+import logging
+import threading
+import numpy as np
+from app.schemas.knowledge import KnowledgeItem, VectorizationStatus
+from app.services.embedding_service import EmbeddingFunction, embedding_dim
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 分块时优先在这些字符之后断开
+_BREAK_CHARS = "。！？；\n.!?;"
+
+class Chunk(NamedTuple):
+    """文档分块，start/end 为在条目正文中的字符偏移"""
+    index: int
+    start: int
+    end: int
+    text: str
+    content_hash: str
+
+def embedding_text(item: KnowledgeItem, text: str) -> str:
+    """分块用于嵌入和关键词索引的文本：标题和标签加分块正文"""
+    return "\n".join([item.title, " ".join(item.tags or []), text])
+
+def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> List[Chunk]:
+    """
+    把正文切分为相互重叠的分块
+
+    每块最长 chunk_size 个字符，相邻块重叠 overlap 个字符；窗口后 20% 范围内
+    有句末标点时在标点处断开，尽量不截断句子。空正文返回一个空分块，
+    保证标题和标签仍然可以被检索到。
+
+    Args:
+        text: 条目正文
+        chunk_size: 分块最大长度
+        overlap: 相邻分块的重叠长度
+
+    Returns:
+        分块列表（content_hash 暂为空，由调用方按嵌入文本计算）
+    """
+    if not text:
+        return [Chunk(0, 0, 0, "", "")]
+
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            floor = start + int(chunk_size * 0.8)
+            for pos in range(end - 1, floor - 1, -1):
+                if text[pos] in _BREAK_CHARS:
+                    end = pos + 1
+                    break
+
+        chunks.append(Chunk(len(chunks), start, end, text[start:end], ""))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+
+    return chunks
+
+class IngestionJob:
+    """
+    单个知识库条目的向量化任务
+
+    记录分块、已就绪的向量，以及仍需嵌入的分块位置。
+    """
+
+    def __init__(self, item: KnowledgeItem, version: int, chunks: List[Chunk], texts: List[str], dim: int):
+        self.item_id = item.id
+        self.version = version
+        self.chunks = chunks
+        self.texts = texts
+        self.vectors = np.zeros((len(chunks), dim), dtype=np.float32)
+        self.missing: List[int] = []
+        self.remaining = 0
+
+class IngestionPipeline:
+    """
+    知识库向量化流水线
+
+    负责分块、按内容哈希去重以及批量嵌入。未变化的分块直接复用缓存中的向量，
+    只有新增或变化的分块才会调用嵌入函数。可以同步执行，也可以提交到后台线程池，
+    多个条目的待嵌入分块会合并成固定大小的批次。
+    """
+
+    def __init__(
+        self,
+        embedder: EmbeddingFunction,
+        chunk_size: int = 500,
+        chunk_overlap: int = 100,
+        batch_size: int = 64,
+        max_workers: int = 4,
+        cache_size: int = 100000
+    ):
+        """
+        初始化向量化流水线
+
+        Args:
+            embedder: 嵌入函数
+            chunk_size: 分块最大长度
+            chunk_overlap: 相邻分块的重叠长度
+            batch_size: 每次调用嵌入函数的分块数
+            max_workers: 后台线程数
+            cache_size: 分块向量缓存的最大条数
+        """
+        self.embedder = embedder
+        self.dim = embedding_dim(embedder)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.progress: Dict[str, VectorizationStatus] = {}
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+
+    def plan(self, item: KnowledgeItem) -> IngestionJob:
+        """
+        为条目分块并查找可复用的向量
+
+        Args:
+            item: 知识库条目
+
+        Returns:
+            向量化任务
+        """
+        chunks = []
+        texts = []
+        for chunk in chunk_text(item.content, self.chunk_size, self.chunk_overlap):
+            text = embedding_text(item, chunk.text)
+            chunks.append(chunk._replace(content_hash=hashlib.sha1(text.encode("utf-8")).hexdigest()))
+            texts.append(text)
+
+        with self._lock:
+            version = self._versions.get(item.id, 0) + 1
+            self._versions[item.id] = version
+            job = IngestionJob(item, version, chunks, texts, self.dim)
+            for i, chunk in enumerate(chunks):
+                vector = self._cache.get(chunk.content_hash)
+                if vector is None:
+                    job.missing.append(i)
+                else:
+                    self._cache.move_to_end(chunk.content_hash)
+                    job.vectors[i] = vector
+            job.remaining = len(job.missing)
+
+            self.progress[item.id] = VectorizationStatus(
+                item_id=item.id,
+                total_chunks=len(chunks),
+                embedded_chunks=len(chunks) - len(job.missing),
+                reused_chunks=len(chunks) - len(job.missing),
+                updated_at=datetime.now()
+            )
+        return job
+
+    def is_current(self, job: IngestionJob) -> bool:
+        """任务是否仍是该条目最新的一次规划（旧任务的结果应当丢弃）"""
+        return self._versions.get(job.item_id) == job.version
+
+    def forget(self, item_id: str) -> None:
+        """条目删除后清理进度，并使尚未完成的任务失效"""
+        with self._lock:
+            self.progress.pop(item_id, None)
+            self._versions[item_id] = self._versions.get(item_id, 0) + 1
+
+    def run(self, jobs: List[IngestionJob]) -> None:
+        """
+        在当前线程同步完成所有任务的嵌入
+
+        Args:
+            jobs: 向量化任务列表
+        """
+        for batch in self._batches(jobs):
+            self._embed_batch(batch)
+
+    def submit(self, jobs: List[IngestionJob], on_complete: Callable[[IngestionJob], None]) -> None:
+        """
+        把任务提交到后台线程池，每个任务的全部分块嵌入完成后回调 on_complete
+
+        Args:
+            jobs: 向量化任务列表
+            on_complete: 完成回调，在后台线程中执行
+        """
+        for job in jobs:
+            if job.remaining == 0:
+                self._executor.submit(self.complete, job, on_complete)
+
+        for batch in self._batches(jobs):
+            self._executor.submit(self._run_batch, batch, on_complete)
+
+    def get_status(self, item_id: str) -> Optional[VectorizationStatus]:
+        """
+        获取条目的向量化进度
+
+        Args:
+            item_id: 知识库条目ID
+
+        Returns:
+            进度对象，从未提交过向量化时返回None
+        """
+        return self.progress.get(item_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        关闭后台线程池
+
+        Args:
+            wait: 是否等待已提交的任务完成
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _batches(self, jobs: List[IngestionJob]):
+        """把所有任务中待嵌入的分块切分为 (任务, 分块位置) 批次"""
+        pending = [(job, i) for job in jobs for i in job.missing]
+        for start in range(0, len(pending), self.batch_size):
+            yield pending[start:start + self.batch_size]
+
+    def _embed_batch(self, batch) -> List[IngestionJob]:
+        """嵌入一个批次并写回任务和缓存，返回因此完成的任务"""
+        for job in {id(job): job for job, _ in batch}.values():
+            self._set_status(job, "running")
+
+        vectors = np.asarray(self.embedder([job.texts[i] for job, i in batch]), dtype=np.float32)
+
+        finished = []
+        with self._lock:
+            for (job, i), vector in zip(batch, vectors):
+                job.vectors[i] = vector
+                job.remaining -= 1
+                self._cache[job.chunks[i].content_hash] = vector
+                status = self.progress.get(job.item_id)
+                if status is not None and self.is_current(job):
+                    status.embedded_chunks += 1
+                    status.updated_at = datetime.now()
+                if job.remaining == 0:
+                    finished.append(job)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return finished
+
+    def _run_batch(self, batch, on_complete: Callable[[IngestionJob], None]) -> None:
+        """后台执行一个批次，失败时把涉及的任务标记为失败"""
+        try:
+            finished = self._embed_batch(batch)
+        except Exception as e:
+            logger.error(f"知识库向量化批次失败: {str(e)}")
+            for job in {id(job): job for job, _ in batch}.values():
+                self._set_status(job, "failed", error=str(e))
+            return
+
+        for job in finished:
+            self.complete(job, on_complete)
+
+    def complete(self, job: IngestionJob, on_complete: Callable[[IngestionJob], None]) -> None:
+        """
+        执行完成回调并更新进度
+
+        Args:
+            job: 已完成嵌入的向量化任务
+            on_complete: 完成回调
+        """
+        try:
+            on_complete(job)
+            self._set_status(job, "completed")
+        except Exception as e:
+            logger.error(f"知识库条目向量化写入失败: {job.item_id}, 错误: {str(e)}")
+            self._set_status(job, "failed", error=str(e))
+
+    def _set_status(self, job: IngestionJob, status: str, error: Optional[str] = None) -> None:
+        """更新最新任务的进度状态，旧任务不覆盖新任务的进度"""
+        with self._lock:
+            progress = self.progress.get(job.item_id)
+            if progress is None or not self.is_current(job):
+                return
+            progress.status = status
+            progress.error = error
+            progress.updated_at = datetime.now()
@@ -0,0 +1,194 @@
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+import heapq
+import math
+import logging
+import threading
+from app.utils.text import tokenize
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class InvertedIndex:
+    """
+    倒排索引（BM25 打分）
+
+    词元到 {文档键: 词频} 的倒排表，检索时只访问查询词元对应的倒排表，
+    耗时与命中文档数相关，而不是与语料总量相关。
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        初始化倒排索引
+
+        Args:
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        # 文档的过滤元数据：(租户, 分类, 是否公开)
+        self._meta: Dict[str, Tuple[Optional[str], Optional[str], bool]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._doc_lengths
+
+    def add(
+        self,
+        key: str,
+        text: str,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        is_public: bool = True
+    ) -> None:
+        """
+        添加或替换文档
+
+        Args:
+            key: 文档键
+            text: 文档文本
+            tenant_id: 所属租户
+            category: 分类
+            is_public: 是否公开
+        """
+        self.remove(key)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[key] = tf
+
+        length = sum(terms.values())
+        self._doc_terms[key] = terms
+        self._doc_lengths[key] = length
+        self._meta[key] = (tenant_id, category, is_public)
+        self._total_length += length
+
+    def set_metadata(
+        self,
+        key: str,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        is_public: Optional[bool] = None
+    ) -> bool:
+        """
+        更新文档的过滤元数据
+
+        Args:
+            key: 文档键
+            tenant_id: 所属租户，None 表示不修改
+            category: 分类，None 表示不修改
+            is_public: 是否公开，None 表示不修改
+
+        Returns:
+            更新成功返回True，文档不存在返回False
+        """
+        meta = self._meta.get(key)
+        if meta is None:
+            return False
+
+        self._meta[key] = (
+            tenant_id if tenant_id is not None else meta[0],
+            category if category is not None else meta[1],
+            is_public if is_public is not None else meta[2]
+        )
+        return True
+
+    def remove(self, key: str) -> bool:
+        """
+        删除文档
+
+        Args:
+            key: 文档键
+
+        Returns:
+            删除成功返回True，文档不存在返回False
+        """
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return False
+
+        for term in terms:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+
+        self._total_length -= self._doc_lengths.pop(key)
+        del self._meta[key]
+        return True
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        public_only: bool = False,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            k: 返回数量
+            tenant_id: 租户筛选（该租户的文档和公开文档）
+            category: 分类筛选
+            public_only: 是否只检索公开文档
+            cancel_event: 取消信号，置位后尽快返回已累积的结果
+
+        Returns:
+            按得分降序排列的 (文档键, 得分) 列表
+        """
+        doc_count = len(self._doc_lengths)
+        if doc_count == 0:
+            return []
+
+        avg_length = self._total_length / doc_count
+        scores: Dict[str, float] = {}
+        allowed: Dict[str, bool] = {}
+
+        for term in set(tokenize(query)):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for key, tf in postings.items():
+                ok = allowed.get(key)
+                if ok is None:
+                    ok = allowed[key] = self._matches(key, tenant_id, category, public_only)
+                if not ok:
+                    continue
+
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+
+    def _matches(
+        self,
+        key: str,
+        tenant_id: Optional[str],
+        category: Optional[str],
+        public_only: bool
+    ) -> bool:
+        """文档是否满足过滤条件，语义与向量索引一致"""
+        doc_tenant, doc_category, doc_public = self._meta[key]
+        if public_only and not doc_public:
+            return False
+        if tenant_id is not None and not public_only and doc_tenant != tenant_id and not doc_public:
+            return False
+        if category is not None and doc_category != category:
+            return False
+        return True
@@ -1,24 +1,109 @@
-from typing import List, Optional, Dict, Any
+from typing import Callable, Hashable, List, Optional, Dict, Any, Set, Tuple, Union
+import os
 import uuid
 import logging
+import threading
+import time
 from datetime import datetime
-from app.schemas.log import Log, LogCreate, LogSearch
+from app.core.metrics import REGISTRY
+from app.core.tracing import TRACER
+from app.schemas.log import LogBulkResult, LogCreate, LogSearch
+from app.services.error_fingerprint import DEFAULT_LOG_ERROR_TYPE, fingerprint_error
+from app.services.log_store import ColumnarLogStore, DictLogStore
+from app.services.records import LogRecord
+from app.utils.cache import TTLCache
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+LogStore = Union[ColumnarLogStore, DictLogStore]
+
+# store 为指纹计算和写入存储，listeners 为监听函数（分析引擎汇总）
+LOG_WRITE_LATENCY = REGISTRY.histogram("saas_log_write_duration_seconds", "Log write latency by stage", ("stage",))
+LOGS_WRITTEN = REGISTRY.counter("saas_logs_written_total", "Logs written")
+_STORE_STAGE = LOG_WRITE_LATENCY.labels("store")
+_LISTENERS_STAGE = LOG_WRITE_LATENCY.labels("listeners")
+
+# 字典编码的日志列；fingerprint 为错误日志的错误指纹（附加列）
+LOG_COLUMNS = ("tenant_id", "template_id", "process_id", "step_id", "user_id", "level", "fingerprint")
+
+# 建立 zone map 的列，按租户或模板筛选时跳过不含该值的日志段
+LOG_ZONE_COLUMNS = ("tenant_id", "template_id")
+
 class LogService:
     """
     日志服务类，负责处理日志相关的业务逻辑
     """
     
-    def __init__(self):
+    def __init__(self, store: Optional[LogStore] = None, segment_dir: Optional[str] = None):
         """
         初始化日志服务
+        
+        Args:
+            store: 日志存储，默认为列式存储
+            segment_dir: 列式存储的磁盘日志段目录，为None时日志只保存在内存中
         """
         # 在实际实现中，这里需要连接数据库
         # 为了简化，我们使用内存存储
-        self.logs = {}
+        if store is None:
+            store = ColumnarLogStore(LogRecord, LOG_COLUMNS, directory=segment_dir, zone_columns=LOG_ZONE_COLUMNS)
+        self.store = store
+        # 最近处理过的批量导入批次 (租户, 批次ID) -> 导入结果，发送方重试同一批次时直接返回结果而不重复写入
+        self.bulk_results = TTLCache(maxsize=10000, ttl=24 * 3600)
+        # 正在处理的批次，超时后重试的并发请求不能再写一遍
+        self._bulk_in_flight: Set[Hashable] = set()
+        self._bulk_lock = threading.Lock()
+        # 新日志写入后依次通知的监听函数（如分析引擎）
+        self.listeners: List[Callable[[List[LogRecord]], None]] = []
+        # 日志数据版本号，每写入一批递增（响应缓存据此计算 ETag）
+        self.generation = 0
+    
+    def add_listener(self, listener: Callable[[List[LogRecord]], None]) -> None:
+        """
+        注册新日志监听函数
+        
+        Args:
+            listener: 参数为同一批新创建的日志对象列表
+        """
+        self.listeners.append(listener)
+    
+    def claim_bulk_batch(self, key: Hashable) -> Tuple[bool, Optional[LogBulkResult]]:
+        """
+        在解析请求体之前占用批量导入批次
+        
+        Args:
+            key: (租户, 批次ID)
+            
+        Returns:
+            (是否占用成功, 已完成时的导入结果)；未占用成功且没有结果时表示同一批次正在处理
+        """
+        with self._bulk_lock:
+            result = self.bulk_results.get(key)
+            if result is not None:
+                return False, result
+            if key in self._bulk_in_flight:
+                return False, None
+            self._bulk_in_flight.add(key)
+            return True, None
+    
+    def release_bulk_batch(self, key: Hashable, result: Optional[LogBulkResult] = None) -> None:
+        """
+        释放占用的批次，导入成功时记录结果（导入失败时没有写入任何日志，批次可以重试）
+        
+        Args:
+            key: (租户, 批次ID)
+            result: 导入结果
+        """
+        with self._bulk_lock:
+            if result is not None:
+                self.bulk_results.set(key, result)
+            self._bulk_in_flight.discard(key)
+    
+    def flush(self) -> None:
+        """
+        封存正在写入的日志段（配置了磁盘目录时写入磁盘），服务停止前调用
+        """
+        self.store.flush()
     
     def get_logs(
         self,
@@ -29,7 +114,7 @@ class LogService:
         level: Optional[str] = None,
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None
-    ) -> List[Log]:
+    ) -> List[LogRecord]:
         """
         获取日志列表
         
@@ -43,33 +128,12 @@ class LogService:
             end_time: 结束时间筛选
             
         Returns:
-            日志列表
+            日志列表，按时间倒序
         """
-        logs = list(self.logs.values())
-        
-        # 应用筛选条件
-        if tenant_id:
-            logs = [log for log in logs if log.tenant_id == tenant_id]
-            
-        if template_id:
-            logs = [log for log in logs if log.template_id == template_id]
-            
-        if level:
-            logs = [log for log in logs if log.level == level]
-            
-        if start_time:
-            logs = [log for log in logs if log.timestamp >= start_time]
-            
-        if end_time:
-            logs = [log for log in logs if log.timestamp <= end_time]
-            
-        # 按时间倒序排列
-        logs.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        # 应用分页
-        return logs[skip:skip+limit]
+        equals = self._equals(tenant_id=tenant_id, template_id=template_id, level=level)
+        return self.store.query(equals, start_time, end_time, skip=skip, limit=limit)
     
-    def get_log_by_id(self, log_id: str) -> Optional[Log]:
+    def get_log_by_id(self, log_id: str) -> Optional[LogRecord]:
         """
         根据ID获取日志详情
         
@@ -79,9 +143,9 @@ class LogService:
         Returns:
             日志对象，如果未找到则返回None
         """
-        return self.logs.get(log_id)
+        return self.store.get(log_id)
     
-    def create_log(self, log_create: LogCreate) -> Log:
+    def create_log(self, log_create: LogCreate) -> LogRecord:
         """
         创建新日志
         
@@ -92,8 +156,8 @@ class LogService:
             创建的日志对象
         """
         log_id = str(uuid.uuid4())
-        log = Log(
-            id=log_id,
+        # 字段已由 LogCreate 校验，直接构造记录
+        log = LogRecord(
             tenant_id=log_create.tenant_id,
             template_id=log_create.template_id,
             process_id=log_create.process_id,
@@ -102,57 +166,65 @@ class LogService:
             level=log_create.level,
             message=log_create.message,
             details=log_create.details,
+            id=log_id,
             timestamp=datetime.now()
         )
-        self.logs[log_id] = log
+        self._store([log])
         logger.info(f"创建新日志: {log_id}")
         return log
     
-    def search_logs(self, search: LogSearch) -> List[Log]:
+    def create_logs(self, rows: List[Dict[str, Any]]) -> List[LogRecord]:
         """
-        搜索日志
+        批量创建日志
         
         Args:
-            search: 日志搜索对象
+            rows: 已校验的日志字段（见 log_ingest.validate_log_line），可带 timestamp
             
         Returns:
-            搜索结果列表
+            创建的日志对象列表
+        """
+        if not rows:
+            return []
+        # 一次取出全部随机字节生成 UUID4
+        entropy = os.urandom(16 * len(rows))
+        now = datetime.now()
+        logs = []
+        for i, row in enumerate(rows):
+            fields = dict(row)
+            fields["id"] = str(uuid.UUID(bytes=entropy[16 * i:16 * i + 16], version=4))
+            if fields.get("timestamp") is None:
+                fields["timestamp"] = now
+            # 字段已逐项校验，直接构造记录
+            logs.append(LogRecord(**fields))
+        with TRACER.span("logs.store", {"log.count": len(logs)}):
+            self._store(logs)
+        return logs
+    
+    def search_logs(self, search: LogSearch) -> List[LogRecord]:
         """
-        logs = list(self.logs.values())
+        搜索日志
         
-        # 应用搜索条件
-        if search.tenant_id:
-            logs = [log for log in logs if log.tenant_id == search.tenant_id]
-            
-        if search.template_id:
-            logs = [log for log in logs if log.template_id == search.template_id]
-            
-        if search.process_id:
-            logs = [log for log in logs if log.process_id == search.process_id]
-            
-        if search.step_id:
-            logs = [log for log in logs if log.step_id == search.step_id]
-            
-        if search.user_id:
-            logs = [log for log in logs if log.user_id == search.user_id]
-            
-        if search.level:
-            logs = [log for log in logs if log.level == search.level]
-            
-        if search.message:
-            logs = [log for log in logs if search.message.lower() in log.message.lower()]
-            
-        if search.start_time:
-            logs = [log for log in logs if log.timestamp >= search.start_time]
-            
-        if search.end_time:
-            logs = [log for log in logs if log.timestamp <= search.end_time]
+        Args:
+            search: 日志搜索对象
             
-        # 按时间倒序排列
-        logs.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        # 限制返回数量
-        return logs[:search.limit]
+        Returns:
+            搜索结果列表，按时间倒序
+        """
+        equals = self._equals(
+            tenant_id=search.tenant_id,
+            template_id=search.template_id,
+            process_id=search.process_id,
+            step_id=search.step_id,
+            user_id=search.user_id,
+            level=search.level
+        )
+        return self.store.query(
+            equals,
+            search.start_time,
+            search.end_time,
+            message_contains=search.message or None,
+            limit=search.limit
+        )
     
     def get_log_stats(
         self,
@@ -173,26 +245,14 @@ class LogService:
         Returns:
             日志统计信息
         """
-        logs = list(self.logs.values())
+        equals = self._equals(tenant_id=tenant_id, template_id=template_id)
+        counts = self.store.count_by("level", equals, start_time, end_time)
         
-        # 应用筛选条件
-        if tenant_id:
-            logs = [log for log in logs if log.tenant_id == tenant_id]
-            
-        if template_id:
-            logs = [log for log in logs if log.template_id == template_id]
-            
-        if start_time:
-            logs = [log for log in logs if log.timestamp >= start_time]
-            
-        if end_time:
-            logs = [log for log in logs if log.timestamp <= end_time]
-            
         # 计算统计信息
-        total_logs = len(logs)
-        info_logs = len([log for log in logs if log.level == "info"])
-        warn_logs = len([log for log in logs if log.level == "warn"])
-        error_logs = len([log for log in logs if log.level == "error"])
+        total_logs = sum(counts.values())
+        info_logs = counts.get("info", 0)
+        warn_logs = counts.get("warn", 0)
+        error_logs = counts.get("error", 0)
         
         return {
             "total_logs": total_logs,
@@ -206,8 +266,9 @@ class LogService:
         self,
         tenant_id: Optional[str] = None,
         template_id: Optional[str] = None,
-        limit: int = 100
-    ) -> List[Log]:
+        limit: int = 100,
+        fingerprint: Optional[str] = None
+    ) -> List[LogRecord]:
         """
         获取错误日志
         
@@ -215,24 +276,39 @@ class LogService:
             tenant_id: 租户ID筛选
             template_id: 模板ID筛选
             limit: 返回结果数量限制
+            fingerprint: 错误指纹筛选
             
         Returns:
-            错误日志列表
+            错误日志列表，按时间倒序
         """
-        logs = list(self.logs.values())
-        
-        # 应用筛选条件
-        if tenant_id:
-            logs = [log for log in logs if log.tenant_id == tenant_id]
-            
-        if template_id:
-            logs = [log for log in logs if log.template_id == template_id]
-            
-        # 筛选错误日志
-        error_logs = [log for log in logs if log.level == "error"]
-        
-        # 按时间倒序排列
-        error_logs.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        # 限制返回数量
-        return error_logs[:limit]
+        equals = self._equals(tenant_id=tenant_id, template_id=template_id, fingerprint=fingerprint)
+        equals["level"] = "error"
+        return self.store.query(equals, limit=limit)
+    
+    def _store(self, logs: List[LogRecord]) -> None:
+        """写入存储并通知监听函数"""
+        start = time.perf_counter()
+        extras = []
+        for log in logs:
+            fingerprint = None
+            if log.level == "error":
+                error_type = (log.details or {}).get("error_type") or DEFAULT_LOG_ERROR_TYPE
+                fingerprint = fingerprint_error(error_type, log.message)[0]
+            extras.append({"fingerprint": fingerprint})
+        self.store.append_many(logs, extras)
+        self.generation += 1
+        stored = time.perf_counter()
+        _STORE_STAGE.observe(stored - start)
+        LOGS_WRITTEN.inc(len(logs))
+        for listener in self.listeners:
+            try:
+                listener(logs)
+            except Exception as e:
+                # 监听函数出错不影响日志写入
+                logger.error(f"日志监听处理失败: {str(e)}")
+        _LISTENERS_STAGE.observe(time.perf_counter() - stored)
+    
+    @staticmethod
+    def _equals(**filters: Optional[str]) -> Dict[str, str]:
+        """去掉未指定的筛选条件"""
+        return {column: value for column, value in filters.items() if value}
@@ -1,24 +1,196 @@
-from typing import List, Optional, Dict, Any
+from typing import Callable, Iterator, List, Optional, Dict, Any, Tuple
+import json
+import os
+import re
 import uuid
+import unicodedata
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from app.schemas.knowledge import KnowledgeItem, KnowledgeItemCreate, KnowledgeItemUpdate
+from app.core.metrics import REGISTRY, Sample
+from app.schemas.knowledge import KnowledgeItem, KnowledgeItemCreate, KnowledgeItemUpdate, VectorizationStatus
+from app.services.embedding_service import EmbeddingFunction, HashingEmbedder, embedding_dim
+from app.services.vector_index import VectorIndex
+from app.services.ann_index import IVFIndex, load_index
+from app.services.ingestion_service import IngestionPipeline, IngestionJob, Chunk, chunk_text, embedding_text
+from app.services.lexical_index import InvertedIndex
+from app.utils.text import tokenize
+from app.utils.cache import TTLCache, GenerationCounter
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 支持的搜索模式
+SEARCH_MODES = ("keyword", "semantic", "hybrid")
+
+# 倒数排名融合（RRF）的平滑常数
+RRF_K = 60
+
+# 结果片段的最大长度
+SNIPPET_LENGTH = 200
+
+SEARCH_LATENCY = REGISTRY.histogram(
+    "saas_knowledge_search_duration_seconds", "Knowledge search latency by mode and cache result", ("mode", "cache")
+)
+# 混合检索两路任务在线程池队列中的等待时间
+RETRIEVAL_POOL_WAIT = REGISTRY.histogram(
+    "saas_retrieval_pool_wait_seconds", "Time hybrid retrieval legs wait for a pool thread", ("leg",)
+)
+
+# 条目和分块信息的文件名，与向量索引保存在同一目录
+ITEMS_FILE = "items.json"
+
+# 搜索缓存的版本号作用域：全部条目、公开条目，以及按租户划分的 ("tenant", tenant_id)
+ALL_SCOPE = "all"
+PUBLIC_SCOPE = "public"
+
+def chunk_key(item_id: str, index: int) -> str:
+    """分块在向量索引中的键"""
+    return f"{item_id}#{index}"
+
+def item_id_of(key: str) -> str:
+    """从分块键解析出条目ID"""
+    return key.rpartition("#")[0]
+
+def normalize_query(query: str) -> str:
+    """
+    规范化搜索查询，用作缓存键
+    
+    Args:
+        query: 搜索查询
+        
+    Returns:
+        全角转半角、小写并折叠空白后的查询
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().lower()
+
+def make_snippet(text: str, query: str, length: int = SNIPPET_LENGTH) -> str:
+    """
+    截取分块中最先命中查询词元的一段文本
+    
+    Args:
+        text: 分块文本
+        query: 搜索查询
+        length: 片段最大长度
+        
+    Returns:
+        片段文本
+    """
+    if len(text) <= length:
+        return text
+        
+    lowered = text.lower()
+    positions = [lowered.find(token) for token in tokenize(query)]
+    hit = min((pos for pos in positions if pos >= 0), default=0)
+    start = max(0, min(hit - length // 4, len(text) - length))
+    return text[start:start + length]
+
+def _positive_int_env(name: str) -> Optional[int]:
+    """读取正整数环境变量，未配置时返回None"""
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise ValueError(f"{name} 必须是正整数: {value}")
+    return number
+
 class RAGService:
     """
     RAG 服务类，负责处理知识库相关的业务逻辑
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        embedder: Optional[EmbeddingFunction] = None,
+        vector_index: Optional[VectorIndex] = None,
+        index_dir: Optional[str] = None,
+        ingestion: Optional[IngestionPipeline] = None,
+        search_cache: Optional[TTLCache] = None
+    ):
         """
         初始化 RAG 服务
+        
+        Args:
+            embedder: 嵌入函数，默认使用本地哈希嵌入器
+            vector_index: 向量索引，默认使用与嵌入维度一致的精确索引；
+                大规模语料可传入 IVFIndex 进行近似检索
+            index_dir: 向量索引持久化目录，目录中已有索引时启动即以内存映射方式加载，
+                并恢复条目和分块（关键词索引由分块文本重建，不重新嵌入）
+            ingestion: 分块向量化流水线，默认使用该嵌入函数构建
+            search_cache: 搜索结果缓存，默认容量 10000、有效期 300 秒
         """
         # 在实际实现中，这里需要连接数据库和向量数据库
         # 为了简化，我们使用内存存储
         self.knowledge_items = {}
+        self.embedder = embedder or HashingEmbedder()
+        self.index_dir = index_dir
+        
+        if vector_index is None:
+            if index_dir and os.path.exists(os.path.join(index_dir, "meta.json")):
+                vector_index = load_index(index_dir)
+            else:
+                vector_index = VectorIndex(dim=embedding_dim(self.embedder))
+        self.vector_index = vector_index
+        self.ingestion = ingestion or IngestionPipeline(self.embedder)
+        self.lexical_index = InvertedIndex()
+        # 每个条目当前写入索引的分块
+        self.item_chunks: Dict[str, List[Chunk]] = {}
+        # 后台线程和请求线程共享索引；两个索引各用一把锁，混合检索的两路才能并行
+        self._index_lock = threading.RLock()
+        self._lexical_lock = threading.RLock()
+        self._query_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieval")
+        # 搜索结果缓存，键中包含数据版本号，写入后旧结果不再命中
+        self.search_cache = search_cache if search_cache is not None else TTLCache(maxsize=10000, ttl=300)
+        self.generations = GenerationCounter()
+        # 条目创建、修改或删除后依次通知的监听函数（如同步变更流）
+        self.listeners: List[Callable[[str], None]] = []
+        if index_dir:
+            self._load_items(index_dir)
+    
+    @classmethod
+    def from_env(cls) -> "RAGService":
+        """
+        根据环境变量创建 RAG 服务
+        
+        KNOWLEDGE_INDEX_DIR 为索引持久化目录；配置 KNOWLEDGE_ANN_NLIST（簇数量）时使用 IVF 近似索引，
+        KNOWLEDGE_ANN_NPROBE（检索时探查的簇数量，默认 8）同时作用于从目录加载的 IVF 索引。
+        目录中已保存的索引优先，类型与配置不同时沿用已保存的类型。
+        
+        Raises:
+            ValueError: KNOWLEDGE_ANN_NLIST 或 KNOWLEDGE_ANN_NPROBE 不是正整数
+        """
+        index_dir = os.environ.get("KNOWLEDGE_INDEX_DIR")
+        nlist = _positive_int_env("KNOWLEDGE_ANN_NLIST")
+        nprobe = _positive_int_env("KNOWLEDGE_ANN_NPROBE")
+        
+        embedder = HashingEmbedder()
+        vector_index = None
+        if index_dir and os.path.exists(os.path.join(index_dir, "meta.json")):
+            vector_index = load_index(index_dir)
+            if nlist and not isinstance(vector_index, IVFIndex):
+                logger.warning(f"索引目录中已保存精确索引，忽略 KNOWLEDGE_ANN_NLIST={nlist}")
+        elif nlist:
+            vector_index = IVFIndex(embedding_dim(embedder), nlist=nlist, nprobe=nprobe or 8)
+        if nprobe and isinstance(vector_index, IVFIndex):
+            vector_index.nprobe = nprobe
+        if isinstance(vector_index, IVFIndex):
+            logger.info(f"知识库使用 IVF 近似索引: nlist={vector_index.nlist}, nprobe={vector_index.nprobe}")
+        return cls(embedder=embedder, vector_index=vector_index, index_dir=index_dir)
+    
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        注册知识库条目变更监听函数
+        
+        Args:
+            listener: 参数为发生变化的条目ID
+        """
+        self.listeners.append(listener)
     
     def get_knowledge_items(
         self, 
@@ -73,6 +245,37 @@ class RAGService:
         Returns:
             创建的知识库条目对象
         """
+        item = self._new_item(item_create)
+        # 新条目立即增量写入向量索引
+        self._index_items([item])
+        logger.info(f"创建新知识库条目: {item.id}")
+        return item
+    
+    def create_knowledge_items(self, item_creates: List[KnowledgeItemCreate]) -> List[KnowledgeItem]:
+        """
+        批量创建知识库条目，向量化在后台批量完成，不阻塞调用方
+        
+        Args:
+            item_creates: 知识库条目创建对象列表
+            
+        Returns:
+            创建的知识库条目对象列表（is_vectorized 在后台完成后才会置为True）
+        """
+        items = [self._new_item(item_create) for item_create in item_creates]
+        self.vectorize_items_async([item.id for item in items])
+        logger.info(f"批量创建知识库条目: {len(items)}")
+        return items
+    
+    def _new_item(self, item_create: KnowledgeItemCreate) -> KnowledgeItem:
+        """
+        构建并保存知识库条目（不做向量化）
+        
+        Args:
+            item_create: 知识库条目创建对象
+            
+        Returns:
+            知识库条目对象
+        """
         item_id = str(uuid.uuid4())
         item = KnowledgeItem(
             id=item_id,
@@ -85,7 +288,8 @@ class RAGService:
             updated_at=datetime.now()
         )
         self.knowledge_items[item_id] = item
-        logger.info(f"创建新知识库条目: {item_id}")
+        self._bump_generation(item)
+        self._notify(item_id)
         return item
     
     def update_knowledge_item(self, item_id: str, item_update: KnowledgeItemUpdate) -> Optional[KnowledgeItem]:
@@ -103,6 +307,7 @@ class RAGService:
             return None
             
         item = self.knowledge_items[item_id]
+        was_public = item.is_public
         update_data = item_update.dict(exclude_unset=True)
         
         for field, value in update_data.items():
@@ -110,6 +315,19 @@ class RAGService:
             
         item.updated_at = datetime.now()
         self.knowledge_items[item_id] = item
+        self._bump_generation(item, was_public)
+        self._notify(item_id)
+        
+        # 同步向量索引：文本变化时重新分块，只有变化的分块会重新嵌入；否则只更新过滤元数据
+        if update_data.keys() & {"title", "content", "tags"} or not item.is_vectorized:
+            self._index_items([item])
+        else:
+            with self._index_lock, self._lexical_lock:
+                for chunk in self.item_chunks.get(item_id, []):
+                    key = chunk_key(item_id, chunk.index)
+                    self.vector_index.set_metadata(key, category=item.category, is_public=item.is_public)
+                    self.lexical_index.set_metadata(key, category=item.category, is_public=item.is_public)
+                
         logger.info(f"更新知识库条目: {item_id}")
         return item
     
@@ -126,49 +344,348 @@ class RAGService:
         if item_id not in self.knowledge_items:
             return False
             
-        del self.knowledge_items[item_id]
+        item = self.knowledge_items.pop(item_id)
+        self._bump_generation(item)
+        self._notify(item_id)
+        self.ingestion.forget(item_id)
+        with self._index_lock, self._lexical_lock:
+            for chunk in self.item_chunks.pop(item_id, []):
+                key = chunk_key(item_id, chunk.index)
+                self.vector_index.remove(key)
+                self.lexical_index.remove(key)
         logger.info(f"删除知识库条目: {item_id}")
         return True
     
-    def search_knowledge(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def search_knowledge(
+        self,
+        query: str,
+        limit: int = 10,
+        mode: str = "keyword",
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        time_budget_ms: float = 200
+    ) -> List[Dict[str, Any]]:
         """
         搜索知识库
         
         Args:
             query: 搜索查询
             limit: 返回结果数量限制
+            mode: 搜索模式，keyword 为关键词匹配，semantic 为向量语义检索，
+                hybrid 为关键词与向量混合检索
+            tenant_id: 租户筛选（仅语义/混合检索，返回该租户条目和公开条目）
+            category: 分类筛选（仅语义/混合检索）
+            time_budget_ms: 混合检索的时间预算（毫秒）
             
         Returns:
             搜索结果列表
+            
+        Raises:
+            ValueError: 搜索模式不受支持时抛出
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"不支持的搜索模式: {mode}")
+            
+        start = time.perf_counter()
+        cache_key = self._search_cache_key(query, limit, mode, tenant_id, category)
+        results = self.search_cache.get(cache_key)
+        if results is not None:
+            SEARCH_LATENCY.labels(mode, "hit").observe(time.perf_counter() - start)
+            return results
+            
+        complete = True
+        if mode == "semantic":
+            results = self._semantic_search(query, limit, tenant_id, category)
+        elif mode == "hybrid":
+            results, complete = self._retrieve(query, limit, tenant_id, category, time_budget_ms)
+        else:
+            results = self._keyword_search(query, limit)
+            
+        # 超出时间预算的不完整结果不缓存
+        if complete:
+            self.search_cache.set(cache_key, results)
+        SEARCH_LATENCY.labels(mode, "miss").observe(time.perf_counter() - start)
+        return results
+    
+    def get_search_cache_stats(self) -> Dict[str, Any]:
         """
-        # 在实际实现中，这里会使用向量数据库进行语义搜索
-        # 为了简化，我们使用简单的文本匹配
+        获取搜索缓存统计
         
-        results = []
+        Returns:
+            缓存条目数、命中/未命中次数和命中率等
+        """
+        return self.search_cache.stats()
+    
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        输出搜索缓存和索引规模指标（注册为指标采集回调）
+        
+        Returns:
+            指标样本
+        """
+        stats = self.search_cache.stats()
+        for name in ("hits", "misses", "evictions", "expirations"):
+            yield (f"saas_search_cache_{name}_total", "counter", f"Knowledge search cache {name}", [({}, stats[name])])
+        yield ("saas_search_cache_entries", "gauge", "Knowledge search cache entries", [({}, stats["size"])])
+        yield ("saas_knowledge_items", "gauge", "Knowledge items", [({}, len(self.knowledge_items))])
+    
+    def _search_cache_key(
+        self,
+        query: str,
+        limit: int,
+        mode: str,
+        tenant_id: Optional[str],
+        category: Optional[str]
+    ) -> tuple:
+        """
+        构造搜索缓存键
+        
+        带租户筛选的语义/混合检索只依赖该租户的条目和公开条目，键中带这两个作用域的版本号；
+        其余查询可能命中任意条目，带全局版本号。
+        """
+        if mode != "keyword" and tenant_id is not None:
+            generation = (self.generations.get(("tenant", tenant_id)), self.generations.get(PUBLIC_SCOPE))
+        else:
+            generation = (self.generations.get(ALL_SCOPE),)
+        return (normalize_query(query), tenant_id, mode, limit, category, generation)
+    
+    def _bump_generation(self, item: KnowledgeItem, was_public: bool = False) -> None:
+        """
+        条目写入后递增相关作用域的版本号，使受影响的缓存结果失效
+        
+        Args:
+            item: 被写入的条目
+            was_public: 写入前是否公开（公开状态变化时也要使公开作用域失效）
+        """
+        scopes = [ALL_SCOPE, ("tenant", item.tenant_id)]
+        if item.is_public or was_public:
+            scopes.append(PUBLIC_SCOPE)
+        self.generations.bump(*scopes)
+    
+    def _notify(self, item_id: str) -> None:
+        """通知条目变更监听函数"""
+        for listener in self.listeners:
+            try:
+                listener(item_id)
+            except Exception as e:
+                # 监听函数出错不影响条目写入
+                logger.error(f"知识库条目变更监听处理失败: {str(e)}")
+    
+    def _keyword_search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        关键词匹配搜索
+        
+        Args:
+            query: 搜索查询
+            limit: 返回结果数量限制
+            
+        Returns:
+            分块级搜索结果列表（与语义/混合检索相同），正文命中时为最先命中的分块，否则为第一个分块
+        """
+        needle = query.lower()
+        scored = []
         for item in self.knowledge_items.values():
             # 计算匹配分数（简化实现）
             score = 0
-            if query.lower() in item.title.lower():
+            if needle in item.title.lower():
                 score += 2
-            if query.lower() in item.content.lower():
+            position = item.content.lower().find(needle)
+            if position >= 0:
                 score += 1
-            if any(query.lower() in tag.lower() for tag in item.tags):
+            if any(needle in tag.lower() for tag in item.tags):
                 score += 1
                 
             if score > 0:
-                results.append({
-                    "id": item.id,
-                    "title": item.title,
-                    "content": item.content,
-                    "category": item.category,
-                    "score": score
-                })
+                scored.append((score, item, position))
+        
+        # 按分数排序（稳定排序，同分保持条目顺序）
+        scored.sort(key=lambda x: x[0], reverse=True)
+        
+        results = []
+        for score, item, position in scored[:limit]:
+            # 尚未向量化的条目按默认参数临时分块，只返回片段和偏移
+            chunks = self.item_chunks.get(item.id) or chunk_text(item.content)
+            chunk = next((c for c in chunks if c.start <= position < c.end), chunks[0])
+            results.append({
+                "id": item.id,
+                "title": item.title,
+                "category": item.category,
+                "score": score,
+                "chunk_index": chunk.index,
+                "start": chunk.start,
+                "end": chunk.end,
+                "snippet": make_snippet(chunk.text, query)
+            })
+        return results
+    
+    def _semantic_search(
+        self,
+        query: str,
+        limit: int,
+        tenant_id: Optional[str],
+        category: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        向量语义检索
+        
+        Args:
+            query: 搜索查询
+            limit: 返回结果数量限制
+            tenant_id: 租户筛选
+            category: 分类筛选
+            
+        Returns:
+            分块级搜索结果列表，score 为余弦相似度
+        """
+        hits = self._vector_leg(query, limit * 4, tenant_id, category)
+        return self._collapse_chunks(hits, query, limit)
+    
+    def retrieve(
+        self,
+        query: str,
+        limit: int = 10,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        time_budget_ms: float = 200
+    ) -> List[Dict[str, Any]]:
+        """
+        混合检索：关键词（BM25 倒排索引）和向量两路并行检索，用倒数排名融合（RRF）合并
         
-        # 按分数排序
-        results.sort(key=lambda x: x["score"], reverse=True)
+        每路都受同一个时间预算约束，超时的一路会被取消，只用已完成的一路结果，
+        保证查询延迟有上界。结果只携带命中分块的片段和偏移，不返回完整正文。
         
-        # 限制返回数量
-        return results[:limit]
+        Args:
+            query: 搜索查询
+            limit: 返回结果数量限制
+            tenant_id: 租户筛选（该租户条目和公开条目）
+            category: 分类筛选
+            time_budget_ms: 单次查询的时间预算（毫秒）
+            
+        Returns:
+            分块级搜索结果列表，score 为 RRF 得分，sources 为命中该条目的检索路
+        """
+        results, _ = self._retrieve(query, limit, tenant_id, category, time_budget_ms)
+        return results
+    
+    def _retrieve(
+        self,
+        query: str,
+        limit: int,
+        tenant_id: Optional[str],
+        category: Optional[str],
+        time_budget_ms: float
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        混合检索的实现
+        
+        Returns:
+            (搜索结果列表, 两路是否都在时间预算内完成)
+        """
+        depth = limit * 4
+        cancel_event = threading.Event()
+        submitted = time.perf_counter()
+        legs = {
+            "lexical": self._query_executor.submit(
+                self._run_leg, "lexical", submitted, self._lexical_leg, query, depth, tenant_id, category, cancel_event
+            ),
+            "vector": self._query_executor.submit(
+                self._run_leg, "vector", submitted, self._vector_leg, query, depth, tenant_id, category, cancel_event
+            )
+        }
+        
+        done, not_done = wait(legs.values(), timeout=time_budget_ms / 1000)
+        if not_done:
+            cancel_event.set()
+            for future in not_done:
+                future.cancel()
+            timed_out = [name for name, future in legs.items() if future in not_done]
+            logger.warning(f"混合检索超出时间预算 {time_budget_ms}ms，已取消: {', '.join(timed_out)}")
+        
+        fused: Dict[str, float] = {}
+        sources: Dict[str, List[str]] = {}
+        for name, future in legs.items():
+            if future not in done or future.exception() is not None:
+                continue
+            for rank, (key, _) in enumerate(future.result()):
+                fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+                sources.setdefault(item_id_of(key), []).append(name)
+        
+        hits = sorted(fused.items(), key=lambda x: x[1], reverse=True)
+        results = self._collapse_chunks(hits, query, limit)
+        for result in results:
+            result["sources"] = sorted(set(sources[result["id"]]))
+        return results, not not_done
+    
+    @staticmethod
+    def _run_leg(name: str, submitted: float, leg: Callable, *args: Any) -> List[Tuple[str, float]]:
+        """在线程池中执行一路检索，并记录排队等待时间"""
+        RETRIEVAL_POOL_WAIT.labels(name).observe(time.perf_counter() - submitted)
+        return leg(*args)
+    
+    def _lexical_leg(
+        self,
+        query: str,
+        k: int,
+        tenant_id: Optional[str],
+        category: Optional[str],
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[Tuple[str, float]]:
+        """关键词检索一路，返回分块键和 BM25 得分"""
+        with self._lexical_lock:
+            return self.lexical_index.search(query, k, tenant_id=tenant_id, category=category, cancel_event=cancel_event)
+    
+    def _vector_leg(
+        self,
+        query: str,
+        k: int,
+        tenant_id: Optional[str],
+        category: Optional[str],
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[Tuple[str, float]]:
+        """向量检索一路，返回分块键和余弦相似度"""
+        query_vector = self.embedder([query])[0]
+        if cancel_event is not None and cancel_event.is_set():
+            return []
+        with self._index_lock:
+            return self.vector_index.search(query_vector, k, tenant_id=tenant_id, category=category)
+    
+    def _collapse_chunks(self, hits: List[Tuple[str, float]], query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        把分块命中按条目去重，每个条目只保留得分最高的分块
+        
+        Args:
+            hits: 按得分降序排列的 (分块键, 得分) 列表
+            query: 搜索查询，用于定位片段
+            limit: 返回结果数量限制
+            
+        Returns:
+            分块级搜索结果列表
+        """
+        results = []
+        seen = set()
+        for key, score in hits:
+            if len(results) == limit:
+                break
+            item_id, _, index = key.rpartition("#")
+            item = self.knowledge_items.get(item_id)
+            chunks = self.item_chunks.get(item_id)
+            if item is None or not chunks or item_id in seen or int(index) >= len(chunks):
+                # 持久化索引中可能残留已不存在的条目或分块
+                continue
+            seen.add(item_id)
+            
+            chunk = chunks[int(index)]
+            results.append({
+                "id": item.id,
+                "title": item.title,
+                "category": item.category,
+                "score": score,
+                "chunk_index": chunk.index,
+                "start": chunk.start,
+                "end": chunk.end,
+                "snippet": make_snippet(chunk.text, query)
+            })
+        return results
     
     def vectorize_item(self, item_id: str) -> bool:
         """
@@ -183,14 +700,157 @@ class RAGService:
         if item_id not in self.knowledge_items:
             return False
             
-        item = self.knowledge_items[item_id]
+        self._index_items([self.knowledge_items[item_id]])
+        logger.info(f"知识库条目向量化完成: {item_id}")
+        return True
+    
+    def vectorize_items(self, item_ids: List[str]) -> int:
+        """
+        同步批量向量化知识库条目，所有待嵌入分块合并成批次完成
         
-        # 在实际实现中，这里会调用向量数据库API进行向量化
-        # 为了简化，我们只是设置标记
+        Args:
+            item_ids: 知识库条目ID列表
+            
+        Returns:
+            成功向量化的条目数
+        """
+        items = [self.knowledge_items[item_id] for item_id in item_ids if item_id in self.knowledge_items]
+        if items:
+            self._index_items(items)
+        logger.info(f"批量向量化知识库条目完成: {len(items)}/{len(item_ids)}")
+        return len(items)
+    
+    def vectorize_items_async(self, item_ids: List[str]) -> List[VectorizationStatus]:
+        """
+        把条目提交到后台流水线向量化，立即返回
         
-        item.is_vectorized = True
-        item.updated_at = datetime.now()
-        self.knowledge_items[item_id] = item
+        Args:
+            item_ids: 知识库条目ID列表
+            
+        Returns:
+            已提交条目的初始进度
+        """
+        jobs = [self.ingestion.plan(self.knowledge_items[item_id]) for item_id in item_ids if item_id in self.knowledge_items]
+        self.ingestion.submit(jobs, self._apply_job)
+        logger.info(f"提交后台向量化任务: {len(jobs)}/{len(item_ids)}")
+        return [self.ingestion.get_status(job.item_id) for job in jobs]
+    
+    def get_vectorization_status(self, item_id: str) -> Optional[VectorizationStatus]:
+        """
+        获取条目的向量化进度
         
-        logger.info(f"知识库条目向量化完成: {item_id}")
+        Args:
+            item_id: 知识库条目ID
+            
+        Returns:
+            进度对象，未提交过向量化时返回None
+        """
+        return self.ingestion.get_status(item_id)
+    
+    def save_index(self) -> bool:
+        """
+        把向量索引以及条目和分块信息保存到 index_dir
+        
+        Returns:
+            保存成功返回True，未配置 index_dir 时返回False
+        """
+        if not self.index_dir:
+            return False
+            
+        with self._index_lock:
+            self.vector_index.save(self.index_dir)
+            records = [
+                {
+                    "item": item.dict(),
+                    # 分块正文可由条目正文按偏移截取，只保存偏移和内容摘要
+                    "chunks": [[chunk.index, chunk.start, chunk.end, chunk.content_hash]
+                               for chunk in self.item_chunks.get(item.id, [])]
+                }
+                for item in self.knowledge_items.values()
+            ]
+        path = os.path.join(self.index_dir, ITEMS_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, default=lambda value: value.isoformat())
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"知识库条目已保存: {self.index_dir} ({len(records)} 个条目)")
         return True
+    
+    def _load_items(self, index_dir: str) -> None:
+        """
+        从 index_dir 恢复条目和分块，并由分块文本重建关键词索引
+        
+        Args:
+            index_dir: 索引目录
+        """
+        path = os.path.join(index_dir, ITEMS_FILE)
+        if not os.path.exists(path):
+            return
+            
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        for record in records:
+            item = KnowledgeItem.parse_obj(record["item"])
+            chunks = [
+                Chunk(index, start, end, item.content[start:end], content_hash)
+                for index, start, end, content_hash in record["chunks"]
+            ]
+            self.knowledge_items[item.id] = item
+            if chunks:
+                self.item_chunks[item.id] = chunks
+            for chunk in chunks:
+                self.lexical_index.add(
+                    chunk_key(item.id, chunk.index), embedding_text(item, chunk.text),
+                    item.tenant_id, item.category, item.is_public
+                )
+        logger.info(f"知识库条目已加载: {index_dir} ({len(records)} 个条目)")
+    
+    def _index_items(self, items: List[KnowledgeItem]) -> None:
+        """
+        在当前线程完成分块、嵌入并写入向量索引
+        
+        Args:
+            items: 知识库条目列表
+        """
+        jobs = [self.ingestion.plan(item) for item in items]
+        self.ingestion.run(jobs)
+        for job in jobs:
+            self.ingestion.complete(job, self._apply_job)
+    
+    def _apply_job(self, job: IngestionJob) -> None:
+        """
+        把向量化任务的结果写入向量索引，并移除多余的旧分块
+        
+        Args:
+            job: 已完成嵌入的向量化任务
+        """
+        with self._index_lock:
+            item = self.knowledge_items.get(job.item_id)
+            if item is None or not self.ingestion.is_current(job):
+                # 条目已删除或已有更新的任务，丢弃旧结果
+                return
+                
+            count = len(job.chunks)
+            keys = [chunk_key(item.id, chunk.index) for chunk in job.chunks]
+            self.vector_index.upsert_many(
+                keys,
+                job.vectors,
+                tenant_ids=[item.tenant_id] * count,
+                categories=[item.category] * count,
+                public_flags=[item.is_public] * count
+            )
+            previous = self.item_chunks.get(item.id, [])
+            with self._lexical_lock:
+                for chunk, key, text in zip(job.chunks, keys, job.texts):
+                    # 内容未变的分块不必重新分词
+                    if chunk.index < len(previous) and previous[chunk.index].content_hash == chunk.content_hash:
+                        self.lexical_index.set_metadata(key, item.tenant_id, item.category, item.is_public)
+                    else:
+                        self.lexical_index.add(key, text, item.tenant_id, item.category, item.is_public)
+                for chunk in previous[count:]:
+                    self.vector_index.remove(chunk_key(item.id, chunk.index))
+                    self.lexical_index.remove(chunk_key(item.id, chunk.index))
+            self.item_chunks[item.id] = job.chunks
+            
+            item.is_vectorized = True
+            item.updated_at = datetime.now()
+            self._bump_generation(item)
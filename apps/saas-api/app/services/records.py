@@ -0,0 +1,45 @@
+from typing import Any, Dict, Optional
+from dataclasses import dataclass
+from datetime import datetime
+import sys
+
+# 内存存储使用的紧凑记录类型
+#
+# pydantic 模型每个实例带 __dict__ 和 __fields_set__，创建时还要逐字段校验；存储中的数据在接口层已校验过，
+# 因此服务内部保存为带 __slots__ 的数据类，字段与对应的 pydantic 模型相同，只在接口边界使用 pydantic 模型。
+# FastAPI 按 response_model 直接接受数据类，列表接口由 json_response 直接序列化（orjson 原生支持数据类）。
+
+def interned(value: Optional[str]) -> Optional[str]:
+    """驻留重复出现的字符串（租户ID、模板ID等），相同取值的记录共用一个字符串对象"""
+    return sys.intern(value) if value is not None else None
+
+@dataclass
+class LogRecord:
+    """执行日志，字段同 schemas.log.Log"""
+    __slots__ = (
+        "tenant_id", "template_id", "process_id", "step_id", "user_id", "level", "message", "details",
+        "id", "timestamp"
+    )
+    tenant_id: str
+    template_id: Optional[str]
+    process_id: Optional[str]
+    step_id: Optional[str]
+    user_id: Optional[str]
+    level: str
+    message: str
+    details: Optional[Dict[str, Any]]
+    id: str
+    timestamp: datetime
+
+@dataclass
+class APIKeyRecord:
+    """API 密钥，字段同 schemas.tenant.APIKey"""
+    __slots__ = ("name", "description", "id", "tenant_id", "key_hash", "created_at", "expires_at", "is_active")
+    name: str
+    description: Optional[str]
+    id: str
+    tenant_id: str
+    key_hash: str
+    created_at: datetime
+    expires_at: Optional[datetime]
+    is_active: bool
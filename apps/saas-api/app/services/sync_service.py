@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional, Tuple
+from bisect import bisect_right
+import logging
+import threading
+import uuid
+from app.schemas.sync import SyncChange, SyncChanges
+from app.services.template_service import TemplateService
+from app.services.rag_service import RAGService
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class SyncService:
+    """
+    模板和知识库的增量同步服务（供本地部署的 MCP 服务器拉取）
+
+    每次模板或知识库条目变化时递增全局版本号，变更流只保留每个实体的最新版本。
+    客户端带上次的版本水位拉取之后的变更，拿到的是实体的当前状态（upsert）或删除标记；
+    对客户端不可见的实体（未发布、不公开且不属于该租户）也作为删除下发。
+    """
+
+    def __init__(self, template_service: TemplateService, rag_service: RAGService):
+        """
+        初始化同步服务并订阅模板和知识库的变更
+
+        Args:
+            template_service: 模板服务
+            rag_service: 知识库服务
+        """
+        self.template_service = template_service
+        self.rag_service = rag_service
+        # 服务重启后版本号从头开始，客户端发现 feed_id 变化时全量重新同步
+        self.feed_id = uuid.uuid4().hex[:12]
+        self.version = 0
+        # (类型, 实体ID) -> 最新版本号；删除的实体保留在这里作为删除标记
+        self._latest: Dict[Tuple[str, str], int] = {}
+        # 按版本号递增的变更日志，被后续变更覆盖的条目在压缩时清除
+        self._log_versions: List[int] = []
+        self._log_keys: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+        for template_id in list(template_service.templates):
+            self.record("template", template_id)
+        for item_id in list(rag_service.knowledge_items):
+            self.record("knowledge", item_id)
+        template_service.add_listener(lambda template_id: self.record("template", template_id))
+        rag_service.add_listener(lambda item_id: self.record("knowledge", item_id))
+
+    def record(self, kind: str, entity_id: str) -> int:
+        """
+        记录一次实体变更
+
+        Args:
+            kind: 实体类型
+            entity_id: 实体ID
+
+        Returns:
+            新的版本号
+        """
+        key = (kind, entity_id)
+        with self._lock:
+            self.version += 1
+            self._latest[key] = self.version
+            self._log_versions.append(self.version)
+            self._log_keys.append(key)
+            if len(self._log_keys) > 2 * len(self._latest) + 1024:
+                self._compact()
+            return self.version
+
+    def head_etag(self) -> str:
+        """变更流当前位置的 ETag"""
+        return make_etag(self.feed_id, self.version)
+
+    def get_changes(
+        self,
+        since: int = 0,
+        tenant_id: Optional[str] = None,
+        limit: int = 500,
+        feed_id: Optional[str] = None
+    ) -> SyncChanges:
+        """
+        获取版本水位之后的变更
+
+        Args:
+            since: 客户端已同步到的版本号
+            tenant_id: 客户端所属租户，为None时只同步公开的内容
+            limit: 最多返回的变更数
+            feed_id: 客户端上次同步的变更流ID，与当前不一致时从头同步
+
+        Returns:
+            变更列表；has_more 为True时以返回的 version 继续拉取
+
+        Raises:
+            ValueError: 参数无效
+        """
+        if since < 0:
+            raise ValueError("版本号不能为负数")
+        if limit <= 0:
+            raise ValueError("limit 必须大于0")
+
+        reset = False
+        if (feed_id and feed_id != self.feed_id) or since > self.version:
+            since, reset = 0, True
+
+        with self._lock:
+            position = bisect_right(self._log_versions, since)
+            entries = []
+            has_more = False
+            for index in range(position, len(self._log_keys)):
+                version, key = self._log_versions[index], self._log_keys[index]
+                if self._latest[key] != version:
+                    # 已被更新的变更覆盖
+                    continue
+                if len(entries) >= limit:
+                    has_more = True
+                    break
+                entries.append((version, key))
+            watermark = entries[-1][0] if has_more else self.version
+
+        # 读取实体的当前状态；读取期间的新变更版本号更高，下次同步时会再次下发
+        changes = []
+        for version, (kind, entity_id) in entries:
+            data = self._visible_data(kind, entity_id, tenant_id)
+            if data is not None:
+                changes.append(SyncChange(kind=kind, id=entity_id, op="upsert", version=version, data=data))
+            elif since > 0:
+                # 从头同步的客户端没有旧数据，不需要删除标记
+                changes.append(SyncChange(kind=kind, id=entity_id, op="delete", version=version))
+        return SyncChanges(
+            feed_id=self.feed_id,
+            version=watermark,
+            reset=reset,
+            has_more=has_more,
+            changes=changes
+        )
+
+    def _visible_data(self, kind: str, entity_id: str, tenant_id: Optional[str]) -> Optional[dict]:
+        """客户端可见时返回实体数据，否则返回None"""
+        if kind == "template":
+            template = self.template_service.templates.get(entity_id)
+            if template is None or template.status != "published":
+                return None
+            if not template.is_public and (tenant_id is None or template.tenant_id != tenant_id):
+                return None
+            return template.dict()
+        item = self.rag_service.knowledge_items.get(entity_id)
+        if item is None:
+            return None
+        if not item.is_public and (tenant_id is None or item.tenant_id != tenant_id):
+            return None
+        return item.dict()
+
+    def _compact(self) -> None:
+        """清除被覆盖的变更（调用方持有锁）"""
+        kept = [(version, key) for version, key in zip(self._log_versions, self._log_keys)
+                if self._latest[key] == version]
+        self._log_versions = [version for version, _ in kept]
+        self._log_keys = [key for _, key in kept]
+
+def make_etag(feed_id: str, version: int) -> str:
+    """
+    生成变更流位置的 ETag
+
+    Args:
+        feed_id: 变更流ID
+        version: 版本号
+
+    Returns:
+        带引号的 ETag
+    """
+    return f'"{feed_id}.{version}"'
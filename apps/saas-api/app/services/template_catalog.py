@@ -0,0 +1,346 @@
+from typing import Dict, List, Optional, Set, Tuple
+from bisect import bisect_left, bisect_right, insort
+import base64
+import heapq
+import json
+import logging
+import math
+import threading
+from app.schemas.template import ProcessTemplate
+from app.utils.text import tokenize
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 支持的排序方式；relevance 仅在有搜索关键词时生效
+SORT_OPTIONS = ("usage", "updated", "relevance")
+
+# 各字段命中时的词元权重
+FIELD_WEIGHTS = (("name", 3.0), ("tags", 2.0), ("description", 1.0))
+
+# 最后一个英文词元按前缀扩展的最大词数
+MAX_PREFIX_EXPANSIONS = 50
+
+SortKey = Tuple
+
+class _Entry:
+    """模板在索引中的快照，删除和重建索引时不依赖模板对象的当前状态"""
+    __slots__ = ("category", "status", "tokens", "usage_key", "updated_key")
+
+    def __init__(self, template: ProcessTemplate):
+        self.category = template.category
+        self.status = template.status
+        self.tokens: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS:
+            value = getattr(template, field)
+            text = " ".join(value) if isinstance(value, list) else value
+            for token in set(tokenize(text)):
+                self.tokens[token] = self.tokens.get(token, 0.0) + weight
+
+        updated = -template.updated_at.timestamp()
+        self.usage_key = (-template.usage_count, updated, template.id)
+        self.updated_key = (updated, template.id)
+
+class TemplateCatalog:
+    """
+    流程模板目录索引
+
+    维护分类、状态和词元三类倒排索引，以及按使用次数、更新时间排好序的键列表。
+    筛选只访问对应的 ID 集合，排序列表支持基于游标的稳定分页，
+    分类/状态的分面计数直接由集合交集得到，不需要遍历全部模板。
+    """
+
+    def __init__(self):
+        """
+        初始化目录索引
+        """
+        self._entries: Dict[str, _Entry] = {}
+        self._by_category: Dict[str, Set[str]] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._orders: Dict[str, List[SortKey]] = {"usage": [], "updated": []}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        # 模板服务的写入和后台的使用计数落库可能在不同线程中
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, template: ProcessTemplate) -> None:
+        """
+        添加或重建模板的索引
+
+        Args:
+            template: 流程模板
+        """
+        with self._lock:
+            self.remove(template.id)
+            entry = _Entry(template)
+            self._entries[template.id] = entry
+            self._by_category.setdefault(entry.category, set()).add(template.id)
+            self._by_status.setdefault(entry.status, set()).add(template.id)
+            for token, weight in entry.tokens.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    self._vocabulary_dirty = True
+                postings[template.id] = weight
+            insort(self._orders["usage"], entry.usage_key)
+            insort(self._orders["updated"], entry.updated_key)
+
+    def remove(self, template_id: str) -> bool:
+        """
+        删除模板的索引
+
+        Args:
+            template_id: 流程模板ID
+
+        Returns:
+            删除成功返回True，模板不在索引中返回False
+        """
+        with self._lock:
+            entry = self._entries.pop(template_id, None)
+            if entry is None:
+                return False
+
+            self._discard(self._by_category, entry.category, template_id)
+            self._discard(self._by_status, entry.status, template_id)
+            for token in entry.tokens:
+                postings = self._postings[token]
+                del postings[template_id]
+                if not postings:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+            for name, key in (("usage", entry.usage_key), ("updated", entry.updated_key)):
+                order = self._orders[name]
+                del order[bisect_left(order, key)]
+            return True
+
+    def update_usage(self, template: ProcessTemplate) -> None:
+        """
+        使用次数变化后只更新排序列表，不重建词元索引
+
+        Args:
+            template: 流程模板
+        """
+        with self._lock:
+            entry = self._entries.get(template.id)
+            if entry is None:
+                return
+            order = self._orders["usage"]
+            del order[bisect_left(order, entry.usage_key)]
+            entry.usage_key = (-template.usage_count,) + entry.usage_key[1:]
+            insort(order, entry.usage_key)
+
+    def query(
+        self,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        sort: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> Tuple[List[str], Optional[str], int, Dict[str, Dict[str, int]]]:
+        """
+        查询模板目录
+
+        Args:
+            category: 分类筛选
+            status: 状态筛选（draft、published、archived）
+            search: 搜索关键词，匹配名称、描述和标签，所有词元都需命中
+            sort: 排序方式，默认有关键词时按相关度、否则按使用次数
+            cursor: 上一页返回的游标
+            limit: 返回数量
+
+        Returns:
+            (模板ID列表, 下一页游标, 匹配总数, 分面计数)；分面计数中每个维度
+            不受该维度自身筛选条件的影响，便于前端展示可切换的选项
+        """
+        with self._lock:
+            if sort is None:
+                sort = "relevance" if search else "usage"
+            if sort not in SORT_OPTIONS:
+                raise ValueError(f"不支持的排序方式: {sort}")
+            if sort == "relevance" and not search:
+                sort = "usage"
+
+            scores = self._match(search) if search else None
+            matched = set(scores) if scores is not None else None
+            category_ids = self._by_category.get(category, set()) if category else None
+            status_ids = self._by_status.get(status, set()) if status else None
+
+            facets = {
+                "category": self._facet_counts(self._by_category, matched, status_ids),
+                "status": self._facet_counts(self._by_status, matched, category_ids)
+            }
+
+            candidates = self._intersect(matched, category_ids, status_ids)
+            total = len(candidates) if candidates is not None else len(self._entries)
+            after = self._decode_cursor(cursor, sort) if cursor else None
+
+            if sort == "relevance":
+                keys = (self._sort_key(template_id, sort, scores) for template_id in candidates)
+                if after is not None:
+                    keys = (key for key in keys if key > after)
+                page = heapq.nsmallest(limit + 1, keys)
+            else:
+                page = self._walk(sort, candidates, after, limit + 1)
+
+            next_cursor = None
+            if len(page) > limit:
+                page = page[:limit]
+                next_cursor = self._encode_cursor(sort, page[-1])
+            return [key[-1] for key in page], next_cursor, total, facets
+
+    def _match(self, search: str) -> Dict[str, float]:
+        """
+        计算命中全部查询词元的模板及其相关度得分
+
+        最后一个英文词元同时按前缀匹配，支持输入过程中的即时搜索。
+        """
+        tokens = list(dict.fromkeys(tokenize(search)))
+        # 命中双字词元必然命中其中的单字，查询中有双字时单字不再单独求交
+        bigram_chars = {char for token in tokens if len(token) == 2 and not token.isascii() for char in token}
+        tokens = [token for token in tokens if token.isascii() or len(token) > 1 or token not in bigram_chars]
+        if not tokens:
+            return {}
+
+        doc_count = len(self._entries)
+        scores: Optional[Dict[str, float]] = None
+        for position, token in enumerate(tokens):
+            variants = [token]
+            if position == len(tokens) - 1 and token.isascii():
+                variants = self._expand_prefix(token)
+
+            token_scores: Dict[str, float] = {}
+            if variants == [token]:
+                postings = self._postings.get(token, {})
+                idf = math.log(1 + doc_count / max(1, len(postings)))
+                token_scores = {template_id: weight * idf for template_id, weight in postings.items()}
+                variants = []
+            for variant in variants:
+                postings = self._postings.get(variant)
+                if not postings:
+                    continue
+                idf = math.log(1 + doc_count / len(postings))
+                # 精确命中的得分高于前缀命中
+                boost = 1.0 if variant == token else 0.5
+                for template_id, weight in postings.items():
+                    score = weight * idf * boost
+                    if score > token_scores.get(template_id, 0.0):
+                        token_scores[template_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    template_id: score + token_scores[template_id]
+                    for template_id, score in scores.items()
+                    if template_id in token_scores
+                }
+            if not scores:
+                return {}
+        return scores
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """返回以 prefix 开头的词元（含 prefix 本身）"""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+
+        start = bisect_left(self._vocabulary, prefix)
+        variants = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            variants.append(term)
+        return variants
+
+    def _walk(
+        self,
+        sort: str,
+        candidates: Optional[Set[str]],
+        after: Optional[SortKey],
+        count: int
+    ) -> List[SortKey]:
+        """从游标位置开始按排序列表取出满足筛选条件的键"""
+        order = self._orders[sort]
+        start = bisect_right(order, after) if after is not None else 0
+        if candidates is None:
+            return order[start:start + count]
+
+        # 候选集合远小于全部模板时，直接对候选排序比顺序扫描更快
+        if len(candidates) * 8 < len(order) - start:
+            keys = sorted(self._sort_key(template_id, sort) for template_id in candidates)
+            start = bisect_right(keys, after) if after is not None else 0
+            return keys[start:start + count]
+
+        page = []
+        for key in order[start:]:
+            if key[-1] in candidates:
+                page.append(key)
+                if len(page) == count:
+                    break
+        return page
+
+    def _sort_key(self, template_id: str, sort: str, scores: Optional[Dict[str, float]] = None) -> SortKey:
+        """模板在指定排序方式下的排序键，最后一个元素总是模板ID"""
+        entry = self._entries[template_id]
+        if sort == "relevance":
+            return (-scores[template_id],) + entry.usage_key
+        return entry.usage_key if sort == "usage" else entry.updated_key
+
+    @staticmethod
+    def _intersect(*sets: Optional[Set[str]]) -> Optional[Set[str]]:
+        """求多个集合的交集，None 表示不限制；全部为 None 时返回None"""
+        present = sorted((s for s in sets if s is not None), key=len)
+        if not present:
+            return None
+        result = set(present[0])
+        for other in present[1:]:
+            result &= other
+        return result
+
+    def _facet_counts(
+        self,
+        index: Dict[str, Set[str]],
+        *filters: Optional[Set[str]]
+    ) -> Dict[str, int]:
+        """统计某个维度下各取值在其他筛选条件下的模板数"""
+        base = self._intersect(*filters)
+        counts = {}
+        for value, ids in index.items():
+            count = len(ids) if base is None else len(ids & base)
+            if count:
+                counts[value] = count
+        return counts
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], value: str, template_id: str) -> None:
+        """从分类/状态索引中移除模板，集合为空时删除该取值"""
+        ids = index.get(value)
+        if ids is not None:
+            ids.discard(template_id)
+            if not ids:
+                del index[value]
+
+    @staticmethod
+    def _encode_cursor(sort: str, key: SortKey) -> str:
+        """把排序方式和最后一条的排序键编码为不透明游标"""
+        payload = json.dumps([sort, list(key)], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: str) -> SortKey:
+        """解析游标，游标与排序方式不符或格式错误时抛出 ValueError"""
+        try:
+            cursor_sort, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except (ValueError, TypeError):
+            raise ValueError("无效的分页游标")
+        if cursor_sort != sort:
+            raise ValueError("分页游标与排序方式不匹配")
+        if not isinstance(key, list) or not key or not isinstance(key[-1], str) \
+                or not all(isinstance(part, (int, float)) for part in key[:-1]):
+            raise ValueError("无效的分页游标")
+        return tuple(key)
@@ -1,8 +1,17 @@
-from typing import List, Optional, Dict, Any
+from typing import Callable, Iterator, List, Optional, Dict, Any
 import uuid
 import logging
+from collections import Counter
 from datetime import datetime
-from app.schemas.template import ProcessTemplate, ProcessTemplateCreate, ProcessTemplateUpdate
+from app.core.metrics import Sample
+from app.schemas.template import (
+    ProcessTemplate, ProcessTemplateCreate, ProcessTemplateUpdate, TemplatePage,
+    TemplateVersion, TemplateVersionDetail, DSLChange
+)
+from app.services.template_catalog import TemplateCatalog
+from app.services.template_store import DSLObjectStore
+from app.services.usage_tracker import UsageTracker
+from app.services.dsl_compiler import DSLCompiler, ExecutionPlan
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -19,6 +28,29 @@ class TemplateService:
         # 在实际实现中，这里需要连接数据库
         # 为了简化，我们使用内存存储
         self.templates = {}
+        # 分类、状态、词元索引和排序列表
+        self.catalog = TemplateCatalog()
+        # 发布时编译 DSL，已发布模板的执行计划按模板ID保存
+        self.compiler = DSLCompiler()
+        self.plans: Dict[str, ExecutionPlan] = {}
+        # DSL 按内容寻址存储，各版本和克隆共享相同的子树
+        self.store = DSLObjectStore()
+        self.versions: Dict[str, List[TemplateVersion]] = {}
+        # 使用计数在内存中分片累计，定期批量写回 usage_count
+        self.usage = UsageTracker(on_flush=self.apply_usage)
+        # 模板创建、修改、发布状态变化或删除后依次通知的监听函数（如同步变更流）
+        self.listeners: List[Callable[[str], None]] = []
+        # 模板数据版本号，每次变更递增（响应缓存据此计算 ETag）；使用计数的定期写回不递增
+        self.generation = 0
+    
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        注册模板变更监听函数
+        
+        Args:
+            listener: 参数为发生变化的模板ID
+        """
+        self.listeners.append(listener)
     
     def get_templates(
         self, 
@@ -37,19 +69,51 @@ class TemplateService:
             search: 搜索关键词
             
         Returns:
-            流程模板列表
+            流程模板列表，有搜索关键词时按相关度排序，否则按使用次数排序
+        """
+        template_ids, _, _, _ = self.catalog.query(category=category, search=search, limit=skip + limit)
+        return [self.templates[template_id] for template_id in template_ids[skip:]]
+    
+    def search_templates(
+        self,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        sort: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> TemplatePage:
         """
-        templates = list(self.templates.values())
+        浏览模板目录（游标分页并返回分面计数）
         
-        # 应用筛选条件
-        if category:
-            templates = [template for template in templates if template.category == category]
+        Args:
+            category: 分类筛选
+            status: 状态筛选
+            search: 搜索关键词
+            sort: 排序方式（usage、updated、relevance）
+            cursor: 上一页返回的游标
+            limit: 每页数量
             
-        if search:
-            templates = [template for template in templates if search.lower() in template.name.lower() or search.lower() in template.description.lower()]
+        Returns:
+            模板分页结果
             
-        # 应用分页
-        return templates[skip:skip+limit]
+        Raises:
+            ValueError: 排序方式或游标无效
+        """
+        template_ids, next_cursor, total, facets = self.catalog.query(
+            category=category,
+            status=status,
+            search=search,
+            sort=sort,
+            cursor=cursor,
+            limit=limit
+        )
+        return TemplatePage(
+            items=[self.templates[template_id] for template_id in template_ids],
+            total=total,
+            next_cursor=next_cursor,
+            facets=facets
+        )
     
     def get_template_by_id(self, template_id: str) -> Optional[ProcessTemplate]:
         """
@@ -86,7 +150,10 @@ class TemplateService:
             created_at=datetime.now(),
             updated_at=datetime.now()
         )
+        self._record_version(template, self.store.put(template.dsl))
         self.templates[template_id] = template
+        self.catalog.add(template)
+        self._notify(template_id)
         logger.info(f"创建新流程模板: {template_id}")
         return template
     
@@ -107,11 +174,38 @@ class TemplateService:
         template = self.templates[template_id]
         update_data = template_update.dict(exclude_unset=True)
         
+        # DSL 或版本号变化时生成新的不可变版本，内容相同的 DSL 不重复存储
+        # DSL 由存储按哈希共享，不直接赋值到模板上
+        digest = None
+        new_dsl = update_data.pop("dsl", None)
+        if new_dsl is not None or update_data.get("version") is not None:
+            dsl = new_dsl or template.dsl
+            version = update_data.get("version") or template.version
+            digest = self.store.put(dsl)
+            if digest == template.dsl_hash and version == template.version:
+                self.store.release(digest)
+                digest = None
+        
+        # 已发布的模板先编译，无效的 DSL 不会覆盖当前版本
+        plan = None
+        if digest is not None and template.status == "published":
+            try:
+                plan = self.compiler.compile(template_id, version, dsl, dsl_hash=digest)
+            except ValueError:
+                self.store.release(digest)
+                raise
+        
         for field, value in update_data.items():
             setattr(template, field, value)
             
+        if digest is not None:
+            self._record_version(template, digest)
+        if plan is not None:
+            self.plans[template_id] = plan
         template.updated_at = datetime.now()
         self.templates[template_id] = template
+        self.catalog.add(template)
+        self._notify(template_id)
         logger.info(f"更新流程模板: {template_id}")
         return template
     
@@ -129,6 +223,13 @@ class TemplateService:
             return False
             
         del self.templates[template_id]
+        self.catalog.remove(template_id)
+        self.plans.pop(template_id, None)
+        self.compiler.evict(template_id)
+        for version in self.versions.pop(template_id, []):
+            self.store.release(version.dsl_hash)
+        self.usage.forget(template_id)
+        self._notify(template_id)
         logger.info(f"删除流程模板: {template_id}")
         return True
     
@@ -141,14 +242,25 @@ class TemplateService:
             
         Returns:
             发布成功返回True，否则返回False
+            
+        Raises:
+            ValueError: DSL 无效
         """
         if template_id not in self.templates:
             return False
             
         template = self.templates[template_id]
+        self.plans[template_id] = self.compiler.compile(
+            template_id,
+            template.version,
+            template.dsl,
+            dsl_hash=template.dsl_hash
+        )
         template.status = "published"
         template.updated_at = datetime.now()
         self.templates[template_id] = template
+        self.catalog.add(template)
+        self._notify(template_id)
         logger.info(f"发布流程模板: {template_id}")
         return True
     
@@ -167,7 +279,219 @@ class TemplateService:
             
         template = self.templates[template_id]
         template.status = "draft"
+        self.plans.pop(template_id, None)
         template.updated_at = datetime.now()
         self.templates[template_id] = template
+        self.catalog.add(template)
+        self._notify(template_id)
         logger.info(f"取消发布流程模板: {template_id}")
         return True
+    
+    def get_execution_plan(self, template_id: str) -> Optional[ExecutionPlan]:
+        """
+        获取已发布模板的执行计划
+        
+        Args:
+            template_id: 流程模板ID
+            
+        Returns:
+            执行计划，模板未发布时返回None
+        """
+        return self.plans.get(template_id)
+    
+    def record_usage(
+        self,
+        template_id: str,
+        tenant_id: Optional[str] = None,
+        duration: Optional[float] = None
+    ) -> bool:
+        """
+        记录一次模板使用（流程执行启动时调用）
+        
+        Args:
+            template_id: 流程模板ID
+            tenant_id: 使用方租户ID
+            duration: 执行耗时（秒）
+            
+        Returns:
+            记录成功返回True，模板不存在返回False
+        """
+        if template_id not in self.templates:
+            return False
+            
+        self.usage.record(template_id, tenant_id, duration)
+        return True
+    
+    def record_duration(self, template_id: str, tenant_id: Optional[str], duration: float) -> None:
+        """
+        记录一次已结束执行的耗时（流程执行完成或失败时调用），计入平均耗时但不增加使用次数
+        
+        Args:
+            template_id: 流程模板ID
+            tenant_id: 使用方租户ID
+            duration: 执行耗时（秒）
+        """
+        self.usage.record_duration(template_id, tenant_id, duration)
+    
+    def apply_usage(self, deltas: Dict[str, int]) -> None:
+        """
+        批量写回使用次数增量（由使用计数器定期回调）
+        
+        Args:
+            deltas: {模板ID: 增量}
+        """
+        for template_id, delta in deltas.items():
+            template = self.templates.get(template_id)
+            if not template:
+                continue
+            template.usage_count += delta
+            self.catalog.update_usage(template)
+        logger.info(f"写回模板使用计数: {len(deltas)} 个模板")
+    
+    def clone_template(
+        self,
+        template_id: str,
+        tenant_id: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Optional[ProcessTemplate]:
+        """
+        克隆流程模板，克隆与源模板共享同一份 DSL 存储
+        
+        Args:
+            template_id: 源流程模板ID
+            tenant_id: 克隆所属租户
+            name: 克隆的名称，默认与源模板相同
+            
+        Returns:
+            克隆的流程模板对象（草稿、私有），如果源模板未找到则返回None
+        """
+        source = self.templates.get(template_id)
+        if not source:
+            return None
+            
+        clone_id = str(uuid.uuid4())
+        clone = ProcessTemplate(
+            id=clone_id,
+            name=name or source.name,
+            description=source.description,
+            category=source.category,
+            dsl=self.store.shared(source.dsl_hash),
+            version=source.version,
+            is_public=False,
+            tags=list(source.tags),
+            tenant_id=tenant_id,
+            created_at=datetime.now(),
+            updated_at=datetime.now()
+        )
+        self.store.retain(source.dsl_hash)
+        self._record_version(clone, source.dsl_hash)
+        self.templates[clone_id] = clone
+        self.catalog.add(clone)
+        self._notify(clone_id)
+        logger.info(f"克隆流程模板: {template_id} -> {clone_id}")
+        return clone
+    
+    def get_template_versions(self, template_id: str) -> Optional[List[TemplateVersion]]:
+        """
+        获取流程模板的版本历史
+        
+        Args:
+            template_id: 流程模板ID
+            
+        Returns:
+            按版本序号升序排列的版本列表，如果模板未找到则返回None
+        """
+        if template_id not in self.templates:
+            return None
+        return list(self.versions.get(template_id, []))
+    
+    def get_template_version(self, template_id: str, number: int) -> Optional[TemplateVersionDetail]:
+        """
+        获取流程模板某个版本的 DSL
+        
+        Args:
+            template_id: 流程模板ID
+            number: 版本序号（从 1 开始）
+            
+        Returns:
+            版本详情，如果模板或版本未找到则返回None
+        """
+        version = self._get_version(template_id, number)
+        if not version:
+            return None
+        return TemplateVersionDetail(**version.dict(), dsl=self.store.get(version.dsl_hash))
+    
+    def diff_template_versions(
+        self,
+        template_id: str,
+        from_number: int,
+        to_number: int
+    ) -> Optional[List[DSLChange]]:
+        """
+        比较流程模板两个版本的 DSL 结构差异
+        
+        Args:
+            template_id: 流程模板ID
+            from_number: 旧版本序号
+            to_number: 新版本序号
+            
+        Returns:
+            变更列表（路径为 JSON Pointer），如果模板或版本未找到则返回None
+        """
+        old = self._get_version(template_id, from_number)
+        new = self._get_version(template_id, to_number)
+        if not old or not new:
+            return None
+        return [DSLChange(**change) for change in self.store.diff(old.dsl_hash, new.dsl_hash)]
+    
+    def collect_metrics(self) -> Iterator[Sample]:
+        """
+        输出执行计划缓存和模板数指标（注册为指标采集回调）
+        
+        Returns:
+            指标样本
+        """
+        yield ("saas_plan_cache_hits_total", "counter", "Execution plan cache hits", [({}, self.compiler.hits)])
+        yield ("saas_plan_cache_misses_total", "counter", "Execution plan cache misses", [({}, self.compiler.misses)])
+        yield ("saas_templates", "gauge", "Process templates by status", [
+            ({"status": status}, count)
+            for status, count in sorted(Counter(t.status for t in list(self.templates.values())).items())
+        ])
+    
+    def _notify(self, template_id: str) -> None:
+        """递增数据版本号并通知模板变更监听函数"""
+        self.generation += 1
+        for listener in self.listeners:
+            try:
+                listener(template_id)
+            except Exception as e:
+                # 监听函数出错不影响模板写入
+                logger.error(f"模板变更监听处理失败: {str(e)}")
+    
+    def _get_version(self, template_id: str, number: int) -> Optional[TemplateVersion]:
+        """按序号获取版本记录"""
+        versions = self.versions.get(template_id, [])
+        if 1 <= number <= len(versions):
+            return versions[number - 1]
+        return None
+    
+    def _record_version(self, template: ProcessTemplate, digest: str) -> None:
+        """
+        追加一个不可变版本并指向 DSL 根哈希（调用方已为该版本持有一次引用），
+        模板的 dsl 改为存储中按哈希共享的一份，不再各自持有副本
+        
+        Args:
+            template: 流程模板
+            digest: DSL 根哈希
+        """
+        versions = self.versions.setdefault(template.id, [])
+        versions.append(TemplateVersion(
+            template_id=template.id,
+            number=len(versions) + 1,
+            version=template.version,
+            dsl_hash=digest,
+            created_at=datetime.now()
+        ))
+        template.dsl_hash = digest
+        template.dsl = self.store.shared(digest)
+        template.revision = len(versions)
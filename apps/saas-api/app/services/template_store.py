@@ -0,0 +1,251 @@
+from typing import Any, Dict, List, Tuple
+import hashlib
+import json
+import logging
+import threading
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 节点类型：对象、数组
+_DICT = "d"
+_LIST = "l"
+
+class DSLObjectStore:
+    """
+    内容寻址的 DSL 存储（Merkle DAG）
+
+    每个对象/数组节点按规范化内容计算 sha256，子节点以哈希引用，标量直接内联。
+    相同的子树在不同版本、不同租户之间只存一份；两个版本的差异只需沿哈希不同的
+    路径向下比较。节点带引用计数，版本删除后不再被引用的节点随之回收。
+    """
+
+    def __init__(self):
+        """
+        初始化存储
+        """
+        # 哈希 -> (节点类型, 条目)；对象条目为 (键, 是否引用, 值)，数组条目为 (是否引用, 值)
+        self._objects: Dict[str, Tuple[str, tuple]] = {}
+        self._refcounts: Dict[str, int] = {}
+        # 根哈希 -> 共享的完整 DSL，引用同一内容的模板共用一份
+        self._shared: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._objects
+
+    def put(self, value: Dict[str, Any]) -> str:
+        """
+        写入 DSL 并增加根节点的引用计数
+
+        Args:
+            value: DSL（JSON 对象或数组）
+
+        Returns:
+            根节点哈希
+
+        Raises:
+            ValueError: DSL 不是对象或数组
+        """
+        if not isinstance(value, (dict, list)):
+            raise ValueError("DSL 必须是 JSON 对象或数组")
+
+        with self._lock:
+            digest = self._put(value)
+            self._refcounts[digest] += 1
+            return digest
+
+    def retain(self, digest: str) -> None:
+        """
+        增加根节点的引用计数（新版本或克隆引用已有内容时调用）
+
+        Args:
+            digest: 根节点哈希
+        """
+        with self._lock:
+            if digest not in self._objects:
+                raise ValueError(f"DSL 对象不存在: {digest}")
+            self._refcounts[digest] += 1
+
+    def release(self, digest: str) -> None:
+        """
+        减少根节点的引用计数，计数归零时递归回收不再被引用的节点
+
+        Args:
+            digest: 根节点哈希
+        """
+        with self._lock:
+            pending = [digest]
+            while pending:
+                current = pending.pop()
+                count = self._refcounts.get(current)
+                if count is None:
+                    continue
+                if count > 1:
+                    self._refcounts[current] = count - 1
+                    continue
+
+                del self._refcounts[current]
+                self._shared.pop(current, None)
+                _, entries = self._objects.pop(current)
+                pending.extend(child for child in self._children(entries))
+
+    def get(self, digest: str) -> Any:
+        """
+        读取完整的 DSL（返回新构建的对象，调用方可以自由修改）
+
+        Args:
+            digest: 根节点哈希
+
+        Returns:
+            DSL
+        """
+        with self._lock:
+            return self._get(digest)
+
+    def shared(self, digest: str) -> Any:
+        """
+        读取完整的 DSL，同一根哈希每次返回同一个对象（调用方不得修改）
+
+        Args:
+            digest: 根节点哈希
+
+        Returns:
+            DSL
+        """
+        with self._lock:
+            value = self._shared.get(digest)
+            if value is None:
+                value = self._shared[digest] = self._get(digest)
+            return value
+
+    def diff(self, old: str, new: str, path: str = "") -> List[Dict[str, Any]]:
+        """
+        比较两个版本的结构差异，哈希相同的子树直接跳过
+
+        Args:
+            old: 旧版本根节点哈希
+            new: 新版本根节点哈希
+            path: 当前节点的 JSON Pointer 路径（根节点为空字符串）
+
+        Returns:
+            变更列表，每项包含 op（add、remove、replace）、path、old_value、new_value
+        """
+        with self._lock:
+            return self._diff(old, new, path)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取存储统计
+
+        Returns:
+            节点数和规范化编码的总字节数
+        """
+        with self._lock:
+            return {
+                "objects": len(self._objects),
+                "bytes": sum(len(self._encode(kind, entries)) for kind, entries in self._objects.values())
+            }
+
+    def _diff(self, old: str, new: str, path: str) -> List[Dict[str, Any]]:
+        """比较两个节点，只递归进入哈希不同的子节点"""
+        if old == new:
+            return []
+
+        old_kind, old_entries = self._objects[old]
+        new_kind, new_entries = self._objects[new]
+        if old_kind != new_kind:
+            return [self._change("replace", path, self._get(old), self._get(new))]
+
+        if old_kind == _DICT:
+            old_items = {key: (is_ref, value) for key, is_ref, value in old_entries}
+            new_items = {key: (is_ref, value) for key, is_ref, value in new_entries}
+            keys = [key for key, _, _ in old_entries]
+            keys += [key for key, _, _ in new_entries if key not in old_items]
+        else:
+            old_items = dict(enumerate(old_entries))
+            new_items = dict(enumerate(new_entries))
+            keys = list(range(max(len(old_entries), len(new_entries))))
+
+        changes = []
+        for key in keys:
+            child_path = f"{path}/{self._escape(key)}"
+            before = old_items.get(key)
+            after = new_items.get(key)
+            # 1 与 True、1 与 1.0 相等但不是同一个值
+            if before == after and type(before[1]) is type(after[1]):
+                continue
+            if after is None:
+                changes.append(self._change("remove", child_path, self._value(before), None))
+            elif before is None:
+                changes.append(self._change("add", child_path, None, self._value(after)))
+            elif before[0] and after[0]:
+                changes.extend(self._diff(before[1], after[1], child_path))
+            else:
+                changes.append(self._change("replace", child_path, self._value(before), self._value(after)))
+        return changes
+
+    def _put(self, value: Any) -> str:
+        """递归写入节点，返回哈希；新节点对子节点的引用计入子节点的引用计数"""
+        if isinstance(value, dict):
+            kind = _DICT
+            entries = tuple(
+                (key,) + self._entry(value[key])
+                for key in sorted(value)
+            )
+        else:
+            kind = _LIST
+            entries = tuple(self._entry(item) for item in value)
+
+        digest = hashlib.sha256(self._encode(kind, entries)).hexdigest()
+        if digest not in self._objects:
+            self._objects[digest] = (kind, entries)
+            self._refcounts[digest] = 0
+            for child in self._children(entries):
+                self._refcounts[child] += 1
+        return digest
+
+    def _get(self, digest: str) -> Any:
+        kind, entries = self._objects[digest]
+        if kind == _DICT:
+            return {key: self._get(value) if is_ref else value for key, is_ref, value in entries}
+        return [self._get(value) if is_ref else value for is_ref, value in entries]
+
+    def _entry(self, value: Any) -> Tuple[bool, Any]:
+        """对象/数组写入为子节点引用，标量直接内联"""
+        if isinstance(value, (dict, list)):
+            return True, self._put(value)
+        return False, value
+
+    def _value(self, entry: Tuple[bool, Any]) -> Any:
+        is_ref, value = entry
+        return self._get(value) if is_ref else value
+
+    @staticmethod
+    def _children(entries: tuple):
+        """节点条目中引用的子节点哈希"""
+        for entry in entries:
+            if entry[-2]:
+                yield entry[-1]
+
+    @staticmethod
+    def _encode(kind: str, entries: tuple) -> bytes:
+        """节点的规范化编码，用于计算哈希"""
+        return json.dumps(
+            [kind, entries],
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str
+        ).encode("utf-8")
+
+    @staticmethod
+    def _escape(key: Any) -> str:
+        """JSON Pointer 路径转义"""
+        return str(key).replace("~", "~0").replace("/", "~1")
+
+    @staticmethod
+    def _change(op: str, path: str, old_value: Any, new_value: Any) -> Dict[str, Any]:
+        return {"op": op, "path": path, "old_value": old_value, "new_value": new_value}
@@ -4,7 +4,8 @@ import logging
 import hashlib
 import secrets
 from datetime import datetime, timedelta
-from app.schemas.tenant import Tenant, TenantCreate, TenantUpdate, APIKey
+from app.schemas.tenant import Tenant, TenantCreate, TenantUpdate
+from app.services.records import APIKeyRecord, interned
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -21,7 +22,8 @@ class TenantService:
         # 在实际实现中，这里需要连接数据库
         # 为了简化，我们使用内存存储
         self.tenants = {}
-        self.api_keys = {}
+        # API 密钥以紧凑记录保存
+        self.api_keys: Dict[str, APIKeyRecord] = {}
     
     def get_tenants(
         self, 
@@ -132,7 +134,7 @@ class TenantService:
         logger.info(f"删除租户: {tenant_id}")
         return True
     
-    def create_api_key(self, tenant_id: str, key: str) -> APIKey:
+    def create_api_key(self, tenant_id: str, key: str) -> APIKeyRecord:
         """
         为租户创建API密钥
         
@@ -147,20 +149,22 @@ class TenantService:
         # 对密钥进行哈希处理存储
         key_hash = hashlib.sha256(key.encode()).hexdigest()
         
-        api_key = APIKey(
+        now = datetime.now()
+        api_key = APIKeyRecord(
+            name=f"API Key {key_id[:8]}",
+            description=None,
             id=key_id,
-            tenant_id=tenant_id,
+            tenant_id=interned(tenant_id),
             key_hash=key_hash,
-            name=f"API Key {key_id[:8]}",
-            created_at=datetime.now(),
-            expires_at=datetime.now() + timedelta(days=365),  # 默认有效期1年
+            created_at=now,
+            expires_at=now + timedelta(days=365),  # 默认有效期1年
             is_active=True
         )
         self.api_keys[key_id] = api_key
         logger.info(f"为租户创建API密钥: {tenant_id}")
         return api_key
     
-    def get_api_keys_for_tenant(self, tenant_id: str) -> List[APIKey]:
+    def get_api_keys_for_tenant(self, tenant_id: str) -> List[APIKeyRecord]:
         """
         获取租户的API密钥列表
         
@@ -193,7 +197,7 @@ class TenantService:
         logger.info(f"撤销租户的API密钥: {tenant_id} - {key_id}")
         return True
     
-    def verify_api_key(self, key: str) -> Optional[APIKey]:
+    def verify_api_key(self, key: str) -> Optional[APIKeyRecord]:
         """
         验证API密钥
         
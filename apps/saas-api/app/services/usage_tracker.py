@@ -0,0 +1,248 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import logging
+import threading
+import time
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+UsageKey = Tuple[str, Optional[str]]
+
+class UsageCounter:
+    """单个 (模板, 租户) 的累计使用数据和滑动窗口计数"""
+    __slots__ = ("count", "pending", "last_used", "duration_sum", "duration_count", "buckets", "epochs")
+
+    def __init__(self, window_buckets: int):
+        self.count = 0
+        self.pending = 0
+        self.last_used: Optional[datetime] = None
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        # 环形时间桶：epochs[i] 记录槽位 i 当前对应的时间桶编号
+        self.buckets = [0] * window_buckets
+        self.epochs = [-1] * window_buckets
+
+class _Shard:
+    """计数分片，每个分片一把锁，不同模板的并发写入分散到不同的锁上"""
+    __slots__ = ("lock", "counters")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[UsageKey, UsageCounter] = {}
+
+class UsageTracker:
+    """
+    模板使用计数器
+
+    按 (模板, 租户) 分片计数，每次执行启动只在一个分片锁内做常数次整数运算。
+    未落库的增量由后台线程定期合并为每个模板一条，批量回调 on_flush 写入模板服务；
+    同时用环形时间桶维护最近 window_seconds 秒内的使用速率。
+    """
+
+    def __init__(
+        self,
+        shards: int = 16,
+        window_seconds: int = 300,
+        bucket_seconds: int = 10,
+        flush_interval: float = 5.0,
+        on_flush: Optional[Callable[[Dict[str, int]], None]] = None
+    ):
+        """
+        初始化使用计数器
+
+        Args:
+            shards: 分片数
+            window_seconds: 滑动窗口长度（秒）
+            bucket_seconds: 时间桶宽度（秒）
+            flush_interval: 后台落库间隔（秒）
+            on_flush: 落库回调，参数为 {模板ID: 增量}
+        """
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = max(1, window_seconds // bucket_seconds)
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._shards = [_Shard() for _ in range(shards)]
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        template_id: str,
+        tenant_id: Optional[str] = None,
+        duration: Optional[float] = None,
+        now: Optional[float] = None
+    ) -> None:
+        """
+        记录一次模板使用
+
+        Args:
+            template_id: 模板ID
+            tenant_id: 租户ID
+            duration: 执行耗时（秒），未知时为None
+            now: 当前时间戳（秒），默认取系统时间
+        """
+        now = time.time() if now is None else now
+        key = (template_id, tenant_id)
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % self.window_buckets
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            counter = shard.counters.get(key)
+            if counter is None:
+                counter = shard.counters[key] = UsageCounter(self.window_buckets)
+            counter.count += 1
+            counter.pending += 1
+            counter.last_used = datetime.fromtimestamp(now)
+            if duration is not None:
+                counter.duration_sum += duration
+                counter.duration_count += 1
+            if counter.epochs[slot] != epoch:
+                counter.epochs[slot] = epoch
+                counter.buckets[slot] = 0
+            counter.buckets[slot] += 1
+
+    def record_duration(self, template_id: str, tenant_id: Optional[str], duration: float) -> None:
+        """
+        记录一次已结束执行的耗时，不增加使用次数（使用次数在执行启动时已记录）
+
+        Args:
+            template_id: 模板ID
+            tenant_id: 租户ID
+            duration: 执行耗时（秒）
+        """
+        key = (template_id, tenant_id)
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            counter = shard.counters.get(key)
+            # 没有启动记录的执行（如模板已删除）不计入
+            if counter is not None:
+                counter.duration_sum += duration
+                counter.duration_count += 1
+
+    def flush(self) -> Dict[str, int]:
+        """
+        取出所有未落库的增量并按模板合并，交给 on_flush 批量写入
+
+        Returns:
+            {模板ID: 增量}
+        """
+        with self._flush_lock:
+            deltas: Dict[str, int] = {}
+            for shard in self._shards:
+                with shard.lock:
+                    for (template_id, _), counter in shard.counters.items():
+                        if counter.pending:
+                            deltas[template_id] = deltas.get(template_id, 0) + counter.pending
+                            counter.pending = 0
+
+            if deltas and self.on_flush is not None:
+                try:
+                    self.on_flush(deltas)
+                except Exception as e:
+                    # 写入失败时把增量放回，下次重试
+                    logger.error(f"模板使用计数落库失败: {str(e)}")
+                    self._restore(deltas)
+                    return {}
+            return deltas
+
+    def snapshot(self, tenant_id: Optional[str] = None, now: Optional[float] = None) -> List[Dict]:
+        """
+        读取累计使用数据
+
+        Args:
+            tenant_id: 租户筛选，None 表示全部租户
+            now: 当前时间戳（秒），用于计算窗口速率
+
+        Returns:
+            每个 (模板, 租户) 一项，包含 template_id、tenant_id、usage_count、last_used、
+            avg_duration、duration_count 和 recent_rate（窗口内每分钟使用次数）
+        """
+        now = time.time() if now is None else now
+        rows = []
+        for shard in self._shards:
+            with shard.lock:
+                for (template_id, counter_tenant), counter in shard.counters.items():
+                    if tenant_id is not None and counter_tenant != tenant_id:
+                        continue
+                    rows.append({
+                        "template_id": template_id,
+                        "tenant_id": counter_tenant,
+                        "usage_count": counter.count,
+                        "last_used": counter.last_used,
+                        "avg_duration": counter.duration_sum / counter.duration_count if counter.duration_count else 0.0,
+                        "duration_count": counter.duration_count,
+                        "recent_rate": self._window_count(counter, now) * 60 / self.window_seconds
+                    })
+        return rows
+
+    def recent_rate(self, template_id: str, tenant_id: Optional[str] = None, now: Optional[float] = None) -> float:
+        """
+        获取模板在滑动窗口内的使用速率
+
+        Args:
+            template_id: 模板ID
+            tenant_id: 租户ID
+            now: 当前时间戳（秒）
+
+        Returns:
+            每分钟使用次数
+        """
+        now = time.time() if now is None else now
+        key = (template_id, tenant_id)
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            counter = shard.counters.get(key)
+            count = self._window_count(counter, now) if counter else 0
+        return count * 60 / self.window_seconds
+
+    def forget(self, template_id: str) -> None:
+        """
+        删除模板的全部计数（模板删除后调用）
+
+        Args:
+            template_id: 模板ID
+        """
+        for shard in self._shards:
+            with shard.lock:
+                for key in [key for key in shard.counters if key[0] == template_id]:
+                    del shard.counters[key]
+
+    def start(self) -> None:
+        """启动后台落库线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台落库线程，并落库剩余的增量"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def _window_count(self, counter: UsageCounter, now: float) -> int:
+        """窗口内的使用次数，只累加仍在窗口内的时间桶"""
+        oldest = int(now // self.bucket_seconds) - self.window_buckets + 1
+        return sum(
+            count for count, epoch in zip(counter.buckets, counter.epochs)
+            if epoch >= oldest
+        )
+
+    def _restore(self, deltas: Dict[str, int]) -> None:
+        """把落库失败的增量放回任意一个该模板的计数上"""
+        remaining = dict(deltas)
+        for shard in self._shards:
+            with shard.lock:
+                for (template_id, _), counter in shard.counters.items():
+                    delta = remaining.pop(template_id, 0)
+                    counter.pending += delta
@@ -0,0 +1,394 @@
+from typing import List, Optional, Dict, Tuple, Sequence
+import os
+import json
+import logging
+import numpy as np
+from app.services.embedding_service import normalize
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 搜索结果：(键, 余弦相似度)
+SearchHit = Tuple[str, float]
+
+class VectorIndex:
+    """
+    稠密向量索引（精确检索）
+
+    所有向量保存在一块连续的 float32 矩阵中，租户、分类以字典编码的整数列保存，
+    过滤条件通过向量化的布尔掩码完成，相似度通过一次矩阵乘法批量计算。
+    删除时用最后一行填补空位，保证矩阵始终紧凑。
+    索引可以保存为 .npy 文件，加载时以内存映射方式打开，首次写入时才复制到内存。
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        """
+        初始化向量索引
+
+        Args:
+            dim: 向量维度
+            capacity: 初始容量（行数），不足时按倍数扩容
+        """
+        self.dim = dim
+        self._size = 0
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._tenants = np.zeros(capacity, dtype=np.int32)
+        self._categories = np.zeros(capacity, dtype=np.int32)
+        self._public = np.zeros(capacity, dtype=bool)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # 字典编码表，0 号保留给 None
+        self._tenant_codes: Dict[Optional[str], int] = {None: 0}
+        self._category_codes: Dict[Optional[str], int] = {None: 0}
+        # 从内存映射文件加载后为只读，首次写入前需要复制
+        self._readonly = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def upsert(
+        self,
+        key: str,
+        vector: np.ndarray,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        is_public: bool = True
+    ) -> None:
+        """
+        插入或替换单个向量
+
+        Args:
+            key: 向量键
+            vector: 向量
+            tenant_id: 所属租户
+            category: 分类
+            is_public: 是否公开
+        """
+        self.upsert_many([key], np.asarray(vector).reshape(1, -1), [tenant_id], [category], [is_public])
+
+    def upsert_many(
+        self,
+        keys: Sequence[str],
+        vectors: np.ndarray,
+        tenant_ids: Optional[Sequence[Optional[str]]] = None,
+        categories: Optional[Sequence[Optional[str]]] = None,
+        public_flags: Optional[Sequence[bool]] = None
+    ) -> None:
+        """
+        批量插入或替换向量
+
+        Args:
+            keys: 向量键列表
+            vectors: (n, dim) 矩阵
+            tenant_ids: 所属租户列表
+            categories: 分类列表
+            public_flags: 是否公开列表
+        """
+        self._ensure_writable()
+        count = len(keys)
+        vectors = normalize(np.asarray(vectors).reshape(count, self.dim))
+        tenant_ids = tenant_ids if tenant_ids is not None else [None] * count
+        categories = categories if categories is not None else [None] * count
+        public_flags = public_flags if public_flags is not None else [True] * count
+
+        rows = np.empty(count, dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self._rows.get(key)
+            if row is None:
+                row = self._append_row(key)
+            rows[i] = row
+
+        self._vectors[rows] = vectors
+        self._tenants[rows] = [self._encode(self._tenant_codes, t) for t in tenant_ids]
+        self._categories[rows] = [self._encode(self._category_codes, c) for c in categories]
+        self._public[rows] = public_flags
+        self._on_rows_written(rows)
+
+    def set_metadata(
+        self,
+        key: str,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        is_public: Optional[bool] = None
+    ) -> bool:
+        """
+        更新向量的过滤元数据（不重新计算向量）
+
+        Args:
+            key: 向量键
+            tenant_id: 所属租户，None 表示不修改
+            category: 分类，None 表示不修改
+            is_public: 是否公开，None 表示不修改
+
+        Returns:
+            更新成功返回True，键不存在返回False
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return False
+
+        self._ensure_writable()
+        if tenant_id is not None:
+            self._tenants[row] = self._encode(self._tenant_codes, tenant_id)
+        if category is not None:
+            self._categories[row] = self._encode(self._category_codes, category)
+        if is_public is not None:
+            self._public[row] = is_public
+        return True
+
+    def remove(self, key: str) -> bool:
+        """
+        删除向量
+
+        Args:
+            key: 向量键
+
+        Returns:
+            删除成功返回True，键不存在返回False
+        """
+        if key not in self._rows:
+            return False
+
+        self._ensure_writable()
+        row = self._rows.pop(key)
+        last = self._size - 1
+        if row != last:
+            # 用最后一行填补被删除的行
+            moved_key = self._keys[last]
+            self._move_row(last, row)
+            self._keys[row] = moved_key
+            self._rows[moved_key] = row
+
+        self._keys.pop()
+        self._size -= 1
+        return True
+
+    def save(self, directory: str) -> None:
+        """
+        把索引保存到目录，每个数组一个 .npy 文件，元数据保存为 meta.json
+
+        Args:
+            directory: 索引目录
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = self._persistent_arrays()
+        for filename in os.listdir(directory):
+            if filename.endswith(".npy") and filename[:-4] not in arrays:
+                os.remove(os.path.join(directory, filename))
+        # 先写临时文件再原子替换，避免破坏仍在映射旧文件的读者
+        for name, array in arrays.items():
+            path = os.path.join(directory, f"{name}.npy")
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(f"{path}.tmp", path)
+        meta_path = os.path.join(directory, "meta.json")
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._persistent_meta(), f, ensure_ascii=False)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        logger.info(f"向量索引已保存: {directory} ({self._size} 个向量)")
+
+    @classmethod
+    def load(cls, directory: str) -> "VectorIndex":
+        """
+        以内存映射方式加载索引，加载耗时与向量数量基本无关
+
+        Args:
+            directory: 索引目录
+
+        Returns:
+            加载后的索引
+        """
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        arrays = {}
+        for filename in os.listdir(directory):
+            if filename.endswith(".npy"):
+                arrays[filename[:-4]] = np.load(os.path.join(directory, filename), mmap_mode="r")
+
+        index = cls.__new__(cls)
+        index._restore(meta, arrays)
+        logger.info(f"向量索引已加载: {directory} ({index._size} 个向量)")
+        return index
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        public_only: bool = False
+    ) -> List[SearchHit]:
+        """
+        检索与单个查询向量最相似的 k 个向量
+
+        Args:
+            query: 查询向量
+            k: 返回数量
+            tenant_id: 租户筛选（该租户的条目和公开条目）
+            category: 分类筛选
+            public_only: 是否只检索公开条目
+
+        Returns:
+            按相似度降序排列的 (键, 相似度) 列表
+        """
+        return self.search_batch(np.asarray(query).reshape(1, -1), k, tenant_id, category, public_only)[0]
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        tenant_id: Optional[str] = None,
+        category: Optional[str] = None,
+        public_only: bool = False
+    ) -> List[List[SearchHit]]:
+        """
+        批量检索，所有查询共享同一组过滤条件
+
+        Args:
+            queries: (m, dim) 查询矩阵
+            k: 每个查询的返回数量
+            tenant_id: 租户筛选（该租户的条目和公开条目）
+            category: 分类筛选
+            public_only: 是否只检索公开条目
+
+        Returns:
+            每个查询对应一个按相似度降序排列的 (键, 相似度) 列表
+        """
+        queries = normalize(np.asarray(queries).reshape(-1, self.dim))
+        mask = self._filter_mask(tenant_id, category, public_only)
+        rows = None if mask is None else np.flatnonzero(mask)
+        vectors = self._vectors[:self._size] if rows is None else self._vectors[rows]
+
+        # 一次矩阵乘法得到 (m, n) 的相似度矩阵
+        scores = queries @ vectors.T
+        return [self._top_k(row_scores, rows, k) for row_scores in scores]
+
+    def _top_k(self, scores: np.ndarray, rows: Optional[np.ndarray], k: int) -> List[SearchHit]:
+        """
+        从相似度向量中取前 k 个
+
+        Args:
+            scores: 候选行的相似度
+            rows: 候选行号，None 表示 scores 覆盖全部行
+            k: 返回数量
+
+        Returns:
+            按相似度降序排列的 (键, 相似度) 列表
+        """
+        if k <= 0 or scores.size == 0:
+            return []
+
+        # argpartition 取前 k 个为 O(n)，只对这 k 个排序
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        positions = top if rows is None else rows[top]
+        return [(self._keys[p], float(scores[t])) for p, t in zip(positions.tolist(), top.tolist())]
+
+    def _filter_mask(
+        self,
+        tenant_id: Optional[str],
+        category: Optional[str],
+        public_only: bool
+    ) -> Optional[np.ndarray]:
+        """根据过滤条件生成布尔掩码，没有过滤条件时返回None"""
+        n = self._size
+        mask = None
+
+        if public_only:
+            mask = self._public[:n].copy()
+        elif tenant_id is not None:
+            code = self._tenant_codes.get(tenant_id, -1)
+            mask = (self._tenants[:n] == code) | self._public[:n]
+
+        if category is not None:
+            code = self._category_codes.get(category, -1)
+            category_mask = self._categories[:n] == code
+            mask = category_mask if mask is None else mask & category_mask
+
+        return mask
+
+    def _append_row(self, key: str) -> int:
+        """分配新行，容量不足时扩容"""
+        if self._size == self._vectors.shape[0]:
+            self._grow(max(1024, self._size * 2))
+        row = self._size
+        self._size += 1
+        self._keys.append(key)
+        self._rows[key] = row
+        return row
+
+    def _grow(self, capacity: int) -> None:
+        """扩容到指定行数"""
+        def resize(array: np.ndarray) -> np.ndarray:
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            return grown
+
+        self._vectors = resize(self._vectors)
+        self._tenants = resize(self._tenants)
+        self._categories = resize(self._categories)
+        self._public = resize(self._public)
+
+    def _move_row(self, src: int, dst: int) -> None:
+        """把 src 行的数据移动到 dst 行"""
+        self._vectors[dst] = self._vectors[src]
+        self._tenants[dst] = self._tenants[src]
+        self._categories[dst] = self._categories[src]
+        self._public[dst] = self._public[src]
+
+    def _on_rows_written(self, rows: np.ndarray) -> None:
+        """行写入后的扩展点，子类可用于维护附加结构"""
+
+    def _ensure_writable(self) -> None:
+        """内存映射加载的索引在首次写入前复制到可写内存"""
+        if self._readonly:
+            self._grow(max(1024, self._size * 2))
+            self._readonly = False
+
+    def _persistent_arrays(self) -> Dict[str, np.ndarray]:
+        """需要持久化的数组"""
+        n = self._size
+        return {
+            "vectors": self._vectors[:n],
+            "tenants": self._tenants[:n],
+            "categories": self._categories[:n],
+            "public": self._public[:n]
+        }
+
+    def _persistent_meta(self) -> Dict:
+        """需要持久化的元数据，编码表按编码顺序保存"""
+        return {
+            "type": type(self).__name__,
+            "dim": self.dim,
+            "keys": self._keys,
+            "tenant_codes": list(self._tenant_codes),
+            "category_codes": list(self._category_codes)
+        }
+
+    def _restore(self, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+        """从持久化数据恢复索引状态"""
+        self.dim = meta["dim"]
+        self._keys = list(meta["keys"])
+        self._size = len(self._keys)
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        self._tenant_codes = {value: code for code, value in enumerate(meta["tenant_codes"])}
+        self._category_codes = {value: code for code, value in enumerate(meta["category_codes"])}
+        self._vectors = arrays["vectors"]
+        self._tenants = arrays["tenants"]
+        self._categories = arrays["categories"]
+        self._public = arrays["public"]
+        self._readonly = True
+
+    @staticmethod
+    def _encode(codes: Dict[Optional[str], int], value: Optional[str]) -> int:
+        """字典编码，新值分配新的编码"""
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            codes[value] = code
+        return code
@@ -0,0 +1,140 @@
+from typing import Any, Dict, Hashable, Optional
+from collections import OrderedDict
+import threading
+import time
+
+class TTLCache:
+    """
+    带过期时间的 LRU 缓存（线程安全）
+
+    超过容量时淘汰最久未使用的条目，超过 ttl 秒的条目在读取时视为未命中并删除。
+    同时统计命中、未命中、淘汰和过期次数。
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大条目数
+            ttl: 条目有效期（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+            default: 未命中时的返回值
+
+        Returns:
+            缓存值，未命中或已过期时返回 default
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 有效期（秒），默认使用缓存的 ttl
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存（不重置统计）"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            条目数、容量、命中/未命中/淘汰/过期次数以及命中率
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups > 0 else 0.0
+        }
+
+class GenerationCounter:
+    """
+    按作用域划分的数据版本号
+
+    每次写入递增相关作用域的版本号，缓存键中带上读取时的版本号，
+    写入之后旧键自然不再命中，不需要逐条失效缓存。
+    """
+
+    def __init__(self):
+        """
+        初始化版本号
+        """
+        self._generations: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope: Hashable) -> int:
+        """
+        获取作用域的当前版本号
+
+        Args:
+            scope: 作用域
+
+        Returns:
+            版本号，从未写入过的作用域为 0
+        """
+        return self._generations.get(scope, 0)
+
+    def bump(self, *scopes: Hashable) -> None:
+        """
+        递增一个或多个作用域的版本号
+
+        Args:
+            scopes: 作用域列表
+        """
+        with self._lock:
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
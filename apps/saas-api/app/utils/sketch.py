@@ -0,0 +1,123 @@
+from typing import Dict, Optional
+import math
+
+# 不大于该值的耗时计入零值桶
+MIN_INDEXABLE = 1e-9
+
+class DDSketch:
+    """
+    可合并的分位数草图（DDSketch）
+
+    数值按对数划分到宽度为 gamma 倍的桶中，任意分位数估计的相对误差不超过 relative_accuracy。
+    同参数的草图可以直接按桶相加合并，桶数超过 max_bins 时合并最低的桶，
+    保证内存有界且高分位数（长尾）仍保持精度。
+    """
+    __slots__ = ("relative_accuracy", "gamma", "_log_gamma", "max_bins", "bins", "zero_count", "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        """
+        初始化草图
+
+        Args:
+            relative_accuracy: 分位数估计的相对误差上限
+            max_bins: 最多保留的桶数
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("相对误差必须在 0 和 1 之间")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """
+        添加一个数值
+
+        Args:
+            value: 数值（耗时等非负数）
+            weight: 重复次数
+        """
+        if value < 0:
+            raise ValueError("DDSketch 只接受非负数")
+        if value <= MIN_INDEXABLE:
+            self.zero_count += weight
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "DDSketch") -> None:
+        """
+        合并另一个草图
+
+        Args:
+            other: 参数相同的草图
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("只能合并相对误差相同的草图")
+        if not other.count:
+            return
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def copy(self) -> "DDSketch":
+        """复制草图"""
+        sketch = DDSketch(self.relative_accuracy, self.max_bins)
+        sketch.merge(self)
+        return sketch
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        估计分位数
+
+        Args:
+            q: 分位点（0 到 1）
+
+        Returns:
+            分位数估计值，草图为空时返回None
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("分位点必须在 0 和 1 之间")
+        if not self.count:
+            return None
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return max(self.min, 0.0)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def _collapse(self) -> None:
+        """把最低的若干个桶合并为一个，使桶数回到 max_bins"""
+        indexes = sorted(self.bins)
+        overflow = len(indexes) - self.max_bins
+        target = indexes[overflow]
+        for index in indexes[:overflow]:
+            self.bins[target] += self.bins.pop(index)
@@ -0,0 +1,33 @@
+import re
+from typing import List
+
+# 英文/数字词元，以及连续的中日韩字符片段
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为检索词元
+
+    英文和数字按单词切分；中文没有空格分隔，因此对连续的汉字片段
+    同时输出单字和相邻双字（bigram），兼顾召回率和区分度。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词元列表（保留重复，便于统计词频）
+    """
+    if not text:
+        return []
+
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        piece = match.group()
+        if piece[0].isascii():
+            tokens.append(piece)
+            continue
+
+        tokens.extend(piece)
+        tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+
+    return tokens
@@ -0,0 +1,232 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from app.services.analytics_engine import AnalyticsEngine
+from app.services.analytics_service import AnalyticsService
+from app.services.error_fingerprint import fingerprint_error, normalize_error_message
+from app.services.log_service import LogService
+from app.services.template_service import TemplateService
+from app.schemas.analytics import ExecutionEvent
+from app.schemas.log import LogCreate
+from app.schemas.template import ProcessTemplateCreate
+from app.utils.sketch import DDSketch
+
+class TestAnalyticsService(unittest.TestCase):
+    """分析服务测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.template_service = TemplateService()
+        self.log_service = LogService()
+        self.analytics_service = AnalyticsService(self.template_service, self.log_service)
+        self.template = self.template_service.create_template(ProcessTemplateCreate(
+            name="销售订单处理流程",
+            category="sales",
+            dsl={"steps": [{"id": "start", "type": "input"}]}
+        ))
+        self.now = datetime.now()
+    
+    def _events(self, tenant_id, completed, failed, duration=10.0, timestamp=None):
+        events = []
+        for i in range(completed + failed):
+            status = "completed" if i < completed else "failed"
+            events.append(ExecutionEvent(tenant_id=tenant_id, template_id=self.template.id, status="started", process_id=f"{tenant_id}-{i}", timestamp=timestamp))
+            events.append(ExecutionEvent(
+                tenant_id=tenant_id,
+                template_id=self.template.id,
+                process_id=f"{tenant_id}-{i}",
+                status=status,
+                duration=duration,
+                error_type="参数验证错误" if status == "failed" else None,
+                error_message="缺少必需参数: customer_id" if status == "failed" else None,
+                timestamp=timestamp
+            ))
+        return events
+    
+    def test_process_and_tenant_stats(self):
+        """测试流程和租户统计由执行事件汇总得到"""
+        self.analytics_service.ingest_events(self._events("tenant_1", 8, 2))
+        self.analytics_service.ingest_events(self._events("tenant_2", 3, 0, duration=20.0))
+        # 已启动但尚未结束的执行
+        self.analytics_service.ingest_events([ExecutionEvent(tenant_id="tenant_1", template_id=self.template.id, status="started")])
+        
+        stats = self.analytics_service.get_process_stats(tenant_id="tenant_1")
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0].template_name, "销售订单处理流程")
+        self.assertEqual(stats[0].total_executions, 11)
+        self.assertEqual(stats[0].successful_executions, 8)
+        self.assertEqual(stats[0].failed_executions, 2)
+        self.assertAlmostEqual(stats[0].success_rate, 0.8)
+        self.assertAlmostEqual(stats[0].avg_duration, 10.0)
+        
+        tenants = {item.tenant_id: item for item in self.analytics_service.get_tenant_stats()}
+        self.assertEqual(tenants["tenant_1"].active_processes, 1)
+        self.assertEqual(tenants["tenant_1"].failed_processes, 2)
+        self.assertEqual(tenants["tenant_2"].total_executions, 3)
+        
+        # 执行启动同时计入模板使用次数
+        self.template_service.usage.flush()
+        self.assertEqual(self.template.usage_count, 14)
+        # 模板平均耗时来自完成和失败事件
+        usage = {u.tenant_id: u for u in self.analytics_service.get_template_usage(tenant_id="tenant_2")}
+        self.assertEqual(usage["tenant_2"].usage_count, 3)
+        self.assertAlmostEqual(usage["tenant_2"].avg_duration, 20.0)
+        self.assertAlmostEqual(self.analytics_service.get_template_usage()[0].avg_duration, 12.3077, places=3)
+        
+        # 时间范围之外的事件不计入
+        old = self.now - timedelta(days=60)
+        self.analytics_service.ingest_events(self._events("tenant_2", 5, 0, timestamp=old))
+        self.assertEqual(self.analytics_service.get_process_stats(tenant_id="tenant_2")[0].total_executions, 3)
+        
+        with self.assertRaises(ValueError):
+            self.analytics_service.ingest_events([ExecutionEvent(tenant_id="tenant_1", status="paused")])
+    
+    def test_error_analysis_and_report(self):
+        """测试错误分析合并执行失败和错误日志"""
+        self.analytics_service.ingest_events(self._events("tenant_1", 6, 4))
+        self.log_service.create_log(LogCreate(
+            tenant_id="tenant_1",
+            template_id=self.template.id,
+            process_id="p-log",
+            level="error",
+            message="SAP 连接超时",
+            details={"error_type": "连接错误"}
+        ))
+        self.log_service.create_log(LogCreate(tenant_id="tenant_1", level="info", message="ok"))
+        
+        errors = self.analytics_service.get_error_analysis(tenant_id="tenant_1")
+        self.assertEqual([(item.error_type, item.count) for item in errors], [("参数验证错误", 4), ("连接错误", 1)])
+        self.assertEqual(len(errors[0].affected_processes), 4)
+        self.assertEqual(errors[1].error_message, "SAP 连接超时")
+        
+        report = self.analytics_service.generate_report("tenant_1")
+        self.assertEqual(report["summary"]["total_executions"], 10)
+        self.assertAlmostEqual(report["summary"]["success_rate"], 0.6)
+        self.assertEqual(report["top_templates"][0]["template_id"], self.template.id)
+        self.assertEqual(report["error_summary"]["total_errors"], 5)
+        self.assertEqual(report["error_summary"]["top_error_types"][0]["percentage"], 80.0)
+        self.assertEqual(report["recommendations"][0]["priority"], "high")
+    
+    def test_mixed_timezone_timestamps(self):
+        """测试带时区和不带时区的事件时间统一为本地时间，可以汇总到同一个错误"""
+        failed = dict(tenant_id="tenant_1", template_id=self.template.id, status="failed", duration=3.0,
+                      error_type="连接错误", error_message="SAP 连接超时")
+        aware = datetime.now(timezone.utc) - timedelta(minutes=5)
+        self.analytics_service.ingest_events([
+            ExecutionEvent(process_id="p-1", **failed),
+            ExecutionEvent(process_id="p-2", timestamp=aware, **failed),
+            ExecutionEvent(process_id="p-3", timestamp=aware.isoformat().replace("+00:00", "Z"), **failed)
+        ])
+        
+        errors = self.analytics_service.get_error_analysis(tenant_id="tenant_1")
+        self.assertEqual([(item.error_type, item.count) for item in errors], [("连接错误", 3)])
+        self.assertEqual(errors[0].first_occurrence, aware.astimezone().replace(tzinfo=None))
+        self.assertIsNone(errors[0].last_occurrence.tzinfo)
+        
+        # 查询范围带时区时同样换算
+        stats = self.analytics_service.get_process_stats(start_time=aware - timedelta(minutes=1), end_time=datetime.now(timezone.utc))
+        self.assertEqual(stats[0].failed_executions, 3)
+    
+    def test_error_fingerprints(self):
+        """测试错误信息规范化后按指纹聚合，错误日志可按指纹查询"""
+        self.assertEqual(
+            normalize_error_message("订单4500012345不存在 (process 3f2a9c1e-0b7d-4c1e-9a55-1f2e3d4c5b6a, 重试 3 次)"),
+            "订单<doc>不存在 (process <uuid>, 重试 <num> 次)"
+        )
+        self.assertEqual(normalize_error_message("客户 'ACME 公司' 余额 12.5 不足"), "客户 <str> 余额 <num> 不足")
+        self.assertEqual(normalize_error_message("RFC BAPI_PO_CREATE1 调用失败"), "RFC BAPI_PO_CREATE1 调用失败")
+        
+        for i in range(3):
+            self.log_service.create_log(LogCreate(
+                tenant_id="tenant_1",
+                template_id=self.template.id,
+                process_id=f"p-{i}",
+                level="error",
+                message=f"采购订单 {4500000000 + i} 过账失败: 金额 {100 + i} 超出限额"
+            ))
+        self.log_service.create_log(LogCreate(tenant_id="tenant_1", level="error", message="SAP 连接超时"))
+        
+        errors = self.analytics_service.get_error_analysis(tenant_id="tenant_1")
+        self.assertEqual([item.count for item in errors], [3, 1])
+        self.assertEqual(errors[0].message_template, "采购订单 <doc> 过账失败: 金额 <num> 超出限额")
+        self.assertEqual(errors[0].affected_processes, ["p-0", "p-1", "p-2"])
+        self.assertEqual(errors[0].fingerprint, fingerprint_error("运行错误", "采购订单 4500000099 过账失败: 金额 7 超出限额")[0])
+        
+        logs = self.log_service.get_error_logs(fingerprint=errors[0].fingerprint, limit=2)
+        self.assertEqual([log.process_id for log in logs], ["p-2", "p-1"])
+        self.assertEqual(len(self.log_service.get_error_logs(tenant_id="tenant_1")), 4)
+    
+    def test_error_fingerprint_capacity(self):
+        """测试每个时间桶的错误指纹数有界，高频错误不会被挤出"""
+        engine = AnalyticsEngine(max_error_fingerprints=10)
+        now = datetime.now()
+        for _ in range(50):
+            engine.record_log("t", None, "error", now, message="SAP 连接超时")
+        for i in range(200):
+            engine.record_log("t", None, "error", now, message=f"错误类型 E{i}")
+        
+        errors = engine.errors(now - timedelta(hours=1), now)
+        self.assertEqual(len(errors), 10)
+        top = max(errors.values(), key=lambda error: error["count"])
+        self.assertEqual((top["template"], top["count"], top["overcount"]), ("SAP 连接超时", 50, 0))
+    
+    def test_duration_percentiles(self):
+        """测试流程和步骤耗时分位数"""
+        durations = [1.0] * 90 + [30.0] * 9 + [600.0]
+        events = []
+        for i, duration in enumerate(durations):
+            events.append(ExecutionEvent(tenant_id="tenant_1", template_id=self.template.id, status="completed", duration=duration))
+            events.append(ExecutionEvent(tenant_id="tenant_1", template_id=self.template.id, step_id="sap_call", status="completed", duration=duration / 2))
+        self.analytics_service.ingest_events(events)
+        
+        stats = self.analytics_service.get_process_stats(tenant_id="tenant_1")[0]
+        self.assertEqual(stats.total_executions, 100)
+        self.assertAlmostEqual(stats.p50_duration, 1.0, delta=0.02)
+        self.assertAlmostEqual(stats.p90_duration, 1.0, delta=0.02)
+        self.assertAlmostEqual(stats.p99_duration, 30.0, delta=0.6)
+        self.assertEqual(stats.max_duration, 600.0)
+        
+        steps = self.analytics_service.get_step_latency(tenant_id="tenant_1")
+        self.assertEqual([(item.step_id, item.count) for item in steps], [("sap_call", 100)])
+        self.assertAlmostEqual(steps[0].p99_duration, 15.0, delta=0.3)
+        self.assertEqual(steps[0].max_duration, 300.0)
+    
+    def test_sketch_merge_accuracy(self):
+        """测试合并后的草图分位数误差在相对误差范围内"""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(2, 1.5) for _ in range(20000)]
+        parts = [DDSketch() for _ in range(4)]
+        for i, value in enumerate(values):
+            parts[i % 4].add(value)
+        merged = DDSketch()
+        for part in parts:
+            merged.merge(part)
+        
+        values.sort()
+        for q in (0.5, 0.9, 0.99):
+            expected = values[int(q * (len(values) - 1))]
+            self.assertLessEqual(abs(merged.quantile(q) - expected) / expected, 0.02)
+        self.assertEqual(merged.count, 20000)
+        
+        # 桶数超过上限时合并低位桶，高分位数不受影响
+        small = DDSketch(max_bins=300)
+        for value in values:
+            small.add(value)
+        self.assertLessEqual(len(small.bins), 300)
+        self.assertLessEqual(abs(small.quantile(0.99) - merged.quantile(0.99)) / merged.quantile(0.99), 0.01)
+    
+    def test_engine_retention(self):
+        """测试超出保留期的时间桶被淘汰"""
+        engine = AnalyticsEngine(bucket_seconds=60, retention_buckets=10)
+        start = datetime(2024, 1, 1)
+        for minute in range(30):
+            engine.record_execution("t", "tpl", "completed", start + timedelta(minutes=minute), duration=1.0)
+        
+        rollups = engine.rollups(start, start + timedelta(days=1))
+        self.assertEqual(rollups[("t", "tpl")].completed, 10)
+        # 已淘汰范围内的迟到事件直接丢弃
+        engine.record_execution("t", "tpl", "completed", start)
+        self.assertEqual(engine.rollups(start, start + timedelta(days=1))[("t", "tpl")].completed, 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import gzip
+import json
+import unittest
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.routes import logs
+from app.services.log_ingest import BulkLogIngestor, BulkPayloadTooLarge, MAX_LINE_BYTES
+from app.services.log_service import LogService
+
+class TestBulkLogIngest(unittest.TestCase):
+    """批量日志导入测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.log_service = LogService()
+        self.batches = []
+        self.log_service.add_listener(self.batches.append)
+    
+    def _body(self, count):
+        lines = [
+            json.dumps({
+                "tenant_id": f"tenant_{i % 2}",
+                "process_id": f"p_{i}",
+                "level": "error" if i % 10 == 0 else "info",
+                "message": f"步骤 {i} 完成",
+                "timestamp": f"2024-05-01T08:{i // 60 % 60:02d}:{i % 60:02d}"
+            }, ensure_ascii=False)
+            for i in range(count)
+        ]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+    
+    def _ingest(self, body, gzipped=False, chunk_size=777):
+        ingestor = BulkLogIngestor(self.log_service, gzip=gzipped)
+        for start in range(0, len(body), chunk_size):
+            ingestor.feed(body[start:start + chunk_size])
+        return ingestor.finish()
+    
+    def test_ndjson_single_write(self):
+        """测试跨块切分的行，整个请求体一次写入"""
+        result = self._ingest(self._body(2500))
+        self.assertEqual((result.accepted, result.rejected), (2500, 0))
+        self.assertEqual([len(batch) for batch in self.batches], [2500])
+        
+        stats = self.log_service.get_log_stats(tenant_id="tenant_0")
+        self.assertEqual((stats["total_logs"], stats["error_logs"]), (1250, 250))
+        latest = self.log_service.get_logs(limit=1)[0]
+        self.assertEqual((latest.process_id, latest.timestamp.minute, latest.timestamp.second), ("p_2499", 41, 39))
+        self.assertEqual(self.log_service.get_log_by_id(latest.id).message, "步骤 2499 完成")
+    
+    def test_gzip_and_line_errors(self):
+        """测试 gzip 请求体和逐行错误报告"""
+        lines = [
+            b'{"tenant_id": "t", "level": "info", "message": "ok"}',
+            b'{"tenant_id": "t", "level": "debug", "message": "bad level"}',
+            b'not json',
+            b'',
+            b'{"level": "info", "message": "no tenant"}',
+            b'{"tenant_id": "t", "level": "warn", "message": "ok", "timestamp": "2024-05-01T00:00:00Z"}',
+            b'{"tenant_id": "t", "level": "info", "message": "' + b"x" * (MAX_LINE_BYTES + 10) + b'"}',
+            b'{"tenant_id": "t", "level": "info", "message": "last line without newline"}'
+        ]
+        result = self._ingest(gzip.compress(b"\n".join(lines)), gzipped=True, chunk_size=4096)
+        self.assertEqual((result.accepted, result.rejected), (3, 4))
+        self.assertEqual([error.line for error in result.errors], [2, 3, 5, 7])
+        self.assertIn("debug", result.errors[0].error)
+        self.assertEqual(len(self.log_service.get_logs(level="info")), 2)
+        self.assertEqual(self.log_service.get_logs(level="warn")[0].timestamp.year, 2024)
+        
+        with self.assertRaises(ValueError):
+            self._ingest(gzip.compress(self._body(10))[:-8], gzipped=True)
+        with self.assertRaises(ValueError):
+            self._ingest(b"definitely not gzip", gzipped=True)
+
+    def test_bulk_route_is_atomic_and_idempotent(self):
+        """测试请求体不完整时不写入，同一批次重试和并发重试不重复写入"""
+        original = logs.log_service
+        logs.log_service = self.log_service
+        self.addCleanup(setattr, logs, "log_service", original)
+        app = FastAPI()
+        app.include_router(logs.router, prefix="/logs")
+        client = TestClient(app)
+        body = gzip.compress(self._body(2500))
+        headers = {"Content-Encoding": "gzip", "X-Batch-Id": "node-1-0-2500", "X-Tenant-Id": "tenant_0"}
+
+        response = client.post("/logs/bulk", content=body[:-8], headers=headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.log_service.store), 0)
+
+        # 失败的批次可以重试，成功后再重试直接返回首次结果
+        for _ in range(2):
+            response = client.post("/logs/bulk", content=body, headers=headers)
+            self.assertEqual(response.json()["accepted"], 2500)
+        self.assertEqual(len(self.log_service.store), 2500)
+
+        # 其他租户的同名批次单独处理
+        client.post("/logs/bulk", content=body, headers=dict(headers, **{"X-Tenant-Id": "tenant_1"}))
+        self.assertEqual(len(self.log_service.store), 5000)
+
+        # 同一批次仍在处理时，并发的重试返回 409
+        key = ("tenant_0", "node-1-2500-5000")
+        self.assertEqual(self.log_service.claim_bulk_batch(key), (True, None))
+        response = client.post("/logs/bulk", content=body, headers=dict(headers, **{"X-Batch-Id": key[1]}))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.headers["retry-after"], "1")
+        self.assertEqual(len(self.log_service.store), 5000)
+
+    def test_size_limits(self):
+        """测试解压后的大小和行数超过上限时整批拒绝，压缩炸弹按块解压"""
+        bomb = gzip.compress(b"\n" * (64 << 20))
+        ingestor = BulkLogIngestor(self.log_service, gzip=True, max_bytes=1 << 20)
+        with self.assertRaises(BulkPayloadTooLarge):
+            ingestor.feed(bomb)
+        self.assertLessEqual(ingestor._size, (1 << 20) + (1 << 20))
+        
+        ingestor = BulkLogIngestor(self.log_service, max_rows=100)
+        with self.assertRaises(BulkPayloadTooLarge):
+            ingestor.feed(self._body(150))
+        self.assertEqual(len(self.log_service.store), 0)
+        
+        self._ingest(self._body(100), chunk_size=1 << 20)
+        self.assertEqual(len(self.log_service.store), 100)
+
+    def test_bulk_route_streams_and_limits_body(self):
+        """测试分块传输的请求体流式导入，超过请求体上限时返回 413 且不写入"""
+        original = logs.log_service
+        logs.log_service = self.log_service
+        self.addCleanup(setattr, logs, "log_service", original)
+        app = FastAPI()
+        app.include_router(logs.router, prefix="/logs")
+        client = TestClient(app)
+        body = self._body(2500)
+        chunks = lambda: iter([body[i:i + 10000] for i in range(0, len(body), 10000)])  # noqa: E731
+
+        response = client.post("/logs/bulk", content=chunks())
+        self.assertEqual(response.json()["accepted"], 2500)
+        
+        with mock.patch.object(logs, "MAX_BULK_BODY_BYTES", len(body) - 1):
+            # 带 Content-Length 的请求在读取请求体之前拒绝
+            response = client.post("/logs/bulk", content=body)
+            self.assertEqual(response.status_code, 413)
+            # 分块传输的请求体在读取过程中超过上限
+            response = client.post("/logs/bulk", content=chunks(), headers={"X-Batch-Id": "node-1-0-2500"})
+            self.assertEqual(response.status_code, 413)
+        self.assertEqual(len(self.log_service.store), 2500)
+
+if __name__ == "__main__":
+    unittest.main()
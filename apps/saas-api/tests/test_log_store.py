@@ -0,0 +1,118 @@
+import os
+import random
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from app.schemas.log import Log
+from app.services.log_service import LOG_COLUMNS
+from app.services.log_store import ColumnarLogStore, DictLogStore, _DiskSegment
+
+class TestLogStore(unittest.TestCase):
+    """列式日志存储测试类"""
+    
+    def setUp(self):
+        """测试前准备：同一批日志写入两种存储"""
+        rng = random.Random(3)
+        self.dict_store = DictLogStore(Log, LOG_COLUMNS)
+        self.columnar_store = ColumnarLogStore(Log, LOG_COLUMNS, segment_size=64)
+        self.base = datetime(2024, 5, 1, 8, 0, 0)
+        self.logs = []
+        for i in range(500):
+            level = rng.choice(["info", "info", "warn", "error"])
+            log = Log(
+                id=str(uuid.uuid4()),
+                tenant_id=f"tenant_{rng.randrange(3)}",
+                template_id=rng.choice([None, "tpl_a", "tpl_b"]),
+                process_id=f"p_{rng.randrange(40)}",
+                level=level,
+                message=f"步骤 {i} {'SAP 超时' if level == 'error' else '完成'}",
+                details={"i": i} if i % 5 == 0 else None,
+                # 大体递增，偶尔乱序（批量导入的历史日志）
+                timestamp=self.base + timedelta(seconds=i if i % 50 else rng.randrange(500))
+            )
+            fingerprint = "fp_timeout" if level == "error" else None
+            self.dict_store.append(log, fingerprint=fingerprint)
+            self.columnar_store.append(log, fingerprint=fingerprint)
+            self.logs.append(log)
+    
+    def _assert_same(self, **kwargs):
+        expected = self.dict_store.query(**kwargs)
+        actual = self.columnar_store.query(**kwargs)
+        self.assertEqual([log.dict() for log in actual], [log.dict() for log in expected])
+    
+    def test_query_matches_dict_store(self):
+        """测试各类筛选和分页结果与字典存储一致"""
+        self._assert_same()
+        self._assert_same(equals={"tenant_id": "tenant_1"}, skip=10, limit=30)
+        self._assert_same(equals={"level": "error", "template_id": "tpl_a"})
+        self._assert_same(equals={"fingerprint": "fp_timeout"}, limit=5)
+        self._assert_same(
+            equals={"tenant_id": "tenant_2"},
+            start_time=self.base + timedelta(seconds=100),
+            end_time=self.base + timedelta(seconds=300),
+            limit=1000
+        )
+        self._assert_same(message_contains="sap", limit=1000)
+        self._assert_same(equals={"tenant_id": "unknown"})
+        
+        for equals in ({}, {"tenant_id": "tenant_0"}):
+            self.assertEqual(
+                self.columnar_store.count_by("level", equals, self.base + timedelta(seconds=50)),
+                self.dict_store.count_by("level", equals, self.base + timedelta(seconds=50))
+            )
+    
+    def test_get_and_delete(self):
+        """测试按ID查找（含已封存的日志段）和删除"""
+        for log in (self.logs[0], self.logs[200], self.logs[-1]):
+            self.assertEqual(self.columnar_store.get(log.id).dict(), log.dict())
+        self.assertIsNone(self.columnar_store.get(str(uuid.uuid4())))
+        self.assertIsNone(self.columnar_store.get("not-a-uuid"))
+        
+        target = self.logs[10]
+        self.assertTrue(self.columnar_store.delete(target.id))
+        self.assertTrue(self.dict_store.delete(target.id))
+        self.assertFalse(self.columnar_store.delete(target.id))
+        self.assertIsNone(self.columnar_store.get(target.id))
+        self.assertEqual(len(self.columnar_store), 499)
+        self._assert_same(limit=1000)
+    
+    def test_disk_segments(self):
+        """测试日志段写入磁盘、重新打开以及按 zone map 跳过日志段"""
+        with tempfile.TemporaryDirectory() as directory:
+            store = ColumnarLogStore(Log, LOG_COLUMNS, segment_size=64, directory=directory, zone_columns=("tenant_id",))
+            for i, log in enumerate(self.logs):
+                # 前半部分日志只属于 tenant_0，后半部分不含 tenant_0
+                tenant_id = "tenant_0" if i < 256 else "tenant_1"
+                store.append(log.copy(update={"tenant_id": tenant_id}), fingerprint=None)
+            store.flush()
+            self.assertTrue(all(isinstance(segment, _DiskSegment) for segment in store._segments))
+            self.assertEqual(len(store._segments), 8)
+            # 模拟上次写入中途退出留下的临时目录
+            os.makedirs(os.path.join(directory, "segment-00000099.tmp"))
+            
+            reopened = ColumnarLogStore(Log, LOG_COLUMNS, segment_size=64, directory=directory, zone_columns=("tenant_id",))
+            self.assertEqual(len(reopened), 500)
+            self.assertFalse(os.path.exists(os.path.join(directory, "segment-00000099.tmp")))
+            self.assertEqual(reopened.get(self.logs[3].id).message, self.logs[3].message)
+            self.assertEqual(reopened.get(self.logs[3].id).details, self.logs[3].details)
+            
+            logs = reopened.query({"tenant_id": "tenant_1", "level": "error"}, limit=1000)
+            expected = store.query({"tenant_id": "tenant_1", "level": "error"}, limit=1000)
+            self.assertEqual([log.dict() for log in logs], [log.dict() for log in expected])
+            # 只含 tenant_0 的日志段（第 1 段已被按ID查找打开）没有被打开
+            self.assertTrue(all(not segment._arrays for segment in reopened._segments[1:4]))
+            self.assertTrue(all(segment._arrays for segment in reopened._segments[4:]))
+            self.assertEqual(sum(reopened.count_by("level", {"tenant_id": "tenant_0"}).values()), 256)
+            
+            # 删除记录持久化，新写入的日志段编号接续已有的日志段
+            self.assertTrue(reopened.delete(self.logs[3].id))
+            reopened.append(Log(id=str(uuid.uuid4()), tenant_id="tenant_2", level="info", message="新日志", timestamp=self.base))
+            reopened.flush()
+            again = ColumnarLogStore(Log, LOG_COLUMNS, directory=directory, zone_columns=("tenant_id",))
+            self.assertIsNone(again.get(self.logs[3].id))
+            self.assertEqual(len(again), 500)
+            self.assertEqual(len(again.query({"tenant_id": "tenant_2"})), 1)
+
+if __name__ == "__main__":
+    unittest.main()
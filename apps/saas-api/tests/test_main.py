@@ -0,0 +1,19 @@
+import unittest
+from fastapi.testclient import TestClient
+from app.main import app
+
+class TestMain(unittest.TestCase):
+    """应用入口冒烟测试类"""
+
+    def test_app_starts_and_exposes_metrics(self):
+        """测试应用可以导入、启动和关闭，/metrics 记录请求耗时"""
+        with TestClient(app) as client:
+            self.assertEqual(client.get("/templates/").status_code, 200)
+            response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('saas_http_request_duration_seconds_count{method="GET",route="/templates/",status="200"}',
+                      response.text)
+
+if __name__ == "__main__":
+    unittest.main()
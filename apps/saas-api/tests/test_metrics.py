@@ -0,0 +1,84 @@
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.metrics import Registry, instrument_app
+
+class TestMetrics(unittest.TestCase):
+    """指标测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.registry = Registry()
+
+    def test_histogram_buckets(self):
+        """测试直方图输出累计分桶、总和与次数"""
+        histogram = self.registry.histogram("rfc_seconds", "RFC latency", ("function",), buckets=(0.01, 0.1, 1.0))
+        child = histogram.labels("BAPI_X")
+        for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+            child.observe(value)
+        text = self.registry.render()
+        self.assertIn("# TYPE rfc_seconds histogram", text)
+        self.assertIn('rfc_seconds_bucket{function="BAPI_X",le="0.01"} 1', text)
+        self.assertIn('rfc_seconds_bucket{function="BAPI_X",le="0.1"} 3', text)
+        self.assertIn('rfc_seconds_bucket{function="BAPI_X",le="1"} 4', text)
+        self.assertIn('rfc_seconds_bucket{function="BAPI_X",le="+Inf"} 5', text)
+        self.assertIn('rfc_seconds_count{function="BAPI_X"} 5', text)
+        self.assertIn('rfc_seconds_sum{function="BAPI_X"} 5.605', text)
+
+    def test_counter_gauge_and_labels(self):
+        """测试计数器、瞬时值和标签值转义"""
+        counter = self.registry.counter("errors_total", "Errors", ("message",))
+        counter.labels('say "hi"\n').inc(2)
+        gauge = self.registry.gauge("in_flight", "In flight")
+        with gauge.track_inprogress():
+            self.assertIn("in_flight 1", self.registry.render())
+        text = self.registry.render()
+        self.assertIn('errors_total{message="say \\"hi\\"\\n"} 2', text)
+        self.assertIn("in_flight 0", text)
+
+        # 同名指标返回同一个对象，类型或标签不同时报错
+        self.assertIs(self.registry.counter("errors_total", "Errors", ("message",)), counter)
+        with self.assertRaises(ValueError):
+            self.registry.gauge("errors_total", "Errors")
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+
+    def test_collector(self):
+        """测试采集回调在输出时读取，出错的回调被跳过"""
+        stats = {"hits": 3}
+        self.registry.add_collector(lambda: [("cache_hits_total", "counter", "Hits", [({}, stats["hits"])])])
+        self.registry.add_collector(lambda: 1 / 0)
+        stats["hits"] = 7
+        self.assertIn("cache_hits_total 7", self.registry.render())
+
+    def test_instrument_app(self):
+        """测试请求耗时按路由模板分组，未匹配的路由和未处理的异常也被记录"""
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            return {"id": item_id}
+
+        @app.get("/broken")
+        async def broken():
+            raise RuntimeError("boom")
+
+        instrument_app(app, registry=self.registry, prefix="test_http")
+        client = TestClient(app, raise_server_exceptions=False)
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+        self.assertEqual(client.get("/broken").status_code, 500)
+        response = client.get("/metrics")
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('test_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2',
+                      response.text)
+        self.assertIn('test_http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1',
+                      response.text)
+        self.assertIn('test_http_request_duration_seconds_count{method="GET",route="/broken",status="500"} 1',
+                      response.text)
+        # 渲染时 /metrics 请求本身仍在处理中
+        self.assertIn("test_http_requests_in_flight 1", response.text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import time
+import unittest
+from typing import List
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from app.core.profiling import instrument_profiling
+
+class _Row(BaseModel):
+    id: int
+    message: str
+
+class TestProfiling(unittest.TestCase):
+    """慢请求记录测试类"""
+
+    def test_slow_request_phases(self):
+        """测试慢请求分别记录依赖解析、路由函数和序列化耗时，快请求不记录"""
+        app = FastAPI()
+
+        def slow_auth():
+            time.sleep(0.03)
+
+        @app.get("/logs", response_model=List[_Row])
+        def list_logs(limit: int = 10, auth: None = Depends(slow_auth)):
+            return [{"id": i, "message": "步骤执行完成"} for i in range(limit)]
+
+        @app.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+        instrument_profiling(app, token="secret", slow_request_ms=20)
+        client = TestClient(app)
+        self.assertEqual(len(client.get("/logs", params={"limit": 1000}).json()), 1000)
+        client.get("/health")
+
+        body = client.get("/debug/slow-requests", headers={"X-Admin-Token": "secret"}).json()
+        self.assertEqual(body["threshold_ms"], 20)
+        self.assertEqual(len(body["requests"]), 1)
+        record = body["requests"][0]
+        self.assertEqual(record["route"], "/logs")
+        self.assertEqual(record["query"], "limit=1000")
+        self.assertGreaterEqual(record["phases"]["dependencies"], 30)
+        self.assertGreater(record["phases"]["serialization"], 0)
+        self.assertGreaterEqual(record["duration_ms"], sum(record["phases"].values()) - 0.01)
+
+        filtered = client.get("/debug/slow-requests", params={"route": "/other"},
+                              headers={"X-Admin-Token": "secret"}).json()
+        self.assertEqual(filtered["requests"], [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,16 @@
+import shutil
+import tempfile
+import time
 import unittest
-from app.services.rag_service import RAGService
-from app.schemas.knowledge import KnowledgeItemCreate
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.routes import knowledge
+from app.services.rag_service import RAGService, chunk_key
+from app.services.ann_index import IVFIndex
+from app.services.embedding_service import HashingEmbedder
+from app.services.ingestion_service import IngestionPipeline, chunk_text
+from app.schemas.knowledge import KnowledgeItemCreate, KnowledgeItemUpdate
 
 class TestRAGService(unittest.TestCase):
     """RAG 服务测试类"""
@@ -131,5 +141,301 @@ class TestRAGService(unittest.TestCase):
         self.assertGreater(len(results), 0)
         self.assertEqual(results[0]["title"], "销售订单处理")
 
+    def test_keyword_search_snippets(self):
+        """测试关键词检索返回命中分块的片段和偏移，不返回完整正文"""
+        content = "。".join(f"第{i}条一般说明" for i in range(300)) + "。库存调拨需要先创建转储订单。"
+        item = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="库存管理", content=content, category="mm", tags=["mm"]
+        ))
+        draft = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="转储订单草稿", content=content, category="mm"
+        ))
+        # 模拟尚未向量化的条目
+        self.rag_service.item_chunks.pop(draft.id, None)
+        
+        results = self.rag_service.search_knowledge("转储订单", 10)
+        self.assertEqual([r["id"] for r in results], [draft.id, item.id])
+        for result in results:
+            self.assertNotIn("content", result)
+            self.assertGreater(result["chunk_index"], 0)
+            self.assertIn("转储订单", content[result["start"]:result["end"]])
+            self.assertIn("转储订单", result["snippet"])
+            self.assertLess(len(result["snippet"]), len(content))
+        
+        # 只有标题命中时返回第一个分块
+        results = self.rag_service.search_knowledge("库存管理", 10)
+        self.assertEqual((results[0]["chunk_index"], results[0]["start"]), (0, 0))
+
+    def test_search_route(self):
+        """测试搜索接口在线程池中执行检索，无效模式返回 400"""
+        self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="销售订单处理", content="如何处理销售订单", category="sales", tags=["sales"]
+        ))
+        original = knowledge.rag_service
+        knowledge.rag_service = self.rag_service
+        self.addCleanup(setattr, knowledge, "rag_service", original)
+        app = FastAPI()
+        app.include_router(knowledge.router, prefix="/knowledge")
+        client = TestClient(app)
+        
+        with mock.patch.object(knowledge, "run_in_threadpool", wraps=knowledge.run_in_threadpool) as spy:
+            response = client.post("/knowledge/search", params={"query": "销售", "mode": "hybrid"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["title"], "销售订单处理")
+        spy.assert_called_once()
+        self.assertEqual(client.post("/knowledge/search", params={"query": "销售", "mode": "fuzzy"}).status_code, 400)
+
+    def test_semantic_search(self):
+        """测试向量语义检索"""
+        item1 = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="销售订单处理",
+            content="使用 BAPI_SALESORDER_CREATEFROMDAT2 创建销售订单",
+            category="sales",
+            tags=["sales", "order"],
+            is_public=True
+        ))
+        item2 = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="采购订单处理",
+            content="使用 BAPI_PO_CREATE1 创建采购订单",
+            category="purchase",
+            tags=["purchase", "order"],
+            is_public=True
+        ))
+        
+        # 创建时即增量写入向量索引
+        self.assertTrue(self.rag_service.get_knowledge_item_by_id(item1.id).is_vectorized)
+        self.assertEqual(self.rag_service.vectorize_items([item1.id, item2.id]), 2)
+        
+        results = self.rag_service.search_knowledge("如何创建销售订单", 10, mode="semantic")
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]["id"], item1.id)
+        self.assertGreaterEqual(results[0]["score"], results[1]["score"])
+        
+        # 分类筛选
+        results = self.rag_service.search_knowledge("订单", 10, mode="semantic", category="purchase")
+        self.assertEqual([r["id"] for r in results], [item2.id])
+        
+        # 删除后从索引中移除
+        self.rag_service.delete_knowledge_item(item1.id)
+        results = self.rag_service.search_knowledge("销售订单", 10, mode="semantic")
+        self.assertEqual([r["id"] for r in results], [item2.id])
+    
+    def test_semantic_search_tenant_filter(self):
+        """测试语义检索的租户和公开范围筛选"""
+        private_item = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="内部定价规则",
+            content="租户私有的定价规则",
+            category="sales",
+            is_public=False
+        ))
+        private_item.tenant_id = "tenant_a"
+        public_item = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="通用定价规则",
+            content="公开的定价规则",
+            category="sales",
+            is_public=True
+        ))
+        self.rag_service.vectorize_items([private_item.id])
+        
+        results = self.rag_service.search_knowledge("定价规则", 10, mode="semantic", tenant_id="tenant_a")
+        self.assertEqual({r["id"] for r in results}, {private_item.id, public_item.id})
+        
+        results = self.rag_service.search_knowledge("定价规则", 10, mode="semantic", tenant_id="tenant_b")
+        self.assertEqual([r["id"] for r in results], [public_item.id])
+        
+        with self.assertRaises(ValueError):
+            self.rag_service.search_knowledge("定价规则", 10, mode="fuzzy")
+
+    def test_ivf_index_persistence(self):
+        """测试近似索引的增量写入、删除和内存映射加载"""
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        
+        rag_service = RAGService(vector_index=IVFIndex(dim=256, nlist=4, nprobe=4, train_size=16), index_dir=index_dir)
+        items = [
+            rag_service.create_knowledge_item(KnowledgeItemCreate(
+                title=f"物料主数据 {i}",
+                content=f"物料 MAT{i:05d} 的维护说明",
+                category="material"
+            ))
+            for i in range(32)
+        ]
+        self.assertTrue(rag_service.vector_index.is_trained)
+        
+        rag_service.delete_knowledge_item(items[0].id)
+        self.assertNotIn(items[0].id, rag_service.vector_index)
+        self.assertTrue(rag_service.save_index())
+        
+        # 重新启动后从索引目录加载
+        reloaded = RAGService(index_dir=index_dir)
+        self.assertIsInstance(reloaded.vector_index, IVFIndex)
+        self.assertEqual(len(reloaded.vector_index), 31)
+        
+        query = rag_service.embedder(["物料 MAT00007 的维护说明"])[0]
+        hits = reloaded.vector_index.search(query, 1)
+        self.assertEqual(hits[0][0], chunk_key(items[7].id, 0))
+
+        # 条目和分块随索引一起恢复，语义和关键词检索都能返回结果
+        self.assertEqual(len(reloaded.knowledge_items), 31)
+        self.assertNotIn(items[0].id, reloaded.knowledge_items)
+        for mode in ("semantic", "keyword"):
+            results = reloaded.search_knowledge("物料 MAT00007 的维护说明", 1, mode=mode)
+            self.assertEqual(results[0]["id"], items[7].id)
+
+    def test_ann_index_from_env(self):
+        """测试按环境变量创建 IVF 近似索引，重启后加载的索引沿用配置的 nprobe"""
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        env = {"KNOWLEDGE_INDEX_DIR": index_dir, "KNOWLEDGE_ANN_NLIST": "4", "KNOWLEDGE_ANN_NPROBE": "2"}
+        with mock.patch.dict("os.environ", env):
+            rag_service = RAGService.from_env()
+        self.assertIsInstance(rag_service.vector_index, IVFIndex)
+        self.assertEqual((rag_service.vector_index.nlist, rag_service.vector_index.nprobe), (4, 2))
+        
+        items = [
+            rag_service.create_knowledge_item(KnowledgeItemCreate(
+                title=f"物料 MAT{i:05d}", content=f"物料 MAT{i:05d} 的维护说明", category="mm"
+            ))
+            for i in range(300)
+        ]
+        self.assertTrue(rag_service.vector_index.is_trained)
+        results = rag_service.search_knowledge("物料 MAT00042 的维护说明", 1, mode="semantic")
+        self.assertEqual(results[0]["id"], items[42].id)
+        self.assertTrue(rag_service.save_index())
+        
+        with mock.patch.dict("os.environ", dict(env, KNOWLEDGE_ANN_NPROBE="4")):
+            reloaded = RAGService.from_env()
+        self.assertIsInstance(reloaded.vector_index, IVFIndex)
+        self.assertEqual(reloaded.vector_index.nprobe, 4)
+        self.assertEqual(len(reloaded.vector_index), 300)
+        
+        with mock.patch.dict("os.environ", {"KNOWLEDGE_ANN_NLIST": "0"}):
+            with self.assertRaises(ValueError):
+                RAGService.from_env()
+    
+    def test_chunk_text(self):
+        """测试正文分块的重叠和偏移"""
+        text = "。".join(f"第{i}句说明" for i in range(200))
+        chunks = chunk_text(text, chunk_size=100, overlap=20)
+        
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(chunks[0].start, 0)
+        self.assertEqual(chunks[-1].end, len(text))
+        for prev, chunk in zip(chunks, chunks[1:]):
+            self.assertLess(chunk.start, prev.end)
+            self.assertEqual(chunk.text, text[chunk.start:chunk.end])
+    
+    def test_update_reembeds_changed_chunks_only(self):
+        """测试更新条目时只重新嵌入变化的分块"""
+        embedded = []
+        embedder = HashingEmbedder()
+        
+        def counting_embedder(texts):
+            embedded.extend(texts)
+            return embedder(texts)
+        
+        counting_embedder.dim = embedder.dim
+        rag_service = RAGService(
+            embedder=counting_embedder,
+            ingestion=IngestionPipeline(counting_embedder, chunk_size=50, chunk_overlap=0)
+        )
+        content = "".join(f"段落{i}的内容说明文字。" for i in range(20))
+        item = rag_service.create_knowledge_item(KnowledgeItemCreate(title="长文档", content=content, category="doc"))
+        total_chunks = len(rag_service.item_chunks[item.id])
+        self.assertEqual(len(embedded), total_chunks)
+        
+        # 只修改最后一段
+        embedded.clear()
+        rag_service.update_knowledge_item(item.id, KnowledgeItemUpdate(content=content + "新增内容。"))
+        self.assertEqual(len(embedded), 1)
+        
+        status = rag_service.get_vectorization_status(item.id)
+        self.assertEqual(status.status, "completed")
+        self.assertEqual(status.reused_chunks, status.total_chunks - 1)
+    
+    def test_bulk_create_vectorizes_in_background(self):
+        """测试批量创建后在后台完成向量化"""
+        items = self.rag_service.create_knowledge_items([
+            KnowledgeItemCreate(title=f"批量条目 {i}", content=f"批量导入的文档 {i}", category="bulk")
+            for i in range(50)
+        ])
+        self.rag_service.ingestion.shutdown(wait=True)
+        
+        for item in items:
+            self.assertTrue(item.is_vectorized)
+            self.assertEqual(self.rag_service.get_vectorization_status(item.id).status, "completed")
+        results = self.rag_service.search_knowledge("批量导入的文档 7", 1, mode="semantic")
+        self.assertEqual(results[0]["id"], items[7].id)
+
+    def test_hybrid_retrieve(self):
+        """测试混合检索的融合结果和分块片段"""
+        long_content = "物料主数据维护说明。" * 80 + "使用事务码 MM02 修改物料的采购视图。" + "其他说明。" * 80
+        item1 = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="物料主数据", content=long_content, category="material"
+        ))
+        item2 = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="客户主数据", content="使用事务码 XD02 修改客户主数据。", category="sales"
+        ))
+        
+        results = self.rag_service.search_knowledge("MM02 采购视图", 10, mode="hybrid")
+        self.assertEqual(results[0]["id"], item1.id)
+        self.assertIn("lexical", results[0]["sources"])
+        self.assertNotIn("content", results[0])
+        self.assertIn("mm02", results[0]["snippet"].lower())
+        self.assertLessEqual(len(results[0]["snippet"]), 200)
+        self.assertEqual(
+            long_content[results[0]["start"]:results[0]["end"]],
+            self.rag_service.item_chunks[item1.id][results[0]["chunk_index"]].text
+        )
+        
+        # 分类筛选同时作用于两路检索
+        results = self.rag_service.retrieve("事务码", 10, category="sales")
+        self.assertEqual([r["id"] for r in results], [item2.id])
+    
+    def test_hybrid_retrieve_time_budget(self):
+        """测试超出时间预算的检索路被取消"""
+        self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="销售订单", content="创建销售订单", category="sales"
+        ))
+        
+        embedder = self.rag_service.embedder
+        
+        def slow_embedder(texts):
+            time.sleep(0.2)
+            return embedder(texts)
+        
+        self.rag_service.embedder = slow_embedder
+        results = self.rag_service.retrieve("销售订单", 10, time_budget_ms=50)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["sources"], ["lexical"])
+    
+    def test_search_cache(self):
+        """测试搜索缓存命中以及写入后失效"""
+        item1 = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="销售订单", content="创建销售订单", category="sales", is_public=False
+        ))
+        item1.tenant_id = "tenant_a"
+        self.rag_service.vectorize_items([item1.id])
+        
+        first = self.rag_service.search_knowledge("销售订单", 10, mode="hybrid", tenant_id="tenant_a")
+        second = self.rag_service.search_knowledge("  销售订单 ", 10, mode="hybrid", tenant_id="tenant_a")
+        self.assertEqual([r["id"] for r in first], [item1.id])
+        self.assertIs(first, second)
+        stats = self.rag_service.get_search_cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        
+        # 其他租户的私有条目不影响该租户的缓存
+        other = self.rag_service.create_knowledge_item(KnowledgeItemCreate(
+            title="销售订单", content="其他租户", category="sales", is_public=False
+        ))
+        other.tenant_id = "tenant_b"
+        self.rag_service.vectorize_items([other.id])
+        self.assertIs(self.rag_service.search_knowledge("销售订单", 10, mode="hybrid", tenant_id="tenant_a"), first)
+        
+        # 本租户条目删除后重新检索
+        self.rag_service.delete_knowledge_item(item1.id)
+        self.assertEqual(self.rag_service.search_knowledge("销售订单", 10, mode="hybrid", tenant_id="tenant_a"), [])
+
 if __name__ == "__main__":
     unittest.main()
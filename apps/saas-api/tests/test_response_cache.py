@@ -0,0 +1,120 @@
+import gzip
+import unittest
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.routes import logs, templates
+from app.core import response_cache
+from app.core.metrics import Registry
+from app.core.response_cache import ResponseCache, instrument_response_cache
+from app.schemas.log import LogCreate
+from app.schemas.template import ProcessTemplateCreate
+from app.services.log_service import LogService
+from app.services.template_service import TemplateService
+
+class TestResponseCache(unittest.TestCase):
+    """响应缓存测试类"""
+
+    def setUp(self):
+        """测试前准备：模板和日志路由使用新的服务，启用响应缓存"""
+        self.template_service = TemplateService()
+        self.log_service = LogService()
+        for i in range(40):
+            self.create_template(f"销售订单模板 {i}")
+            self.log_service.create_log(LogCreate(tenant_id="tenant-1", level="info", message=f"步骤执行完成 {i}"))
+        self.originals = (templates.template_service, logs.log_service)
+        templates.template_service = self.template_service
+        logs.log_service = self.log_service
+
+        self.cache = ResponseCache()
+        self.cache.add_route("/templates/", ttl=30, generation=lambda: self.template_service.generation)
+        self.cache.add_route("/logs/aggregate/stats", ttl=10, generation=lambda: self.log_service.generation)
+        self.registry = Registry()
+        app = FastAPI()
+        app.include_router(templates.router, prefix="/templates")
+        app.include_router(logs.router, prefix="/logs")
+        instrument_response_cache(app, self.cache, registry=self.registry)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        """测试后清理"""
+        templates.template_service, logs.log_service = self.originals
+
+    def create_template(self, name: str):
+        return self.template_service.create_template(ProcessTemplateCreate(
+            name=name, category="SD", dsl={"steps": [{"id": "start", "type": "input"}]}
+        ))
+
+    def test_hit_skips_service(self):
+        """测试命中缓存时不调用服务方法，参数顺序不同也命中同一条目"""
+        first = self.client.get("/templates/", params={"limit": 10, "category": "SD"})
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("etag", first.headers)
+        with mock.patch.object(self.template_service, "get_templates", wraps=self.template_service.get_templates) as spy:
+            second = self.client.get("/templates/?category=SD&limit=10")
+            spy.assert_not_called()
+            self.assertEqual(second.json(), first.json())
+            # 测试客户端默认接受 gzip，命中时返回预压缩的表示
+            self.assertEqual(second.headers["etag"], first.headers["etag"][:-1] + '-gzip"')
+
+            # 不同租户和不同参数分别缓存
+            self.client.get("/templates/?category=SD&limit=10", headers={"X-Tenant-Id": "tenant-2"})
+            self.client.get("/templates/?category=SD&limit=11")
+            self.assertEqual(spy.call_count, 2)
+
+    def test_conditional_request(self):
+        """测试 If-None-Match 命中时返回 304，数据变化后返回新内容"""
+        etag = self.client.get("/logs/aggregate/stats").headers["etag"]
+        with mock.patch.object(self.log_service, "get_log_stats") as spy:
+            response = self.client.get("/logs/aggregate/stats", headers={"If-None-Match": etag})
+            spy.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["etag"], etag)
+        self.assertEqual(self.cache.stats()["not_modified"], 1)
+
+        self.log_service.create_log(LogCreate(tenant_id="tenant-1", level="error", message="订单创建失败"))
+        response = self.client.get("/logs/aggregate/stats", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], etag)
+        self.assertEqual(response.json()["total_logs"], 41)
+
+    def test_ttl_changes_etag(self):
+        """测试超过 TTL 后 ETag 改变，重新运行服务方法"""
+        etag = self.client.get("/templates/").headers["etag"]
+        now = response_cache.time.time()
+        with mock.patch.object(response_cache.time, "time", return_value=now + 31):
+            response = self.client.get("/templates/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], etag)
+
+    def test_precompressed_body(self):
+        """测试缓存的响应体按 Accept-Encoding 返回预压缩的 gzip"""
+        body = self.client.get("/templates/").content
+        response = self.client.get("/templates/", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertTrue(response.headers["etag"].endswith('-gzip"'))
+        self.assertEqual(response.content, body)
+        self.assertLess(int(response.headers["content-length"]), len(body))
+        entry = self.cache.get(response.headers["etag"].strip('"')[:-len("-gzip")])
+        self.assertEqual(gzip.decompress(entry.bodies["gzip"]), body)
+
+        response = self.client.get("/templates/", headers={"Accept-Encoding": "gzip;q=0"})
+        self.assertNotIn("content-encoding", response.headers)
+
+        # 同一资源任一编码的 ETag 都可以用于条件请求
+        response = self.client.get("/templates/", headers={"If-None-Match": response.headers["etag"],
+                                                            "Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 304)
+        self.assertTrue(response.headers["etag"].endswith('-gzip"'))
+
+    def test_metrics(self):
+        """测试按路由和结果计数"""
+        for _ in range(3):
+            self.client.get("/templates/")
+        rendered = self.registry.render()
+        self.assertIn('http_response_cache_requests_total{route="/templates/",result="miss"} 1', rendered)
+        self.assertIn('http_response_cache_requests_total{route="/templates/",result="hit"} 2', rendered)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import importlib
+import json
+import sys
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from app.api.routes import logs
+from app.core import serialization
+from app.schemas.knowledge import KnowledgeItem
+from app.schemas.log import Log, LogCreate, LogSearch
+from app.services.log_service import LogService
+
+class TestSerialization(unittest.TestCase):
+    """响应序列化测试类"""
+
+    def setUp(self):
+        """测试前准备：日志路由使用新的日志服务"""
+        self.log_service = LogService()
+        for i in range(1200):
+            self.log_service.create_log(LogCreate(
+                tenant_id=f"tenant-{i % 3}",
+                template_id="template-1",
+                level="error" if i % 10 == 0 else "info",
+                message=f"步骤执行完成 {i}",
+                details={"attempt": i, "tags": ["SD", "订单"]} if i % 2 else None
+            ))
+        self.original = logs.log_service
+        logs.log_service = self.log_service
+        app = FastAPI()
+        app.include_router(logs.router, prefix="/logs")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        """测试后清理"""
+        logs.log_service = self.original
+
+    def test_dumps_matches_jsonable_encoder(self):
+        """测试序列化结果与 FastAPI 默认的编码一致"""
+        rows = self.log_service.get_logs(limit=50)
+        item = KnowledgeItem(
+            id="k1", title="销售订单", content="创建销售订单", category="SD", tags={"SD"},
+            created_at=datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc), updated_at=datetime(2024, 5, 1, 8, 30, 0, 123)
+        )
+        for value in (rows, item, {"page": rows[:3], "total": 3, 1: None}):
+            self.assertEqual(json.loads(serialization.dumps(value)), json.loads(json.dumps(jsonable_encoder(value))))
+
+    def test_extra_attributes_are_dropped(self):
+        """测试 construct 构造时带入的多余属性不会输出"""
+        log = Log.construct(id="1", tenant_id="t", level="info", message="m", timestamp=datetime(2024, 1, 1),
+                            internal_code=7)
+        self.assertNotIn("internal_code", json.loads(serialization.dumps([log]))[0])
+
+    def test_list_routes(self):
+        """测试列表接口的内容与 response_model 一致，长列表流式输出"""
+        response = self.client.get("/logs/", params={"limit": 100, "level": "error"})
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertIn("content-length", response.headers)
+        expected = jsonable_encoder(self.log_service.get_logs(limit=100, level="error"))
+        self.assertEqual(response.json(), expected)
+
+        response = self.client.post("/logs/search", json={"limit": 1000})
+        self.assertNotIn("content-length", response.headers)
+        rows = response.json()
+        self.assertEqual(len(rows), 1000)
+        self.assertEqual(rows, jsonable_encoder(self.log_service.search_logs(LogSearch(limit=1000))))
+
+    def test_stdlib_fallback(self):
+        """测试未安装 orjson 时使用标准库得到相同结果"""
+        rows = self.log_service.get_logs(limit=20)
+        expected = json.loads(serialization.dumps(rows))
+        try:
+            with mock.patch.dict(sys.modules, {"orjson": None}):
+                fallback = importlib.reload(serialization)
+                self.assertIsNone(fallback.orjson)
+                self.assertEqual(json.loads(fallback.dumps(rows)), expected)
+        finally:
+            importlib.reload(serialization)
+
+if __name__ == "__main__":
+    unittest.main()
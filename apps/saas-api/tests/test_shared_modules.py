@@ -0,0 +1,31 @@
+import os
+import unittest
+
+# 两个应用各自保留一份的公共模块，需逐字节保持一致
+SHARED_MODULES = [
+    "app/core/metrics.py",
+    "app/core/tracing.py",
+    "app/core/profiling.py",
+    "app/core/serialization.py",
+    "app/services/log_store.py",
+    "app/services/dsl_compiler.py",
+]
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OTHER_APP_DIR = os.path.join(os.path.dirname(APP_DIR), "mcp-server")
+
+class TestSharedModules(unittest.TestCase):
+    """公共模块一致性测试类"""
+
+    def test_copies_identical(self):
+        """测试与 mcp-server 中的公共模块副本完全一致"""
+        for path in SHARED_MODULES:
+            with self.subTest(path=path):
+                with open(os.path.join(APP_DIR, path), "rb") as f:
+                    ours = f.read()
+                with open(os.path.join(OTHER_APP_DIR, path), "rb") as f:
+                    theirs = f.read()
+                self.assertTrue(ours == theirs, f"{path} 在 saas-api 与 mcp-server 中不一致，请两处同步修改")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from app.services.template_service import TemplateService
+from app.services.rag_service import RAGService
+from app.services.sync_service import SyncService
+from app.schemas.template import ProcessTemplateCreate, ProcessTemplateUpdate
+from app.schemas.knowledge import KnowledgeItemCreate, KnowledgeItemUpdate
+
+DSL = {"steps": [{"id": "start", "type": "input", "next": "end"}, {"id": "end", "type": "output"}]}
+
+class TestSyncService(unittest.TestCase):
+    """增量同步服务测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.template_service = TemplateService()
+        self.rag_service = RAGService()
+        self.sync_service = SyncService(self.template_service, self.rag_service)
+
+    def _template(self, name):
+        template = self.template_service.create_template(ProcessTemplateCreate(name=name, category="sales", dsl=DSL))
+        self.template_service.publish_template(template.id)
+        return template
+
+    def test_changes_since_watermark(self):
+        """测试按版本水位返回变更，每个实体只返回最新状态"""
+        draft = self.template_service.create_template(ProcessTemplateCreate(name="草稿", category="sales", dsl=DSL))
+        order = self._template("Sales Order")
+        item = self.rag_service.create_knowledge_item(KnowledgeItemCreate(title="BAPI", content="销售订单", category="sap"))
+
+        changes = self.sync_service.get_changes(0)
+        # 未发布的模板不下发，从头同步时也不需要删除标记
+        self.assertEqual([(c.kind, c.id, c.op) for c in changes.changes],
+                         [("template", order.id, "upsert"), ("knowledge", item.id, "upsert")])
+        self.assertEqual(changes.version, self.sync_service.version)
+        self.assertFalse(changes.has_more)
+
+        self.template_service.update_template(order.id, ProcessTemplateUpdate(description="新描述"))
+        self.template_service.unpublish_template(draft.id)
+        self.rag_service.delete_knowledge_item(item.id)
+        delta = self.sync_service.get_changes(changes.version)
+        self.assertEqual([(c.kind, c.id, c.op) for c in delta.changes], [
+            ("template", order.id, "upsert"),
+            ("template", draft.id, "delete"),
+            ("knowledge", item.id, "delete"),
+        ])
+        self.assertEqual(delta.changes[0].data["description"], "新描述")
+        self.assertEqual(self.sync_service.get_changes(delta.version).changes, [])
+
+    def test_pagination(self):
+        """测试分页拉取"""
+        templates = [self._template(f"模板 {i}") for i in range(5)]
+        seen, since = [], 0
+        while True:
+            page = self.sync_service.get_changes(since, limit=2)
+            seen.extend(c.id for c in page.changes)
+            since = page.version
+            if not page.has_more:
+                break
+        self.assertEqual(seen, [t.id for t in templates])
+
+    def test_tenant_visibility(self):
+        """测试私有内容只下发给所属租户"""
+        item = self.rag_service.create_knowledge_item(KnowledgeItemCreate(title="私有", content="内容", category="sap", is_public=False))
+        item.tenant_id = "tenant-1"
+        self.assertEqual(self.sync_service.get_changes(0).changes, [])
+        self.assertEqual([c.id for c in self.sync_service.get_changes(0, tenant_id="tenant-1").changes], [item.id])
+
+        # 改为其他租户可见后，原租户收到删除标记
+        since = self.sync_service.version
+        self.rag_service.update_knowledge_item(item.id, KnowledgeItemUpdate(category="fi"))
+        item.tenant_id = "tenant-2"
+        delta = self.sync_service.get_changes(since, tenant_id="tenant-1")
+        self.assertEqual([(c.id, c.op) for c in delta.changes], [(item.id, "delete")])
+
+    def test_reset_on_unknown_feed(self):
+        """测试变更流ID不一致或水位超前时从头同步"""
+        order = self._template("Sales Order")
+        changes = self.sync_service.get_changes(100, feed_id=self.sync_service.feed_id)
+        self.assertTrue(changes.reset)
+        self.assertEqual([c.id for c in changes.changes], [order.id])
+        changes = self.sync_service.get_changes(self.sync_service.version, feed_id="other")
+        self.assertTrue(changes.reset)
+        self.assertEqual(len(changes.changes), 1)
+
+    def test_compaction(self):
+        """测试压缩后不影响变更结果"""
+        order = self._template("Sales Order")
+        for i in range(3000):
+            self.template_service.update_template(order.id, ProcessTemplateUpdate(description=f"描述 {i}"))
+        self.assertLess(len(self.sync_service._log_keys), 1100)
+        changes = self.sync_service.get_changes(0)
+        self.assertEqual(len(changes.changes), 1)
+        self.assertEqual(changes.changes[0].data["description"], "描述 2999")
+
+if __name__ == "__main__":
+    unittest.main()
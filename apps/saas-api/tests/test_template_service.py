@@ -0,0 +1,150 @@
+import copy
+import unittest
+from app.services.template_service import TemplateService
+from app.schemas.template import ProcessTemplateCreate, ProcessTemplateUpdate
+
+class TestTemplateService(unittest.TestCase):
+    """流程模板服务测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.template_service = TemplateService()
+    
+    def _create(self, name, category, description=None, tags=None, usage_count=0):
+        template = self.template_service.create_template(ProcessTemplateCreate(
+            name=name,
+            description=description,
+            category=category,
+            dsl={"steps": [{"id": "start", "type": "input", "next": "end"}, {"id": "end", "type": "output"}]},
+            tags=tags or []
+        ))
+        if usage_count:
+            template.usage_count = usage_count
+            self.template_service.catalog.add(template)
+        return template
+    
+    def test_get_templates_filters(self):
+        """测试分类筛选和关键词搜索（描述为空的模板不报错）"""
+        order = self._create("Sales Order", "sales", description=None)
+        delivery = self._create("外向交货", "logistics", description="根据销售订单创建交货")
+        self._create("Purchase Order", "purchasing", description="采购申请转采购订单")
+        
+        templates = self.template_service.get_templates(category="sales")
+        self.assertEqual([t.id for t in templates], [order.id])
+        
+        templates = self.template_service.get_templates(search="销售订单")
+        self.assertEqual([t.id for t in templates], [delivery.id])
+        
+        # 最后一个英文词元按前缀匹配
+        templates = self.template_service.get_templates(search="sal")
+        self.assertEqual([t.id for t in templates], [order.id])
+    
+    def test_search_templates_cursor_paging(self):
+        """测试按使用次数排序的游标分页"""
+        created = [self._create(f"Template {i}", "sales", usage_count=i) for i in range(5)]
+        
+        page = self.template_service.search_templates(limit=2)
+        self.assertEqual([t.id for t in page.items], [created[4].id, created[3].id])
+        self.assertEqual(page.total, 5)
+        
+        seen = [t.id for t in page.items]
+        while page.next_cursor:
+            page = self.template_service.search_templates(cursor=page.next_cursor, limit=2)
+            seen.extend(t.id for t in page.items)
+        self.assertEqual(seen, [t.id for t in reversed(created)])
+        
+        with self.assertRaises(ValueError):
+            self.template_service.search_templates(cursor="not-a-cursor")
+        with self.assertRaises(ValueError):
+            self.template_service.search_templates(sort="name")
+    
+    def test_search_templates_facets(self):
+        """测试分面计数以及更新、发布、删除后的索引同步"""
+        order = self._create("Sales Order", "sales")
+        returns = self._create("Sales Return", "sales")
+        self._create("Goods Receipt", "logistics")
+        self.template_service.publish_template(order.id)
+        
+        page = self.template_service.search_templates(category="sales", status="published")
+        self.assertEqual([t.id for t in page.items], [order.id])
+        self.assertEqual(page.facets["category"], {"sales": 1})
+        self.assertEqual(page.facets["status"], {"published": 1, "draft": 1})
+        
+        self.template_service.update_template(returns.id, ProcessTemplateUpdate(category="logistics"))
+        self.template_service.delete_template(order.id)
+        page = self.template_service.search_templates(search="sales")
+        self.assertEqual([t.id for t in page.items], [returns.id])
+        self.assertEqual(page.facets["category"], {"logistics": 1})
+    
+    def test_publish_compiles_dsl(self):
+        """测试发布时编译 DSL，无效 DSL 被拒绝"""
+        template = self._create("Sales Order", "sales")
+        self.assertTrue(self.template_service.publish_template(template.id))
+        plan = self.template_service.get_execution_plan(template.id)
+        self.assertEqual([step.id for step in plan.steps], ["start", "end"])
+        self.assertEqual(plan.content_hash, template.dsl_hash)
+        
+        with self.assertRaises(ValueError):
+            self.template_service.update_template(template.id, ProcessTemplateUpdate(dsl={"nodes": []}))
+        self.assertIs(self.template_service.get_execution_plan(template.id), plan)
+        
+        self.template_service.unpublish_template(template.id)
+        self.assertIsNone(self.template_service.get_execution_plan(template.id))
+        
+        invalid = self.template_service.create_template(ProcessTemplateCreate(
+            name="Invalid", category="sales", dsl={"steps": [{"id": "call", "type": "mcp_call", "config": {}}]}
+        ))
+        with self.assertRaises(ValueError):
+            self.template_service.publish_template(invalid.id)
+        self.assertEqual(invalid.status, "draft")
+    
+    def test_template_versions_and_diff(self):
+        """测试内容寻址的版本历史和结构差异"""
+        template = self._create("Sales Order", "sales")
+        dsl = template.dsl
+        new_dsl = {"steps": [dict(dsl["steps"][0], next="check"), {"id": "check", "type": "condition", "config": {}, "next": "end"}, dsl["steps"][1]]}
+        
+        self.template_service.update_template(template.id, ProcessTemplateUpdate(dsl=new_dsl, version="1.1"))
+        # DSL 和版本号都未变化时不生成新版本
+        self.template_service.update_template(template.id, ProcessTemplateUpdate(dsl=new_dsl))
+        
+        versions = self.template_service.get_template_versions(template.id)
+        self.assertEqual([(v.number, v.version) for v in versions], [(1, "1.0"), (2, "1.1")])
+        self.assertEqual(template.revision, 2)
+        self.assertEqual(self.template_service.get_template_version(template.id, 1).dsl, dsl)
+        
+        changes = self.template_service.diff_template_versions(template.id, 1, 2)
+        self.assertEqual(
+            [(c.op, c.path) for c in changes],
+            [("replace", "/steps/0/next"), ("replace", "/steps/1/id"), ("replace", "/steps/1/type"),
+             ("add", "/steps/1/config"), ("add", "/steps/1/next"), ("add", "/steps/2")]
+        )
+        self.assertIsNone(self.template_service.diff_template_versions(template.id, 1, 3))
+    
+    def test_clone_shares_storage(self):
+        """测试克隆和版本共享相同的 DSL 子树，删除后回收"""
+        template = self._create("Sales Order", "sales")
+        objects = len(self.template_service.store)
+        
+        clones = [self.template_service.clone_template(template.id, tenant_id=f"tenant-{i}") for i in range(10)]
+        self.assertEqual(len(self.template_service.store), objects)
+        self.assertEqual(clones[0].dsl_hash, template.dsl_hash)
+        # 同一内容只物化一份 DSL，模板和克隆共用
+        self.assertIs(clones[0].dsl, template.dsl)
+        self.assertFalse(clones[0].is_public)
+        
+        # 只修改一个步骤时只新增该步骤及其祖先节点
+        dsl = copy.deepcopy(clones[0].dsl)
+        dsl["steps"][1]["name"] = "结束"
+        self.template_service.update_template(clones[0].id, ProcessTemplateUpdate(dsl=dsl))
+        self.assertEqual(len(self.template_service.store), objects + 3)
+        self.assertNotIn("name", template.dsl["steps"][1])
+        
+        for clone in clones:
+            self.template_service.delete_template(clone.id)
+        self.assertEqual(len(self.template_service.store), objects)
+        self.template_service.delete_template(template.id)
+        self.assertEqual(len(self.template_service.store), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.tracing import AdaptiveSampler, Tracer, instrument_tracing
+
+class TestTracing(unittest.TestCase):
+    """链路追踪测试类"""
+
+    def test_server_span_continues_remote_trace(self):
+        """测试请求的 server Span 挂在调用方的 traceparent 下，并可通过 /traces 查询"""
+        tracer = Tracer(sampler=AdaptiveSampler(target_per_second=float("inf")))
+        app = FastAPI()
+
+        @app.post("/logs/bulk")
+        async def bulk():
+            with tracer.span("logs.store", {"log.count": 2}):
+                return {"accepted": 2}
+
+        @app.get("/fail")
+        async def fail():
+            raise RuntimeError("boom")
+
+        instrument_tracing(app, tracer)
+        client = TestClient(app, raise_server_exceptions=False)
+        trace_id, parent_id = "0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331"
+        client.post("/logs/bulk", headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+        client.get("/fail")
+
+        traces = client.get("/traces", params={"trace_id": trace_id}).json()
+        self.assertEqual(len(traces), 1)
+        server, store = traces[0]["spans"]
+        self.assertEqual(server["name"], "POST /logs/bulk")
+        self.assertEqual(server["kind"], "server")
+        self.assertEqual(server["parent_id"], parent_id)
+        self.assertEqual(server["attributes"]["http.status_code"], 200)
+        self.assertEqual(store["parent_id"], server["span_id"])
+
+        failed = client.get("/traces", params={"name": "GET /fail"}).json()[0]
+        self.assertTrue(failed["error"])
+        self.assertEqual(failed["spans"][0]["error"], "RuntimeError: boom")
+
+if __name__ == "__main__":
+    unittest.main()
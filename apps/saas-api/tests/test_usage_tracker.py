@@ -0,0 +1,80 @@
+import threading
+import unittest
+from app.services.usage_tracker import UsageTracker
+from app.services.template_service import TemplateService
+from app.services.analytics_service import AnalyticsService
+from app.schemas.template import ProcessTemplateCreate
+
+class TestUsageTracker(unittest.TestCase):
+    """模板使用计数测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.template_service = TemplateService()
+        self.analytics_service = AnalyticsService(self.template_service)
+        self.templates = [
+            self.template_service.create_template(ProcessTemplateCreate(
+                name=f"Template {i}",
+                category="sales",
+                dsl={"steps": [{"id": "start", "type": "input"}]}
+            ))
+            for i in range(3)
+        ]
+    
+    def test_concurrent_record_and_flush(self):
+        """测试并发计数不丢失，并批量写回模板服务"""
+        template = self.templates[0]
+        
+        def worker(tenant_id):
+            for _ in range(1000):
+                self.template_service.record_usage(template.id, tenant_id)
+        
+        threads = [threading.Thread(target=worker, args=(f"tenant-{i % 2}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(template.usage_count, 0)
+        self.assertEqual(self.template_service.usage.flush(), {template.id: 8000})
+        self.assertEqual(template.usage_count, 8000)
+        self.assertEqual(self.template_service.usage.flush(), {})
+        self.assertFalse(self.template_service.record_usage("missing"))
+        
+        # 写回后按使用次数排序
+        page = self.template_service.search_templates(sort="usage")
+        self.assertEqual(page.items[0].id, template.id)
+    
+    def test_sliding_window_rate(self):
+        """测试滑动窗口内的使用速率"""
+        tracker = UsageTracker(window_seconds=60, bucket_seconds=10)
+        for second in range(0, 60, 2):
+            tracker.record("template-1", now=1000.0 + second)
+        
+        self.assertAlmostEqual(tracker.recent_rate("template-1", now=1059.0), 30.0)
+        # 窗口滑过后旧时间桶不再计入
+        self.assertAlmostEqual(tracker.recent_rate("template-1", now=1089.0), 15.0)
+        self.assertEqual(tracker.recent_rate("template-1", now=2000.0), 0.0)
+    
+    def test_get_template_usage(self):
+        """测试模板使用情况直接读取预先累计的计数"""
+        first, second, _ = self.templates
+        for _ in range(3):
+            self.template_service.record_usage(first.id, "tenant-a", duration=2.0)
+        self.template_service.record_usage(first.id, "tenant-b", duration=4.0)
+        self.template_service.record_usage(second.id, "tenant-a")
+        
+        usage = self.analytics_service.get_template_usage()
+        self.assertEqual([(u.template_id, u.usage_count) for u in usage], [(first.id, 4), (second.id, 1)])
+        self.assertEqual(usage[0].template_name, "Template 0")
+        self.assertAlmostEqual(usage[0].avg_duration, 2.5)
+        
+        usage = self.analytics_service.get_template_usage(tenant_id="tenant-b")
+        self.assertEqual([(u.template_id, u.usage_count) for u in usage], [(first.id, 1)])
+        
+        self.template_service.delete_template(first.id)
+        usage = self.analytics_service.get_template_usage(limit=10, sort="recent")
+        self.assertEqual([u.template_id for u in usage], [second.id])
+
+if __name__ == "__main__":
+    unittest.main()
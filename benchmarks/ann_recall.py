@@ -0,0 +1,108 @@
+"""
+近似最近邻索引召回率基准
+
+用带簇结构的合成向量对比 IVFIndex 与精确检索（VectorIndex），
+输出不同 nprobe 下的 recall@k、平均单次查询延迟和相对精确检索的加速比。
+
+用法：
+    python benchmarks/ann_recall.py --size 50000 --dim 128 --k 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "apps", "saas-api"))
+
+from app.services.vector_index import VectorIndex  # noqa: E402
+from app.services.ann_index import IVFIndex  # noqa: E402
+
+def make_corpus(size: int, dim: int, clusters: int, seed: int):
+    """生成带簇结构的合成向量，近似真实文档嵌入的分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(clusters, size=size)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(size, dim))
+    return vectors.astype(np.float32)
+
+def make_queries(corpus: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """在语料附近随机扰动生成查询"""
+    rng = np.random.default_rng(seed + 1)
+    picks = corpus[rng.integers(len(corpus), size=count)]
+    return (picks + 0.3 * rng.normal(size=picks.shape)).astype(np.float32)
+
+def timed_search(index, queries: np.ndarray, k: int):
+    """逐条查询，返回结果和平均单次延迟（毫秒）"""
+    start = time.perf_counter()
+    results = [index.search(query, k) for query in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall_at_k(exact, approx) -> float:
+    """approx 命中 exact 前 k 个结果的平均比例"""
+    total = 0.0
+    for truth, found in zip(exact, approx):
+        truth_keys = {key for key, _ in truth}
+        total += len(truth_keys & {key for key, _ in found}) / max(1, len(truth_keys))
+    return total / len(exact)
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF 索引召回率基准")
+    parser.add_argument("--size", type=int, default=50000, help="语料向量数")
+    parser.add_argument("--dim", type=int, default=128, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--k", type=int, default=10, help="返回数量")
+    parser.add_argument("--nlist", type=int, default=256, help="IVF 簇数量")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="待测 nprobe 列表")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.size, args.dim, clusters=max(args.nlist // 2, 8), seed=args.seed)
+    queries = make_queries(corpus, args.queries, args.seed)
+    keys = [f"doc-{i}" for i in range(args.size)]
+
+    exact_index = VectorIndex(args.dim)
+    exact_index.upsert_many(keys, corpus)
+
+    start = time.perf_counter()
+    ivf_index = IVFIndex(args.dim, nlist=args.nlist, train_size=args.size + 1)
+    ivf_index.upsert_many(keys, corpus)
+    ivf_index.train()
+    build_seconds = time.perf_counter() - start
+
+    exact, exact_ms = timed_search(exact_index, queries, args.k)
+    report = {
+        "size": args.size,
+        "dim": args.dim,
+        "k": args.k,
+        "nlist": ivf_index.nlist,
+        "build_seconds": round(build_seconds, 3),
+        "exact_latency_ms": round(exact_ms, 3),
+        "runs": []
+    }
+
+    print(f"语料 {args.size} x {args.dim}, nlist={ivf_index.nlist}, 构建 {build_seconds:.2f}s")
+    print(f"精确检索: {exact_ms:.3f} ms/query")
+    print(f"{'nprobe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>8}")
+    for nprobe in args.nprobe:
+        ivf_index.nprobe = nprobe
+        approx, approx_ms = timed_search(ivf_index, queries, args.k)
+        recall = recall_at_k(exact, approx)
+        speedup = exact_ms / approx_ms if approx_ms else float("inf")
+        report["runs"].append({
+            "nprobe": nprobe,
+            "recall": round(recall, 4),
+            "latency_ms": round(approx_ms, 3),
+            "speedup": round(speedup, 2)
+        })
+        print(f"{nprobe:>8} {recall:>10.4f} {approx_ms:>10.3f} {speedup:>7.1f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+基准测试公共工具
+
+场景函数完成数据准备后返回一个无参的待测操作，measure 负责预热、自动确定每轮调用次数并多轮计时。
+两个服务的代码都在顶层包 app 下，不能在同一个进程中导入，因此每个服务的场景
+（saas_api_bench.py、mcp_server_bench.py）各自在子进程中运行，结果以 JSON 交给 run.py 汇总和对比基线。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 数据规模档位，场景按档位取自己的参数
+SCALES = ("small", "medium", "large")
+
+# 默认回归阈值：中位耗时比基线慢 25% 以上视为回归
+DEFAULT_THRESHOLD = 0.25
+
+class Scenario(NamedTuple):
+    """一个基准场景"""
+    name: str
+    setup: Callable[[Any], Callable[[], Any]]  # 参数为档位对应的规模，返回待测操作
+    sizes: Dict[str, Any]                      # 档位 -> 规模参数
+    threshold: float                           # 回归阈值（相对基线的变慢比例）
+
+SCENARIOS: List[Scenario] = []
+
+def scenario(name: str, sizes: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD):
+    """
+    注册基准场景的装饰器
+
+    Args:
+        name: 场景名，结果和基线按名称加规模对应
+        sizes: 各档位的规模参数
+        threshold: 回归阈值，噪声较大的场景（如 HTTP）可放宽
+    """
+    def register(setup: Callable[[Any], Callable[[], Any]]):
+        SCENARIOS.append(Scenario(name, setup, sizes, threshold))
+        return setup
+    return register
+
+def measure(operation: Callable[[], Any], min_time: float = 0.2, rounds: int = 5) -> Dict[str, float]:
+    """
+    测量操作的单次耗时
+
+    先预热并按 min_time 确定每轮调用次数（与 timeit.autorange 相同的思路），
+    再计时 rounds 轮，每轮取平均单次耗时。
+
+    Args:
+        operation: 待测操作
+        min_time: 每轮的最短时长（秒）
+        rounds: 计时轮数
+
+    Returns:
+        单次耗时统计（微秒）和吞吐量
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number = number * 10 if elapsed < min_time / 10 else max(number + 1, int(number * min_time / elapsed) + 1)
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+
+    median = statistics.median(samples)
+    return {
+        "median_us": round(median, 3),
+        "min_us": round(min(samples), 3),
+        "max_us": round(max(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "ops_per_sec": round(1e6 / median, 1) if median else 0.0,
+        "calls_per_round": number,
+        "rounds": rounds,
+    }
+
+def run_scenarios(app: str, scale: str, pattern: Optional[str], min_time: float, rounds: int) -> List[Dict[str, Any]]:
+    """
+    运行当前进程中注册的场景
+
+    Args:
+        app: 服务名（写入结果）
+        scale: 数据规模档位
+        pattern: 只运行名称包含该字符串的场景
+        min_time: 每轮的最短时长（秒）
+        rounds: 计时轮数
+
+    Returns:
+        场景结果列表
+    """
+    results = []
+    for item in SCENARIOS:
+        if pattern and pattern not in item.name:
+            continue
+        size = item.sizes[scale]
+        started = time.perf_counter()
+        operation = item.setup(size)
+        setup_seconds = time.perf_counter() - started
+        stats = measure(operation, min_time, rounds)
+        extra = getattr(operation, "extra", None)
+        result = {
+            "app": app,
+            "name": item.name,
+            "size": size,
+            "threshold": item.threshold,
+            "setup_seconds": round(setup_seconds, 3),
+            **stats,
+        }
+        if extra:
+            result["extra"] = extra
+        print(f"  {item.name} [{size}] {stats['median_us']:.1f} us ({stats['ops_per_sec']:.0f} ops/s)",
+              file=sys.stderr)
+        results.append(result)
+    return results
+
+def app_main(app: str) -> None:
+    """
+    服务基准脚本的入口：运行已注册的场景，把结果 JSON 写到标准输出
+
+    Args:
+        app: 服务名
+    """
+    parser = argparse.ArgumentParser(description=f"{app} 基准场景")
+    parser.add_argument("--scale", choices=SCALES, default="small", help="数据规模档位")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的场景")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮的最短时长（秒）")
+    parser.add_argument("--rounds", type=int, default=5, help="计时轮数")
+    args = parser.parse_args()
+    results = run_scenarios(app, args.scale, args.filter, args.min_time, args.rounds)
+    json.dump(results, sys.stdout)
+
+def run_app(script: str, args: List[str]) -> List[Dict[str, Any]]:
+    """
+    在子进程中运行一个服务的基准脚本
+
+    Args:
+        script: benchmarks 目录下的脚本名
+        args: 传给脚本的参数
+
+    Returns:
+        场景结果列表
+    """
+    path = os.path.join(ROOT, "benchmarks", script)
+    completed = subprocess.run([sys.executable, path] + args, stdout=subprocess.PIPE, check=True)
+    return json.loads(completed.stdout)
+
+def environment() -> Dict[str, Any]:
+    """记录结果时的运行环境，不同机器的结果不应直接对比"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    与基线对比中位耗时
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        threshold: 统一的回归阈值，为None时使用各场景自己的阈值
+
+    Returns:
+        每个同时出现在两边的场景的对比，regression 为True表示超出阈值
+    """
+    previous = {(r["app"], r["name"], str(r["size"])): r for r in baseline}
+    rows = []
+    for result in results:
+        base = previous.get((result["app"], result["name"], str(result["size"])))
+        if base is None or not base["median_us"]:
+            continue
+        ratio = result["median_us"] / base["median_us"]
+        limit = result["threshold"] if threshold is None else threshold
+        rows.append({
+            "app": result["app"],
+            "name": result["name"],
+            "size": result["size"],
+            "baseline_us": base["median_us"],
+            "current_us": result["median_us"],
+            "ratio": round(ratio, 3),
+            "threshold": limit,
+            "regression": ratio > 1 + limit,
+        })
+    return rows
@@ -0,0 +1,153 @@
+"""
+MCP Server 服务的基准场景
+
+由 run.py 在子进程中运行，也可以单独运行：
+    python benchmarks/mcp_server_bench.py --scale small --filter execute_step
+"""
+import functools
+import itertools
+import os
+import random
+import sys
+from typing import Any, Dict
+
+from harness import ROOT, app_main, scenario
+
+sys.path.insert(0, os.path.join(ROOT, "apps", "mcp-server"))
+
+from app.schemas.execution import ExecutionCreate  # noqa: E402
+from app.schemas.flow import FlowCreate  # noqa: E402
+from app.schemas.step import StepCreate  # noqa: E402
+from app.services.dsl_compiler import compile_dsl  # noqa: E402
+from app.services.flow_service import FlowService  # noqa: E402
+from app.services.log_service import LogService  # noqa: E402
+from app.services.rfc_service import RFCService  # noqa: E402
+
+SEED = 42
+RFC_FUNCTION = "BAPI_SALESORDER_CREATEFROMDAT2"
+POSITION = {"x": 0, "y": 0}
+
+class FakeConnection:
+    """代替 pyrfc.Connection 的 RFC 后端，立即返回固定结果"""
+
+    def call(self, function_name: str, **parameters) -> Dict[str, Any]:
+        return {"RETURN": [{"TYPE": "S", "MESSAGE": f"{function_name} OK"}], "SALESDOCUMENT": "0000012345"}
+
+    def close(self) -> None:
+        pass
+
+class FakeRFCService(RFCService):
+    """不连接 SAP 系统的 RFC 服务，测的是 RFC 调用以外的执行开销"""
+
+    def _connect(self):
+        self.connection = FakeConnection()
+
+def make_dsl(steps: int, seed: int = SEED) -> Dict[str, Any]:
+    """
+    生成合成流程 DSL：一条主链，随机加入跨层依赖
+
+    Args:
+        steps: 步骤数
+        seed: 随机种子
+
+    Returns:
+        流程 DSL
+    """
+    rng = random.Random(seed)
+    types = ("mcp_call", "condition", "loop", "subflow")
+    dsl_steps = [{"id": "s0", "type": "input", "next": "s1" if steps > 1 else None}]
+    for i in range(1, steps):
+        step = {"id": f"s{i}", "type": "output" if i == steps - 1 else rng.choice(types)}
+        if i < steps - 1:
+            step["next"] = f"s{i + 1}"
+        if step["type"] == "mcp_call":
+            step["config"] = {"rfc_function": RFC_FUNCTION}
+        elif step["type"] == "subflow":
+            step["config"] = {"flow_id": "flow-child"}
+        if i > 2 and rng.random() < 0.3:
+            step["depends_on"] = [f"s{rng.randrange(i - 1)}"]
+        dsl_steps.append(step)
+    if steps == 1:
+        del dsl_steps[0]["next"]
+    return {"steps": dsl_steps}
+
+@functools.lru_cache(maxsize=1)
+def flow_service_with(logs: int):
+    """
+    已有 logs 条执行日志的流程服务（同一规模的场景共用）
+
+    Returns:
+        (流程服务, 流程, RFC 步骤, 条件步骤)
+    """
+    service = FlowService(LogService())
+    service.rfc_service = FakeRFCService()
+    flow = service.create_flow(FlowCreate(name="销售订单", dsl=make_dsl(6)))
+    call = service.create_step(StepCreate(
+        flow_id=flow.id, name="创建订单", type="mcp_call", position=POSITION, config={"rfc_function": RFC_FUNCTION}
+    ))
+    check = service.create_step(StepCreate(flow_id=flow.id, name="检查", type="condition", position=POSITION, config={}))
+    execution = service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+    for i in range(logs):
+        service.log_service.create_log({
+            "flow_id": flow.id,
+            "execution_id": execution.id,
+            "step_id": check.id,
+            "user_id": "user-1",
+            "level": "info",
+            "message": "步骤 检查 执行完成",
+            "details": {"parameters": {}, "result": {"result": True}},
+        })
+    return service, flow, call, check
+
+LOG_SIZES = {"small": 10_000, "medium": 100_000, "large": 1_000_000}
+
+@scenario("flow_service.execute_step.mcp_call", LOG_SIZES)
+def execute_rfc_step(logs):
+    service, flow, call, _ = flow_service_with(logs)
+    execution = service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+    parameters = {"ORDER_HEADER_IN": {"DOC_TYPE": "TA", "SALES_ORG": "1000"}, "ORDER_ITEMS_IN": [{"MATERIAL": "M-01"}]}
+    return lambda: service.execute_step(execution.id, call.id, parameters)
+
+@scenario("flow_service.execute_step.condition", LOG_SIZES)
+def execute_condition_step(logs):
+    service, flow, _, check = flow_service_with(logs)
+    execution = service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+    return lambda: service.execute_step(execution.id, check.id, {})
+
+@scenario("flow_service.start_execution", LOG_SIZES)
+def start_execution(logs):
+    service, flow, _, _ = flow_service_with(logs)
+    service.publish_flow(flow.id)
+    request = ExecutionCreate(flow_id=flow.id, user_id="user-1", initial_parameters={"ORDER": "1"})
+    return lambda: service.start_execution(request)
+
+@scenario("dsl_compiler.compile_dsl", {"small": 10, "medium": 100, "large": 1_000})
+def compile_flow(steps):
+    dsl = make_dsl(steps)
+    resolver = FakeRFCService().search_rfc_schema
+    return lambda: compile_dsl(dsl, "flow-1", "1.0", resolver)
+
+@scenario("http.execute_step", {"small": 10_000, "medium": 100_000, "large": 1_000_000}, threshold=0.5)
+def http_execute_step(logs):
+    from fastapi.testclient import TestClient
+    from app.api.routes import executions
+    from app.main import app
+
+    service, flow, call, _ = flow_service_with(logs)
+    # 路由模块引用 deps 中的单例，替换为已写入合成数据的服务
+    executions.flow_service = service
+    execution = service.start_execution(ExecutionCreate(flow_id=flow.id, user_id="user-1"))
+    client = TestClient(app)
+    url = f"/executions/{execution.id}/execute_step"
+    parameters = itertools.cycle([{"ORDER": str(i)} for i in range(100)])
+
+    def operation():
+        return client.post(url, params={"step_id": call.id}, json=next(parameters))
+
+    response = operation()
+    if response.status_code != 200:
+        raise RuntimeError(f"请求失败: {response.status_code} {response.text[:200]}")
+    return operation
+
+if __name__ == "__main__":
+    app_main("mcp-server")
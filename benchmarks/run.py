@@ -0,0 +1,86 @@
+"""
+运行两个服务的基准场景，保存 JSON 结果并与基线对比
+
+每个服务的场景在独立子进程中运行（见 harness.py）。数据全部由固定种子的合成数据生成器产生，
+同一台机器上多次运行的结果可以直接对比；不同机器之间只应对比比例，不应对比绝对耗时。
+
+用法：
+    # 运行全部场景并保存为基线
+    python benchmarks/run.py --scale small --save-baseline benchmarks/baselines/small.json
+    # 之后与基线对比，任一场景的中位耗时超出阈值时退出码为 1
+    python benchmarks/run.py --scale small --baseline benchmarks/baselines/small.json --output results.json
+    # 只运行部分场景
+    python benchmarks/run.py --app saas-api --filter log_service
+"""
+import argparse
+import json
+import os
+import sys
+
+from harness import SCALES, compare, environment, run_app
+
+# 服务名 -> 场景脚本
+APPS = {
+    "saas-api": "saas_api_bench.py",
+    "mcp-server": "mcp_server_bench.py",
+}
+
+def load_results(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_results(path: str, report) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="服务基准测试")
+    parser.add_argument("--app", choices=sorted(APPS), action="append", help="只运行指定服务（可重复）")
+    parser.add_argument("--scale", choices=SCALES, default="small", help="数据规模档位")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的场景")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮的最短时长（秒）")
+    parser.add_argument("--rounds", type=int, default=5, help="计时轮数")
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", help="对比的基线 JSON")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, help="统一的回归阈值（如 0.2 表示慢 20%%），默认使用各场景的阈值")
+    args = parser.parse_args()
+
+    script_args = ["--scale", args.scale, "--min-time", str(args.min_time), "--rounds", str(args.rounds)]
+    if args.filter:
+        script_args += ["--filter", args.filter]
+
+    results = []
+    for app in args.app or sorted(APPS):
+        print(f"{app} ({args.scale})", file=sys.stderr)
+        results.extend(run_app(APPS[app], script_args))
+
+    report = {"scale": args.scale, "environment": environment(), "results": results}
+    exit_code = 0
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        if baseline.get("environment", {}).get("machine") != report["environment"]["machine"]:
+            print("警告：基线来自不同的机器架构，对比结果仅供参考", file=sys.stderr)
+        rows = compare(results, baseline["results"], args.threshold)
+        report["comparison"] = rows
+        print(f"\n{'场景':<44} {'规模':>9} {'基线 us':>11} {'本次 us':>11} {'比例':>7}")
+        for row in rows:
+            flag = "  回归" if row["regression"] else ""
+            print(f"{row['app'] + ':' + row['name']:<46} {row['size']:>9} {row['baseline_us']:>11.1f} "
+                  f"{row['current_us']:>11.1f} {row['ratio']:>7.2f}{flag}")
+        regressions = [row for row in rows if row["regression"]]
+        if regressions:
+            print(f"\n{len(regressions)} 个场景超出回归阈值", file=sys.stderr)
+            exit_code = 1
+
+    if args.output:
+        write_results(args.output, report)
+    if args.save_baseline:
+        write_results(args.save_baseline, report)
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+SaaS API 服务的基准场景
+
+由 run.py 在子进程中运行，也可以单独运行：
+    python benchmarks/saas_api_bench.py --scale small --filter log_service
+"""
+import functools
+import itertools
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from harness import ROOT, app_main, scenario
+
+sys.path.insert(0, os.path.join(ROOT, "apps", "saas-api"))
+
+from app.schemas.knowledge import KnowledgeItemCreate  # noqa: E402
+from app.schemas.log import LogSearch  # noqa: E402
+from app.services.ann_index import IVFIndex  # noqa: E402
+from app.services.log_service import LogService  # noqa: E402
+from app.services.rag_service import RAGService  # noqa: E402
+from app.services.tenant_service import TenantService  # noqa: E402
+from app.services.vector_index import VectorIndex  # noqa: E402
+from app.utils.cache import TTLCache  # noqa: E402
+from ann_recall import make_corpus, make_queries, recall_at_k  # noqa: E402
+
+SEED = 42
+# 合成数据的时间跨度
+DAYS = 30
+START = datetime(2025, 1, 1)
+
+# 合成文本用的 SAP 业务词汇
+VOCABULARY = (
+    "销售订单 采购订单 交货单 发票 物料 库存 供应商 客户 会计凭证 成本中心 "
+    "BAPI_SALESORDER_CREATEFROMDAT2 BAPI_PO_CREATE1 BAPI_GOODSMVT_CREATE RFC_READ_TABLE "
+    "超时 授权 锁定 过账 冲销 审批 批量 同步 接口 字段 校验 失败 成功 重试"
+).split()
+
+def make_log_rows(count: int, seed: int = SEED):
+    """
+    生成合成日志字段，租户和模板的分布是偏斜的（少数租户产生大部分日志）
+
+    Args:
+        count: 日志条数
+        seed: 随机种子
+
+    Returns:
+        逐条产生日志字段的生成器
+    """
+    rng = random.Random(seed)
+    tenants = [f"tenant-{i:03d}" for i in range(50)]
+    tenant_weights = [1 / (i + 1) for i in range(len(tenants))]
+    templates = [f"template-{i:03d}" for i in range(200)]
+    levels = ("info", "warn", "error")
+    step = DAYS * 86400 / max(count, 1)
+    for i in range(count):
+        level = rng.choices(levels, (80, 15, 5))[0]
+        yield {
+            "tenant_id": rng.choices(tenants, tenant_weights)[0],
+            "template_id": rng.choice(templates),
+            "process_id": f"process-{rng.randrange(count // 10 + 1)}",
+            "step_id": f"step-{rng.randrange(20)}",
+            "user_id": f"user-{rng.randrange(500)}",
+            "level": level,
+            "message": " ".join(rng.choices(VOCABULARY, k=6)),
+            "details": {"error_type": "RFCError"} if level == "error" else None,
+            "timestamp": START + timedelta(seconds=i * step),
+        }
+
+@functools.lru_cache(maxsize=1)
+def log_service_with(rows: int) -> LogService:
+    """写入 rows 条合成日志的日志服务（同一规模的场景共用）"""
+    service = LogService()
+    batch = []
+    for row in make_log_rows(rows):
+        batch.append(row)
+        if len(batch) == 50000:
+            service.create_logs(batch)
+            batch = []
+    service.create_logs(batch)
+    service.flush()
+    return service
+
+def make_knowledge(count: int, seed: int = SEED):
+    """生成合成知识库条目"""
+    rng = random.Random(seed)
+    categories = ["SD", "MM", "FI", "CO", "PP"]
+    for i in range(count):
+        yield KnowledgeItemCreate(
+            title=" ".join(rng.choices(VOCABULARY, k=4)),
+            content="。".join(" ".join(rng.choices(VOCABULARY, k=12)) for _ in range(rng.randint(3, 12))),
+            category=rng.choice(categories),
+            tags=rng.sample(VOCABULARY, 3),
+        )
+
+@functools.lru_cache(maxsize=1)
+def rag_service_with(items: int) -> RAGService:
+    """写入 items 个合成条目的 RAG 服务，关闭搜索结果缓存，测的是每次完整检索"""
+    service = RAGService(search_cache=TTLCache(maxsize=1, ttl=0))
+    for item in make_knowledge(items):
+        service.create_knowledge_item(item)
+    return service
+
+def knowledge_queries(count: int = 64):
+    rng = random.Random(SEED + 1)
+    return [" ".join(rng.sample(VOCABULARY, rng.randint(1, 3))) for _ in range(count)]
+
+@scenario("log_service.search_logs", {"small": 10_000, "medium": 1_000_000, "large": 10_000_000})
+def search_logs(rows):
+    service = log_service_with(rows)
+    searches = itertools.cycle([
+        LogSearch(tenant_id="tenant-003", level="error", limit=100),
+        LogSearch(template_id="template-042", limit=100),
+        LogSearch(tenant_id="tenant-001", message="超时", limit=100),
+    ])
+    return lambda: service.search_logs(next(searches))
+
+@scenario("log_service.get_log_stats", {"small": 10_000, "medium": 1_000_000, "large": 10_000_000})
+def get_log_stats(rows):
+    service = log_service_with(rows)
+    week = (START + timedelta(days=7), START + timedelta(days=14))
+    calls = itertools.cycle([
+        lambda: service.get_log_stats(),
+        lambda: service.get_log_stats(tenant_id="tenant-000"),
+        lambda: service.get_log_stats(template_id="template-007", start_time=week[0], end_time=week[1]),
+    ])
+    return lambda: next(calls)()
+
+def _search_scenario(mode):
+    def setup(items):
+        service = rag_service_with(items)
+        queries = itertools.cycle(knowledge_queries())
+        return lambda: service.search_knowledge(next(queries), limit=10, mode=mode)
+    return setup
+
+for _mode in ("keyword", "semantic", "hybrid"):
+    scenario(f"rag_service.search_knowledge.{_mode}", {"small": 1_000, "medium": 10_000, "large": 50_000})(
+        _search_scenario(_mode)
+    )
+
+@scenario("tenant_service.verify_api_key", {"small": 1_000, "medium": 10_000, "large": 100_000})
+def verify_api_key(keys):
+    service = TenantService()
+    for i in range(keys):
+        service.create_api_key(f"tenant-{i % 50:03d}", f"sk-bench-{i}")
+    # 最后创建的密钥和不存在的密钥
+    candidates = itertools.cycle([f"sk-bench-{keys - 1}", "sk-unknown"])
+    return lambda: service.verify_api_key(next(candidates))
+
+@scenario("ann_index.search", {"small": 10_000, "medium": 100_000, "large": 1_000_000})
+def ann_search(size):
+    dim, k = 128, 10
+    corpus = make_corpus(size, dim, clusters=128, seed=SEED)
+    queries = make_queries(corpus, 100, SEED)
+    keys = [f"doc-{i}" for i in range(size)]
+    index = IVFIndex(dim, nlist=256, train_size=size + 1)
+    index.upsert_many(keys, corpus)
+    index.train()
+    index.nprobe = 8
+
+    # 召回率是质量指标，记录在结果中但不参与耗时对比
+    exact_index = VectorIndex(dim)
+    exact_index.upsert_many(keys, corpus)
+    exact = [exact_index.search(query, k) for query in queries[:50]]
+    approx = [index.search(query, k) for query in queries[:50]]
+
+    cycle = itertools.cycle(np.asarray(queries))
+    operation = lambda: index.search(next(cycle), k)  # noqa: E731
+    operation.extra = {"recall_at_10": round(recall_at_k(exact, approx), 4), "nprobe": index.nprobe}
+    return operation
+
+@functools.lru_cache(maxsize=1)
+def http_client():
+    """完整应用（含全部路由和中间件）的测试客户端"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+def checked(operation):
+    """先调用一次，确认请求成功再计时"""
+    response = operation()
+    if response.status_code != 200:
+        raise RuntimeError(f"请求失败: {response.status_code} {response.text[:200]}")
+    return operation
+
+@scenario("http.logs_bulk", {"small": 100, "medium": 1_000, "large": 5_000}, threshold=0.5)
+def http_logs_bulk(lines):
+    client = http_client()
+    body = "\n".join(
+        json.dumps(row, ensure_ascii=False, default=datetime.isoformat) for row in make_log_rows(lines)
+    ).encode("utf-8")
+    headers = {"Content-Type": "application/x-ndjson"}
+    return checked(lambda: client.post("/logs/bulk", content=body, headers=headers))
+
+@scenario("http.knowledge_search", {"small": 1_000, "medium": 10_000, "large": 50_000}, threshold=0.5)
+def http_knowledge_search(items):
+    from app.api.routes import knowledge
+    client = http_client()
+    # 路由模块引用 deps 中的单例，替换为已写入合成数据的服务
+    knowledge.rag_service = rag_service_with(items)
+    queries = itertools.cycle(knowledge_queries())
+    return checked(lambda: client.post("/knowledge/search", params={"query": next(queries), "limit": 10}))
+
+@scenario("http.logs_page", {"small": 100, "medium": 500, "large": 1_000}, threshold=0.5)
+def http_logs_page(limit):
+    from app.api.routes import logs
+    client = http_client()
+    # 每页 limit 条，测的主要是列表响应的序列化开销
+    logs.log_service = log_service_with(10_000)
+    return checked(lambda: client.get("/logs/", params={"limit": limit}))
+
+if __name__ == "__main__":
+    app_main("saas-api")
@@ -0,0 +1,163 @@
+"""
+基于 asyncio 的 HTTP/1.1 长连接客户端
+
+压测客户端本身的开销越小，单个进程能产生的负载越高；这里只实现压测需要的部分
+（Content-Length 和 chunked 响应、连接复用），不依赖第三方 HTTP 库。
+"""
+import asyncio
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+class AsyncHTTPClient:
+    """
+    连接池复用长连接的异步 HTTP 客户端
+
+    最多 pool_size 个并发连接；复用的连接可能已被服务端关闭，此时换一个新连接重试一次。
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 100, timeout: float = 30.0,
+                 headers: Optional[Dict[str, str]] = None):
+        """
+        初始化客户端
+
+        Args:
+            base_url: 服务地址，例如 http://localhost:8001
+            pool_size: 最大连接数
+            timeout: 单次请求超时（秒）
+            headers: 每个请求都带上的请求头
+        """
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"无效的服务地址: {base_url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = parts.scheme == "https"
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Host": parts.netloc, "User-Agent": "mcp-loadtest", **(headers or {})}
+        self._idle: "asyncio.LifoQueue[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]" = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+        self.connections_opened = 0
+
+    async def request(self, method: str, path: str, body: Optional[bytes] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """
+        发送请求并读取完整响应
+
+        Args:
+            method: 请求方法
+            path: 请求路径（相对 base_url，可带查询串）
+            body: 请求体
+            headers: 额外的请求头
+
+        Returns:
+            (状态码, 响应体)
+
+        Raises:
+            OSError: 连接失败
+            asyncio.TimeoutError: 超时
+            ValueError: 响应格式错误
+        """
+        request_headers = dict(self.headers)
+        if headers:
+            request_headers.update(headers)
+        request_headers["Content-Length"] = str(len(body or b""))
+        head = f"{method} {self.base_path}{path} HTTP/1.1\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in request_headers.items()
+        ) + "\r\n"
+        payload = head.encode("latin-1") + (body or b"")
+
+        async with self._slots:
+            conn, reused = await self._acquire()
+            try:
+                status, data, keep_alive = await asyncio.wait_for(self._send(conn, payload), self.timeout)
+            except asyncio.TimeoutError:
+                # 超时不重试（TimeoutError 也是 OSError 的子类）
+                conn[1].close()
+                raise
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                conn[1].close()
+                if not reused:
+                    raise
+                # 空闲的长连接被服务端关闭，换新连接重试一次
+                conn = await self._connect()
+                try:
+                    status, data, keep_alive = await asyncio.wait_for(self._send(conn, payload), self.timeout)
+                except BaseException:
+                    conn[1].close()
+                    raise
+            except BaseException:
+                conn[1].close()
+                raise
+            if keep_alive:
+                self._idle.put_nowait(conn)
+            else:
+                conn[1].close()
+            return status, data
+
+    async def close(self) -> None:
+        """关闭所有空闲连接"""
+        while not self._idle.empty():
+            self._idle.get_nowait()[1].close()
+
+    async def _acquire(self):
+        if not self._idle.empty():
+            return self._idle.get_nowait(), True
+        return await self._connect(), False
+
+    async def _connect(self):
+        self.connections_opened += 1
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+
+    @staticmethod
+    async def _send(conn, payload: bytes) -> Tuple[int, bytes, bool]:
+        reader, writer = conn
+        writer.write(payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ValueError("连接已关闭")
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/"):
+            raise ValueError(f"无效的状态行: {status_line[:80]!r}")
+        status = int(parts[1])
+
+        length = None
+        chunked = False
+        keep_alive = parts[0] == b"HTTP/1.1"
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            value = value.strip()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding":
+                chunked = b"chunked" in value.lower()
+            elif name == b"connection":
+                keep_alive = value.lower() != b"close"
+
+        if chunked:
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # 跳过 trailer 直到空行
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b"".join(chunks)
+        elif length is not None:
+            data = await reader.readexactly(length)
+        elif status in (204, 304) or status < 200:
+            data = b""
+        else:
+            # 没有长度信息时读到连接关闭
+            data = await reader.read()
+            keep_alive = False
+        return status, data, keep_alive
@@ -0,0 +1,259 @@
+"""
+多租户混合流量压测
+
+虚拟用户（并发数）按阶段逐级增加，每个虚拟用户循环发送请求：按 Zipf 权重抽租户、按流量配比抽操作。
+每个阶段分别统计各操作的吞吐量、p50/p95/p99 延迟和错误率；吞吐量不再随并发增长而延迟明显上升的阶段
+即为饱和点，用于确定上线前的 worker 数量。
+
+用法（在仓库根目录执行，服务需已启动）：
+    python loadtest/run.py --saas-url http://localhost:8001 --mcp-url http://localhost:8000 \\
+        --ramp 10:200:10:20 --output loadtest-report.json
+    # 使用自定义流量配比和阶段
+    python loadtest/run.py --saas-url http://localhost:8001 --profile loadtest/profiles/default.json \\
+        --stages 20x30,50x30,100x60
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from client import AsyncHTTPClient
+from traffic import OPERATIONS, Traffic, make_tenants
+
+DEFAULT_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles", "default.json")
+
+# 判断饱和：并发增加后吞吐量增长不足 10%，且 p95 延迟上升超过 50%
+SATURATION_GAIN = 0.10
+SATURATION_LATENCY = 0.50
+
+class Recorder:
+    """按阶段和操作记录请求结果"""
+
+    def __init__(self):
+        self.stage = 0
+        # (阶段, 操作) -> 延迟列表（秒）
+        self.latencies: Dict[Tuple[int, str], List[float]] = {}
+        # (阶段, 操作) -> 状态码或异常类型 -> 次数
+        self.outcomes: Dict[Tuple[int, str], Dict[str, int]] = {}
+        self.errors: Dict[Tuple[int, str], int] = {}
+
+    def record(self, operation: str, latency: float, outcome: str, ok: bool) -> None:
+        key = (self.stage, operation)
+        self.latencies.setdefault(key, []).append(latency)
+        counts = self.outcomes.setdefault(key, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+        if not ok:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def summarize(self, stage: int, duration: float) -> Dict[str, Any]:
+        """
+        汇总一个阶段
+
+        Args:
+            stage: 阶段序号
+            duration: 阶段实际时长（秒）
+
+        Returns:
+            各操作和合计的吞吐量、延迟分位数（毫秒）和错误率
+        """
+        operations = {}
+        everything: List[float] = []
+        total_errors = 0
+        for (index, operation), latencies in sorted(self.latencies.items()):
+            if index != stage:
+                continue
+            errors = self.errors.get((index, operation), 0)
+            operations[operation] = _stats(latencies, errors, duration)
+            operations[operation]["outcomes"] = self.outcomes[(index, operation)]
+            everything.extend(latencies)
+            total_errors += errors
+        return {"operations": operations, "total": _stats(everything, total_errors, duration)}
+
+def _stats(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    count = len(ordered)
+
+    def percentile(p: float) -> Optional[float]:
+        if not count:
+            return None
+        return round(ordered[min(count - 1, int(p * count))] * 1000, 2)
+
+    return {
+        "requests": count,
+        "throughput": round(count / duration, 1) if duration else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2) if count else None,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+    }
+
+async def virtual_user(traffic: Traffic, recorder: Recorder, seed: int, think_time: float) -> None:
+    """循环发送请求直到任务被取消"""
+    rng = random.Random(seed)
+    while True:
+        operation, request = traffic.next_request(rng)
+        start = time.perf_counter()
+        try:
+            status, data = await request.client.request(request.method, request.path, request.body, request.headers)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            recorder.record(operation, time.perf_counter() - start, type(e).__name__, False)
+        else:
+            ok = status < 400
+            recorder.record(operation, time.perf_counter() - start, str(status), ok)
+            if ok and request.on_success is not None:
+                request.on_success(data)
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+async def run_stages(traffic: Traffic, stages: List[Tuple[int, float]], think_time: float,
+                     seed: int) -> List[Dict[str, Any]]:
+    """
+    逐阶段调整虚拟用户数并汇总结果
+
+    Args:
+        traffic: 流量模型
+        stages: (虚拟用户数, 持续秒数) 列表
+        think_time: 虚拟用户两次请求之间的平均间隔（秒），0 为不间断发送
+        seed: 随机种子
+
+    Returns:
+        各阶段的汇总
+    """
+    recorder = Recorder()
+    users: List[asyncio.Task] = []
+    results = []
+    try:
+        for index, (target, duration) in enumerate(stages):
+            recorder.stage = index
+            while len(users) < target:
+                users.append(asyncio.create_task(virtual_user(traffic, recorder, seed + len(users), think_time)))
+            while len(users) > target:
+                users.pop().cancel()
+            started = time.perf_counter()
+            await asyncio.sleep(duration)
+            summary = recorder.summarize(index, time.perf_counter() - started)
+            summary.update({"stage": index + 1, "users": target, "duration": duration})
+            results.append(summary)
+            print_stage(summary)
+    finally:
+        for task in users:
+            task.cancel()
+        await asyncio.gather(*users, return_exceptions=True)
+    return results
+
+def find_saturation(stages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    找出饱和点：第一个并发增加后吞吐量几乎不变而 p95 延迟明显上升的阶段
+
+    Returns:
+        饱和前最后一个阶段的并发数和吞吐量，没有饱和时返回None
+    """
+    for previous, current in zip(stages, stages[1:]):
+        before, after = previous["total"], current["total"]
+        if not before["throughput"] or not before["p95_ms"] or current["users"] <= previous["users"]:
+            continue
+        gain = after["throughput"] / before["throughput"] - 1
+        slowdown = (after["p95_ms"] or 0) / before["p95_ms"] - 1
+        if gain < SATURATION_GAIN and slowdown > SATURATION_LATENCY:
+            return {"users": previous["users"], "throughput": before["throughput"], "p95_ms": before["p95_ms"]}
+    return None
+
+def print_stage(summary: Dict[str, Any]) -> None:
+    print(f"\n阶段 {summary['stage']}: {summary['users']} 个虚拟用户, {summary['duration']:g}s")
+    print(f"  {'操作':<18} {'请求数':>8} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'错误率':>8}")
+    rows = list(summary["operations"].items()) + [("合计", summary["total"])]
+    for name, stats in rows:
+        print(f"  {name:<20} {stats['requests']:>8} {stats['throughput']:>9.1f} {_ms(stats['p50_ms'])} "
+              f"{_ms(stats['p95_ms'])} {_ms(stats['p99_ms'])} {stats['error_rate']:>9.2%}")
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+def parse_stages(text: str) -> List[Tuple[int, float]]:
+    """解析 "10x30,50x30"（虚拟用户数 x 秒数）"""
+    stages = []
+    for part in text.split(","):
+        users, _, seconds = part.strip().partition("x")
+        stages.append((int(users), float(seconds)))
+    return stages
+
+def parse_ramp(text: str) -> List[Tuple[int, float]]:
+    """解析 "10:200:10:20"（起始并发:最大并发:步长:每级秒数）"""
+    start, stop, step, seconds = text.split(":")
+    return [(users, float(seconds)) for users in range(int(start), int(stop) + 1, int(step))]
+
+async def main_async(args, profile: Dict[str, Any]) -> Dict[str, Any]:
+    if args.stages:
+        stages = parse_stages(args.stages)
+    elif args.ramp:
+        stages = parse_ramp(args.ramp)
+    else:
+        stages = [(stage["users"], stage["duration"]) for stage in profile["stages"]]
+    pool_size = max(users for users, _ in stages)
+
+    saas = AsyncHTTPClient(args.saas_url, pool_size=pool_size, timeout=args.timeout) if args.saas_url else None
+    mcp = AsyncHTTPClient(args.mcp_url, pool_size=pool_size, timeout=args.timeout) if args.mcp_url else None
+    tenant_config = profile.get("tenants", {})
+    tenants = make_tenants(tenant_config.get("count", 50), tenant_config.get("zipf_s", 1.1), args.keys)
+    traffic = Traffic(saas, mcp, tenants, profile["mix"], profile.get("log_batch_size", 200), args.seed)
+    try:
+        await traffic.setup()
+        results = await run_stages(traffic, stages, args.think_time, args.seed)
+    finally:
+        for client in (saas, mcp):
+            if client is not None:
+                await client.close()
+
+    saturation = find_saturation(results)
+    if saturation:
+        print(f"\n饱和点: 约 {saturation['users']} 个虚拟用户, {saturation['throughput']:.0f} rps, "
+              f"p95 {saturation['p95_ms']:.1f} ms")
+    else:
+        print("\n各阶段未出现饱和，可继续增加并发")
+    return {
+        "saas_url": args.saas_url,
+        "mcp_url": args.mcp_url,
+        "tenants": len(tenants),
+        "mix": profile["mix"],
+        "stages": results,
+        "saturation": saturation,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="多租户混合流量压测")
+    parser.add_argument("--saas-url", help="SaaS API 地址，例如 http://localhost:8001")
+    parser.add_argument("--mcp-url", help="MCP 服务器地址，例如 http://localhost:8000")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="流量配置 JSON（流量配比、租户分布、阶段）")
+    parser.add_argument("--stages", help="阶段列表，如 10x30,50x30（虚拟用户数 x 秒数），覆盖配置中的阶段")
+    parser.add_argument("--ramp", help="逐级加压，如 10:200:10:20（起始:最大:步长:每级秒数），覆盖配置中的阶段")
+    parser.add_argument("--keys", help="租户密钥文件，JSON 数组，每项为 {\"tenant_id\", \"api_key\"}")
+    parser.add_argument("--think-time", type=float, default=0.0, help="两次请求之间的平均间隔（秒）")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单次请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="报告 JSON 输出路径")
+    args = parser.parse_args()
+    if not args.saas_url and not args.mcp_url:
+        parser.error("至少需要 --saas-url 或 --mcp-url")
+
+    with open(args.profile, encoding="utf-8") as f:
+        profile = json.load(f)
+    unknown = set(profile["mix"]) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"配置中有未知的操作: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(main_async(args, profile))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    # 有阶段错误率超过 1% 时退出码为 1
+    sys.exit(1 if any(stage["total"]["error_rate"] > 0.01 for stage in report["stages"]) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+多租户流量模型
+
+租户按 Zipf 分布加权（少数大租户产生大部分流量），每个请求先按权重抽租户，再按流量配比抽操作。
+操作覆盖 SaaS API 的日志导入、日志搜索、知识库搜索、模板浏览，以及 MCP 服务器的执行启动和步骤执行。
+"""
+import bisect
+import collections
+import gzip
+import itertools
+import json
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+from client import AsyncHTTPClient
+
+# 流量配比中的操作 -> 所属服务
+OPERATIONS = {
+    "log_ingest": "saas",
+    "log_search": "saas",
+    "knowledge_search": "saas",
+    "template_browse": "saas",
+    "execution_start": "mcp",
+    "step_execute": "mcp",
+}
+
+# 合成请求用的 SAP 业务词汇
+VOCABULARY = (
+    "销售订单 采购订单 交货单 发票 物料 库存 供应商 客户 会计凭证 成本中心 "
+    "BAPI_SALESORDER_CREATEFROMDAT2 BAPI_PO_CREATE1 BAPI_GOODSMVT_CREATE RFC_READ_TABLE "
+    "超时 授权 锁定 过账 冲销 审批 批量 同步 接口 字段 校验 失败 成功 重试"
+).split()
+CATEGORIES = ("SD", "MM", "FI", "CO", "PP")
+RFC_FUNCTION = "BAPI_SALESORDER_CREATEFROMDAT2"
+
+class Tenant(NamedTuple):
+    """压测租户"""
+    id: str
+    api_key: str
+    weight: float
+
+def make_tenants(count: int, zipf_s: float, keys_path: Optional[str] = None) -> List[Tenant]:
+    """
+    生成压测租户
+
+    Args:
+        count: 租户数（提供 keys_path 时以文件为准）
+        zipf_s: Zipf 分布指数，越大流量越集中在头部租户，0 为均匀分布
+        keys_path: 租户密钥文件，JSON 数组，每项为 {"tenant_id": ..., "api_key": ...}；
+            为None时使用合成的租户ID和密钥（服务端未启用密钥校验时可用）
+
+    Returns:
+        按权重降序的租户列表
+    """
+    if keys_path:
+        with open(keys_path, encoding="utf-8") as f:
+            entries = [(entry["tenant_id"], entry["api_key"]) for entry in json.load(f)]
+    else:
+        entries = [(f"lt-tenant-{i:03d}", f"lt-key-{i:03d}") for i in range(count)]
+    return [Tenant(tenant_id, key, 1 / (rank + 1) ** zipf_s) for rank, (tenant_id, key) in enumerate(entries)]
+
+class WeightedChoice:
+    """按权重抽样（预先计算累积权重，单次抽样为二分查找）"""
+
+    def __init__(self, items: List[Any], weights: List[float]):
+        if not items or sum(weights) <= 0:
+            raise ValueError("抽样项为空或权重之和不为正")
+        self.items = items
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def pick(self, rng: random.Random) -> Any:
+        return self.items[bisect.bisect_right(self.cumulative, rng.random() * self.cumulative[-1])]
+
+class Request(NamedTuple):
+    """一个待发送的请求"""
+    client: AsyncHTTPClient
+    method: str
+    path: str
+    body: Optional[bytes]
+    headers: Dict[str, str]
+    on_success: Optional[Callable[[bytes], None]] = None
+
+class Traffic:
+    """
+    按流量配比生成请求
+
+    准备阶段在 MCP 服务器上创建压测流程和步骤，并读取 SaaS 平台已有的模板ID；
+    执行启动返回的执行实例进入一个有界池，步骤执行从池中取执行实例。
+    """
+
+    def __init__(self, saas: Optional[AsyncHTTPClient], mcp: Optional[AsyncHTTPClient], tenants: List[Tenant],
+                 mix: Dict[str, float], log_batch_size: int = 200, seed: int = 42):
+        """
+        初始化流量模型
+
+        Args:
+            saas: SaaS API 客户端，为None时不产生 SaaS 请求
+            mcp: MCP 服务器客户端，为None时不产生 MCP 请求
+            tenants: 压测租户
+            mix: 操作 -> 权重
+            log_batch_size: 每次日志导入的条数
+            seed: 随机种子
+        """
+        unknown = set(mix) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"未知的操作: {', '.join(sorted(unknown))}")
+        clients = {"saas": saas, "mcp": mcp}
+        # 没有配置地址的服务的操作不参与抽样
+        enabled = {op: weight for op, weight in mix.items() if weight > 0 and clients[OPERATIONS[op]] is not None}
+        self.saas = saas
+        self.mcp = mcp
+        self.tenants = WeightedChoice(tenants, [tenant.weight for tenant in tenants])
+        self.operations = WeightedChoice(list(enabled), list(enabled.values()))
+        self.log_batch_size = log_batch_size
+        self.seed = seed
+        self.template_ids: List[str] = []
+        self.flow_id: Optional[str] = None
+        self.step_ids: List[str] = []
+        self.executions: "collections.deque[str]" = collections.deque(maxlen=10000)
+        self._log_bodies: Dict[str, bytes] = {}
+
+    async def setup(self) -> None:
+        """准备压测数据"""
+        if self.mcp is not None:
+            await self._setup_flow()
+        if self.saas is not None:
+            status, body = await self.saas.request("GET", "/templates/catalog?limit=100")
+            if status == 200:
+                self.template_ids = [item["id"] for item in json.loads(body)["items"]]
+
+    def next_request(self, rng: random.Random) -> Tuple[str, Request]:
+        """
+        抽取下一个请求
+
+        Args:
+            rng: 虚拟用户自己的随机数生成器
+
+        Returns:
+            (操作名, 请求)
+        """
+        operation = self.operations.pick(rng)
+        if operation == "step_execute" and not self.executions:
+            # 还没有执行实例时先启动一个
+            operation = "execution_start"
+        tenant = self.tenants.pick(rng)
+        return operation, getattr(self, f"_{operation}")(tenant, rng)
+
+    async def _setup_flow(self) -> None:
+        dsl = {"steps": [
+            {"id": "start", "type": "input", "next": "create"},
+            {"id": "create", "type": "mcp_call", "config": {"rfc_function": RFC_FUNCTION}, "next": "check"},
+            {"id": "check", "type": "condition", "config": {"true_next": "end"}, "next": "end"},
+            {"id": "end", "type": "output"},
+        ]}
+        flow = await self._post_json(self.mcp, "/flows/", {"name": "压测流程", "dsl": dsl})
+        self.flow_id = flow["id"]
+        position = {"x": 0, "y": 0}
+        for name, step_type, config in (("创建订单", "mcp_call", {"rfc_function": RFC_FUNCTION}),
+                                        ("检查", "condition", {"true_next": "end"})):
+            step = await self._post_json(self.mcp, "/steps/", {
+                "flow_id": self.flow_id, "name": name, "type": step_type, "config": config, "position": position
+            })
+            self.step_ids.append(step["id"])
+        await self._post_json(self.mcp, f"/flows/{self.flow_id}/publish", None)
+
+    @staticmethod
+    async def _post_json(client: AsyncHTTPClient, path: str, payload: Any) -> Dict[str, Any]:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        status, data = await client.request("POST", path, body, {"Content-Type": "application/json"})
+        if status != 200:
+            raise RuntimeError(f"准备压测数据失败: POST {path} 返回 {status}: {data[:200]!r}")
+        return json.loads(data)
+
+    def _saas_headers(self, tenant: Tenant, content_type: str = "application/json") -> Dict[str, str]:
+        return {"X-API-Key": tenant.api_key, "X-Tenant-Id": tenant.id, "Content-Type": content_type}
+
+    def _log_ingest(self, tenant: Tenant, rng: random.Random) -> Request:
+        # 同一租户复用压缩好的请求体，批次ID每次不同，服务端按新批次写入
+        body = self._log_bodies.get(tenant.id)
+        if body is None:
+            body = self._log_bodies[tenant.id] = gzip.compress(self._log_lines(tenant, rng), compresslevel=6)
+        headers = self._saas_headers(tenant, "application/x-ndjson")
+        headers["Content-Encoding"] = "gzip"
+        headers["X-Batch-Id"] = f"loadtest-{uuid.uuid4().hex}"
+        return Request(self.saas, "POST", "/logs/bulk", body, headers)
+
+    def _log_lines(self, tenant: Tenant, rng: random.Random) -> bytes:
+        now = datetime.now(timezone.utc).isoformat()
+        lines = []
+        for _ in range(self.log_batch_size):
+            level = rng.choices(("info", "warn", "error"), (80, 15, 5))[0]
+            lines.append(json.dumps({
+                "tenant_id": tenant.id,
+                "template_id": f"template-{rng.randrange(50):03d}",
+                "process_id": f"process-{rng.randrange(1000)}",
+                "step_id": f"step-{rng.randrange(20)}",
+                "user_id": f"user-{rng.randrange(100)}",
+                "level": level,
+                "message": " ".join(rng.choices(VOCABULARY, k=6)),
+                "details": {"error_type": "RFCError"} if level == "error" else None,
+                "timestamp": now,
+            }, ensure_ascii=False))
+        return "\n".join(lines).encode("utf-8")
+
+    def _log_search(self, tenant: Tenant, rng: random.Random) -> Request:
+        search: Dict[str, Any] = {"tenant_id": tenant.id, "limit": 100}
+        kind = rng.random()
+        if kind < 0.4:
+            search["level"] = "error"
+        elif kind < 0.7:
+            search["message"] = rng.choice(VOCABULARY)
+        body = json.dumps(search, ensure_ascii=False).encode("utf-8")
+        return Request(self.saas, "POST", "/logs/search", body, self._saas_headers(tenant))
+
+    def _knowledge_search(self, tenant: Tenant, rng: random.Random) -> Request:
+        params = {
+            "query": " ".join(rng.sample(VOCABULARY, rng.randint(1, 3))),
+            "limit": 10,
+            "mode": rng.choices(("keyword", "semantic", "hybrid"), (50, 20, 30))[0],
+            "tenant_id": tenant.id,
+        }
+        return Request(self.saas, "POST", f"/knowledge/search?{urlencode(params)}", None, self._saas_headers(tenant))
+
+    def _template_browse(self, tenant: Tenant, rng: random.Random) -> Request:
+        if self.template_ids and rng.random() < 0.3:
+            return Request(self.saas, "GET", f"/templates/{rng.choice(self.template_ids)}", None,
+                           self._saas_headers(tenant))
+        params = {"limit": 20, "sort": rng.choice(("usage", "updated"))}
+        if rng.random() < 0.5:
+            params["category"] = rng.choice(CATEGORIES)
+        return Request(self.saas, "GET", f"/templates/catalog?{urlencode(params)}", None, self._saas_headers(tenant))
+
+    def _execution_start(self, tenant: Tenant, rng: random.Random) -> Request:
+        body = json.dumps({
+            "flow_id": self.flow_id,
+            "user_id": f"{tenant.id}-user-{rng.randrange(100)}",
+            "initial_parameters": {"ORDER_TYPE": "TA", "SALES_ORG": "1000"},
+        }).encode("utf-8")
+        return Request(self.mcp, "POST", "/executions/", body, {"Content-Type": "application/json"},
+                       on_success=lambda data: self.executions.append(json.loads(data)["id"]))
+
+    def _step_execute(self, tenant: Tenant, rng: random.Random) -> Request:
+        execution_id = self.executions[rng.randrange(len(self.executions))]
+        params = urlencode({"step_id": rng.choice(self.step_ids)})
+        body = json.dumps({"ORDER_HEADER_IN": {"DOC_TYPE": "TA"}, "ITEMS": rng.randint(1, 10)}).encode("utf-8")
+        return Request(self.mcp, "POST", f"/executions/{execution_id}/execute_step?{params}", body,
+                       {"Content-Type": "application/json"})